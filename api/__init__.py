@@ -0,0 +1,6 @@
+"""
+API HTTP/JSON sobre la capa de servicios
+Expone sensores, mediciones, solicitudes de informes, alertas y
+notificaciones para integraciones (gateways de ingesta, dashboards)
+Uso: python -m api [--puerto 8080] [--procesos 4]
+"""
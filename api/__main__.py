@@ -0,0 +1,3 @@
+from api.servidor import main
+
+main()
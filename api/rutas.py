@@ -0,0 +1,246 @@
+"""
+Rutas de la API
+Cada ruta recibe una Peticion y devuelve los datos de la respuesta (o
+(estado, datos)); los errores de validación y de negocio se informan con
+ErrorAPI. Las rutas solo llaman a los servicios, como los menús de ui/.
+"""
+
+from datetime import datetime
+from urllib.parse import unquote
+from config.db_config import API_CONFIG
+from services.alerta_service import AlertaService
+from services.auth_service import AuthService
+from services.notificacion_service import NotificacionService
+from services.proceso_service import ProcesoService
+from services.sensor_service import SensorService
+from utils.db_manager import db_manager
+from utils import instrumentacion
+
+
+class ErrorAPI(Exception):
+    """Error con el estado HTTP que corresponde informar"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+class Peticion:
+    """Datos de un pedido: parámetros de la URL, cuerpo JSON y sesión"""
+
+    def __init__(self, parametros, cuerpo, argumentos, session_id=None):
+        self.parametros = parametros
+        self.cuerpo = cuerpo
+        self.argumentos = argumentos
+        self.session_id = session_id
+        self.usuario = None
+
+    def texto(self, nombre, defecto=None):
+        return self.parametros.get(nombre, defecto)
+
+    def entero(self, nombre, defecto=None, minimo=None, maximo=None):
+        """Parámetro entero de la URL, validado contra el rango"""
+        valor = self.parametros.get(nombre)
+        if valor is None:
+            return defecto
+        try:
+            numero = int(valor)
+        except ValueError:
+            raise ErrorAPI(400, f"'{nombre}' debe ser un número entero")
+        if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+            raise ErrorAPI(400, f"'{nombre}' fuera de rango")
+        return numero
+
+    def fecha(self, nombre):
+        """Parámetro de fecha ISO (2024-05-01 o 2024-05-01T10:30)"""
+        valor = self.parametros.get(nombre)
+        if valor is None:
+            return None
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            raise ErrorAPI(400, f"'{nombre}' debe ser una fecha ISO")
+
+    def limite(self):
+        return self.entero('limite', API_CONFIG['limite_defecto'], 1, API_CONFIG['limite_maximo'])
+
+    def campo(self, nombre, tipo=str, obligatorio=True):
+        """Campo del cuerpo JSON convertido al tipo indicado"""
+        if nombre not in self.cuerpo:
+            if obligatorio:
+                raise ErrorAPI(400, f"Falta el campo '{nombre}'")
+            return None
+        try:
+            return tipo(self.cuerpo[nombre])
+        except (TypeError, ValueError):
+            raise ErrorAPI(400, f"Campo '{nombre}' inválido")
+
+    def usuario_id(self):
+        return self.usuario['user_id']
+
+
+def _pagina(datos, limite, siguiente):
+    return {'datos': datos, 'pagina': {'limite': limite, 'siguiente': siguiente}}
+
+
+def _paginar(obtener, peticion):
+    """
+    Paginación por desplazamiento para servicios que devuelven los primeros N
+    elementos (el cursor es la posición de inicio de la página). Cada página
+    vuelve a pedir las anteriores, así que el cursor se acota a
+    API_CONFIG['desplazamiento_maximo']
+
+    Args:
+        obtener: Recibe la cantidad de elementos a pedir al servicio
+    """
+    limite = peticion.limite()
+    desde = peticion.entero('cursor', 0, minimo=0, maximo=API_CONFIG['desplazamiento_maximo'])
+    elementos = obtener(desde + limite + 1)
+    hay_mas = len(elementos) > desde + limite and desde + limite <= API_CONFIG['desplazamiento_maximo']
+    siguiente = str(desde + limite) if hay_mas else None
+    return _pagina(elementos[desde:desde + limite], limite, siguiente)
+
+
+def salud(peticion):
+    """Ping a cada base y estado de los circuitos del proceso"""
+    estado = db_manager.verificar_salud()
+    ok = all(resultado['ok'] for motor, resultado in estado.items() if motor != 'circuitos')
+    return (200 if ok else 503), {'ok': ok, **estado}
+
+
+def iniciar_sesion(peticion):
+    success, mensaje, session_id, usuario = AuthService.login(
+        peticion.campo('email'), peticion.campo('password')
+    )
+    if not success:
+        raise ErrorAPI(401, mensaje)
+    return 201, {'session_id': session_id, 'usuario': usuario}
+
+
+def cerrar_sesion(peticion):
+    success, mensaje = AuthService.logout(peticion.session_id)
+    if not success:
+        raise ErrorAPI(500, mensaje)
+    return {'mensaje': mensaje}
+
+
+def listar_sensores(peticion):
+    sensores = SensorService.listar_sensores(peticion.texto('estado'), peticion.texto('pais'))
+    return _paginar(lambda cantidad: sensores, peticion)
+
+
+def _sensor(peticion):
+    sensor = SensorService.obtener_sensor(peticion.argumentos['sensor_id'])
+    if not sensor:
+        raise ErrorAPI(404, "Sensor no encontrado")
+    return sensor
+
+
+def obtener_sensor(peticion):
+    sensor = _sensor(peticion)
+    return {**sensor, 'ultima_medicion': SensorService.obtener_ultima_medicion(sensor['id'])}
+
+
+def listar_mediciones(peticion):
+    limite = peticion.limite()
+    sensor_id = _sensor(peticion)['id']
+    try:
+        mediciones, siguiente = SensorService.listar_mediciones(
+            sensor_id, peticion.fecha('desde'), peticion.fecha('hasta'),
+            limite=limite, cursor_pagina=peticion.texto('cursor')
+        )
+    except ValueError:
+        raise ErrorAPI(400, "'cursor' inválido")
+    return _pagina(mediciones, limite, siguiente)
+
+
+def registrar_medicion(peticion):
+    timestamp = peticion.campo('timestamp', datetime.fromisoformat, obligatorio=False)
+    success, mensaje = SensorService.registrar_medicion(
+        peticion.argumentos['sensor_id'],
+        peticion.campo('temperatura', float),
+        peticion.campo('humedad', float),
+        timestamp
+    )
+    if not success:
+        if mensaje == "Sensor no encontrado":
+            raise ErrorAPI(404, mensaje)
+        raise ErrorAPI(500 if mensaje.startswith("Error") else 409, mensaje)
+    return 201, {'mensaje': mensaje}
+
+
+def estadisticas_sensor(peticion):
+    dias = peticion.entero('dias', 7, 1, 365)
+    return SensorService.obtener_estadisticas_sensor(_sensor(peticion)['id'], dias) or {}
+
+
+def listar_procesos(peticion):
+    return ProcesoService.listar_procesos_disponibles()
+
+
+def listar_solicitudes(peticion):
+    return _paginar(
+        lambda cantidad: ProcesoService.listar_solicitudes_usuario(
+            peticion.usuario_id(), peticion.texto('estado'), cantidad
+        ),
+        peticion
+    )
+
+
+def solicitar_proceso(peticion):
+    parametros = peticion.campo('parametros', dict, obligatorio=False) or {}
+    success, mensaje, solicitud_id = ProcesoService.solicitar_proceso(
+        peticion.usuario_id(), peticion.campo('proceso_id', int), parametros
+    )
+    if not success:
+        raise ErrorAPI(404 if mensaje == "Proceso no encontrado" else 500, mensaje)
+    return 201, {'solicitud_id': solicitud_id, 'mensaje': mensaje}
+
+
+def listar_alertas(peticion):
+    return _paginar(
+        lambda cantidad: AlertaService.listar_alertas(peticion.texto('estado'), cantidad),
+        peticion
+    )
+
+
+def listar_notificaciones(peticion):
+    return _paginar(
+        lambda cantidad: NotificacionService.obtener_notificaciones(peticion.usuario_id(), cantidad),
+        peticion
+    )
+
+
+def marcar_notificacion(peticion):
+    NotificacionService.marcar_leida(peticion.usuario_id(), unquote(peticion.argumentos['notificacion_id']))
+    return {'mensaje': "Notificación marcada como leída"}
+
+
+def metricas(peticion):
+    """Métricas de instrumentación de este proceso (texto de Prometheus)"""
+    return instrumentacion.prometheus()
+
+
+TECNICOS = ('tecnico', 'administrador')
+
+# (método, ruta, función, roles): roles None = sin sesión, () = cualquier
+# usuario con sesión. Los datos crudos de sensores quedan para técnicos
+# (gateways y dashboards); los usuarios piden informes con /solicitudes
+RUTAS = [
+    ('GET', r'/salud', salud, None),
+    ('POST', r'/sesiones', iniciar_sesion, None),
+    ('DELETE', r'/sesiones', cerrar_sesion, ()),
+    ('GET', r'/sensores', listar_sensores, TECNICOS),
+    ('GET', r'/sensores/(?P<sensor_id>\d+)', obtener_sensor, TECNICOS),
+    ('GET', r'/sensores/(?P<sensor_id>\d+)/mediciones', listar_mediciones, TECNICOS),
+    ('POST', r'/sensores/(?P<sensor_id>\d+)/mediciones', registrar_medicion, TECNICOS),
+    ('GET', r'/sensores/(?P<sensor_id>\d+)/estadisticas', estadisticas_sensor, TECNICOS),
+    ('GET', r'/procesos', listar_procesos, ()),
+    ('GET', r'/solicitudes', listar_solicitudes, ()),
+    ('POST', r'/solicitudes', solicitar_proceso, ()),
+    ('GET', r'/alertas', listar_alertas, TECNICOS),
+    ('GET', r'/notificaciones', listar_notificaciones, ()),
+    ('POST', r'/notificaciones/(?P<notificacion_id>[^/]+)/leida', marcar_notificacion, ()),
+    ('GET', r'/metricas', metricas, ('administrador',)),
+]
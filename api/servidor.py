@@ -0,0 +1,286 @@
+"""
+Servidor HTTP de la API (http.server de la biblioteca estándar)
+Respuestas JSON con ETag (304 si no cambiaron) y gzip cuando el cliente lo
+acepta. Con --procesos N el socket se abre antes de crear los procesos y
+todos lo atienden; cada proceso tiene sus propias conexiones a las bases
+(db_manager conecta recién con el primer pedido, ya en el proceso hijo).
+
+La conexión MySQL de db_manager no se comparte entre hilos, así que dentro
+de un proceso las llamadas a servicios se atienden de a una: los hilos
+solo reparten la lectura de pedidos y la escritura de respuestas, y la
+concurrencia se escala con procesos.
+
+Los servicios se llaman dentro de resiliencia.propagar_caidas(): una base
+caída (o con el circuito abierto) es un 503 y no una lista vacía.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import signal
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from config.db_config import API_CONFIG
+from services.auth_service import AuthService
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import resiliencia
+from api.rutas import ErrorAPI, Peticion, RUTAS
+
+# Cuerpo máximo de un pedido
+MAXIMO_CUERPO = 1024 * 1024
+
+_RUTAS = [(metodo, re.compile(patron), funcion, roles) for metodo, patron, funcion, roles in RUTAS]
+
+# Una llamada a servicios a la vez por proceso (ver docstring del módulo)
+_lock_servicios = threading.Lock()
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+def _resolver(metodo, ruta):
+    """
+    Ruta que atiende el pedido
+
+    Returns:
+        (función, argumentos, roles)
+    """
+    metodos = []
+    for metodo_ruta, patron, funcion, roles in _RUTAS:
+        coincidencia = patron.fullmatch(ruta)
+        if not coincidencia:
+            continue
+        if metodo_ruta == metodo:
+            argumentos = {
+                nombre: int(valor) if valor.isdigit() else valor
+                for nombre, valor in coincidencia.groupdict().items()
+            }
+            return funcion, argumentos, roles
+        metodos.append(metodo_ruta)
+
+    if metodos:
+        raise ErrorAPI(405, f"Método no permitido (usar {', '.join(metodos)})")
+    raise ErrorAPI(404, "Ruta inexistente")
+
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """Atiende un pedido: ruta, sesión, servicio y respuesta"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SensoresAPI/1.0'
+
+    def do_GET(self):
+        self._atender('GET')
+
+    def do_POST(self):
+        self._atender('POST')
+
+    def do_DELETE(self):
+        self._atender('DELETE')
+
+    def _leer_cuerpo(self):
+        """
+        Lee el cuerpo completo del pedido; va antes de cualquier validación
+        para que un error no deje bytes sin leer en una conexión keep-alive
+        """
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            raise ErrorAPI(411, "Se requiere Content-Length")
+        try:
+            largo = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            raise ErrorAPI(400, "Content-Length inválido")
+        if largo < 0:
+            raise ErrorAPI(400, "Content-Length inválido")
+        if largo > MAXIMO_CUERPO:
+            raise ErrorAPI(413, "Cuerpo demasiado grande")
+        return self.rfile.read(largo) if largo else b''
+
+    @staticmethod
+    def _json(crudo):
+        if not crudo:
+            return {}
+        try:
+            cuerpo = json.loads(crudo)
+        except ValueError:
+            raise ErrorAPI(400, "El cuerpo debe ser JSON")
+        if not isinstance(cuerpo, dict):
+            raise ErrorAPI(400, "El cuerpo debe ser un objeto JSON")
+        return cuerpo
+
+    def _autenticar(self, peticion, roles):
+        autorizacion = self.headers.get('Authorization', '')
+        if not autorizacion.startswith('Bearer '):
+            raise ErrorAPI(401, "Falta la sesión (Authorization: Bearer <session_id>)")
+
+        peticion.session_id = autorizacion[len('Bearer '):].strip()
+        valida, usuario = AuthService.verificar_sesion(peticion.session_id)
+        if not valida:
+            raise ErrorAPI(401, "Sesión inválida o vencida")
+        if roles and not set(roles) & set(usuario['roles']):
+            raise ErrorAPI(403, "Sin permisos para esta operación")
+        peticion.usuario = usuario
+
+    def _atender(self, metodo):
+        url = urlsplit(self.path)
+        crudo = None
+        try:
+            crudo = self._leer_cuerpo()
+            funcion, argumentos, roles = _resolver(metodo, url.path.rstrip('/') or '/')
+            peticion = Peticion(dict(parse_qsl(url.query)), self._json(crudo), argumentos)
+
+            with _lock_servicios, resiliencia.propagar_caidas():
+                if roles is not None:
+                    self._autenticar(peticion, roles)
+                with logger.contexto(api=f"{metodo} {url.path}"):
+                    resultado = funcion(peticion)
+            estado, datos = resultado if isinstance(resultado, tuple) else (200, resultado)
+
+        except ErrorAPI as e:
+            estado, datos = e.estado, {'error': e.mensaje}
+        except resiliencia.CircuitoAbierto as e:
+            estado, datos = 503, {'error': str(e)}
+        except Exception as e:
+            if resiliencia.es_error_de_conexion(e):
+                logger.warning("Base no disponible en %s %s: %s", metodo, url.path, e)
+                estado, datos = 503, {'error': "Base de datos no disponible"}
+            else:
+                logger.error("Error en %s %s", metodo, url.path, excepcion=e)
+                estado, datos = 500, {'error': "Error interno"}
+
+        if crudo is None:
+            # Sin el cuerpo leído la conexión quedaría desincronizada
+            self.close_connection = True
+        self._responder(estado, datos, metodo)
+
+    def _responder(self, estado, datos, metodo):
+        if isinstance(datos, str):
+            cuerpo, tipo = datos.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+        else:
+            cuerpo = json.dumps(datos, ensure_ascii=False, default=_serializar).encode('utf-8')
+            tipo = 'application/json; charset=utf-8'
+
+        encabezados = {'Content-Type': tipo}
+        if metodo == 'GET' and estado == 200:
+            # ETag del contenido: el cliente revalida y recibe 304 sin cuerpo
+            etag = f'"{hashlib.sha1(cuerpo).hexdigest()[:20]}"'
+            encabezados['ETag'] = etag
+            encabezados['Cache-Control'] = 'private, no-cache'
+            pedidos = [re.sub(r'^W/', '', e.strip()) for e in self.headers.get('If-None-Match', '').split(',')]
+            if etag in pedidos or '*' in pedidos:
+                self.send_response(304)
+                for nombre, valor in encabezados.items():
+                    if nombre != 'Content-Type':
+                        self.send_header(nombre, valor)
+                self.end_headers()
+                return
+
+        if len(cuerpo) >= API_CONFIG['gzip_minimo_bytes']:
+            encabezados['Vary'] = 'Accept-Encoding'
+            if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                cuerpo = gzip.compress(cuerpo, compresslevel=5)
+                encabezados['Content-Encoding'] = 'gzip'
+
+        self.send_response(estado)
+        for nombre, valor in encabezados.items():
+            self.send_header(nombre, valor)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        logger.debug(formato, *args, cliente=self.client_address[0])
+
+
+def _interrumpir(*_):
+    """SIGTERM termina igual que Ctrl+C (ejecutando los finally)"""
+    raise KeyboardInterrupt
+
+
+def _atender_hijo(servidor):
+    """Bucle de un proceso hijo"""
+    signal.signal(signal.SIGTERM, _interrumpir)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db_manager.cerrar_conexiones()
+        logger.detener()
+        os._exit(0)
+
+
+def servir(host=None, puerto=None, procesos=None):
+    """
+    Atiende la API hasta que se interrumpa
+
+    Args:
+        procesos: Procesos que comparten el socket (1 = este mismo proceso)
+    """
+    host = host or API_CONFIG['host']
+    puerto = puerto or API_CONFIG['puerto']
+    procesos = procesos or API_CONFIG['procesos']
+
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorAPI)
+    print(f"[*] API en http://{host}:{puerto} ({procesos} proceso(s))")
+
+    # Sin fork (Windows) se atiende en un solo proceso
+    if procesos <= 1 or not hasattr(os, 'fork'):
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            print("\n[!] API detenida")
+        finally:
+            servidor.server_close()
+            db_manager.cerrar_conexiones()
+        return
+
+    # El padre no loguea ni conecta antes del fork: los hijos no heredan
+    # conexiones abiertas ni el hilo de escritura del logger
+    signal.signal(signal.SIGTERM, _interrumpir)
+    hijos = []
+    for _ in range(procesos):
+        pid = os.fork()
+        if pid == 0:
+            _atender_hijo(servidor)
+        hijos.append(pid)
+
+    try:
+        for pid in hijos:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        print("\n[!] API detenida")
+    finally:
+        for pid in hijos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in hijos:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        servidor.server_close()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="API HTTP/JSON del sistema de sensores")
+    parser.add_argument('--host', default=API_CONFIG['host'])
+    parser.add_argument('--puerto', type=int, default=API_CONFIG['puerto'])
+    parser.add_argument('--procesos', type=int, default=API_CONFIG['procesos'])
+    args = parser.parse_args()
+
+    servir(args.host, args.puerto, args.procesos)
@@ -0,0 +1,3 @@
+"""
+Benchmarks y verificaciones de rendimiento contra las bases de datos
+"""
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de la API HTTP
+Uso: python -m benchmarks.carga_api [--url http://localhost:8080] [--concurrencia 8] [--duracion 30]
+
+Con la API corriendo (python -m api --procesos N) sobre los datos del
+generador, cada hilo inicia sesión como técnico (bench1) y repite una
+mezcla de pedidos de lectura e ingesta con conexiones keep-alive. Las
+lecturas repetidas envían If-None-Match, como un dashboard que revalida.
+Muestra pedidos por segundo y percentiles por tipo de pedido, y guarda el
+resultado en benchmarks/resultados/api_<fecha>_<commit>.json.
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+RAIZ = Path(__file__).parent
+DIRECTORIO_RESULTADOS = RAIZ / "resultados"
+
+# nombre -> peso en la mezcla de pedidos
+MEZCLA = {
+    'sensores': 2,
+    'sensor': 3,
+    'mediciones': 4,
+    'mediciones_revalidar': 3,
+    'ingesta': 6,
+    'solicitudes': 1,
+    'notificaciones': 2,
+    'alertas': 1,
+}
+
+
+class Cliente:
+    """Conexión keep-alive de un hilo, con la sesión y los ETag vistos"""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+        self.session_id = None
+        self.etags = {}
+
+    def pedir(self, metodo, ruta, cuerpo=None, revalidar=False):
+        """
+        Returns:
+            (estado, datos decodificados o None)
+        """
+        encabezados = {'Accept-Encoding': 'gzip'}
+        if self.session_id:
+            encabezados['Authorization'] = f"Bearer {self.session_id}"
+        if revalidar and ruta in self.etags:
+            encabezados['If-None-Match'] = self.etags[ruta]
+        datos = None
+        if cuerpo is not None:
+            datos = json.dumps(cuerpo).encode('utf-8')
+            encabezados['Content-Type'] = 'application/json'
+
+        try:
+            self.conexion.request(metodo, ruta, body=datos, headers=encabezados)
+            respuesta = self.conexion.getresponse()
+            contenido = respuesta.read()
+        except (OSError, http.client.HTTPException):
+            # Conexión cerrada por el servidor: se reabre en el próximo pedido
+            self.conexion.close()
+            raise
+
+        if respuesta.getheader('ETag'):
+            self.etags[ruta] = respuesta.getheader('ETag')
+        if respuesta.getheader('Content-Encoding') == 'gzip':
+            contenido = gzip.decompress(contenido)
+        if respuesta.status == 304 or not contenido:
+            return respuesta.status, None
+        if respuesta.getheader('Content-Type', '').startswith('application/json'):
+            return respuesta.status, json.loads(contenido)
+        return respuesta.status, contenido
+
+
+def iniciar_sesion(cliente, email, password):
+    estado, datos = cliente.pedir('POST', '/sesiones', {'email': email, 'password': password})
+    if estado != 201:
+        raise RuntimeError(f"No se pudo iniciar sesión como {email}: {datos}")
+    cliente.session_id = datos['session_id']
+
+
+def _pedido(nombre, rng, sensores):
+    """(método, ruta, cuerpo, revalidar) de un pedido de la mezcla"""
+    sensor_id = rng.choice(sensores)
+    if nombre == 'sensores':
+        return 'GET', '/sensores?limite=50', None, False
+    if nombre == 'sensor':
+        return 'GET', f"/sensores/{sensor_id}", None, False
+    if nombre == 'mediciones':
+        return 'GET', f"/sensores/{sensor_id}/mediciones?limite=100", None, False
+    if nombre == 'mediciones_revalidar':
+        # Pocos sensores: las revalidaciones repiten rutas ya vistas
+        return 'GET', f"/sensores/{rng.choice(sensores[:5])}/mediciones?limite=100", None, True
+    if nombre == 'ingesta':
+        return 'POST', f"/sensores/{sensor_id}/mediciones", {
+            'temperatura': round(rng.uniform(0, 35), 2), 'humedad': round(rng.uniform(20, 95), 2)
+        }, False
+    if nombre == 'solicitudes':
+        return 'GET', '/solicitudes?limite=20', None, False
+    if nombre == 'notificaciones':
+        return 'GET', '/notificaciones', None, False
+    return 'GET', '/alertas?limite=20', None, False
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=RAIZ
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentil(valores, p):
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def ejecutar(url, email, password, concurrencia, duracion, semilla=42):
+    """
+    Corre la mezcla con 'concurrencia' hilos durante 'duracion' segundos
+
+    Returns:
+        Diccionario de resultados (el contenido del JSON)
+    """
+    cliente = Cliente(url)
+    iniciar_sesion(cliente, email, password)
+    _, pagina = cliente.pedir('GET', '/sensores?limite=500&estado=activo')
+    sensores = [s['id'] for s in pagina['datos'] if s['codigo'].startswith('BENCH-')]
+    if not sensores:
+        raise RuntimeError("No hay sensores de benchmark: ejecutar antes python -m benchmarks.generador")
+
+    tiempos = defaultdict(list)
+    estados = defaultdict(Counter)
+    lock = threading.Lock()
+    fin = time.monotonic() + duracion
+    nombres, pesos = list(MEZCLA), list(MEZCLA.values())
+
+    def trabajar(numero):
+        rng = random.Random(semilla + numero)
+        propio = Cliente(url)
+        iniciar_sesion(propio, email, password)
+        locales = defaultdict(list)
+        estados_locales = defaultdict(Counter)
+        while time.monotonic() < fin:
+            nombre = rng.choices(nombres, pesos)[0]
+            metodo, ruta, cuerpo, revalidar = _pedido(nombre, rng, sensores)
+            inicio = time.perf_counter()
+            try:
+                estado, _ = propio.pedir(metodo, ruta, cuerpo, revalidar)
+            except (OSError, http.client.HTTPException):
+                estado = 'conexion'
+            locales[nombre].append((time.perf_counter() - inicio) * 1000)
+            estados_locales[nombre][str(estado)] += 1
+        with lock:
+            for nombre, valores in locales.items():
+                tiempos[nombre].extend(valores)
+                estados[nombre].update(estados_locales[nombre])
+
+    inicio = time.monotonic()
+    hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    transcurrido = time.monotonic() - inicio
+
+    resultados = {}
+    for nombre in MEZCLA:
+        valores = sorted(tiempos.get(nombre, []))
+        if not valores:
+            continue
+        resultados[nombre] = {
+            'pedidos': len(valores),
+            'estados': dict(estados[nombre]),
+            'p50_ms': round(_percentil(valores, 50), 3),
+            'p95_ms': round(_percentil(valores, 95), 3),
+            'p99_ms': round(_percentil(valores, 99), 3),
+            'max_ms': round(valores[-1], 3)
+        }
+
+    total = sum(r['pedidos'] for r in resultados.values())
+    return {
+        'commit': _commit_actual(),
+        'fecha': datetime.now().isoformat(),
+        'url': url,
+        'concurrencia': concurrencia,
+        'duracion_segundos': round(transcurrido, 1),
+        'pedidos': total,
+        'pedidos_por_segundo': round(total / transcurrido, 1),
+        'escenarios': resultados
+    }
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API")
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--email', default='bench1@bench.local', help="usuario técnico")
+    parser.add_argument('--password', default='bench123')
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--duracion', type=int, default=30, help="segundos")
+    parser.add_argument('--salida', help="archivo JSON (defecto: benchmarks/resultados/api_<fecha>_<commit>.json)")
+    args = parser.parse_args()
+
+    print(f"⏱️  {args.concurrencia} clientes durante {args.duracion}s contra {args.url}...")
+    resultado = ejecutar(args.url, args.email, args.password, args.concurrencia, args.duracion)
+
+    print(f"\n{'Pedido':<22} {'Cantidad':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  Estados")
+    for nombre, r in resultado['escenarios'].items():
+        estados = ', '.join(f"{estado}: {cantidad}" for estado, cantidad in sorted(r['estados'].items()))
+        print(f"{nombre:<22} {r['pedidos']:>9} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}  {estados}")
+    print(f"\n{resultado['pedidos']} pedidos, {resultado['pedidos_por_segundo']} por segundo")
+
+    salida = Path(args.salida) if args.salida else (
+        DIRECTORIO_RESULTADOS / f"api_{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit'] or 'sin_commit'}.json"
+    )
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"✅ Resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
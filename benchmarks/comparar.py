@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compara dos resultados de benchmarks.escenarios
+Uso: python -m benchmarks.comparar base.json nuevo.json [--umbral 20]
+
+Muestra p50 y p95 de cada escenario y la variación porcentual; termina con
+código 1 si algún p95 empeoró más que el umbral.
+"""
+
+import argparse
+import json
+import sys
+
+
+def _cargar(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+def _variacion(antes, despues):
+    if not antes or despues is None:
+        return None
+    return (despues - antes) / antes * 100
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmarks")
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=20, help="empeoramiento tolerado del p95, en %%")
+    args = parser.parse_args()
+
+    base, nuevo = _cargar(args.base), _cargar(args.nuevo)
+    print(f"Base:  {base['commit']} ({base['fecha'][:19]})")
+    print(f"Nuevo: {nuevo['commit']} ({nuevo['fecha'][:19]})")
+
+    if base.get('carga', {}).get('sensores') != nuevo.get('carga', {}).get('sensores') \
+            or base.get('carga', {}).get('dias') != nuevo.get('carga', {}).get('dias'):
+        print("⚠️ Las cargas de datos son distintas; la comparación puede no ser válida")
+    if base.get('simulado') or nuevo.get('simulado'):
+        print("⚠️ Incluye resultados en modo simulado")
+
+    print(f"\n{'Escenario':<26} {'p50 base':>10} {'p50 nuevo':>10} {'Δ p50':>8} {'p95 base':>10} {'p95 nuevo':>10} {'Δ p95':>8}")
+
+    regresiones = []
+    for nombre in sorted(set(base['escenarios']) | set(nuevo['escenarios'])):
+        antes = base['escenarios'].get(nombre, {})
+        despues = nuevo['escenarios'].get(nombre, {})
+
+        celdas = []
+        for percentil in ('p50_ms', 'p95_ms'):
+            variacion = _variacion(antes.get(percentil), despues.get(percentil))
+            celdas.append(f"{antes.get(percentil, '-'):>10} {despues.get(percentil, '-'):>10} "
+                          + (f"{variacion:>+7.1f}%" if variacion is not None else f"{'-':>8}"))
+            if percentil == 'p95_ms' and variacion is not None and variacion > args.umbral:
+                regresiones.append(nombre)
+
+        print(f"{nombre:<26} {' '.join(celdas)}")
+
+    if regresiones:
+        print(f"\n❌ p95 empeoró más de {args.umbral:.0f}% en: {', '.join(regresiones)}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones por encima del umbral")
+
+
+if __name__ == "__main__":
+    main()
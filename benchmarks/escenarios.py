@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Escenarios cronometrados sobre los datos del generador
+Uso: python -m benchmarks.escenarios [--repeticiones N] [--solo a,b] [--salida archivo.json]
+
+Cada escenario llama a los mismos servicios que la aplicación (ingesta,
+informes, consulta en línea, bandeja de entrada, login y dashboards) y se
+repite N veces después de una ejecución de calentamiento. El resultado es
+un JSON con el commit, los parámetros de la carga y percentiles por
+escenario, para comparar entre commits con benchmarks.comparar.
+
+Con --simulado se genera una carga chica en memoria antes de correr.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from services.auth_service import AuthService
+from services.ejecucion_service import EjecucionService
+from services.facturacion_service import FacturacionService
+from services.mensaje_service import MensajeService
+from services.notificacion_service import NotificacionService
+from services.proceso_service import ProcesoService
+from services.sensor_service import SensorService
+from services.snapshot_service import SnapshotService
+from utils.db_manager import db_manager
+from utils import particiones
+from benchmarks import generador
+
+DIRECTORIO_RESULTADOS = Path(__file__).parent / "resultados"
+
+
+class Contexto:
+    """Datos de la carga que usan los escenarios para elegir parámetros"""
+
+    def __init__(self, semilla):
+        self.rng = random.Random(semilla)
+
+        cursor = db_manager.get_mysql_cursor()
+        cursor.execute("SELECT id, ciudad, pais FROM sensores WHERE codigo LIKE %s",
+                       (generador.PREFIJO_SENSOR + '%',))
+        self.sensores = cursor.fetchall()
+        cursor.execute("SELECT id, email FROM usuarios WHERE email LIKE %s",
+                       ('%' + generador.DOMINIO_USUARIO,))
+        self.usuarios = cursor.fetchall()
+        cursor.close()
+
+        if not self.sensores or not self.usuarios:
+            raise RuntimeError("No hay datos de benchmark: ejecutar antes python -m benchmarks.generador")
+
+        parametros = db_manager.conectar_redis().get(generador.CLAVE_PARAMETROS)
+        self.parametros = json.loads(parametros) if parametros else {}
+        self.dias = self.parametros.get('dias', 30)
+
+    def sensor(self):
+        return self.rng.choice(self.sensores)
+
+    def usuario(self):
+        return self.rng.choice(self.usuarios)
+
+    def parametros_informe(self, dias=30):
+        """Zona de un sensor al azar (las ciudades con más sensores salen más) y los últimos días"""
+        sensor = self.sensor()
+        fin = datetime.now()
+        inicio = fin - timedelta(days=min(dias, self.dias))
+        zona = {'ciudad': sensor['ciudad']} if self.rng.random() < 0.5 else {'pais': sensor['pais']}
+        return {**zona, 'fecha_inicio': f"{inicio:%Y-%m-%d}", 'fecha_fin': f"{fin:%Y-%m-%d}"}
+
+
+def _exigir(resultado):
+    """Convierte las respuestas de error de los servicios en excepciones"""
+    if isinstance(resultado, tuple) and resultado and resultado[0] is False:
+        raise RuntimeError(resultado[1])
+    if isinstance(resultado, dict) and 'error' in resultado:
+        raise RuntimeError(resultado['error'])
+    return resultado
+
+
+def ingesta_unitaria(ctx):
+    sensor = ctx.sensor()
+    _exigir(SensorService.registrar_medicion(
+        sensor['id'], ctx.rng.uniform(0, 35), ctx.rng.uniform(20, 95)
+    ))
+
+
+def ingesta_lote(ctx, cantidad=1000):
+    ahora = datetime.now()
+    mediciones = []
+    for _ in range(cantidad):
+        sensor = ctx.sensor()
+        mediciones.append({
+            'sensor_id': sensor['id'], 'timestamp': ahora,
+            'temperatura': ctx.rng.uniform(0, 35), 'humedad': ctx.rng.uniform(20, 95),
+            'ciudad': sensor['ciudad'], 'pais': sensor['pais']
+        })
+    db = db_manager.conectar_mongodb()
+    particiones.coleccion_escritura(db, ahora).insert_many(mediciones, ordered=False)
+
+
+def _informe(ejecutar, **extra):
+    def escenario(ctx):
+        _exigir(ejecutar({**ctx.parametros_informe(), **extra}))
+    return escenario
+
+
+def consulta_online(ctx):
+    _exigir(EjecucionService._ejecutar_consulta_online({'zona': ctx.sensor()['ciudad']}))
+
+
+def bandeja_entrada(ctx):
+    """Primera y segunda página de la bandeja (los usuarios con más mensajes salen igual que el resto)"""
+    usuario_id = ctx.usuario()['id']
+    mensajes = MensajeService.listar_mensajes_recibidos(usuario_id, limite=50)
+    cursor = MensajeService.siguiente_cursor(mensajes, 50)
+    if cursor:
+        MensajeService.listar_mensajes_recibidos(usuario_id, limite=50, cursor_pagina=cursor)
+    MensajeService.contar_mensajes_no_leidos(usuario_id)
+
+
+def login(ctx):
+    success, mensaje, session_id, _ = AuthService.login(ctx.usuario()['email'], generador.PASSWORD)
+    if not success:
+        raise RuntimeError(mensaje)
+    AuthService.logout(session_id)
+
+
+def dashboard_usuario(ctx):
+    usuario_id = ctx.usuario()['id']
+    ProcesoService.contar_solicitudes_por_estado(usuario_id)
+    FacturacionService.obtener_cuenta_corriente(usuario_id)
+    NotificacionService.contar_no_leidas(usuario_id)
+
+
+def dashboard_admin(ctx):
+    if SnapshotService.obtener() is None:
+        raise RuntimeError("Snapshot no disponible")
+
+
+def snapshot_generar(ctx):
+    _exigir(SnapshotService.generar())
+
+
+# nombre -> (función, repeticiones relativas); los escenarios pesados corren menos veces
+ESCENARIOS = {
+    'ingesta_unitaria': (ingesta_unitaria, 10),
+    'ingesta_lote': (ingesta_lote, 1),
+    'informe_max_min': (_informe(EjecucionService._ejecutar_informe_max_min), 1),
+    'informe_promedio': (_informe(EjecucionService._ejecutar_informe_promedio), 1),
+    'informe_humedad_max_min': (_informe(EjecucionService._ejecutar_humedad_max_min), 1),
+    'informe_humedad_promedio': (_informe(EjecucionService._ejecutar_humedad_promedio), 1),
+    'alertas_rango': (_informe(EjecucionService._ejecutar_generacion_alertas, temp_min=0, temp_max=30), 1),
+    'proceso_periodico': (_informe(EjecucionService._ejecutar_proceso_periodico), 1),
+    'consulta_online': (consulta_online, 5),
+    'bandeja_entrada': (bandeja_entrada, 5),
+    'login': (login, 2),
+    'dashboard_usuario': (dashboard_usuario, 5),
+    'dashboard_admin': (dashboard_admin, 10),
+    'snapshot_generar': (snapshot_generar, 1),
+}
+
+
+def _percentil(valores, p):
+    """Percentil por rango más cercano sobre valores ordenados"""
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+def medir(funcion, ctx, repeticiones):
+    """
+    Una ejecución de calentamiento y 'repeticiones' cronometradas
+
+    Returns:
+        Diccionario con repeticiones, errores y tiempos en ms
+    """
+    errores = []
+    tiempos = []
+    for i in range(repeticiones + 1):
+        inicio = time.perf_counter()
+        try:
+            funcion(ctx)
+        except Exception as e:
+            errores.append(str(e))
+            continue
+        if i > 0:
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    resultado = {'repeticiones': len(tiempos), 'errores': len(errores)}
+    if errores:
+        resultado['ultimo_error'] = errores[-1]
+    if tiempos:
+        tiempos.sort()
+        resultado.update({
+            'min_ms': round(tiempos[0], 3),
+            'p50_ms': round(_percentil(tiempos, 50), 3),
+            'p95_ms': round(_percentil(tiempos, 95), 3),
+            'max_ms': round(tiempos[-1], 3),
+            'media_ms': round(statistics.fmean(tiempos), 3)
+        })
+    return resultado
+
+
+def commit_actual():
+    """Hash del commit del árbol de trabajo (None fuera de git)"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(nombres, repeticiones, semilla=42, simulado=False):
+    """
+    Corre los escenarios indicados
+
+    Returns:
+        Diccionario de resultados (el contenido del JSON)
+    """
+    ctx = Contexto(semilla)
+    resultados = {}
+    for nombre in nombres:
+        funcion, factor = ESCENARIOS[nombre]
+        resultados[nombre] = medir(funcion, ctx, max(1, repeticiones * factor))
+        r = resultados[nombre]
+        detalle = f"p50={r['p50_ms']:.1f} ms p95={r['p95_ms']:.1f} ms" if r['repeticiones'] else "sin mediciones"
+        errores = f" ({r['errores']} errores: {r.get('ultimo_error')})" if r['errores'] else ""
+        print(f"  {nombre:<26} {detalle}{errores}")
+
+    return {
+        'commit': commit_actual(),
+        'fecha': datetime.now().isoformat(),
+        'simulado': simulado,
+        'carga': ctx.parametros,
+        'escenarios': resultados
+    }
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Escenarios cronometrados")
+    parser.add_argument('--repeticiones', type=int, default=10,
+                        help="repeticiones base (se multiplican por el factor de cada escenario)")
+    parser.add_argument('--solo', help=f"escenarios separados por coma: {', '.join(ESCENARIOS)}")
+    parser.add_argument('--salida', help="archivo JSON (defecto: benchmarks/resultados/<fecha>_<commit>.json)")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--simulado', action='store_true',
+                        help="MongoDB y Redis en memoria con una carga chica (prueba rápida)")
+    args = parser.parse_args()
+
+    nombres = args.solo.split(',') if args.solo else list(ESCENARIOS)
+    desconocidos = [n for n in nombres if n not in ESCENARIOS]
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(desconocidos)}")
+
+    try:
+        if args.simulado:
+            from benchmarks import simulado
+            simulado.activar()
+            generador.generar(sensores=20, dias=3, cadencia=60, usuarios=20, grupos=3, mensajes=500)
+
+        print("⏱️  Ejecutando escenarios...")
+        resultado = ejecutar(nombres, args.repeticiones, args.semilla, args.simulado)
+    finally:
+        db_manager.cerrar_conexiones()
+
+    salida = Path(args.salida) if args.salida else (
+        DIRECTORIO_RESULTADOS / f"{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit'] or 'sin_commit'}.json"
+    )
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False, default=str)
+    print(f"✅ Resultados en {salida}")
+
+
+if __name__ == "__main__":
+    main()
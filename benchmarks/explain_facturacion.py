@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Verifica con EXPLAIN que las consultas de facturación usan los índices
+compuestos de la migración 001 y no ordenan con filesort
+Uso: python -m benchmarks.explain_facturacion [usuario_id]
+
+Con tablas casi vacías el optimizador puede preferir un recorrido completo;
+conviene ejecutarlo sobre una base con datos representativos.
+"""
+
+import sys
+import time
+from utils.db_manager import db_manager
+
+# (descripción, consulta, tabla del plan, índices aceptados)
+CONSULTAS = [
+    (
+        "Facturas por usuario y estado",
+        """
+            SELECT id FROM facturas
+            WHERE usuario_id = %s AND estado = 'pendiente'
+            ORDER BY fecha_emision DESC LIMIT 50
+        """,
+        'facturas', {'idx_usuario_estado_fecha'}
+    ),
+    (
+        "Facturas por usuario",
+        """
+            SELECT id FROM facturas
+            WHERE usuario_id = %s
+            ORDER BY fecha_emision DESC LIMIT 50
+        """,
+        'facturas', {'idx_usuario_fecha'}
+    ),
+    (
+        "Items por factura (join agrupado)",
+        """
+            SELECT f.id, COUNT(fd.id) as items
+            FROM (
+                SELECT id, fecha_emision FROM facturas
+                WHERE usuario_id = %s
+                ORDER BY fecha_emision DESC LIMIT 50
+            ) f
+            LEFT JOIN facturas_detalle fd ON fd.factura_id = f.id
+            GROUP BY f.id
+        """,
+        'fd', {'factura_id'}
+    ),
+    (
+        "Movimientos de cuenta",
+        """
+            SELECT m.id
+            FROM cuenta_corriente cc
+            JOIN movimientos_cuenta m ON m.cuenta_id = cc.id
+            WHERE cc.usuario_id = %s
+            ORDER BY m.fecha DESC LIMIT 50
+        """,
+        'm', {'idx_cuenta_fecha'}
+    ),
+]
+
+
+def verificar(cursor, descripcion, consulta, usuario_id, tabla, indices):
+    """
+    Ejecuta EXPLAIN y la consulta, y verifica el índice elegido
+
+    Returns:
+        True si el plan usa alguno de los índices esperados sin filesort
+    """
+    cursor.execute("EXPLAIN " + consulta, (usuario_id,))
+    plan = cursor.fetchall()
+
+    fila = next((f for f in plan if f['table'] == tabla), None)
+    indice = fila['key'] if fila else None
+    extra = (fila.get('Extra') or '') if fila else ''
+
+    inicio = time.perf_counter()
+    cursor.execute(consulta, (usuario_id,))
+    cursor.fetchall()
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+
+    ok = indice in indices and 'Using filesort' not in extra
+    estado = "OK  " if ok else "FALLA"
+    print(f"[{estado}] {descripcion}: índice={indice} ({duracion_ms:.2f} ms)")
+    if not ok:
+        print(f"        esperado: {', '.join(sorted(indices))}; extra: {extra}")
+    return ok
+
+
+def main():
+    """Función principal"""
+    usuario_id = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    cursor = db_manager.get_mysql_cursor()
+    resultados = [
+        verificar(cursor, descripcion, consulta, usuario_id, tabla, indices)
+        for descripcion, consulta, tabla, indices in CONSULTAS
+    ]
+    cursor.close()
+    db_manager.cerrar_conexiones()
+
+    sys.exit(0 if all(resultados) else 1)
+
+
+if __name__ == "__main__":
+    main()
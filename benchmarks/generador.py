@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos a escala de producción
+Uso: python -m benchmarks.generador [--sensores N] [--dias M] [--cadencia MIN] ...
+
+Carga sensores, usuarios, grupos y mensajes en MySQL/MongoDB y mediciones
+en las particiones mensuales, con inserciones por lotes. Todo lo generado
+se identifica por prefijo (sensores BENCH-*, usuarios @bench.local, grupos
+"Bench *") y se reemplaza en cada ejecución; los datos de la demo no se tocan.
+
+El sesgo (exponente de Zipf) concentra sensores en las primeras ciudades y
+mensajes en los primeros usuarios, como en una instalación real.
+"""
+
+import argparse
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from services.auth_service import AuthService
+from services.mensaje_service import MensajeService
+from services.snapshot_service import CLAVE_SNAPSHOT
+from utils.db_manager import db_manager
+from utils import particiones
+
+PREFIJO_SENSOR = "BENCH-"
+DOMINIO_USUARIO = "@bench.local"
+PREFIJO_GRUPO = "Bench "
+PASSWORD = "bench123"
+
+# Parámetros de la última carga (los escenarios los incluyen en los resultados)
+CLAVE_PARAMETROS = "benchmarks:parametros"
+
+PARAMETROS_DEFECTO = {
+    'sensores': 1000,
+    'dias': 90,
+    'cadencia': 15,
+    'paises': 5,
+    'ciudades_por_pais': 4,
+    'sesgo': 1.1,
+    'usuarios': 500,
+    'grupos': 20,
+    'mensajes': 50000,
+    'lote': 10000,
+    'semilla': 42
+}
+
+
+def _pesos_zipf(cantidad, sesgo):
+    """Pesos 1/rango^sesgo (sesgo 0 = uniforme)"""
+    return [1 / math.pow(rango, sesgo) for rango in range(1, cantidad + 1)]
+
+
+def _insertar_lotes(cursor, consulta, filas, lote):
+    for inicio in range(0, len(filas), lote):
+        cursor.executemany(consulta, filas[inicio:inicio + lote])
+
+
+def limpiar():
+    """Elimina los datos de una carga anterior"""
+    cursor = db_manager.get_mysql_cursor()
+    cursor.execute("SELECT id FROM sensores WHERE codigo LIKE %s", (PREFIJO_SENSOR + '%',))
+    sensores = [row['id'] for row in cursor.fetchall()]
+    cursor.execute("SELECT id FROM usuarios WHERE email LIKE %s", ('%' + DOMINIO_USUARIO,))
+    usuarios = [row['id'] for row in cursor.fetchall()]
+
+    # Solicitudes, facturas y cuentas se borran en cascada con el usuario
+    cursor.execute("DELETE FROM usuarios WHERE email LIKE %s", ('%' + DOMINIO_USUARIO,))
+    cursor.execute("DELETE FROM grupos WHERE nombre LIKE %s", (PREFIJO_GRUPO + '%',))
+    cursor.execute("DELETE FROM sensores WHERE codigo LIKE %s", (PREFIJO_SENSOR + '%',))
+    db_manager.commit_mysql()
+    cursor.close()
+
+    db = db_manager.conectar_mongodb()
+    if sensores:
+        for coleccion in particiones.colecciones_en_rango(db):
+            coleccion.delete_many({'sensor_id': {'$in': sensores}})
+        db.alertas.delete_many({'sensor_id': {'$in': sensores}})
+        db.control_funcionamiento.delete_many({'sensor_id': {'$in': sensores}})
+    if usuarios:
+        db.mensajes.delete_many({'remitente_id': {'$in': usuarios}})
+        db.bandeja_entrada.delete_many({'usuario_id': {'$in': usuarios}})
+
+
+def cargar_mysql(parametros, rng):
+    """
+    Sensores, usuarios (con rol, cuenta corriente y grupos)
+
+    Returns:
+        (sensores, usuarios_ids, grupos_ids); sensores con id, ciudad y pais
+    """
+    cursor = db_manager.get_mysql_cursor()
+    lote = parametros['lote']
+
+    # Ciudades ordenadas por peso: las primeras concentran sensores
+    ciudades = [
+        (f"Ciudad {p + 1}-{c + 1}", f"País {p + 1}")
+        for p in range(parametros['paises'])
+        for c in range(parametros['ciudades_por_pais'])
+    ]
+    rng.shuffle(ciudades)
+    asignadas = rng.choices(ciudades, _pesos_zipf(len(ciudades), parametros['sesgo']), k=parametros['sensores'])
+
+    _insertar_lotes(cursor, """
+        INSERT INTO sensores (nombre, codigo, tipo, latitud, longitud, ciudad, pais, estado)
+        VALUES (%s, %s, 'ambos', %s, %s, %s, %s, 'activo')
+    """, [
+        (f"Sensor Bench {i}", f"{PREFIJO_SENSOR}{i:06d}",
+         round(rng.uniform(-55, 10), 6), round(rng.uniform(-80, -35), 6), ciudad, pais)
+        for i, (ciudad, pais) in enumerate(asignadas, start=1)
+    ], lote)
+
+    cursor.execute("SELECT id, ciudad, pais FROM sensores WHERE codigo LIKE %s ORDER BY id",
+                   (PREFIJO_SENSOR + '%',))
+    sensores = cursor.fetchall()
+
+    # Un solo hash: bcrypt es deliberadamente lento
+    password_hash = AuthService.hashear_password(PASSWORD)
+    _insertar_lotes(cursor, """
+        INSERT INTO usuarios (nombre_completo, email, password_hash, estado)
+        VALUES (%s, %s, %s, 'activo')
+    """, [
+        (f"Usuario Bench {i}", f"bench{i}{DOMINIO_USUARIO}", password_hash)
+        for i in range(1, parametros['usuarios'] + 1)
+    ], lote)
+
+    cursor.execute("SELECT id FROM usuarios WHERE email LIKE %s ORDER BY id", ('%' + DOMINIO_USUARIO,))
+    usuarios = [row['id'] for row in cursor.fetchall()]
+
+    cursor.execute("SELECT id FROM roles WHERE descripcion = 'usuario'")
+    rol_id = cursor.fetchone()['id']
+    _insertar_lotes(cursor, "INSERT INTO usuarios_roles (usuario_id, rol_id) VALUES (%s, %s)",
+                    [(uid, rol_id) for uid in usuarios], lote)
+    # bench1 también es técnico: la prueba de carga de la API lee sensores y mediciones
+    cursor.execute("""
+        INSERT INTO usuarios_roles (usuario_id, rol_id)
+        SELECT %s, id FROM roles WHERE descripcion = 'tecnico'
+    """, (usuarios[0],))
+    _insertar_lotes(cursor, "INSERT INTO cuenta_corriente (usuario_id, saldo) VALUES (%s, %s)",
+                    [(uid, 100000) for uid in usuarios], lote)
+
+    # Grupos de tamaño desigual: el primero llega a tener a casi todos
+    grupos = []
+    for g in range(parametros['grupos']):
+        cursor.execute("INSERT INTO grupos (nombre, descripcion) VALUES (%s, %s)",
+                       (f"{PREFIJO_GRUPO}{g + 1}", "Grupo generado para benchmarks"))
+        grupos.append(cursor.lastrowid)
+
+    pesos = _pesos_zipf(len(grupos), parametros['sesgo'])
+    miembros = set()
+    for uid in usuarios:
+        for grupo_id in rng.choices(grupos, pesos, k=3) if grupos else []:
+            miembros.add((grupo_id, uid))
+    _insertar_lotes(cursor, "INSERT INTO grupos_miembros (grupo_id, usuario_id) VALUES (%s, %s)",
+                    sorted(miembros), lote)
+
+    db_manager.commit_mysql()
+    cursor.close()
+    return sensores, usuarios, grupos
+
+
+def cargar_mediciones(parametros, sensores, rng):
+    """
+    Una medición por sensor cada 'cadencia' minutos durante 'dias' días
+
+    Returns:
+        Cantidad de mediciones insertadas
+    """
+    db = db_manager.conectar_mongodb()
+    lote = parametros['lote']
+    paso = timedelta(minutes=parametros['cadencia'])
+    fin = datetime.now().replace(second=0, microsecond=0)
+    momento = fin - timedelta(days=parametros['dias'])
+
+    # Clima base por ciudad; cada medición agrega ciclo diario y ruido
+    clima = {}
+    for sensor in sensores:
+        if sensor['ciudad'] not in clima:
+            clima[sensor['ciudad']] = (rng.uniform(5, 25), rng.uniform(45, 80))
+
+    total = 0
+    pendientes = []
+    particion = None
+    while momento < fin:
+        nombre = particiones.nombre_particion(momento)
+        if nombre != particion or len(pendientes) >= lote:
+            if pendientes:
+                particiones.coleccion_escritura(db, pendientes[0]['timestamp']).insert_many(pendientes, ordered=False)
+                total += len(pendientes)
+                pendientes = []
+            particion = nombre
+
+        ciclo = math.sin((momento.hour + momento.minute / 60) / 24 * 2 * math.pi)
+        for sensor in sensores:
+            temperatura, humedad = clima[sensor['ciudad']]
+            pendientes.append({
+                'sensor_id': sensor['id'],
+                'timestamp': momento,
+                'temperatura': round(temperatura + 6 * ciclo + rng.gauss(0, 2), 2),
+                'humedad': round(min(100, max(0, humedad - 10 * ciclo + rng.gauss(0, 5))), 2),
+                'ciudad': sensor['ciudad'],
+                'pais': sensor['pais']
+            })
+        momento += paso
+
+    if pendientes:
+        particiones.coleccion_escritura(db, pendientes[0]['timestamp']).insert_many(pendientes, ordered=False)
+        total += len(pendientes)
+
+    return total
+
+
+def cargar_mensajes(parametros, usuarios, grupos, rng):
+    """
+    Mensajes privados (destinatarios con sesgo) y grupales del último mes
+
+    Returns:
+        Cantidad de mensajes insertados
+    """
+    if not usuarios:
+        return 0
+
+    db = db_manager.conectar_mongodb()
+    pesos = _pesos_zipf(len(usuarios), parametros['sesgo'])
+    ahora = datetime.now()
+
+    total = 0
+    pendientes = []
+    for i in range(parametros['mensajes']):
+        timestamp = ahora - timedelta(seconds=rng.uniform(0, 30 * 24 * 3600))
+        remitente = rng.choice(usuarios)
+        if grupos and i % 5 == 0:
+            pendientes.append({
+                'remitente_id': remitente, 'destinatario_id': None,
+                'grupo_id': rng.choice(grupos), 'timestamp': timestamp,
+                'contenido': f"Mensaje grupal {i}", 'tipo': 'grupal'
+            })
+        else:
+            pendientes.append({
+                'remitente_id': remitente, 'destinatario_id': rng.choices(usuarios, pesos)[0],
+                'grupo_id': None, 'timestamp': timestamp,
+                'contenido': f"Mensaje {i}", 'tipo': 'privado', 'leido': rng.random() < 0.7
+            })
+
+        if len(pendientes) >= parametros['lote']:
+            db.mensajes.insert_many(pendientes, ordered=False)
+            total += len(pendientes)
+            pendientes = []
+
+    if pendientes:
+        db.mensajes.insert_many(pendientes, ordered=False)
+        total += len(pendientes)
+
+    return total
+
+
+def generar(**parametros):
+    """
+    Reemplaza los datos de benchmark por una carga nueva
+
+    Args:
+        parametros: Cualquiera de PARAMETROS_DEFECTO
+
+    Returns:
+        Diccionario con los parámetros usados y las cantidades cargadas
+    """
+    parametros = {**PARAMETROS_DEFECTO, **parametros}
+    rng = random.Random(parametros['semilla'])
+
+    limpiar()
+    sensores, usuarios, grupos = cargar_mysql(parametros, rng)
+    print(f"  ✓ MySQL: {len(sensores)} sensores, {len(usuarios)} usuarios, {len(grupos)} grupos")
+
+    mediciones = cargar_mediciones(parametros, sensores, rng)
+    print(f"  ✓ MongoDB: {mediciones} mediciones")
+
+    mensajes = cargar_mensajes(parametros, usuarios, grupos, rng)
+    print(f"  ✓ MongoDB: {mensajes} mensajes")
+
+    # Los contadores y el snapshot se recalculan sobre los datos nuevos
+    success, mensaje = MensajeService.reconstruir_cache_grupos()
+    redis_client = db_manager.conectar_redis()
+    claves = list(redis_client.scan_iter("contadores:*"))
+    if claves:
+        redis_client.delete(*claves)
+    redis_client.delete(CLAVE_SNAPSHOT)
+    print(f"  ✓ Redis: {mensaje if success else 'caché de grupos sin reconstruir'}")
+
+    resumen = {
+        **parametros,
+        'mediciones_cargadas': mediciones,
+        'mensajes_cargados': mensajes,
+        'generado_en': datetime.now().isoformat()
+    }
+    redis_client.set(CLAVE_PARAMETROS, json.dumps(resumen))
+    return resumen
+
+
+def parser_parametros(parser):
+    """Agrega al parser las opciones del generador"""
+    for nombre, valor in PARAMETROS_DEFECTO.items():
+        parser.add_argument(f"--{nombre.replace('_', '-')}", type=type(valor), default=valor,
+                            dest=nombre, help=f"(defecto: {valor})")
+    return parser
+
+
+def main():
+    """Función principal"""
+    parser = parser_parametros(argparse.ArgumentParser(description="Carga datos sintéticos para benchmarks"))
+    parser.add_argument('--simulado', action='store_true',
+                        help="MongoDB y Redis en memoria (mongomock/fakeredis)")
+    args = vars(parser.parse_args())
+
+    if args.pop('simulado'):
+        from benchmarks import simulado
+        simulado.activar()
+
+    print("📦 Generando datos de benchmark...")
+    try:
+        generar(**args)
+        print("✅ Carga completa")
+    finally:
+        db_manager.cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+MongoDB y Redis en memoria para corridas de prueba de los benchmarks
+Reemplaza los clientes de db_manager por mongomock y fakeredis (no se
+instalan con requirements.txt: pip install mongomock fakeredis lupa).
+MySQL sigue siendo el configurado, por ejemplo el del docker-compose.
+
+Sirve para verificar que el generador y los escenarios corren, no para
+medir: los tiempos en memoria no se parecen a los de un servidor real, y
+algunas operaciones (shards, $merge, maxTimeMS) no están soportadas.
+"""
+
+import sys
+from config.db_config import MONGODB_CONFIG
+from utils.db_manager import db_manager
+
+
+def activar():
+    """Conecta db_manager a los reemplazos en memoria"""
+    try:
+        import fakeredis
+        import mongomock
+    except ImportError as e:
+        print(f"❌ Falta una dependencia del modo simulado ({e.name}): pip install mongomock fakeredis lupa")
+        sys.exit(1)
+
+    db_manager.mongo_client = mongomock.MongoClient()
+    db_manager.mongo_db = db_manager.mongo_client[MONGODB_CONFIG['database']]
+    db_manager.mongo_dbs_lectura = {}
+    db_manager.redis_client = fakeredis.FakeRedis(decode_responses=True)
+    print("⚠️ Modo simulado: MongoDB y Redis en memoria, los tiempos no son representativos")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Control del tiempo de arranque de los puntos de entrada
+Uso: python -m benchmarks.tiempo_importacion [--solo main,worker] [--factor 1.5]
+
+Importa cada punto de entrada en un intérprete nuevo con -X importtime y
+verifica que no cargue los módulos que deben quedar para el primer uso
+(drivers de bases, bcrypt, menús y servicios) y que el tiempo acumulado
+no supere el límite. Termina con código 1 si algo de eso no se cumple.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Lo que ningún punto de entrada debe importar al arrancar
+_PESADOS = ('mysql', 'pymongo', 'redis', 'bcrypt', 'http.server', 'services')
+
+# nombre -> (módulo a importar, prefijos prohibidos, límite en ms)
+ENTRADAS = {
+    'main': ('main', _PESADOS + ('ui.auth_menu', 'ui.dashboard_menu', 'ui.admin_menu',
+                                 'ui.proceso_menu', 'ui.sensor_menu')),
+    'worker': ('worker', _PESADOS + ('ui',)),
+}
+LIMITES_MS = {'main': 150, 'worker': 150}
+
+
+def medir(modulo, repeticiones=3):
+    """
+    Importa el módulo en un proceso nuevo con -X importtime
+
+    Returns:
+        (tiempo acumulado en ms del mejor intento, módulos importados)
+    """
+    mejor = None
+    modulos = set()
+    for _ in range(repeticiones):
+        proceso = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f"import {modulo}"],
+            capture_output=True, text=True, cwd=RAIZ
+        )
+        if proceso.returncode != 0:
+            raise RuntimeError(proceso.stderr.strip().splitlines()[-1] if proceso.stderr else "error al importar")
+
+        total = None
+        for linea in proceso.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            if not linea.startswith('import time:') or '|' not in linea:
+                continue
+            _, acumulado, nombre = linea.split('|')
+            if not acumulado.strip().isdigit():
+                continue
+            nombre = nombre.strip()
+            modulos.add(nombre)
+            if nombre == modulo:
+                total = int(acumulado) / 1000
+        if total is not None and (mejor is None or total < mejor):
+            mejor = total
+    return mejor, modulos
+
+
+def prohibidos_cargados(modulos, prefijos):
+    """Módulos importados que coinciden con algún prefijo prohibido"""
+    return sorted(
+        m for m in modulos
+        if any(m == p or m.startswith(p + '.') for p in prefijos)
+    )
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Tiempo de importación de los puntos de entrada")
+    parser.add_argument('--solo', help=f"entradas separadas por coma: {', '.join(ENTRADAS)}")
+    parser.add_argument('--factor', type=float, default=1.0,
+                        help="multiplica los límites (máquinas lentas o CI compartido)")
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    nombres = args.solo.split(',') if args.solo else list(ENTRADAS)
+    desconocidos = [n for n in nombres if n not in ENTRADAS]
+    if desconocidos:
+        parser.error(f"entradas desconocidas: {', '.join(desconocidos)}")
+
+    fallas = []
+    for nombre in nombres:
+        modulo, prefijos = ENTRADAS[nombre]
+        try:
+            total, modulos = medir(modulo, args.repeticiones)
+        except RuntimeError as e:
+            print(f"❌ {nombre}: {e}")
+            fallas.append(nombre)
+            continue
+
+        limite = LIMITES_MS[nombre] * args.factor
+        cargados = prohibidos_cargados(modulos, prefijos)
+        print(f"  {nombre:<8} {total:>8.1f} ms (límite {limite:.0f} ms), {len(modulos)} módulos")
+        if cargados:
+            print(f"    ❌ importa al arrancar: {', '.join(cargados)}")
+            fallas.append(nombre)
+        elif total > limite:
+            print("    ❌ supera el límite")
+            fallas.append(nombre)
+
+    if fallas:
+        print(f"\n❌ Regresión de arranque en: {', '.join(fallas)}")
+        sys.exit(1)
+    print("\n✅ Arranque dentro de los límites")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Verifica contra el clúster de docker-compose.sharded.yml que las consultas
+de mediciones se dirigen solo a los shards necesarios
+Uso: python -m benchmarks.verificar_sharding
+
+Carga mediciones sintéticas si la colección está vacía, muestra la
+distribución por shard y revisa con explain cuántos shards toca cada
+consulta. Las consultas que incluyen sensor_id deben ser dirigidas.
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+from config.db_config import SHARDING_CONFIG
+from utils.db_manager import db_manager
+from utils import particiones
+
+SENSORES = list(range(1, 11))
+
+
+def cargar_datos(coleccion, horas=24 * 7):
+    """Inserta una medición por hora y sensor"""
+    inicio = datetime.now() - timedelta(hours=horas)
+    coleccion.insert_many([
+        {
+            'sensor_id': sensor_id,
+            'timestamp': inicio + timedelta(hours=h),
+            'temperatura': random.uniform(10, 30),
+            'humedad': random.uniform(40, 85),
+            'ciudad': f"Ciudad {sensor_id}",
+            'pais': 'Argentina'
+        }
+        for h in range(horas) for sensor_id in SENSORES
+    ])
+
+
+def distribucion(coleccion):
+    """Documentos por shard"""
+    resultado = coleccion.aggregate([{'$collStats': {'count': {}}}])
+    return {item['shard']: item['count'] for item in resultado}
+
+
+def shards_consultados(db, coleccion, filtro):
+    """Shards que participan del plan ganador de un find"""
+    plan = db.command('explain', {'find': coleccion.name, 'filter': filtro},
+                      verbosity='queryPlanner')
+    ganador = plan['queryPlanner']['winningPlan']
+    return [shard['shardName'] for shard in ganador.get('shards', [])]
+
+
+def main():
+    """Función principal"""
+    db = db_manager.conectar_mongodb()
+
+    if db.client.admin.command('isdbgrid', check=False).get('isdbgrid') != 1:
+        print("❌ La conexión no es a un mongos; ver docker-compose.sharded.yml")
+        sys.exit(1)
+
+    coleccion = db[particiones.COLECCION_BASE]
+    particiones.fragmentar_coleccion(db, coleccion.name)
+
+    if coleccion.estimated_document_count() == 0:
+        cargar_datos(coleccion)
+
+    total_shards = len(db.client.admin.command('listShards')['shards'])
+    print(f"Clave de shard: {SHARDING_CONFIG['clave_mediciones']}")
+    print(f"Distribución: {distribucion(coleccion)}\n")
+
+    desde = datetime.now() - timedelta(days=1)
+    casos = [
+        ("Un sensor (obtener_estadisticas_sensor)",
+         {'sensor_id': 3, 'timestamp': {'$gte': desde}}, 1),
+        ("Zona traducida a sensor_id $in (informes)",
+         {'sensor_id': {'$in': [1, 2]}, 'timestamp': {'$gte': desde}}, 2),
+        ("Solo ciudad, sin clave de shard (scatter-gather)",
+         {'ciudad': 'Ciudad 1', 'timestamp': {'$gte': desde}}, total_shards),
+    ]
+
+    ok = True
+    for descripcion, filtro, maximo in casos:
+        shards = shards_consultados(db, coleccion, filtro)
+        dirigido = len(shards) <= maximo
+        ok = ok and dirigido
+        print(f"[{'OK  ' if dirigido else 'FALLA'}] {descripcion}: "
+              f"{len(shards)}/{total_shards} shards {shards}")
+
+    db_manager.cerrar_conexiones()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
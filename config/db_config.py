@@ -28,6 +28,30 @@ MONGODB_CONFIG = {
     'database': os.getenv('MONGODB_DATABASE', 'sensores_db')
 }
 
+# Réplica de lectura MySQL (opcional): listados que toleran segundos de retraso
+MYSQL_REPLICA_CONFIG = {
+    **MYSQL_CONFIG,
+    'host': os.getenv('MYSQL_REPLICA_HOST', ''),
+    'port': int(os.getenv('MYSQL_REPLICA_PORT', MYSQL_CONFIG['port'])),
+    # Sin transacciones largas: cada lectura ve lo último replicado
+    'autocommit': True
+}
+
+# Preferencia de lectura de MongoDB por tipo de carga. Con un replica set,
+# los informes y dashboards leen de secundarios y no compiten con la
+# ingesta; las lecturas de sesión van siempre al primario.
+MONGODB_LECTURA_CONFIG = {
+    'replica_set': os.getenv('MONGODB_REPLICA_SET', ''),
+    'cargas': {
+        'primario': {'modo': 'primary'},
+        'informes': {
+            'modo': os.getenv('MONGODB_LECTURA_INFORMES', 'secondaryPreferred'),
+            # MongoDB exige al menos 90 segundos
+            'max_staleness': int(os.getenv('MONGODB_MAX_STALENESS', 120))
+        }
+    }
+}
+
 # Configuración Redis
 REDIS_CONFIG = {
     'host': os.getenv('REDIS_HOST', 'localhost'),
@@ -41,4 +65,166 @@ REDIS_CONFIG = {
 APP_CONFIG = {
     'session_timeout': int(os.getenv('SESSION_TIMEOUT', 3600)),
     'cache_timeout': int(os.getenv('CACHE_TIMEOUT', 1800))
-}
\ No newline at end of file
+}
+
+# Configuración del bus de eventos (Redis Streams)
+EVENTOS_CONFIG = {
+    'grupo': os.getenv('EVENTOS_GRUPO', 'sistema_sensores'),
+    'maxlen': int(os.getenv('EVENTOS_MAXLEN', 10000)),
+    'maxlen_usuario': int(os.getenv('EVENTOS_MAXLEN_USUARIO', 100)),
+    'block_ms': int(os.getenv('EVENTOS_BLOCK_MS', 5000)),
+    'reclamo_ms': int(os.getenv('EVENTOS_RECLAMO_MS', 60000))
+}
+
+# Configuración de mensajería
+MENSAJERIA_CONFIG = {
+    # Fan-out on write: los grupos grandes escriben una entrada por destinatario
+    'fanout_habilitado': os.getenv('MENSAJERIA_FANOUT', 'false').lower() == 'true',
+    'fanout_min_miembros': int(os.getenv('MENSAJERIA_FANOUT_MIN_MIEMBROS', 50))
+}
+
+# Configuración de facturación
+FACTURACION_CONFIG = {
+    # 'inmediato': una factura por proceso completado
+    # 'ciclo': una factura por usuario y período, emitida por el worker
+    'modo': os.getenv('FACTURACION_MODO', 'inmediato').lower(),
+    'ciclo_horas': int(os.getenv('FACTURACION_CICLO_HORAS', 24)),
+    'dias_vencimiento': int(os.getenv('FACTURACION_DIAS_VENCIMIENTO', 30))
+}
+
+# Configuración del worker en segundo plano
+WORKER_CONFIG = {
+    'intervalo_segundos': int(os.getenv('WORKER_INTERVALO', 10))
+}
+
+# Configuración de retención de mediciones
+RETENCION_CONFIG = {
+    # Días que las mediciones crudas permanecen en MongoDB antes de archivarse
+    'dias_crudos': int(os.getenv('RETENCION_DIAS_CRUDOS', 90)),
+    # Margen entre archivar una medición y que el índice TTL la elimine
+    'dias_gracia': int(os.getenv('RETENCION_DIAS_GRACIA', 7)),
+    'directorio': os.getenv('RETENCION_DIRECTORIO', 'archivo'),
+    'lote': int(os.getenv('RETENCION_LOTE', 5000)),
+    'intervalo_horas': int(os.getenv('RETENCION_INTERVALO_HORAS', 24))
+}
+
+# Configuración de particiones mensuales de mediciones
+PARTICIONES_CONFIG = {
+    # Si está habilitado, las mediciones nuevas van a mediciones_YYYYMM
+    'habilitado': os.getenv('MEDICIONES_PARTICIONADAS', 'false').lower() == 'true',
+    # Consultas concurrentes sobre particiones
+    'hilos': int(os.getenv('PARTICIONES_HILOS', 4))
+}
+
+# Configuración de sharding de MongoDB (conectando a un mongos)
+SHARDING_CONFIG = {
+    'habilitado': os.getenv('MONGODB_SHARDING', 'false').lower() == 'true',
+    # Clave de shard de mediciones: hash de sensor_id reparte las escrituras
+    # entre shards y timestamp permite dividir los chunks de un mismo sensor
+    'clave_mediciones': [('sensor_id', 'hashed'), ('timestamp', 1)]
+}
+
+# Presupuesto de tiempo por tipo de proceso (segundos). Se aplica como
+# maxTimeMS en MongoDB y MAX_EXECUTION_TIME en MySQL; al agotarse la
+# solicitud termina en estado 'timeout'
+PROCESOS_CONFIG = {
+    'presupuesto_segundos': {
+        'consulta_online': 15,
+        'alertas_rango': 60,
+        'informe_max_min': 120,
+        'informe_promedio': 120,
+        'informe_humedad_max_min': 120,
+        'informe_humedad_promedio': 120,
+        'proceso_periodico_mensual': 300
+    },
+    'presupuesto_defecto': int(os.getenv('PROCESOS_PRESUPUESTO', 120)),
+    # Cola por prioridad: tipo de proceso -> prioridad (el resto es 'normal')
+    'prioridades': {
+        'consulta_online': 'interactiva',
+        'proceso_periodico_mensual': 'lote'
+    },
+    'prioridad_defecto': 'normal',
+    # Turnos de cada prioridad por ciclo, de mayor a menor prioridad; una
+    # prioridad sin solicitudes cede su turno a las demás
+    'pesos': {'interactiva': 6, 'normal': 3, 'lote': 1}
+}
+
+# Programador de procesos recurrentes
+PROGRAMADOR_CONFIG = {
+    # Demora aleatoria sobre el horario programado, para que los procesos
+    # del día 1 a las 00:00 no entren todos a la cola en el mismo segundo
+    'jitter_segundos': int(os.getenv('PROGRAMADOR_JITTER', 300)),
+    # Reintento si no se pudo crear la solicitud
+    'reintento_segundos': 60,
+    # Cada cuánto se reconcilia el ZSET de Redis con MySQL
+    'sincronizar_segundos': 600,
+    # Los informes programados agregan hasta este margen antes de ejecutarse
+    # (más que la demora de réplica de las lecturas de informes)
+    'margen_incremental_segundos': int(os.getenv('PROGRAMADOR_MARGEN_INCREMENTAL', 300))
+}
+
+# Snapshot de indicadores de los dashboards (Redis)
+SNAPSHOT_CONFIG = {
+    # Cada cuánto lo regenera el worker
+    'intervalo_segundos': int(os.getenv('SNAPSHOT_INTERVALO', 300)),
+    # Vigencia de los parciales de meses cerrados: cada cuánto se vuelven a
+    # agregar (para incorporar mediciones escritas con fecha atrasada)
+    'cerrados_segundos': int(os.getenv('SNAPSHOT_CERRADOS', 3600))
+}
+
+# Contadores mantenidos en Redis (alertas y controles por estado, mediciones por ciudad)
+CONTADORES_CONFIG = {
+    # Vencimiento: el próximo acceso recalcula el conteo exacto y corrige
+    # lo que se haya desviado (inserciones masivas, TTL de mediciones)
+    'reconciliar_segundos': int(os.getenv('CONTADORES_RECONCILIAR', 3600))
+}
+
+# Instrumentación de llamadas a bases de datos (utils/instrumentacion.py)
+INSTRUMENTACION_CONFIG = {
+    'habilitado': os.getenv('INSTRUMENTACION', 'true').lower() == 'true',
+    # Puerto del endpoint /metrics de Prometheus en el worker (0 = sin endpoint)
+    'puerto': int(os.getenv('INSTRUMENTACION_PUERTO', 0)),
+    # Volcado JSON periódico del worker (0 = deshabilitado)
+    'volcado_segundos': int(os.getenv('INSTRUMENTACION_VOLCADO', 300)),
+    'directorio': os.getenv('INSTRUMENTACION_DIRECTORIO', 'logs/metricas')
+}
+
+# Configuración de logs (utils/logger.py)
+LOG_CONFIG = {
+    'directorio': os.getenv('LOG_DIRECTORIO', 'logs'),
+    'nivel': os.getenv('LOG_NIVEL', 'INFO').upper(),
+    # Archivos diarios comprimidos que se conservan
+    'dias_retencion': int(os.getenv('LOG_DIAS_RETENCION', 14)),
+    # Registros en espera de escritura; con la cola llena se descartan
+    'cola_maxima': int(os.getenv('LOG_COLA_MAXIMA', 10000))
+}
+
+# Resiliencia de conexiones (utils/resiliencia.py)
+RESILIENCIA_CONFIG = {
+    # Cada cuánto se verifica con un ping una conexión ya abierta
+    'verificar_segundos': float(os.getenv('RESILIENCIA_VERIFICAR', 5)),
+    # Verificaciones fallidas seguidas que abren el circuito de un motor
+    'fallas_para_abrir': int(os.getenv('RESILIENCIA_FALLAS', 3)),
+    # Espera con el circuito abierto: se duplica en cada reapertura hasta el máximo
+    'espera_base_segundos': float(os.getenv('RESILIENCIA_ESPERA_BASE', 2)),
+    'espera_maxima_segundos': float(os.getenv('RESILIENCIA_ESPERA_MAXIMA', 60)),
+    # Tiempo máximo para conectar (y para elegir servidor en MongoDB)
+    'timeout_conexion_segundos': int(os.getenv('RESILIENCIA_TIMEOUT_CONEXION', 5)),
+    # Reintentos con backoff exponencial de un comando Redis ante un corte
+    'reintentos_redis': int(os.getenv('RESILIENCIA_REINTENTOS_REDIS', 3))
+}
+
+# API HTTP/JSON (api/)
+API_CONFIG = {
+    'host': os.getenv('API_HOST', '0.0.0.0'),
+    'puerto': int(os.getenv('API_PUERTO', 8080)),
+    # Procesos que atienden el mismo socket (cada uno con sus hilos y conexiones)
+    'procesos': int(os.getenv('API_PROCESOS', 1)),
+    'limite_defecto': 50,
+    'limite_maximo': 500,
+    # Los listados por desplazamiento piden al servicio cursor + limite
+    # elementos: más allá de esto se filtra (?estado=, fechas) en vez de paginar
+    'desplazamiento_maximo': int(os.getenv('API_DESPLAZAMIENTO_MAXIMO', 1000)),
+    # Respuestas más chicas que esto no se comprimen
+    'gzip_minimo_bytes': int(os.getenv('API_GZIP_MINIMO', 1024))
+}
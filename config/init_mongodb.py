@@ -36,6 +36,8 @@ def crear_colecciones(db):
         'mediciones',
         'alertas',
         'mensajes',
+        'bandeja_entrada',
+        'mediciones_diarias',
         'historial_ejecucion',
         'control_funcionamiento'
     ]
@@ -74,6 +76,28 @@ def crear_indices(db):
     ], name='idx_pais_timestamp')
     print("  ✓ Índice mediciones: pais + timestamp")
     
+    # Índices de RETENCIÓN (archivador y TTL)
+    db.mediciones.create_index([('timestamp', ASCENDING)], name='idx_timestamp')
+    print("  ✓ Índice mediciones: timestamp")
+    
+    db.mediciones.create_index([('archivo_parte', ASCENDING)], name='idx_archivo_parte', sparse=True)
+    print("  ✓ Índice mediciones: archivo_parte (sparse)")
+    
+    # Solo expiran las mediciones que ya tienen archivo y rollup
+    db.mediciones.create_index([('expira_en', ASCENDING)], name='idx_expira_en', expireAfterSeconds=0)
+    print("  ✓ Índice mediciones: expira_en (TTL)")
+    
+    db.mediciones_diarias.create_index([('dia', ASCENDING)], name='idx_dia')
+    db.mediciones_diarias.create_index([
+        ('ciudad', ASCENDING),
+        ('dia', ASCENDING)
+    ], name='idx_ciudad_dia')
+    db.mediciones_diarias.create_index([
+        ('pais', ASCENDING),
+        ('dia', ASCENDING)
+    ], name='idx_pais_dia')
+    print("  ✓ Índices mediciones_diarias: dia, ciudad + dia, pais + dia")
+    
     # Índices para ALERTAS
     db.alertas.create_index([
         ('estado', ASCENDING),
@@ -88,22 +112,42 @@ def crear_indices(db):
     print("  ✓ Índice alertas: sensor_id + timestamp")
     
     # Índices para MENSAJES
+    # Incluyen _id para la paginación por cursor (timestamp, _id); cada rama
+    # del $or destinatario_id / grupo_id de la bandeja usa su propio índice
     db.mensajes.create_index([
         ('destinatario_id', ASCENDING),
-        ('timestamp', DESCENDING)
-    ], name='idx_destinatario_timestamp')
-    print("  ✓ Índice mensajes: destinatario_id + timestamp")
+        ('timestamp', DESCENDING),
+        ('_id', DESCENDING)
+    ], name='idx_destinatario_timestamp_id')
+    print("  ✓ Índice mensajes: destinatario_id + timestamp + _id")
     
     db.mensajes.create_index([
         ('remitente_id', ASCENDING),
-        ('timestamp', DESCENDING)
-    ], name='idx_remitente_timestamp')
-    print("  ✓ Índice mensajes: remitente_id + timestamp")
+        ('timestamp', DESCENDING),
+        ('_id', DESCENDING)
+    ], name='idx_remitente_timestamp_id')
+    print("  ✓ Índice mensajes: remitente_id + timestamp + _id")
     
     db.mensajes.create_index([
-        ('grupo_id', ASCENDING)
-    ], name='idx_grupo')
-    print("  ✓ Índice mensajes: grupo_id")
+        ('grupo_id', ASCENDING),
+        ('timestamp', DESCENDING),
+        ('_id', DESCENDING)
+    ], name='idx_grupo_timestamp_id')
+    print("  ✓ Índice mensajes: grupo_id + timestamp + _id")
+    
+    # Índices para BANDEJA_ENTRADA (fan-out on write de mensajes grupales)
+    db.bandeja_entrada.create_index([
+        ('usuario_id', ASCENDING),
+        ('timestamp', DESCENDING),
+        ('mensaje_id', DESCENDING)
+    ], name='idx_usuario_timestamp_mensaje')
+    print("  ✓ Índice bandeja_entrada: usuario_id + timestamp + mensaje_id")
+    
+    db.bandeja_entrada.create_index([
+        ('usuario_id', ASCENDING),
+        ('mensaje_id', ASCENDING)
+    ], name='idx_usuario_mensaje', unique=True)
+    print("  ✓ Índice bandeja_entrada: usuario_id + mensaje_id (único)")
     
     # Índices para HISTORIAL_EJECUCION
     db.historial_ejecucion.create_index([
@@ -116,6 +160,12 @@ def crear_indices(db):
     ], name='idx_fecha_ejecucion')
     print("  ✓ Índice historial: fecha_ejecucion")
     
+    db.historial_ejecucion.create_index([
+        ('resultado.programado_id', ASCENDING),
+        ('fecha_ejecucion', DESCENDING)
+    ], name='idx_programado_fecha', sparse=True)
+    print("  ✓ Índice historial: programado_id + fecha_ejecucion")
+    
     # Índices para CONTROL_FUNCIONAMIENTO
     db.control_funcionamiento.create_index([
         ('sensor_id', ASCENDING),
@@ -272,8 +322,10 @@ def mostrar_estadisticas(db):
     
     colecciones = {
         'mediciones': 'Mediciones de sensores',
+        'mediciones_diarias': 'Rollups diarios archivados',
         'alertas': 'Alertas generadas',
         'mensajes': 'Mensajes intercambiados',
+        'bandeja_entrada': 'Entradas de bandeja (fan-out)',
         'historial_ejecucion': 'Historiales de procesos',
         'control_funcionamiento': 'Controles de funcionamiento'
     }
@@ -92,7 +92,7 @@ CREATE TABLE solicitudes_proceso (
     proceso_id INT NOT NULL,
     parametros JSON,
     fecha_solicitud TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    estado ENUM('pendiente', 'en_proceso', 'completado', 'error') DEFAULT 'pendiente',
+    estado ENUM('pendiente', 'en_proceso', 'completado', 'error', 'timeout', 'cancelado') DEFAULT 'pendiente',
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
     FOREIGN KEY (proceso_id) REFERENCES procesos(id),
     INDEX idx_usuario (usuario_id),
@@ -100,6 +100,24 @@ CREATE TABLE solicitudes_proceso (
     INDEX idx_fecha (fecha_solicitud)
 ) ENGINE=InnoDB;
 
+-- Tabla: Procesos Programados (recurrentes, expresión cron)
+CREATE TABLE procesos_programados (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    usuario_id INT NOT NULL,
+    proceso_id INT NOT NULL,
+    parametros JSON,
+    expresion_cron VARCHAR(100) NOT NULL,
+    activo BOOLEAN DEFAULT TRUE,
+    proxima_ejecucion DATETIME NOT NULL,
+    ultima_ejecucion DATETIME NULL,
+    ultima_solicitud_id INT NULL,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (proceso_id) REFERENCES procesos(id),
+    INDEX idx_usuario (usuario_id),
+    INDEX idx_activo_proxima (activo, proxima_ejecucion)
+) ENGINE=InnoDB;
+
 -- Tabla: Facturas
 CREATE TABLE facturas (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -109,7 +127,8 @@ CREATE TABLE facturas (
     estado ENUM('pendiente', 'pagada', 'vencida') DEFAULT 'pendiente',
     fecha_vencimiento DATE,
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
-    INDEX idx_usuario (usuario_id),
+    INDEX idx_usuario_estado_fecha (usuario_id, estado, fecha_emision),
+    INDEX idx_usuario_fecha (usuario_id, fecha_emision),
     INDEX idx_estado (estado),
     INDEX idx_fecha_emision (fecha_emision)
 ) ENGINE=InnoDB;
@@ -147,6 +166,19 @@ CREATE TABLE cuenta_corriente (
     FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
+-- Tabla: Resumen financiero por usuario (contadores materializados)
+-- Mantenida en la misma transacción por generar_factura y registrar_pago;
+-- el saldo se lee de cuenta_corriente
+CREATE TABLE resumen_financiero (
+    usuario_id INT PRIMARY KEY,
+    total_facturado DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    facturas_pendientes INT NOT NULL DEFAULT 0,
+    monto_pendiente DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    facturas_pagadas INT NOT NULL DEFAULT 0,
+    ultima_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
 -- Tabla: Movimientos de Cuenta Corriente
 CREATE TABLE movimientos_cuenta (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -159,14 +191,30 @@ CREATE TABLE movimientos_cuenta (
     saldo_nuevo DECIMAL(10, 2) NOT NULL,
     fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (cuenta_id) REFERENCES cuenta_corriente(id) ON DELETE CASCADE,
-    INDEX idx_cuenta (cuenta_id),
+    INDEX idx_cuenta_fecha (cuenta_id, fecha),
     INDEX idx_fecha (fecha)
 ) ENGINE=InnoDB;
 
+-- Tabla: Versiones de migración aplicadas (config/migrate.py)
+-- El esquema de este archivo ya incluye las migraciones MySQL registradas
+-- abajo: migrate.py no las vuelve a aplicar sobre una base nueva
+CREATE TABLE schema_version (
+    version INT PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
 -- ============================================
 -- DATOS INICIALES
 -- ============================================
 
+-- Migraciones incluidas en el esquema
+INSERT INTO schema_version (version, nombre) VALUES
+    (1, 'indices_facturacion'),
+    (3, 'resumen_financiero'),
+    (5, 'estados_solicitud'),
+    (6, 'procesos_programados');
+
 -- Insertar roles
 INSERT INTO roles (descripcion) VALUES 
     ('usuario'),
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Configura el sharding de MongoDB (ejecutar contra un mongos)
+Habilita sharding en la base y shardea mediciones y sus particiones
+mensuales con la clave de SHARDING_CONFIG
+Uso: python -m config.init_sharding
+"""
+
+from config.db_config import SHARDING_CONFIG
+from utils.db_manager import db_manager
+from utils import particiones
+
+
+def main():
+    """Función principal"""
+    print("=" * 60)
+    print("🧩 CONFIGURACIÓN DE SHARDING")
+    print("=" * 60)
+
+    db = db_manager.conectar_mongodb()
+    admin = db.client.admin
+
+    if admin.command('isdbgrid', check=False).get('isdbgrid') != 1:
+        print("❌ La conexión no es a un mongos; ver docker-compose.sharded.yml")
+        db_manager.cerrar_conexiones()
+        return
+
+    shards = admin.command('listShards')['shards']
+    print(f"  Shards: {', '.join(s['_id'] for s in shards)}")
+
+    admin.command('enableSharding', db.name)
+    print(f"  ✓ Sharding habilitado en {db.name}")
+
+    clave = ", ".join(f"{campo}: {tipo}" for campo, tipo in SHARDING_CONFIG['clave_mediciones'])
+    for coleccion in particiones.colecciones_en_rango(db):
+        particiones.fragmentar_coleccion(db, coleccion.name)
+        print(f"  ✓ {coleccion.name} shardeada por {{{clave}}}")
+
+    db_manager.cerrar_conexiones()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
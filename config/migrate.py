@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Ejecutor de migraciones versionadas de esquema e índices
+Uso: python -m config.migrate [--dry-run] [--estado]
+
+Las migraciones viven en config/migrations/ con el formato NNN_nombre:
+  - NNN_nombre.sql: sentencias MySQL separadas por ';' (sin DELIMITER)
+  - NNN_nombre.py:  índices MongoDB declarados en CREAR / ELIMINAR y,
+                    opcionalmente, una función aplicar(db) para datos.
+                    Los de CREAR se construyen antes de eliminar los de
+                    ELIMINAR: las consultas nunca quedan sin índice
+
+La versión aplicada se registra en la tabla schema_version (MySQL) y en
+la colección schema_version (MongoDB). Los índices se construyen en línea:
+las migraciones SQL declaran ALGORITHM=INPLACE, LOCK=NONE y MongoDB
+construye los índices sin bloquear la colección.
+"""
+
+import argparse
+import importlib.util
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+import mysql.connector
+from mysql.connector import errorcode
+from utils.db_manager import db_manager
+
+DIRECTORIO_MIGRACIONES = Path(__file__).parent / "migrations"
+PATRON_MIGRACION = re.compile(r"^(\d{3})_(\w+)\.(sql|py)$")
+
+
+def descubrir_migraciones():
+    """
+    Lista las migraciones ordenadas por versión
+
+    Returns:
+        Lista de diccionarios con version, nombre, motor y ruta
+    """
+    migraciones = []
+    versiones = set()
+
+    for ruta in sorted(DIRECTORIO_MIGRACIONES.iterdir()):
+        coincidencia = PATRON_MIGRACION.match(ruta.name)
+        if not coincidencia:
+            continue
+
+        version = int(coincidencia.group(1))
+        if version in versiones:
+            raise ValueError(f"Versión de migración duplicada: {version:03d}")
+        versiones.add(version)
+
+        migraciones.append({
+            'version': version,
+            'nombre': coincidencia.group(2),
+            'motor': 'mysql' if coincidencia.group(3) == 'sql' else 'mongodb',
+            'ruta': ruta
+        })
+
+    return migraciones
+
+
+def sentencias_sql(ruta):
+    """Separa un archivo .sql en sentencias, ignorando comentarios de línea"""
+    lineas = [
+        linea for linea in ruta.read_text(encoding='utf-8').splitlines()
+        if not linea.strip().startswith('--')
+    ]
+    return [s.strip() for s in "\n".join(lineas).split(';') if s.strip()]
+
+
+def cargar_modulo(ruta):
+    """Importa una migración .py (el nombre empieza con dígitos)"""
+    spec = importlib.util.spec_from_file_location(f"migracion_{ruta.stem}", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def versiones_aplicadas():
+    """
+    Obtiene las versiones ya aplicadas en cada motor
+
+    Returns:
+        {'mysql': set, 'mongodb': set}
+    """
+    cursor = db_manager.get_mysql_cursor()
+    try:
+        cursor.execute("SELECT version FROM schema_version")
+        mysql_versiones = {row['version'] for row in cursor.fetchall()}
+    except mysql.connector.Error as e:
+        # La tabla se crea con la primera migración aplicada (--dry-run no escribe)
+        if e.errno != errorcode.ER_NO_SUCH_TABLE:
+            raise
+        mysql_versiones = set()
+    finally:
+        cursor.close()
+
+    db = db_manager.conectar_mongodb()
+    mongo_versiones = {doc['_id'] for doc in db.schema_version.find({}, {'_id': 1})}
+
+    return {'mysql': mysql_versiones, 'mongodb': mongo_versiones}
+
+
+def describir(migracion):
+    """Líneas del plan de una migración (para --dry-run)"""
+    if migracion['motor'] == 'mysql':
+        return [" ".join(s.split()) for s in sentencias_sql(migracion['ruta'])]
+
+    modulo = cargar_modulo(migracion['ruta'])
+    plan = []
+    for col, claves, opciones in getattr(modulo, 'CREAR', []):
+        campos = ", ".join(f"{campo}: {orden}" for campo, orden in claves)
+        extra = "".join(f" {k}={v}" for k, v in opciones.items() if k != 'name')
+        plan.append(f"createIndex {col}.{opciones.get('name')} {{{campos}}}{extra}")
+    plan += [f"dropIndex {col}.{nombre}" for col, nombre in getattr(modulo, 'ELIMINAR', [])]
+    if hasattr(modulo, 'aplicar'):
+        plan.append("aplicar(db)")
+    return plan
+
+
+def aplicar_mysql(migracion):
+    """Ejecuta una migración SQL y registra su versión"""
+    cursor = db_manager.get_mysql_cursor()
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                nombre VARCHAR(255) NOT NULL,
+                aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB
+        """)
+        for sentencia in sentencias_sql(migracion['ruta']):
+            cursor.execute(sentencia)
+        cursor.execute("""
+            INSERT INTO schema_version (version, nombre) VALUES (%s, %s)
+        """, (migracion['version'], migracion['nombre']))
+        db_manager.commit_mysql()
+    except Exception:
+        # El DDL de MySQL hace commit implícito: lo ya ejecutado no se revierte
+        db_manager.rollback_mysql()
+        raise
+    finally:
+        cursor.close()
+
+
+def aplicar_mongodb(migracion):
+    """Aplica una migración de MongoDB y registra su versión"""
+    db = db_manager.conectar_mongodb()
+    modulo = cargar_modulo(migracion['ruta'])
+
+    # Primero los nuevos: mientras se construyen las consultas usan los viejos
+    for coleccion, claves, opciones in getattr(modulo, 'CREAR', []):
+        db[coleccion].create_index(claves, **opciones)
+
+    for coleccion, nombre in getattr(modulo, 'ELIMINAR', []):
+        if nombre in db[coleccion].index_information():
+            db[coleccion].drop_index(nombre)
+
+    if hasattr(modulo, 'aplicar'):
+        modulo.aplicar(db)
+
+    db.schema_version.insert_one({
+        '_id': migracion['version'],
+        'nombre': migracion['nombre'],
+        'aplicada': datetime.now()
+    })
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Migraciones de esquema e índices")
+    parser.add_argument('--dry-run', action='store_true', help="muestra el plan sin aplicarlo")
+    parser.add_argument('--estado', action='store_true', help="lista las migraciones y su estado")
+    args = parser.parse_args()
+
+    migraciones = descubrir_migraciones()
+    aplicadas = versiones_aplicadas()
+    pendientes = [m for m in migraciones if m['version'] not in aplicadas[m['motor']]]
+
+    if args.estado:
+        for m in migraciones:
+            estado = "pendiente" if m in pendientes else "aplicada"
+            print(f"  {m['version']:03d} {m['nombre']:<30} {m['motor']:<8} {estado}")
+        db_manager.cerrar_conexiones()
+        return
+
+    if not pendientes:
+        print("✅ Esquema al día, no hay migraciones pendientes")
+        db_manager.cerrar_conexiones()
+        return
+
+    for m in pendientes:
+        print(f"\n▶ {m['version']:03d} {m['nombre']} ({m['motor']})")
+
+        if args.dry_run:
+            for linea in describir(m):
+                print(f"    {linea}")
+            continue
+
+        try:
+            if m['motor'] == 'mysql':
+                aplicar_mysql(m)
+            else:
+                aplicar_mongodb(m)
+            print("  ✓ Aplicada")
+        except Exception as e:
+            print(f"  ❌ Error: {e}")
+            print("  Se detiene la ejecución; corregir y volver a ejecutar")
+            db_manager.cerrar_conexiones()
+            sys.exit(1)
+
+    db_manager.cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()
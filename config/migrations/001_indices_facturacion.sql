@@ -0,0 +1,19 @@
+-- ============================================
+-- 001: Índices compuestos de facturación
+-- ============================================
+-- Sirven al listado de facturas (filtro por usuario/estado ordenado por
+-- fecha) y a los movimientos de cuenta corriente (por cuenta ordenados por
+-- fecha) sin filesort. Los índices de una sola columna que quedan cubiertos
+-- por el prefijo de los nuevos se eliminan; las FK pasan a usar los compuestos.
+-- Construcción online: ALGORITHM=INPLACE, LOCK=NONE no bloquea escrituras.
+
+ALTER TABLE facturas
+    ADD INDEX idx_usuario_estado_fecha (usuario_id, estado, fecha_emision),
+    ADD INDEX idx_usuario_fecha (usuario_id, fecha_emision),
+    DROP INDEX idx_usuario,
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE movimientos_cuenta
+    ADD INDEX idx_cuenta_fecha (cuenta_id, fecha),
+    DROP INDEX idx_cuenta,
+    ALGORITHM=INPLACE, LOCK=NONE;
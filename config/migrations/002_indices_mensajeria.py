@@ -0,0 +1,34 @@
+"""
+002: Índices de mensajería en MongoDB
+Paginación por cursor (timestamp, _id) de mensajes y bandeja de entrada
+del fan-out on write; reemplaza los índices originales de mensajes (se
+eliminan después de construir los nuevos)
+"""
+
+from pymongo import ASCENDING, DESCENDING
+
+# (colección, claves, opciones)
+CREAR = [
+    ('mensajes',
+     [('destinatario_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'idx_destinatario_timestamp_id'}),
+    ('mensajes',
+     [('remitente_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'idx_remitente_timestamp_id'}),
+    ('mensajes',
+     [('grupo_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)],
+     {'name': 'idx_grupo_timestamp_id'}),
+    ('bandeja_entrada',
+     [('usuario_id', ASCENDING), ('timestamp', DESCENDING), ('mensaje_id', DESCENDING)],
+     {'name': 'idx_usuario_timestamp_mensaje'}),
+    ('bandeja_entrada',
+     [('usuario_id', ASCENDING), ('mensaje_id', ASCENDING)],
+     {'name': 'idx_usuario_mensaje', 'unique': True}),
+]
+
+# (colección, nombre del índice)
+ELIMINAR = [
+    ('mensajes', 'idx_destinatario_timestamp'),
+    ('mensajes', 'idx_remitente_timestamp'),
+    ('mensajes', 'idx_grupo'),
+]
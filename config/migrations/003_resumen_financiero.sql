@@ -0,0 +1,15 @@
+-- ============================================
+-- 003: Resumen financiero materializado
+-- ============================================
+-- Las filas se crean a demanda desde facturas (FacturacionService),
+-- no hace falta cargar datos en la migración.
+
+CREATE TABLE IF NOT EXISTS resumen_financiero (
+    usuario_id INT PRIMARY KEY,
+    total_facturado DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    facturas_pendientes INT NOT NULL DEFAULT 0,
+    monto_pendiente DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
+    facturas_pagadas INT NOT NULL DEFAULT 0,
+    ultima_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
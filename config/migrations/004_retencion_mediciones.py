@@ -0,0 +1,32 @@
+"""
+004: Retención de mediciones
+Índices del archivador (por fecha y por parte), TTL sobre expira_en y
+rollups diarios de lo archivado
+"""
+
+from pymongo import ASCENDING
+
+ELIMINAR = []
+
+# (colección, claves, opciones)
+CREAR = [
+    ('mediciones',
+     [('timestamp', ASCENDING)],
+     {'name': 'idx_timestamp'}),
+    ('mediciones',
+     [('archivo_parte', ASCENDING)],
+     {'name': 'idx_archivo_parte', 'sparse': True}),
+    # Solo expiran las mediciones que ya tienen archivo y rollup
+    ('mediciones',
+     [('expira_en', ASCENDING)],
+     {'name': 'idx_expira_en', 'expireAfterSeconds': 0}),
+    ('mediciones_diarias',
+     [('dia', ASCENDING)],
+     {'name': 'idx_dia'}),
+    ('mediciones_diarias',
+     [('ciudad', ASCENDING), ('dia', ASCENDING)],
+     {'name': 'idx_ciudad_dia'}),
+    ('mediciones_diarias',
+     [('pais', ASCENDING), ('dia', ASCENDING)],
+     {'name': 'idx_pais_dia'}),
+]
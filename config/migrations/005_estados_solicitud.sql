@@ -0,0 +1,9 @@
+-- ============================================
+-- 005: Estados de solicitud timeout y cancelado
+-- ============================================
+-- Agregar valores al final del ENUM no reescribe la tabla.
+
+ALTER TABLE solicitudes_proceso
+    MODIFY estado ENUM('pendiente', 'en_proceso', 'completado', 'error', 'timeout', 'cancelado')
+        DEFAULT 'pendiente',
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,22 @@
+-- ============================================
+-- 006: Procesos programados (recurrentes)
+-- ============================================
+-- Las próximas ejecuciones también se indexan en el ZSET de Redis
+-- programador:proximas; la tabla es la fuente de verdad.
+
+CREATE TABLE IF NOT EXISTS procesos_programados (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    usuario_id INT NOT NULL,
+    proceso_id INT NOT NULL,
+    parametros JSON,
+    expresion_cron VARCHAR(100) NOT NULL,
+    activo BOOLEAN DEFAULT TRUE,
+    proxima_ejecucion DATETIME NOT NULL,
+    ultima_ejecucion DATETIME NULL,
+    ultima_solicitud_id INT NULL,
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (usuario_id) REFERENCES usuarios(id) ON DELETE CASCADE,
+    FOREIGN KEY (proceso_id) REFERENCES procesos(id),
+    INDEX idx_usuario (usuario_id),
+    INDEX idx_activo_proxima (activo, proxima_ejecucion)
+) ENGINE=InnoDB;
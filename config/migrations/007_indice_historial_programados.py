@@ -0,0 +1,16 @@
+"""
+007: Historial de procesos programados
+Cada ejecución periódica busca la anterior del mismo programado para
+reutilizar sus parciales
+"""
+
+from pymongo import ASCENDING, DESCENDING
+
+ELIMINAR = []
+
+# (colección, claves, opciones)
+CREAR = [
+    ('historial_ejecucion',
+     [('resultado.programado_id', ASCENDING), ('fecha_ejecucion', DESCENDING)],
+     {'name': 'idx_programado_fecha', 'sparse': True}),
+]
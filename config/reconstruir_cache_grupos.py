@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Reconstruye el espejo en Redis de la membresía de grupos
+Uso: python -m config.reconstruir_cache_grupos
+"""
+
+from services.mensaje_service import MensajeService
+from utils.db_manager import db_manager
+
+
+def main():
+    """Función principal"""
+    print("=" * 60)
+    print("🔄 RECONSTRUCCIÓN DE CACHÉ DE GRUPOS")
+    print("=" * 60)
+
+    success, mensaje = MensajeService.reconstruir_cache_grupos()
+    print(f"{'✅' if success else '❌'} {mensaje}")
+
+    db_manager.cerrar_conexiones()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/bin/bash
+# Inicializa el clúster de docker-compose.sharded.yml:
+# replica sets de config y shards, registro de shards en mongos y usuario admin
+set -e
+
+esperar() {
+    until mongosh --quiet --host "$1" --eval "db.adminCommand('ping')" >/dev/null 2>&1; do
+        sleep 1
+    done
+}
+
+iniciar_replica() {
+    local host=$1 replica=$2 extra=$3
+    esperar "$host"
+    mongosh --quiet --host "$host" --eval "
+        try { rs.status() } catch (e) {
+            rs.initiate({_id: '$replica', $extra members: [{_id: 0, host: '$host'}]})
+        }"
+}
+
+iniciar_replica mongo-config:27019 rs-config "configsvr: true,"
+iniciar_replica mongo-shard1:27018 rs-shard1 ""
+iniciar_replica mongo-shard2:27018 rs-shard2 ""
+
+esperar mongos:27017
+mongosh --quiet --host mongos:27017 --eval "
+    sh.addShard('rs-shard1/mongo-shard1:27018');
+    sh.addShard('rs-shard2/mongo-shard2:27018');
+    if (!db.getSiblingDB('admin').getUser('admin')) {
+        db.getSiblingDB('admin').createUser({user: 'admin', pwd: 'admin123', roles: ['root']});
+    }"
+
+echo "Clúster listo"
@@ -4,7 +4,11 @@ Servicio de gestión de alertas
 
 from datetime import datetime
 from utils.db_manager import db_manager
+from utils.event_bus import event_bus, STREAM_ALERTAS
+from utils import contadores, resiliencia
+from utils.instrumentacion import instrumentar
 
+@instrumentar
 class AlertaService:
     """Servicio para gestión de alertas"""
     
@@ -31,26 +35,32 @@ class AlertaService:
             # Buscar alertas ordenadas por fecha (más recientes primero)
             alertas = list(db.alertas.find(query).sort('timestamp', -1).limit(limite))
             
-            # Enriquecer con datos del sensor (de MySQL)
+            # Enriquecer con datos del sensor (de MySQL, una sola consulta)
+            sensores_ids = list({alerta['sensor_id'] for alerta in alertas if alerta.get('sensor_id')})
+            if not sensores_ids:
+                return alertas
+            
             cursor = db_manager.get_mysql_cursor()
+            placeholders = ','.join(['%s'] * len(sensores_ids))
+            cursor.execute(f"""
+                SELECT id, nombre, codigo, ciudad, pais FROM sensores
+                WHERE id IN ({placeholders})
+            """, tuple(sensores_ids))
+            sensores = {sensor['id']: sensor for sensor in cursor.fetchall()}
             
             for alerta in alertas:
-                if alerta.get('sensor_id'):
-                    cursor.execute(
-                        "SELECT nombre, codigo, ciudad, pais FROM sensores WHERE id = %s",
-                        (alerta['sensor_id'],)
-                    )
-                    sensor = cursor.fetchone()
-                    if sensor:
-                        alerta['sensor_nombre'] = sensor['nombre']
-                        alerta['sensor_codigo'] = sensor['codigo']
-                        alerta['sensor_ciudad'] = sensor['ciudad']
-                        alerta['sensor_pais'] = sensor['pais']
+                sensor = sensores.get(alerta.get('sensor_id'))
+                if sensor:
+                    alerta['sensor_nombre'] = sensor['nombre']
+                    alerta['sensor_codigo'] = sensor['codigo']
+                    alerta['sensor_ciudad'] = sensor['ciudad']
+                    alerta['sensor_pais'] = sensor['pais']
             
             cursor.close()
             return alertas
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error listando alertas: {e}")
             return []
     
@@ -93,6 +103,8 @@ class AlertaService:
             resultado = db.alertas.insert_one(alerta)
             
             if resultado.inserted_id:
+                contadores.incrementar('alertas', 'activa')
+                event_bus.publicar(STREAM_ALERTAS, alerta)
                 return True, "Alerta creada exitosamente"
             else:
                 return False, "Error al crear alerta"
@@ -117,11 +129,12 @@ class AlertaService:
             db = db_manager.conectar_mongodb()
             
             resultado = db.alertas.update_one(
-                {'_id': ObjectId(alerta_id)},
+                {'_id': ObjectId(alerta_id), 'estado': {'$ne': 'resuelta'}},
                 {'$set': {'estado': 'resuelta'}}
             )
             
             if resultado.modified_count > 0:
+                contadores.mover('alertas', 'activa', 'resuelta')
                 return True, "Alerta resuelta"
             else:
                 return False, "Alerta no encontrada"
@@ -131,33 +144,53 @@ class AlertaService:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def contar_alertas_por_estado():
+    def contar_alertas_por_estado(exacto=False):
         """
         Cuenta alertas agrupadas por estado
         
+        Args:
+            exacto: Recorrer la colección en lugar de usar el contador mantenido
+        
         Returns:
             Diccionario con conteos
         """
         try:
-            db = db_manager.conectar_mongodb()
-            
-            pipeline = [
-                {
-                    '$group': {
-                        '_id': '$estado',
-                        'total': {'$sum': 1}
+            def recalcular():
+                db = db_manager.conectar_mongodb()
+                pipeline = [
+                    {
+                        '$group': {
+                            '_id': '$estado',
+                            'total': {'$sum': 1}
+                        }
                     }
-                }
-            ]
-            
-            resultado = list(db.alertas.aggregate(pipeline))
+                ]
+                return {item['_id']: item['total'] for item in db.alertas.aggregate(pipeline)}
             
             conteos = {'activa': 0, 'resuelta': 0}
-            for item in resultado:
-                conteos[item['_id']] = item['total']
-            
+            conteos.update(contadores.leer('alertas', recalcular, exacto))
             return conteos
             
         except Exception as e:
             print(f"❌ Error contando alertas: {e}")
             return {'activa': 0, 'resuelta': 0}
+    
+    @staticmethod
+    def suscribir_alertas(callback, grupo=None):
+        """
+        Suscribe a las alertas que se crean (STREAM_ALERTAS)
+        
+        Args:
+            callback: Función que recibe la alerta (dict)
+            grupo: Consumer group compartido para repartir las alertas entre
+                procesos; por defecto el de la sesión, que las recibe todas
+        
+        Returns:
+            Hilo de escucha del bus de eventos
+        """
+        return event_bus.suscribir(STREAM_ALERTAS, callback, grupo)
+    
+    @staticmethod
+    def cancelar_suscripcion(callback, grupo=None):
+        """Cancela una suscripción registrada con suscribir_alertas"""
+        event_bus.cancelar_suscripcion(STREAM_ALERTAS, callback, grupo)
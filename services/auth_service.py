@@ -2,25 +2,29 @@
 Servicio de autenticación y gestión de sesiones
 """
 
-import bcrypt
 import uuid
 import json
 from datetime import datetime
 from utils.db_manager import db_manager
 from config.db_config import APP_CONFIG
+from utils import resiliencia
+from utils.instrumentacion import instrumentar
 
+@instrumentar
 class AuthService:
     """Servicio para autenticación de usuarios"""
     
     @staticmethod
     def hashear_password(password):
         """Genera hash de password con bcrypt"""
+        import bcrypt
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
     
     @staticmethod
     def verificar_password(password, password_hash):
         """Verifica si el password coincide con el hash"""
+        import bcrypt
         return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
     
     @staticmethod
@@ -86,6 +90,7 @@ class AuthService:
             return True, "Login exitoso", session_id, user_data
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error en login: {e}")
             return False, f"Error: {str(e)}", None, None
     
@@ -97,6 +102,7 @@ class AuthService:
             redis_client.delete(f"session:{session_id}")
             return True, "Sesión cerrada"
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             return False, f"Error al cerrar sesión: {str(e)}"
     
     @staticmethod
@@ -128,6 +134,7 @@ class AuthService:
             return True, user_data
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error verificando sesión: {e}")
             return False, None
     
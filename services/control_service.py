@@ -4,7 +4,10 @@ Servicio de control de funcionamiento de sensores
 
 from datetime import datetime, timedelta
 from utils.db_manager import db_manager
+from utils import contadores
+from utils.instrumentacion import instrumentar
 
+@instrumentar
 class ControlService:
     """Servicio para control de funcionamiento de sensores"""
     
@@ -38,6 +41,7 @@ class ControlService:
             resultado = db.control_funcionamiento.insert_one(control)
             
             if resultado.inserted_id:
+                contadores.incrementar('controles', estado)
                 return True, "Control registrado exitosamente"
             else:
                 return False, "Error al registrar control"
@@ -106,36 +110,41 @@ class ControlService:
             return []
     
     @staticmethod
-    def obtener_estadisticas_controles():
+    def obtener_estadisticas_controles(exacto=False):
         """
         Obtiene estadísticas de controles de funcionamiento
         
+        Args:
+            exacto: Contar recorriendo la colección en lugar de usar el total
+                    estimado y el contador mantenido por estado
+        
         Returns:
             Diccionario con estadísticas
         """
         try:
             db = db_manager.conectar_mongodb()
             
-            # Total de controles
-            total = db.control_funcionamiento.count_documents({})
-            
             # Controles por estado
-            pipeline = [
-                {
-                    '$group': {
-                        '_id': '$estado',
-                        'total': {'$sum': 1}
+            def recalcular():
+                pipeline = [
+                    {
+                        '$group': {
+                            '_id': '$estado',
+                            'total': {'$sum': 1}
+                        }
                     }
-                }
-            ]
+                ]
+                return {item['_id']: item['total'] for item in db.control_funcionamiento.aggregate(pipeline)}
             
-            resultado = list(db.control_funcionamiento.aggregate(pipeline))
+            por_estado = contadores.leer('controles', recalcular, exacto)
             
-            por_estado = {}
-            for item in resultado:
-                por_estado[item['_id']] = item['total']
+            # Total de controles
+            if exacto:
+                total = sum(por_estado.values())
+            else:
+                total = contadores.total_estimado(db.control_funcionamiento)
             
-            # Controles recientes (últimos 7 días)
+            # Controles recientes (últimos 7 días, rango sobre el índice)
             fecha_limite = datetime.now() - timedelta(days=7)
             recientes = db.control_funcionamiento.count_documents({
                 'fecha_revision': {'$gte': fecha_limite}
@@ -3,13 +3,19 @@ Servicio de ejecución de procesos
 Motor que ejecuta los diferentes tipos de reportes y procesos
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from config.db_config import FACTURACION_CONFIG, PROGRAMADOR_CONFIG
 from utils.db_manager import db_manager
 from services.facturacion_service import FacturacionService
 from services.notificacion_service import NotificacionService
+from services.retencion_service import RetencionService
+from utils.event_bus import event_bus, STREAM_PROCESOS, STREAM_ALERTAS
+from utils import cola_procesos, contadores, particiones, presupuesto
+from utils.instrumentacion import instrumentar
 from utils.logger import logger
 import json
 
+@instrumentar
 class EjecucionService:
     """Servicio para ejecución de procesos y generación de reportes"""
     
@@ -22,15 +28,28 @@ class EjecucionService:
             (success: bool, mensaje: str)
         """
         try:
-            # Obtener proceso de la cola de Redis
-            redis_client = db_manager.conectar_redis()
-            solicitud_id = redis_client.rpop("cola:procesos_pendientes")
-            
-            if not solicitud_id:
-                return False, "No hay procesos pendientes"
-            
-            solicitud_id = int(solicitud_id)
-            
+            # Obtener el próximo proceso de la cola de Redis
+            solicitud_id = cola_procesos.desencolar()
+        except Exception as e:
+            print(f"❌ Error ejecutando proceso: {e}")
+            return False, f"Error: {str(e)}"
+        
+        if not solicitud_id:
+            return False, "No hay procesos pendientes"
+        
+        # Todos los registros de la ejecución llevan el id de la solicitud
+        with logger.contexto(solicitud_id=solicitud_id):
+            return EjecucionService._ejecutar_solicitud(solicitud_id)
+    
+    @staticmethod
+    def _ejecutar_solicitud(solicitud_id):
+        """
+        Ejecuta una solicitud ya sacada de la cola
+        
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
             # Obtener datos de la solicitud
             cursor = db_manager.get_mysql_cursor()
             cursor.execute("""
@@ -46,6 +65,8 @@ class EjecucionService:
                 cursor.close()
                 return False, f"Solicitud {solicitud_id} no encontrada"
             
+            logger.agregar_contexto(usuario_id=solicitud['usuario_id'])
+            
             # Cambiar estado a 'en_proceso'
             cursor.execute("""
                 UPDATE solicitudes_proceso SET estado = 'en_proceso'
@@ -57,26 +78,40 @@ class EjecucionService:
             # Parsear parámetros
             parametros = json.loads(solicitud['parametros']) if solicitud['parametros'] else {}
             
-            # Ejecutar según tipo de proceso
+            # Ejecutar según tipo de proceso, dentro de su presupuesto de tiempo
             tipo = solicitud['tipo']
             resultado = None
             
-            if tipo == 'informe_max_min':
-                resultado = EjecucionService._ejecutar_informe_max_min(parametros)
-            elif tipo == 'informe_promedio':
-                resultado = EjecucionService._ejecutar_informe_promedio(parametros)
-            elif tipo == 'informe_humedad_max_min':
-                resultado = EjecucionService._ejecutar_humedad_max_min(parametros)
-            elif tipo == 'informe_humedad_promedio':
-                resultado = EjecucionService._ejecutar_humedad_promedio(parametros)
-            elif tipo == 'alertas_rango':
-                resultado = EjecucionService._ejecutar_generacion_alertas(parametros)
-            elif tipo == 'consulta_online':
-                resultado = EjecucionService._ejecutar_consulta_online(parametros)
-            elif tipo == 'proceso_periodico_mensual':
-                resultado = EjecucionService._ejecutar_proceso_periodico(parametros)
-            else:
-                resultado = {'error': f'Tipo de proceso desconocido: {tipo}'}
+            try:
+                with presupuesto.limitar(solicitud_id, presupuesto.segundos_para(tipo)):
+                    presupuesto.verificar()
+                    
+                    if tipo == 'informe_max_min':
+                        resultado = EjecucionService._ejecutar_informe_max_min(parametros)
+                    elif tipo == 'informe_promedio':
+                        resultado = EjecucionService._ejecutar_informe_promedio(parametros)
+                    elif tipo == 'informe_humedad_max_min':
+                        resultado = EjecucionService._ejecutar_humedad_max_min(parametros)
+                    elif tipo == 'informe_humedad_promedio':
+                        resultado = EjecucionService._ejecutar_humedad_promedio(parametros)
+                    elif tipo == 'alertas_rango':
+                        resultado = EjecucionService._ejecutar_generacion_alertas(parametros)
+                    elif tipo == 'consulta_online':
+                        resultado = EjecucionService._ejecutar_consulta_online(parametros)
+                    elif tipo == 'proceso_periodico_mensual':
+                        resultado = EjecucionService._ejecutar_proceso_periodico(parametros)
+                    else:
+                        resultado = {'error': f'Tipo de proceso desconocido: {tipo}'}
+                
+                nuevo_estado = 'completado' if 'error' not in resultado else 'error'
+            except presupuesto.TiempoAgotado as e:
+                resultado = {'error': str(e)}
+                nuevo_estado = 'timeout'
+            except presupuesto.ProcesoCancelado as e:
+                resultado = {'error': str(e)}
+                nuevo_estado = 'cancelado'
+            finally:
+                db_manager.conectar_redis().delete(presupuesto.clave_cancelacion(solicitud_id))
             
             # Guardar resultado en MongoDB
             db = db_manager.conectar_mongodb()
@@ -84,25 +119,26 @@ class EjecucionService:
                 'solicitud_id': solicitud_id,
                 'fecha_ejecucion': datetime.now(),
                 'resultado': resultado,
-                'estado': 'completado' if 'error' not in resultado else 'error'
+                'estado': nuevo_estado
             }
             db.historial_ejecucion.insert_one(historial)
             
             # Actualizar estado en MySQL
             cursor = db_manager.get_mysql_cursor()
-            nuevo_estado = 'completado' if 'error' not in resultado else 'error'
             cursor.execute("""
                 UPDATE solicitudes_proceso SET estado = %s
                 WHERE id = %s
             """, (nuevo_estado, solicitud_id))
             
             # Si completó exitosamente, generar factura y notificar
+            # (en modo 'ciclo' la factura la emite el worker al cierre del período)
             if nuevo_estado == 'completado':
-                FacturacionService.generar_factura(
-                    solicitud['usuario_id'],
-                    [solicitud_id],
-                    f"Factura por proceso: {solicitud['nombre']}"
-                )
+                if FACTURACION_CONFIG['modo'] == 'inmediato':
+                    FacturacionService.generar_factura(
+                        solicitud['usuario_id'],
+                        [solicitud_id],
+                        f"Factura por proceso: {solicitud['nombre']}"
+                    )
                 
                 # Enviar notificación al usuario
                 NotificacionService.enviar_notificacion(
@@ -112,19 +148,28 @@ class EjecucionService:
                     {'solicitud_id': solicitud_id, 'proceso_nombre': solicitud['nombre']}
                 )
                 
-                logger.info(f"Proceso {solicitud_id} completado para usuario {solicitud['usuario_id']}")
-            elif nuevo_estado == 'error':
+                logger.info("Proceso %s completado", solicitud_id, tipo=tipo)
+            elif nuevo_estado in ('error', 'timeout'):
                 # Notificar error también
                 NotificacionService.enviar_notificacion(
                     solicitud['usuario_id'],
                     'proceso_error',
-                    f"Tu proceso '{solicitud['nombre']}' finalizó con error",
+                    f"Tu proceso '{solicitud['nombre']}' "
+                    + ("superó el tiempo máximo de ejecución" if nuevo_estado == 'timeout' else "finalizó con error"),
                     {'solicitud_id': solicitud_id, 'proceso_nombre': solicitud['nombre'], 'error': resultado.get('error', 'Error desconocido')}
                 )
             
             db_manager.commit_mysql()
             cursor.close()
             
+            event_bus.publicar(STREAM_PROCESOS, {
+                'solicitud_id': solicitud_id,
+                'usuario_id': solicitud['usuario_id'],
+                'tipo': tipo,
+                'estado': nuevo_estado,
+                'fecha': datetime.now().isoformat()
+            })
+            
             return True, f"Proceso ejecutado: {solicitud['nombre']}"
             
         except Exception as e:
@@ -144,50 +189,266 @@ class EjecucionService:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def _ejecutar_informe_max_min(parametros):
+    def _resultado_error(error):
         """
-        Genera informe de temperaturas máximas y mínimas
+        Resultado de un proceso que falló
+        
+        Los cortes por presupuesto (incluidos los timeouts de MongoDB y MySQL)
+        no son errores del proceso: se propagan para cerrarlo como timeout
+        o cancelado.
         """
-        try:
-            db = db_manager.conectar_mongodb()
-            
-            # Construir filtro
-            filtro = {}
-            if parametros.get('ciudad'):
-                filtro['ciudad'] = parametros['ciudad']
-            if parametros.get('pais'):
-                filtro['pais'] = parametros['pais']
-            
-            # Rango de fechas
-            if parametros.get('fecha_inicio'):
-                fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
-                filtro['timestamp'] = {'$gte': fecha_inicio}
-            if parametros.get('fecha_fin'):
-                fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
-                if 'timestamp' in filtro:
-                    filtro['timestamp']['$lte'] = fecha_fin
-                else:
-                    filtro['timestamp'] = {'$lte': fecha_fin}
-            
-            # Agregación
-            pipeline = [
+        if isinstance(error, presupuesto.ProcesoCancelado):
+            raise error
+        if presupuesto.es_timeout(error):
+            raise presupuesto.TiempoAgotado(str(error)) from error
+        return {'error': str(error)}
+    
+    @staticmethod
+    def _rango_fechas(parametros):
+        """
+        Convierte fecha_inicio / fecha_fin de los parámetros
+        
+        Returns:
+            (fecha_inicio, fecha_fin) como datetime o None
+        """
+        fecha_inicio = fecha_fin = None
+        if parametros.get('fecha_inicio'):
+            fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
+        if parametros.get('fecha_fin'):
+            fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
+        return fecha_inicio, fecha_fin
+    
+    @staticmethod
+    def _sensores_de_zona(zona):
+        """
+        IDs de los sensores de una zona (desde MySQL)
+        
+        Args:
+            zona: Diccionario con 'ciudad' y/o 'pais'
+        
+        Returns:
+            Lista de IDs
+        """
+        condiciones = ' AND '.join(f"{campo} = %s" for campo in zona)
+        cursor = db_manager.get_mysql_cursor(replica=True)
+        cursor.execute(
+            f"SELECT {presupuesto.hint_mysql()}id FROM sensores WHERE {condiciones}",
+            tuple(zona.values())
+        )
+        sensores = [row['id'] for row in cursor.fetchall()]
+        cursor.close()
+        return sensores
+    
+    @staticmethod
+    def _construir_filtro(parametros, campos=('ciudad', 'pais'), campo_fecha='timestamp', por_sensor=True):
+        """
+        Construye el filtro de mediciones por zona y rango de fechas
+        
+        Args:
+            por_sensor: Traducir la zona a sensor_id $in, el prefijo de la
+                clave de shard, para que mongos dirija la consulta solo a
+                los shards de esos sensores en lugar de a todos
+        
+        Returns:
+            Diccionario de filtro para MongoDB
+        """
+        filtro = {campo: parametros[campo] for campo in campos if parametros.get(campo)}
+        
+        if por_sensor and filtro:
+            filtro['sensor_id'] = {'$in': EjecucionService._sensores_de_zona(dict(filtro))}
+        
+        fecha_inicio, fecha_fin = EjecucionService._rango_fechas(parametros)
+        rango = {}
+        if fecha_inicio:
+            rango['$gte'] = fecha_inicio
+        if fecha_fin:
+            # Los rollups son diarios: el día de fin no entra, igual que con
+            # los datos crudos filtrados por $lte a las 00:00
+            rango['$lt' if campo_fecha == 'dia' else '$lte'] = fecha_fin
+        if rango:
+            filtro[campo_fecha] = rango
+        
+        return filtro
+    
+    @staticmethod
+    def _combinar_parciales(parciales, items):
+        """Suma parciales por (año, mes): totales y sumas se suman, extremos se comparan"""
+        for item in items:
+            clave = (item['_id']['año'], item['_id']['mes'])
+            actual = parciales.get(clave)
+            if actual is None:
+                parciales[clave] = item
+                continue
+            for campo in ('total_mediciones', 'suma_temperatura', 'suma_humedad'):
+                actual[campo] += item[campo]
+            for campo in ('temperatura_maxima', 'humedad_maxima'):
+                actual[campo] = max(actual[campo], item[campo])
+            for campo in ('temperatura_minima', 'humedad_minima'):
+                actual[campo] = min(actual[campo], item[campo])
+        return parciales
+    
+    @staticmethod
+    def _agregados_mensuales(parametros, desde=None, hasta=None):
+        """
+        Agregados parciales por (año, mes) del rango pedido: mediciones
+        crudas vigentes más los rollups diarios de lo ya archivado
+        
+        Args:
+            desde: Solo mediciones posteriores a este instante (exclusivo)
+            hasta: Solo mediciones hasta este instante (inclusive)
+        
+        Returns:
+            Diccionario (año, mes) -> parciales (total, sumas, máximos y mínimos)
+        """
+        # Los informes toleran datos con algunos segundos de retraso
+        db = db_manager.conectar_mongodb('informes')
+        parciales = {}
+        
+        def acumular(items):
+            EjecucionService._combinar_parciales(parciales, items)
+        
+        # Datos crudos que todavía no pasaron al archivo, una consulta
+        # concurrente por cada partición que intersecta el rango
+        fecha_inicio, fecha_fin = EjecucionService._rango_fechas(parametros)
+        filtro = EjecucionService._construir_filtro(parametros)
+        filtro['archivo_parte'] = None
+        if desde or hasta:
+            rango = filtro.setdefault('timestamp', {})
+            if desde:
+                rango.pop('$gte', None)
+                rango['$gt'] = fecha_inicio = desde
+            if hasta:
+                rango['$lte'] = fecha_fin = hasta
+        pipeline = [
+            {'$match': filtro},
+            {
+                '$group': {
+                    '_id': {'año': {'$year': '$timestamp'}, 'mes': {'$month': '$timestamp'}},
+                    'total_mediciones': {'$sum': 1},
+                    'suma_temperatura': {'$sum': '$temperatura'},
+                    'suma_humedad': {'$sum': '$humedad'},
+                    'temperatura_maxima': {'$max': '$temperatura'},
+                    'temperatura_minima': {'$min': '$temperatura'},
+                    'humedad_maxima': {'$max': '$humedad'},
+                    'humedad_minima': {'$min': '$humedad'}
+                }
+            }
+        ]
+        colecciones = particiones.colecciones_en_rango(db, fecha_inicio, fecha_fin)
+        for resultado in particiones.consultar(
+            colecciones, lambda c: list(c.aggregate(pipeline, **presupuesto.opciones_mongo()))
+        ):
+            acumular(resultado)
+        
+        # Rollups de los días archivados (solo si el rango llega hasta ellos;
+        # las evaluaciones incrementales empiezan después del corte)
+        if desde is None and (fecha_inicio is None or fecha_inicio < RetencionService.fecha_corte()):
+            filtro = EjecucionService._construir_filtro(parametros, campo_fecha='dia', por_sensor=False)
+            acumular(db.mediciones_diarias.aggregate([
                 {'$match': filtro},
                 {
                     '$group': {
-                        '_id': None,
-                        'temperatura_maxima': {'$max': '$temperatura'},
-                        'temperatura_minima': {'$min': '$temperatura'},
-                        'humedad_maxima': {'$max': '$humedad'},
-                        'humedad_minima': {'$min': '$humedad'},
-                        'total_mediciones': {'$sum': 1}
+                        '_id': {'año': {'$year': '$dia'}, 'mes': {'$month': '$dia'}},
+                        'total_mediciones': {'$sum': '$total_mediciones'},
+                        'suma_temperatura': {'$sum': '$suma_temperatura'},
+                        'suma_humedad': {'$sum': '$suma_humedad'},
+                        'temperatura_maxima': {'$max': '$temperatura_maxima'},
+                        'temperatura_minima': {'$min': '$temperatura_minima'},
+                        'humedad_maxima': {'$max': '$humedad_maxima'},
+                        'humedad_minima': {'$min': '$humedad_minima'}
                     }
                 }
-            ]
-            
-            resultado = list(db.mediciones.aggregate(pipeline))
+            ], **presupuesto.opciones_mongo()))
+        
+        return parciales
+    
+    @staticmethod
+    def _parciales(parametros):
+        """
+        Parciales mensuales de un informe, incrementales si es programado
+        
+        Una ejecución programada guarda en su resultado los parciales por mes
+        y la marca de agua (hasta qué instante agregó). La siguiente ejecución
+        del mismo programado toma esos parciales para los meses que siguen
+        dentro de su rango y solo agrega las mediciones posteriores a la
+        marca: un informe móvil de doce meses recorre un mes de datos.
+        
+        La marca queda un margen antes del momento de ejecución para no
+        perder mediciones que todavía se están escribiendo o replicando; las
+        que lleguen con un timestamp anterior a la marca no se incorporan.
+        
+        Returns:
+            (parciales, estado) donde estado se agrega al resultado
+            (vacío si la solicitud no es programada)
+        """
+        programado_id = parametros.get('programado_id')
+        if not programado_id:
+            return EjecucionService._agregados_mensuales(parametros), {}
+        
+        fecha_inicio, fecha_fin = EjecucionService._rango_fechas(parametros)
+        marca = datetime.now() - timedelta(seconds=PROGRAMADOR_CONFIG['margen_incremental_segundos'])
+        if fecha_fin:
+            marca = min(marca, fecha_fin)
+        
+        db = db_manager.conectar_mongodb()
+        anterior = db.historial_ejecucion.find_one(
+            {'resultado.programado_id': programado_id, 'estado': 'completado'},
+            sort=[('fecha_ejecucion', -1)]
+        )
+        
+        parciales = {}
+        desde = None
+        if anterior and anterior['resultado'].get('marca_agua'):
+            previo = anterior['resultado']
+            inicio_previo, _ = EjecucionService._rango_fechas(previo['parametros'])
+            mismo_filtro = all(
+                previo['parametros'].get(campo) == parametros.get(campo) for campo in ('ciudad', 'pais')
+            )
+            # Se reutiliza si la ventana no retrocedió y lo nuevo no llega al archivo
+            if (mismo_filtro
+                    and (fecha_inicio is None or (inicio_previo is not None and inicio_previo <= fecha_inicio))
+                    and previo['marca_agua'] <= marca
+                    and previo['marca_agua'] >= RetencionService.fecha_corte()):
+                for parcial in previo['parciales']:
+                    inicio_mes = datetime(parcial['_id']['año'], parcial['_id']['mes'], 1)
+                    if fecha_inicio is None or inicio_mes >= fecha_inicio or inicio_previo == fecha_inicio:
+                        parciales[(parcial['_id']['año'], parcial['_id']['mes'])] = parcial
+                desde = previo['marca_agua']
+        
+        EjecucionService._combinar_parciales(
+            parciales,
+            EjecucionService._agregados_mensuales(parametros, desde=desde, hasta=marca).values()
+        )
+        
+        return parciales, {
+            'programado_id': programado_id,
+            'marca_agua': marca,
+            'incremental': desde is not None,
+            'parciales': [parciales[clave] for clave in sorted(parciales)]
+        }
+    
+    @staticmethod
+    def _extremos(parciales):
+        """Máximos, mínimos y total de todo el rango a partir de los parciales"""
+        valores = list(parciales.values())
+        return {
+            'temperatura_maxima': max(p['temperatura_maxima'] for p in valores),
+            'temperatura_minima': min(p['temperatura_minima'] for p in valores),
+            'humedad_maxima': max(p['humedad_maxima'] for p in valores),
+            'humedad_minima': min(p['humedad_minima'] for p in valores),
+            'total_mediciones': sum(p['total_mediciones'] for p in valores)
+        }
+    
+    @staticmethod
+    def _ejecutar_informe_max_min(parametros):
+        """
+        Genera informe de temperaturas máximas y mínimas
+        """
+        try:
+            parciales, estado_incremental = EjecucionService._parciales(parametros)
             
-            if resultado:
-                data = resultado[0]
+            if parciales:
+                data = EjecucionService._extremos(parciales)
                 return {
                     'tipo': 'informe_max_min',
                     'temperatura_maxima': round(data['temperatura_maxima'], 2),
@@ -195,13 +456,14 @@ class EjecucionService:
                     'humedad_maxima': round(data['humedad_maxima'], 2),
                     'humedad_minima': round(data['humedad_minima'], 2),
                     'total_mediciones': data['total_mediciones'],
-                    'parametros': parametros
+                    'parametros': parametros,
+                    **estado_incremental
                 }
             else:
                 return {'error': 'No se encontraron mediciones con los criterios especificados'}
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_informe_promedio(parametros):
@@ -209,65 +471,29 @@ class EjecucionService:
         Genera informe de temperaturas promedio (mensual/anual)
         """
         try:
-            db = db_manager.conectar_mongodb()
+            parciales, estado_incremental = EjecucionService._parciales(parametros)
             
-            # Construir filtro
-            filtro = {}
-            if parametros.get('ciudad'):
-                filtro['ciudad'] = parametros['ciudad']
-            if parametros.get('pais'):
-                filtro['pais'] = parametros['pais']
-            
-            # Rango de fechas
-            if parametros.get('fecha_inicio'):
-                fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
-                filtro['timestamp'] = {'$gte': fecha_inicio}
-            if parametros.get('fecha_fin'):
-                fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
-                if 'timestamp' in filtro:
-                    filtro['timestamp']['$lte'] = fecha_fin
-                else:
-                    filtro['timestamp'] = {'$lte': fecha_fin}
-            
-            # Agregación mensual
-            pipeline = [
-                {'$match': filtro},
-                {
-                    '$group': {
-                        '_id': {
-                            'año': {'$year': '$timestamp'},
-                            'mes': {'$month': '$timestamp'}
-                        },
-                        'temperatura_promedio': {'$avg': '$temperatura'},
-                        'humedad_promedio': {'$avg': '$humedad'},
-                        'total_mediciones': {'$sum': 1}
-                    }
-                },
-                {'$sort': {'_id.año': 1, '_id.mes': 1}}
-            ]
-            
-            resultado = list(db.mediciones.aggregate(pipeline))
-            
-            if resultado:
+            if parciales:
                 datos_mensuales = []
-                for item in resultado:
+                for (año, mes), item in sorted(parciales.items()):
                     datos_mensuales.append({
-                        'periodo': f"{item['_id']['año']}-{item['_id']['mes']:02d}",
-                        'temperatura_promedio': round(item['temperatura_promedio'], 2),
-                        'humedad_promedio': round(item['humedad_promedio'], 2),
+                        'periodo': f"{año}-{mes:02d}",
+                        'temperatura_promedio': round(item['suma_temperatura'] / item['total_mediciones'], 2),
+                        'humedad_promedio': round(item['suma_humedad'] / item['total_mediciones'], 2),
                         'total_mediciones': item['total_mediciones']
                     })
                 
                 return {
                     'tipo': 'informe_promedio',
                     'datos_mensuales': datos_mensuales,
-                    'parametros': parametros
+                    'parametros': parametros,
+                    **estado_incremental
                 }
             else:
                 return {'error': 'No se encontraron mediciones'}
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_humedad_max_min(parametros):
@@ -275,52 +501,23 @@ class EjecucionService:
         Genera informe de humedad máxima y mínima
         """
         try:
-            db = db_manager.conectar_mongodb()
-            
-            filtro = {}
-            if parametros.get('ciudad'):
-                filtro['ciudad'] = parametros['ciudad']
-            if parametros.get('pais'):
-                filtro['pais'] = parametros['pais']
-            
-            if parametros.get('fecha_inicio'):
-                fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
-                filtro['timestamp'] = {'$gte': fecha_inicio}
-            if parametros.get('fecha_fin'):
-                fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
-                if 'timestamp' in filtro:
-                    filtro['timestamp']['$lte'] = fecha_fin
-                else:
-                    filtro['timestamp'] = {'$lte': fecha_fin}
-            
-            pipeline = [
-                {'$match': filtro},
-                {
-                    '$group': {
-                        '_id': None,
-                        'humedad_maxima': {'$max': '$humedad'},
-                        'humedad_minima': {'$min': '$humedad'},
-                        'total_mediciones': {'$sum': 1}
-                    }
-                }
-            ]
+            parciales, estado_incremental = EjecucionService._parciales(parametros)
             
-            resultado = list(db.mediciones.aggregate(pipeline))
-            
-            if resultado:
-                data = resultado[0]
+            if parciales:
+                data = EjecucionService._extremos(parciales)
                 return {
                     'tipo': 'informe_humedad_max_min',
                     'humedad_maxima': round(data['humedad_maxima'], 2),
                     'humedad_minima': round(data['humedad_minima'], 2),
                     'total_mediciones': data['total_mediciones'],
-                    'parametros': parametros
+                    'parametros': parametros,
+                    **estado_incremental
                 }
             else:
                 return {'error': 'No se encontraron mediciones'}
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_humedad_promedio(parametros):
@@ -328,60 +525,28 @@ class EjecucionService:
         Genera informe de humedad promedio
         """
         try:
-            db = db_manager.conectar_mongodb()
-            
-            filtro = {}
-            if parametros.get('ciudad'):
-                filtro['ciudad'] = parametros['ciudad']
-            if parametros.get('pais'):
-                filtro['pais'] = parametros['pais']
-            
-            if parametros.get('fecha_inicio'):
-                fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
-                filtro['timestamp'] = {'$gte': fecha_inicio}
-            if parametros.get('fecha_fin'):
-                fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
-                if 'timestamp' in filtro:
-                    filtro['timestamp']['$lte'] = fecha_fin
-                else:
-                    filtro['timestamp'] = {'$lte': fecha_fin}
-            
-            pipeline = [
-                {'$match': filtro},
-                {
-                    '$group': {
-                        '_id': {
-                            'año': {'$year': '$timestamp'},
-                            'mes': {'$month': '$timestamp'}
-                        },
-                        'humedad_promedio': {'$avg': '$humedad'},
-                        'total_mediciones': {'$sum': 1}
-                    }
-                },
-                {'$sort': {'_id.año': 1, '_id.mes': 1}}
-            ]
+            parciales, estado_incremental = EjecucionService._parciales(parametros)
             
-            resultado = list(db.mediciones.aggregate(pipeline))
-            
-            if resultado:
+            if parciales:
                 datos_mensuales = []
-                for item in resultado:
+                for (año, mes), item in sorted(parciales.items()):
                     datos_mensuales.append({
-                        'periodo': f"{item['_id']['año']}-{item['_id']['mes']:02d}",
-                        'humedad_promedio': round(item['humedad_promedio'], 2),
+                        'periodo': f"{año}-{mes:02d}",
+                        'humedad_promedio': round(item['suma_humedad'] / item['total_mediciones'], 2),
                         'total_mediciones': item['total_mediciones']
                     })
                 
                 return {
                     'tipo': 'informe_humedad_promedio',
                     'datos_mensuales': datos_mensuales,
-                    'parametros': parametros
+                    'parametros': parametros,
+                    **estado_incremental
                 }
             else:
                 return {'error': 'No se encontraron mediciones'}
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_generacion_alertas(parametros):
@@ -389,21 +554,11 @@ class EjecucionService:
         Genera alertas para mediciones fuera de rango
         """
         try:
-            db = db_manager.conectar_mongodb()
+            # Lee de secundarios; las alertas se insertan igual en el primario
+            db = db_manager.conectar_mongodb('informes')
             
-            filtro = {}
-            if parametros.get('ciudad'):
-                filtro['ciudad'] = parametros['ciudad']
-            
-            if parametros.get('fecha_inicio'):
-                fecha_inicio = datetime.strptime(parametros['fecha_inicio'], '%Y-%m-%d')
-                filtro['timestamp'] = {'$gte': fecha_inicio}
-            if parametros.get('fecha_fin'):
-                fecha_fin = datetime.strptime(parametros['fecha_fin'], '%Y-%m-%d')
-                if 'timestamp' in filtro:
-                    filtro['timestamp']['$lte'] = fecha_fin
-                else:
-                    filtro['timestamp'] = {'$lte': fecha_fin}
+            filtro = EjecucionService._construir_filtro(parametros, campos=('ciudad',))
+            filtro['archivo_parte'] = None
             
             # Buscar mediciones fuera de rango
             temp_min = parametros.get('temp_min', -999)
@@ -414,7 +569,28 @@ class EjecucionService:
                 {'temperatura': {'$gt': temp_max}}
             ]
             
-            mediciones_fuera_rango = list(db.mediciones.find(filtro).limit(100))
+            fecha_inicio, fecha_fin = EjecucionService._rango_fechas(parametros)
+            colecciones = particiones.colecciones_en_rango(db, fecha_inicio, fecha_fin)
+            mediciones_fuera_rango = [
+                medicion
+                for parcial in particiones.consultar(colecciones, lambda c: list(
+                    c.find(filtro, max_time_ms=presupuesto.restante_ms()).limit(100)
+                ))
+                for medicion in parcial
+            ][:100]
+            
+            # Si el rango incluye días archivados, completar leyendo el archivo
+            if len(mediciones_fuera_rango) < 100 and (
+                fecha_inicio is None or fecha_inicio < RetencionService.fecha_corte()
+            ):
+                for medicion in RetencionService.leer_archivo(fecha_inicio, fecha_fin):
+                    if parametros.get('ciudad') and medicion.get('ciudad') != parametros['ciudad']:
+                        continue
+                    if temp_min <= medicion['temperatura'] <= temp_max:
+                        continue
+                    mediciones_fuera_rango.append(medicion)
+                    if len(mediciones_fuera_rango) >= 100:
+                        break
             
             # Crear alertas
             alertas_generadas = 0
@@ -427,6 +603,8 @@ class EjecucionService:
                     'estado': 'activa'
                 }
                 db.alertas.insert_one(alerta)
+                contadores.incrementar('alertas', 'activa')
+                event_bus.publicar(STREAM_ALERTAS, alerta)
                 alertas_generadas += 1
             
             return {
@@ -437,7 +615,7 @@ class EjecucionService:
             }
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_consulta_online(parametros):
@@ -451,8 +629,8 @@ class EjecucionService:
             zona = parametros.get('zona', '')
             
             # Buscar sensores en la zona
-            cursor.execute("""
-                SELECT id, nombre, ciudad, pais, estado
+            cursor.execute(f"""
+                SELECT {presupuesto.hint_mysql()}id, nombre, ciudad, pais, estado
                 FROM sensores
                 WHERE ciudad LIKE %s OR pais LIKE %s
             """, (f'%{zona}%', f'%{zona}%'))
@@ -466,10 +644,8 @@ class EjecucionService:
             # Obtener última medición de cada sensor
             datos_sensores = []
             for sensor in sensores:
-                ultima_medicion = db.mediciones.find_one(
-                    {'sensor_id': sensor['id']},
-                    sort=[('timestamp', -1)]
-                )
+                presupuesto.verificar()
+                ultima_medicion = particiones.ultima_medicion(db, {'sensor_id': sensor['id']})
                 
                 if ultima_medicion:
                     datos_sensores.append({
@@ -492,12 +668,39 @@ class EjecucionService:
             }
             
         except Exception as e:
-            return {'error': str(e)}
+            return EjecucionService._resultado_error(e)
     
     @staticmethod
     def _ejecutar_proceso_periodico(parametros):
         """
-        Proceso periódico mensual
+        Proceso periódico mensual: temperatura y humedad promedio, máximas y
+        mínimas por mes (incremental si viene de un proceso programado)
         """
-        # Similar a informe_promedio pero con más detalles
-        return EjecucionService._ejecutar_informe_promedio(parametros)
+        try:
+            parciales, estado_incremental = EjecucionService._parciales(parametros)
+            
+            if not parciales:
+                return {'error': 'No se encontraron mediciones'}
+            
+            datos_mensuales = []
+            for (año, mes), item in sorted(parciales.items()):
+                datos_mensuales.append({
+                    'periodo': f"{año}-{mes:02d}",
+                    'temperatura_promedio': round(item['suma_temperatura'] / item['total_mediciones'], 2),
+                    'humedad_promedio': round(item['suma_humedad'] / item['total_mediciones'], 2),
+                    'temperatura_maxima': round(item['temperatura_maxima'], 2),
+                    'temperatura_minima': round(item['temperatura_minima'], 2),
+                    'humedad_maxima': round(item['humedad_maxima'], 2),
+                    'humedad_minima': round(item['humedad_minima'], 2),
+                    'total_mediciones': item['total_mediciones']
+                })
+            
+            return {
+                'tipo': 'proceso_periodico_mensual',
+                'datos_mensuales': datos_mensuales,
+                'parametros': parametros,
+                **estado_incremental
+            }
+            
+        except Exception as e:
+            return EjecucionService._resultado_error(e)
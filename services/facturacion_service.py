@@ -2,9 +2,26 @@
 Servicio de facturación y cuenta corriente
 """
 
+import uuid
 from datetime import datetime, timedelta
+from config.db_config import FACTURACION_CONFIG
 from utils.db_manager import db_manager
+from utils import resiliencia
+from utils.instrumentacion import instrumentar
 
+# Claves Redis del ciclo de facturación
+CLAVE_ULTIMO_CICLO = "facturacion:ultimo_ciclo"
+CLAVE_LOCK_CICLO = "facturacion:ciclo_lock"
+
+# Libera el lock solo si sigue siendo del worker que lo tomó (KEYS: lock, ARGV: token)
+_LUA_LIBERAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+@instrumentar
 class FacturacionService:
     """Servicio para gestión de facturación"""
     
@@ -24,9 +41,13 @@ class FacturacionService:
             cuenta = cursor.fetchone()
             cursor.close()
             
-            return cuenta
+            return resiliencia.guardar_respaldo(('cuenta_corriente', usuario_id), cuenta)
             
         except Exception as e:
+            anterior = resiliencia.respaldo(('cuenta_corriente', usuario_id))
+            if anterior:
+                print(f"⚠️ Cuenta corriente no disponible ({e}); se muestra la última leída")
+                return anterior[0]
             print(f"❌ Error obteniendo cuenta corriente: {e}")
             return None
     
@@ -41,20 +62,14 @@ class FacturacionService:
         try:
             cursor = db_manager.get_mysql_cursor()
             
-            # Primero obtener el ID de la cuenta
-            cursor.execute("SELECT id FROM cuenta_corriente WHERE usuario_id = %s", (usuario_id,))
-            cuenta = cursor.fetchone()
-            
-            if not cuenta:
-                cursor.close()
-                return []
-            
             cursor.execute("""
-                SELECT * FROM movimientos_cuenta
-                WHERE cuenta_id = %s
-                ORDER BY fecha DESC
+                SELECT m.*
+                FROM cuenta_corriente cc
+                JOIN movimientos_cuenta m ON m.cuenta_id = cc.id
+                WHERE cc.usuario_id = %s
+                ORDER BY m.fecha DESC
                 LIMIT %s
-            """, (cuenta['id'], limite))
+            """, (usuario_id, limite))
             
             movimientos = cursor.fetchall()
             cursor.close()
@@ -77,21 +92,29 @@ class FacturacionService:
             Lista de facturas
         """
         try:
-            cursor = db_manager.get_mysql_cursor()
-            
-            query = """
-                SELECT f.*, 
-                       (SELECT COUNT(*) FROM facturas_detalle WHERE factura_id = f.id) as items
-                FROM facturas f
-                WHERE f.usuario_id = %s
+            cursor = db_manager.get_mysql_cursor(replica=True)
+            
+            # Primero se limitan las facturas (índice usuario/estado/fecha)
+            # y después se cuentan sus items con un único join agrupado
+            filtro = "AND estado = %s" if filtro_estado else ""
+            query = f"""
+                SELECT f.id, f.usuario_id, f.fecha_emision, f.monto_total,
+                       f.estado, f.fecha_vencimiento, COUNT(fd.id) as items
+                FROM (
+                    SELECT id, usuario_id, fecha_emision, monto_total, estado, fecha_vencimiento
+                    FROM facturas
+                    WHERE usuario_id = %s {filtro}
+                    ORDER BY fecha_emision DESC
+                    LIMIT %s
+                ) f
+                LEFT JOIN facturas_detalle fd ON fd.factura_id = f.id
+                GROUP BY f.id, f.usuario_id, f.fecha_emision, f.monto_total,
+                         f.estado, f.fecha_vencimiento
+                ORDER BY f.fecha_emision DESC
             """
             params = [usuario_id]
-            
             if filtro_estado:
-                query += " AND f.estado = %s"
                 params.append(filtro_estado)
-            
-            query += " ORDER BY f.fecha_emision DESC LIMIT %s"
             params.append(limite)
             
             cursor.execute(query, tuple(params))
@@ -182,32 +205,7 @@ class FacturacionService:
                     cursor.close()
                     return False, f"La solicitud {sol['id']} no está completada", None
             
-            # Calcular monto total
-            monto_total = sum(sol['costo'] for sol in solicitudes)
-            
-            # Crear factura
-            fecha_vencimiento = datetime.now() + timedelta(days=30)
-            cursor.execute("""
-                INSERT INTO facturas (usuario_id, monto_total, estado, fecha_vencimiento)
-                VALUES (%s, %s, 'pendiente', %s)
-            """, (usuario_id, monto_total, fecha_vencimiento))
-            
-            factura_id = cursor.lastrowid
-            
-            # Crear items de factura
-            for sol in solicitudes:
-                cursor.execute("""
-                    INSERT INTO facturas_detalle (factura_id, solicitud_id, concepto, monto)
-                    VALUES (%s, %s, %s, %s)
-                """, (factura_id, sol['id'], sol['nombre'], sol['costo']))
-            
-            # Registrar movimiento en cuenta corriente (débito)
-            cursor.execute("SELECT id FROM cuenta_corriente WHERE usuario_id = %s", (usuario_id,))
-            cuenta = cursor.fetchone()
-            
-            if cuenta:
-                cursor.execute("CALL registrar_movimiento(%s, 'debito', %s, %s, %s)",
-                              (cuenta['id'], monto_total, f"Factura #{factura_id}", factura_id))
+            factura_id, monto_total = FacturacionService._crear_factura(cursor, usuario_id, solicitudes)
             
             db_manager.commit_mysql()
             cursor.close()
@@ -219,6 +217,152 @@ class FacturacionService:
             print(f"❌ Error generando factura: {e}")
             return False, f"Error: {str(e)}", None
     
+    @staticmethod
+    def facturar_ciclo(hasta=None):
+        """
+        Emite una factura por usuario con todas sus solicitudes completadas
+        que todavía no fueron facturadas
+        
+        Args:
+            hasta: Fecha de corte del período (por defecto ahora)
+        
+        Returns:
+            (success: bool, mensaje: str, facturas_generadas: int)
+        """
+        hasta = hasta or datetime.now()
+        redis_client = db_manager.conectar_redis()
+        
+        # Evitar que dos workers facturen el mismo período
+        token = uuid.uuid4().hex
+        if not redis_client.set(CLAVE_LOCK_CICLO, token, nx=True, ex=3600):
+            return False, "Ya hay un ciclo de facturación en curso", 0
+        
+        try:
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("""
+                SELECT sp.id, sp.usuario_id, p.costo, p.nombre
+                FROM solicitudes_proceso sp
+                JOIN procesos p ON sp.proceso_id = p.id
+                LEFT JOIN facturas_detalle fd ON fd.solicitud_id = sp.id
+                WHERE sp.estado = 'completado'
+                  AND fd.id IS NULL
+                  AND sp.fecha_solicitud <= %s
+                ORDER BY sp.usuario_id, sp.id
+            """, (hasta,))
+            
+            por_usuario = {}
+            for sol in cursor.fetchall():
+                por_usuario.setdefault(sol['usuario_id'], []).append(sol)
+            
+            generadas = 0
+            monto_ciclo = 0
+            for usuario_id, solicitudes in por_usuario.items():
+                # Una transacción por usuario: un error no bloquea al resto
+                try:
+                    _, monto_total = FacturacionService._crear_factura(cursor, usuario_id, solicitudes)
+                    db_manager.commit_mysql()
+                    generadas += 1
+                    monto_ciclo += monto_total
+                except Exception as e:
+                    db_manager.rollback_mysql()
+                    print(f"❌ Error facturando usuario {usuario_id}: {e}")
+            
+            cursor.close()
+            redis_client.set(CLAVE_ULTIMO_CICLO, hasta.isoformat())
+            
+            return True, f"{generadas} facturas generadas por ${float(monto_ciclo):.2f}", generadas
+            
+        except Exception as e:
+            db_manager.rollback_mysql()
+            print(f"❌ Error en ciclo de facturación: {e}")
+            return False, f"Error: {str(e)}", 0
+        
+        finally:
+            # Si el lock venció y lo tomó otro worker, no se lo quita
+            redis_client.register_script(_LUA_LIBERAR_LOCK)(keys=[CLAVE_LOCK_CICLO], args=[token])
+    
+    @staticmethod
+    def ciclo_vencido():
+        """
+        Indica si corresponde ejecutar el ciclo de facturación
+        
+        Returns:
+            True si nunca se ejecutó o pasó el período configurado
+        """
+        ultimo = db_manager.conectar_redis().get(CLAVE_ULTIMO_CICLO)
+        if not ultimo:
+            return True
+        
+        periodo = timedelta(hours=FACTURACION_CONFIG['ciclo_horas'])
+        return datetime.now() - datetime.fromisoformat(ultimo) >= periodo
+    
+    @staticmethod
+    def _crear_factura(cursor, usuario_id, solicitudes):
+        """
+        Inserta la factura, su detalle (un solo executemany) y el débito en
+        cuenta corriente. No hace commit.
+        
+        Args:
+            solicitudes: Filas con id, nombre y costo de cada solicitud
+        
+        Returns:
+            (factura_id, monto_total)
+        """
+        monto_total = sum(sol['costo'] for sol in solicitudes)
+        
+        # Materializar el resumen antes de insertar, para no contar la factura dos veces
+        FacturacionService._asegurar_resumen(cursor, usuario_id)
+        
+        fecha_vencimiento = datetime.now() + timedelta(days=FACTURACION_CONFIG['dias_vencimiento'])
+        cursor.execute("""
+            INSERT INTO facturas (usuario_id, monto_total, estado, fecha_vencimiento)
+            VALUES (%s, %s, 'pendiente', %s)
+        """, (usuario_id, monto_total, fecha_vencimiento))
+        
+        factura_id = cursor.lastrowid
+        
+        cursor.executemany("""
+            INSERT INTO facturas_detalle (factura_id, solicitud_id, concepto, monto)
+            VALUES (%s, %s, %s, %s)
+        """, [(factura_id, sol['id'], sol['nombre'], sol['costo']) for sol in solicitudes])
+        
+        # Registrar movimiento en cuenta corriente (débito)
+        cursor.execute("SELECT id FROM cuenta_corriente WHERE usuario_id = %s", (usuario_id,))
+        cuenta = cursor.fetchone()
+        
+        if cuenta:
+            cursor.execute("CALL registrar_movimiento(%s, 'debito', %s, %s, %s)",
+                          (cuenta['id'], monto_total, f"Factura #{factura_id}", factura_id))
+        
+        cursor.execute("""
+            UPDATE resumen_financiero
+            SET total_facturado = total_facturado + %s,
+                facturas_pendientes = facturas_pendientes + 1,
+                monto_pendiente = monto_pendiente + %s
+            WHERE usuario_id = %s
+        """, (monto_total, monto_total, usuario_id))
+        
+        return factura_id, monto_total
+    
+    @staticmethod
+    def _asegurar_resumen(cursor, usuario_id):
+        """
+        Crea la fila de resumen_financiero del usuario si no existe,
+        calculándola desde facturas con una sola agregación condicional.
+        No hace commit.
+        """
+        cursor.execute("""
+            INSERT IGNORE INTO resumen_financiero
+                (usuario_id, total_facturado, facturas_pendientes, monto_pendiente, facturas_pagadas)
+            SELECT %s,
+                   COALESCE(SUM(monto_total), 0),
+                   COALESCE(SUM(estado = 'pendiente'), 0),
+                   COALESCE(SUM(CASE WHEN estado = 'pendiente' THEN monto_total ELSE 0 END), 0),
+                   COALESCE(SUM(estado = 'pagada'), 0)
+            FROM facturas
+            WHERE usuario_id = %s
+        """, (usuario_id, usuario_id))
+    
     @staticmethod
     def registrar_pago(factura_id, usuario_id, monto, metodo_pago, referencia=None):
         """
@@ -230,43 +374,67 @@ class FacturacionService:
         try:
             cursor = db_manager.get_mysql_cursor()
             
-            # Verificar que la factura existe y pertenece al usuario
+            # Verificar que la factura existe y pertenece al usuario; FOR UPDATE
+            # bloquea la fila hasta el commit: un pago concurrente de la misma
+            # factura espera y después la ve pagada
             cursor.execute("""
                 SELECT id, usuario_id, monto_total, estado
                 FROM facturas
                 WHERE id = %s
+                FOR UPDATE
             """, (factura_id,))
             
             factura = cursor.fetchone()
             
             if not factura:
                 cursor.close()
+                db_manager.rollback_mysql()
                 return False, "Factura no encontrada"
             
             if factura['usuario_id'] != usuario_id:
                 cursor.close()
+                db_manager.rollback_mysql()
                 return False, "Esta factura no pertenece al usuario"
             
             if factura['estado'] == 'pagada':
                 cursor.close()
+                db_manager.rollback_mysql()
                 return False, "Esta factura ya está pagada"
             
             # Validar monto
             if monto <= 0 or monto > factura['monto_total']:
                 cursor.close()
+                db_manager.rollback_mysql()
                 return False, f"Monto inválido. Debe ser entre 0 y ${factura['monto_total']:.2f}"
             
+            # El resumen se calcula (si falta) antes de cambiar el estado
+            FacturacionService._asegurar_resumen(cursor, usuario_id)
+            
+            # Actualizar estado de factura (la condición protege aunque no haya bloqueo)
+            cursor.execute("""
+                UPDATE facturas SET estado = 'pagada'
+                WHERE id = %s AND estado <> 'pagada'
+            """, (factura_id,))
+            
+            if cursor.rowcount != 1:
+                cursor.close()
+                db_manager.rollback_mysql()
+                return False, "Esta factura ya está pagada"
+            
             # Registrar pago
             cursor.execute("""
                 INSERT INTO pagos (factura_id, monto, metodo, referencia)
                 VALUES (%s, %s, %s, %s)
             """, (factura_id, monto, metodo_pago, referencia))
             
-            # Actualizar estado de factura
+            pendiente = factura['estado'] == 'pendiente'
             cursor.execute("""
-                UPDATE facturas SET estado = 'pagada'
-                WHERE id = %s
-            """, (factura_id,))
+                UPDATE resumen_financiero
+                SET facturas_pagadas = facturas_pagadas + 1,
+                    facturas_pendientes = facturas_pendientes - %s,
+                    monto_pendiente = monto_pendiente - %s
+                WHERE usuario_id = %s
+            """, (1 if pendiente else 0, factura['monto_total'] if pendiente else 0, usuario_id))
             
             # Registrar movimiento en cuenta corriente (crédito)
             cursor.execute("SELECT id FROM cuenta_corriente WHERE usuario_id = %s", (usuario_id,))
@@ -291,54 +459,49 @@ class FacturacionService:
         """
         Obtiene resumen financiero del usuario
         
+        Lee los contadores materializados en resumen_financiero; si el
+        usuario todavía no tiene fila, la calcula desde facturas y la guarda.
+        
         Returns:
             Diccionario con estadísticas
         """
         try:
             cursor = db_manager.get_mysql_cursor()
             
-            # Saldo actual
-            cursor.execute("""
-                SELECT saldo FROM cuenta_corriente WHERE usuario_id = %s
-            """, (usuario_id,))
-            cuenta = cursor.fetchone()
-            saldo = cuenta['saldo'] if cuenta else 0.0
-            
-            # Total facturado
-            cursor.execute("""
-                SELECT COALESCE(SUM(monto_total), 0) as total
-                FROM facturas
-                WHERE usuario_id = %s
-            """, (usuario_id,))
-            total_facturado = cursor.fetchone()['total']
-            
-            # Facturas pendientes
-            cursor.execute("""
-                SELECT COUNT(*) as cantidad, COALESCE(SUM(monto_total), 0) as monto
-                FROM facturas
-                WHERE usuario_id = %s AND estado = 'pendiente'
-            """, (usuario_id,))
-            pendientes = cursor.fetchone()
+            consulta = """
+                SELECT COALESCE(cc.saldo, 0) as saldo,
+                       rf.usuario_id IS NOT NULL as materializado,
+                       rf.total_facturado, rf.facturas_pendientes,
+                       rf.monto_pendiente, rf.facturas_pagadas
+                FROM usuarios u
+                LEFT JOIN cuenta_corriente cc ON cc.usuario_id = u.id
+                LEFT JOIN resumen_financiero rf ON rf.usuario_id = u.id
+                WHERE u.id = %s
+            """
+            cursor.execute(consulta, (usuario_id,))
+            resumen = cursor.fetchone()
             
-            # Facturas pagadas
-            cursor.execute("""
-                SELECT COUNT(*) as cantidad
-                FROM facturas
-                WHERE usuario_id = %s AND estado = 'pagada'
-            """, (usuario_id,))
-            pagadas = cursor.fetchone()
+            if resumen and not resumen['materializado']:
+                FacturacionService._asegurar_resumen(cursor, usuario_id)
+                db_manager.commit_mysql()
+                cursor.execute(consulta, (usuario_id,))
+                resumen = cursor.fetchone()
             
             cursor.close()
             
+            if not resumen:
+                raise ValueError(f"Usuario {usuario_id} no encontrado")
+            
             return {
-                'saldo': float(saldo),
-                'total_facturado': float(total_facturado),
-                'facturas_pendientes': pendientes['cantidad'],
-                'monto_pendiente': float(pendientes['monto']),
-                'facturas_pagadas': pagadas['cantidad']
+                'saldo': float(resumen['saldo']),
+                'total_facturado': float(resumen['total_facturado']),
+                'facturas_pendientes': resumen['facturas_pendientes'],
+                'monto_pendiente': float(resumen['monto_pendiente']),
+                'facturas_pagadas': resumen['facturas_pagadas']
             }
             
         except Exception as e:
+            db_manager.rollback_mysql()
             print(f"❌ Error obteniendo resumen: {e}")
             return {
                 'saldo': 0.0,
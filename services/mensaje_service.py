@@ -2,9 +2,293 @@
 Servicio de mensajería
 """
 
+import base64
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from bson.objectid import ObjectId
+import redis
+from pymongo.errors import BulkWriteError
+from config.db_config import MENSAJERIA_CONFIG
 from utils.db_manager import db_manager
+from utils import resiliencia
+from utils.instrumentacion import instrumentar
 
+# Orden de las listas de mensajes (más recientes primero, _id desempata)
+ORDEN_MENSAJES = [('timestamp', -1), ('_id', -1)]
+
+# Orden de la bandeja de entrada con fan-out (mensaje_id es el _id del mensaje)
+ORDEN_BANDEJA = [('timestamp', -1), ('mensaje_id', -1)]
+
+# Claves Redis del fan-out on write (grupo -> momento en que pasó a fan-out)
+CLAVE_GRUPOS_FANOUT = "mensajes:grupos_fanout_desde"
+CLAVE_NO_LEIDOS = "mensajes:no_leidos"
+
+# Claves Redis del espejo de membresía de grupos (fuente de verdad: MySQL)
+CLAVE_CACHE_GRUPOS_LISTA = "grupos:cache_listo"
+CLAVE_NOMBRES_GRUPOS = "grupos:nombres"
+
+# Cantidad de usuarios cuyo nombre/email se mantiene en memoria
+CAPACIDAD_CACHE_USUARIOS = 1000
+
+
+class _CacheLRU:
+    """Caché LRU acotada, segura entre hilos"""
+    
+    def __init__(self, capacidad):
+        self._capacidad = capacidad
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._datos:
+                return None
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+    
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self._capacidad:
+                self._datos.popitem(last=False)
+
+
+# Nombres de usuario compartidos por las bandejas de entrada y salida
+_cache_usuarios = _CacheLRU(CAPACIDAD_CACHE_USUARIOS)
+
+
+def _clave_miembros(grupo_id):
+    return f"grupo:{grupo_id}:miembros"
+
+
+def _clave_grupos(usuario_id):
+    return f"usuario:{usuario_id}:grupos"
+
+
+def _cache_grupos_lista(redis_client):
+    """El espejo en Redis solo se usa después de una reconstrucción completa"""
+    return redis_client.exists(CLAVE_CACHE_GRUPOS_LISTA)
+
+
+def _leer_espejo(lectura):
+    """
+    Lee el espejo de grupos en Redis
+    
+    Args:
+        lectura: Recibe el cliente Redis y devuelve el resultado
+    
+    Returns:
+        El resultado, o None si el espejo no está listo o Redis no responde
+        (el llamador lee MySQL)
+    """
+    try:
+        redis_client = db_manager.conectar_redis()
+        if _cache_grupos_lista(redis_client):
+            return lectura(redis_client)
+    except (redis.RedisError, resiliencia.CircuitoAbierto) as e:
+        print(f"⚠️ Espejo de grupos no disponible ({e}); se lee MySQL")
+    return None
+
+
+def _grupos_de_usuario(usuario_id):
+    """
+    IDs de los grupos de un usuario (SMEMBERS, o MySQL si el espejo no está listo)
+    
+    Returns:
+        Lista de IDs de grupo
+    """
+    grupos_ids = _leer_espejo(lambda r: [int(g) for g in r.smembers(_clave_grupos(usuario_id))])
+    if grupos_ids is not None:
+        return grupos_ids
+    
+    cursor = db_manager.get_mysql_cursor()
+    cursor.execute("""
+        SELECT grupo_id FROM grupos_miembros WHERE usuario_id = %s
+    """, (usuario_id,))
+    grupos_ids = [row['grupo_id'] for row in cursor.fetchall()]
+    cursor.close()
+    return grupos_ids
+
+
+def _miembros_grupo(grupo_id):
+    """
+    IDs de los miembros de un grupo (SMEMBERS, o MySQL si el espejo no está listo)
+    
+    Returns:
+        Lista de IDs de usuario
+    """
+    miembros = _leer_espejo(lambda r: [int(u) for u in r.smembers(_clave_miembros(grupo_id))])
+    if miembros is not None:
+        return miembros
+    
+    cursor = db_manager.get_mysql_cursor()
+    cursor.execute("SELECT usuario_id FROM grupos_miembros WHERE grupo_id = %s", (grupo_id,))
+    miembros = [row['usuario_id'] for row in cursor.fetchall()]
+    cursor.close()
+    return miembros
+
+
+def _es_miembro(grupo_id, usuario_id):
+    """Verifica pertenencia (SISMEMBER, o MySQL si el espejo no está listo)"""
+    es_miembro = _leer_espejo(lambda r: bool(r.sismember(_clave_miembros(grupo_id), usuario_id)))
+    if es_miembro is not None:
+        return es_miembro
+    
+    cursor = db_manager.get_mysql_cursor()
+    cursor.execute("""
+        SELECT 1 FROM grupos_miembros WHERE grupo_id = %s AND usuario_id = %s
+    """, (grupo_id, usuario_id))
+    es_miembro = cursor.fetchone() is not None
+    cursor.close()
+    return es_miembro
+
+
+def _totales_grupos(redis_client, usuario_id):
+    """{grupo_id: cantidad de miembros} de los grupos de un usuario, desde el espejo"""
+    grupos_ids = [int(g) for g in redis_client.smembers(_clave_grupos(usuario_id))]
+    pipe = redis_client.pipeline(transaction=False)
+    for grupo_id in grupos_ids:
+        pipe.scard(_clave_miembros(grupo_id))
+    return dict(zip(grupos_ids, pipe.execute()))
+
+
+def _registrar_membresia(grupo_id, usuario_id, nombre_grupo=None):
+    """
+    Replica en Redis una membresía ya confirmada en MySQL
+    
+    Si Redis falla se invalida el espejo, así las lecturas vuelven a MySQL
+    hasta la próxima reconstrucción.
+    """
+    try:
+        redis_client = db_manager.conectar_redis()
+        pipe = redis_client.pipeline()
+        pipe.sadd(_clave_miembros(grupo_id), usuario_id)
+        pipe.sadd(_clave_grupos(usuario_id), grupo_id)
+        if nombre_grupo is not None:
+            pipe.hset(CLAVE_NOMBRES_GRUPOS, grupo_id, nombre_grupo)
+        pipe.execute()
+    except Exception as e:
+        print(f"❌ Error actualizando caché de grupos: {e}")
+        try:
+            db_manager.conectar_redis().delete(CLAVE_CACHE_GRUPOS_LISTA)
+        except Exception:
+            pass
+
+
+def _resolver_usuarios(usuarios_ids):
+    """
+    Obtiene nombre y email de varios usuarios con una sola consulta
+    (solo para los que no están en caché)
+    
+    Returns:
+        Diccionario usuario_id -> {'nombre_completo', 'email'}
+    """
+    usuarios = {}
+    faltantes = []
+    
+    for usuario_id in set(usuarios_ids):
+        if usuario_id is None:
+            continue
+        datos = _cache_usuarios.obtener(usuario_id)
+        if datos:
+            usuarios[usuario_id] = datos
+        else:
+            faltantes.append(usuario_id)
+    
+    if faltantes:
+        cursor = db_manager.get_mysql_cursor()
+        placeholders = ','.join(['%s'] * len(faltantes))
+        cursor.execute(f"""
+            SELECT id, nombre_completo, email FROM usuarios WHERE id IN ({placeholders})
+        """, tuple(faltantes))
+        
+        for row in cursor.fetchall():
+            datos = {'nombre_completo': row['nombre_completo'], 'email': row['email']}
+            _cache_usuarios.guardar(row['id'], datos)
+            usuarios[row['id']] = datos
+        cursor.close()
+    
+    return usuarios
+
+
+def _resolver_grupos(grupos_ids):
+    """
+    Obtiene el nombre de varios grupos (HMGET en Redis; los que falten,
+    con una sola consulta a MySQL)
+    
+    Returns:
+        Diccionario grupo_id -> nombre
+    """
+    grupos_ids = list({g for g in grupos_ids if g})
+    if not grupos_ids:
+        return {}
+    
+    # Con Redis caído se toman todos como faltantes y se leen de MySQL
+    grupos = {}
+    try:
+        nombres = db_manager.conectar_redis().hmget(CLAVE_NOMBRES_GRUPOS, grupos_ids)
+        grupos = {g: nombre for g, nombre in zip(grupos_ids, nombres) if nombre is not None}
+    except (redis.RedisError, resiliencia.CircuitoAbierto) as e:
+        print(f"⚠️ Nombres de grupos no disponibles en Redis ({e}); se leen de MySQL")
+    
+    faltantes = [g for g in grupos_ids if g not in grupos]
+    if faltantes:
+        cursor = db_manager.get_mysql_cursor()
+        placeholders = ','.join(['%s'] * len(faltantes))
+        cursor.execute(f"""
+            SELECT id, nombre FROM grupos WHERE id IN ({placeholders})
+        """, tuple(faltantes))
+        encontrados = {row['id']: row['nombre'] for row in cursor.fetchall()}
+        cursor.close()
+        
+        if encontrados:
+            try:
+                db_manager.conectar_redis().hset(CLAVE_NOMBRES_GRUPOS, mapping=encontrados)
+            except (redis.RedisError, resiliencia.CircuitoAbierto):
+                pass  # Se completa en la próxima lectura
+        grupos.update(encontrados)
+    
+    return grupos
+
+
+def _codificar_cursor(mensaje):
+    """Genera el token de cursor (timestamp, _id) de un mensaje"""
+    valor = f"{mensaje['timestamp'].isoformat()}|{mensaje['_id']}"
+    return base64.urlsafe_b64encode(valor.encode('utf-8')).decode('ascii')
+
+
+def _filtro_cursor(cursor, campo_id='_id'):
+    """
+    Convierte un token de cursor en la condición keyset
+    (mensajes estrictamente anteriores al último de la página)
+    
+    Args:
+        cursor: Token generado por _codificar_cursor o None
+        campo_id: Campo que contiene el _id del mensaje ('mensaje_id' en la bandeja)
+    """
+    if not cursor:
+        return {}
+    
+    valor = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    timestamp_str, mensaje_id = valor.split('|')
+    timestamp = datetime.fromisoformat(timestamp_str)
+    
+    # El rango sobre timestamp usa el índice; el $nor descarta empates ya vistos
+    return {
+        'timestamp': {'$lte': timestamp},
+        '$nor': [{'timestamp': timestamp, campo_id: {'$gte': ObjectId(mensaje_id)}}]
+    }
+
+
+def _combinar_paginas(*listas, limite):
+    """Une páginas ordenadas por (timestamp, _id) y devuelve los primeros 'limite'"""
+    mensajes = [m for lista in listas for m in lista]
+    mensajes.sort(key=lambda m: (m['timestamp'], m['_id']), reverse=True)
+    return mensajes[:limite]
+
+@instrumentar
 class MensajeService:
     """Servicio para gestión de mensajes"""
     
@@ -58,22 +342,15 @@ class MensajeService:
             (success: bool, mensaje: str)
         """
         try:
-            # Verificar que el grupo existe y el usuario es miembro
-            cursor = db_manager.get_mysql_cursor()
-            cursor.execute("""
-                SELECT g.id FROM grupos g
-                JOIN grupos_miembros gm ON g.id = gm.grupo_id
-                WHERE g.id = %s AND gm.usuario_id = %s
-            """, (grupo_id, remitente_id))
-            
-            if not cursor.fetchone():
-                cursor.close()
+            # Verificar que el usuario es miembro (si lo es, el grupo existe)
+            if not _es_miembro(grupo_id, remitente_id):
                 return False, "Grupo no encontrado o no es miembro"
-            cursor.close()
             
             # Insertar mensaje en MongoDB
             db = db_manager.conectar_mongodb()
             
+            miembros_fanout = MensajeService._miembros_fanout(grupo_id)
+            
             mensaje = {
                 'remitente_id': remitente_id,
                 'destinatario_id': None,
@@ -86,6 +363,9 @@ class MensajeService:
             resultado = db.mensajes.insert_one(mensaje)
             
             if resultado.inserted_id:
+                # Fan-out on write: una entrada liviana en la bandeja de cada miembro
+                if miembros_fanout:
+                    MensajeService._escribir_bandejas(db, [mensaje], miembros_fanout, remitente_id)
                 return True, "Mensaje enviado al grupo"
             else:
                 return False, "Error al enviar mensaje"
@@ -95,10 +375,15 @@ class MensajeService:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def listar_mensajes_recibidos(usuario_id, limite=50):
+    def listar_mensajes_recibidos(usuario_id, limite=50, cursor_pagina=None):
         """
         Lista mensajes recibidos por un usuario (privados y grupales)
         
+        Args:
+            usuario_id: ID del usuario
+            limite: Cantidad de mensajes por página
+            cursor_pagina: Token de la página anterior (ver siguiente_cursor) o None
+        
         Returns:
             Lista de mensajes con información del remitente
         """
@@ -106,43 +391,54 @@ class MensajeService:
             db = db_manager.conectar_mongodb()
             
             # Obtener grupos del usuario
-            cursor = db_manager.get_mysql_cursor()
-            cursor.execute("""
-                SELECT grupo_id FROM grupos_miembros WHERE usuario_id = %s
-            """, (usuario_id,))
-            grupos_ids = [row['grupo_id'] for row in cursor.fetchall()]
-            
-            # Buscar mensajes privados y grupales
-            query = {
-                '$or': [
-                    {'destinatario_id': usuario_id},  # Mensajes privados
-                    {'grupo_id': {'$in': grupos_ids}} if grupos_ids else {'grupo_id': None}  # Mensajes grupales
-                ]
-            }
+            grupos_ids = _grupos_de_usuario(usuario_id)
+            
+            # Los grupos con fan-out se leen de la bandeja del usuario (con
+            # Redis caído, todos de la colección de mensajes)
+            try:
+                grupos_fanout = MensajeService._grupos_con_fanout(grupos_ids)
+            except (redis.RedisError, resiliencia.CircuitoAbierto) as e:
+                print(f"⚠️ Grupos con fan-out no disponibles ({e}); se leen los mensajes del grupo")
+                grupos_fanout = {}
+            grupos_lectura = [g for g in grupos_ids if g not in grupos_fanout]
+            
+            # Cada rama del $or usa su propio índice (campo, timestamp, _id)
+            filtro_cursor = _filtro_cursor(cursor_pagina)
+            ramas = [{'destinatario_id': usuario_id, **filtro_cursor}]  # Mensajes privados
+            if grupos_lectura:
+                ramas.append({'grupo_id': {'$in': grupos_lectura}, **filtro_cursor})  # Mensajes grupales
+            for grupo_id, desde in grupos_fanout.items():
+                # Lo anterior al paso a fan-out no está en las bandejas
+                ramas.append({
+                    **filtro_cursor,
+                    'grupo_id': grupo_id,
+                    'timestamp': {**filtro_cursor.get('timestamp', {}), '$lt': desde}
+                })
+            
+            query = {'$or': ramas} if len(ramas) > 1 else ramas[0]
+            
+            mensajes = list(db.mensajes.find(query).sort(ORDEN_MENSAJES).limit(limite))
+            
+            if grupos_fanout:
+                mensajes = _combinar_paginas(
+                    mensajes,
+                    MensajeService._leer_bandeja(db, usuario_id, limite, cursor_pagina),
+                    limite=limite
+                )
+            
+            # Enriquecer con datos del remitente y grupo (cachés; a lo sumo una consulta por tabla)
+            remitentes = _resolver_usuarios([m['remitente_id'] for m in mensajes])
+            grupos = _resolver_grupos([m.get('grupo_id') for m in mensajes])
             
-            mensajes = list(db.mensajes.find(query).sort('timestamp', -1).limit(limite))
-            
-            # Enriquecer con datos del remitente y grupo
             for mensaje in mensajes:
-                # Datos del remitente
-                cursor.execute("""
-                    SELECT nombre_completo, email FROM usuarios WHERE id = %s
-                """, (mensaje['remitente_id'],))
-                remitente = cursor.fetchone()
+                remitente = remitentes.get(mensaje['remitente_id'])
                 if remitente:
                     mensaje['remitente_nombre'] = remitente['nombre_completo']
                     mensaje['remitente_email'] = remitente['email']
                 
-                # Si es grupal, datos del grupo
-                if mensaje.get('grupo_id'):
-                    cursor.execute("""
-                        SELECT nombre FROM grupos WHERE id = %s
-                    """, (mensaje['grupo_id'],))
-                    grupo = cursor.fetchone()
-                    if grupo:
-                        mensaje['grupo_nombre'] = grupo['nombre']
+                if mensaje.get('grupo_id') in grupos:
+                    mensaje['grupo_nombre'] = grupos[mensaje['grupo_id']]
             
-            cursor.close()
             return mensajes
             
         except Exception as e:
@@ -150,10 +446,15 @@ class MensajeService:
             return []
     
     @staticmethod
-    def listar_mensajes_enviados(usuario_id, limite=50):
+    def listar_mensajes_enviados(usuario_id, limite=50, cursor_pagina=None):
         """
         Lista mensajes enviados por un usuario
         
+        Args:
+            usuario_id: ID del usuario
+            limite: Cantidad de mensajes por página
+            cursor_pagina: Token de la página anterior (ver siguiente_cursor) o None
+        
         Returns:
             Lista de mensajes
         """
@@ -161,30 +462,26 @@ class MensajeService:
             db = db_manager.conectar_mongodb()
             
             mensajes = list(db.mensajes.find(
-                {'remitente_id': usuario_id}
-            ).sort('timestamp', -1).limit(limite))
+                {'remitente_id': usuario_id, **_filtro_cursor(cursor_pagina)}
+            ).sort(ORDEN_MENSAJES).limit(limite))
             
-            # Enriquecer con datos del destinatario o grupo
-            cursor = db_manager.get_mysql_cursor()
+            # Enriquecer con datos del destinatario o grupo (cachés; a lo sumo una consulta por tabla)
+            destinatarios = _resolver_usuarios(
+                [m['destinatario_id'] for m in mensajes if m['tipo'] == 'privado']
+            )
+            grupos = _resolver_grupos(
+                [m['grupo_id'] for m in mensajes if m['tipo'] != 'privado']
+            )
             
             for mensaje in mensajes:
                 if mensaje['tipo'] == 'privado':
-                    cursor.execute("""
-                        SELECT nombre_completo, email FROM usuarios WHERE id = %s
-                    """, (mensaje['destinatario_id'],))
-                    destinatario = cursor.fetchone()
+                    destinatario = destinatarios.get(mensaje['destinatario_id'])
                     if destinatario:
                         mensaje['destinatario_nombre'] = destinatario['nombre_completo']
                         mensaje['destinatario_email'] = destinatario['email']
-                else:
-                    cursor.execute("""
-                        SELECT nombre FROM grupos WHERE id = %s
-                    """, (mensaje['grupo_id'],))
-                    grupo = cursor.fetchone()
-                    if grupo:
-                        mensaje['grupo_nombre'] = grupo['nombre']
+                elif mensaje.get('grupo_id') in grupos:
+                    mensaje['grupo_nombre'] = grupos[mensaje['grupo_id']]
             
-            cursor.close()
             return mensajes
             
         except Exception as e:
@@ -192,17 +489,43 @@ class MensajeService:
             return []
     
     @staticmethod
-    def marcar_como_leido(mensaje_id):
+    def siguiente_cursor(mensajes, limite):
+        """
+        Token para pedir la página siguiente a una lista de mensajes
+        
+        Returns:
+            Token de cursor o None si no hay más páginas
+        """
+        if not mensajes or len(mensajes) < limite:
+            return None
+        return _codificar_cursor(mensajes[-1])
+    
+    @staticmethod
+    def marcar_como_leido(mensaje_id, usuario_id=None):
         """
         Marca un mensaje como leído
         
+        Args:
+            mensaje_id: ID del mensaje
+            usuario_id: Lector; necesario para mensajes grupales con fan-out
+        
         Returns:
             (success: bool, mensaje: str)
         """
         try:
-            from bson.objectid import ObjectId
             db = db_manager.conectar_mongodb()
             
+            # Mensajes grupales con fan-out: el estado de lectura es por destinatario
+            if usuario_id is not None:
+                resultado = db.bandeja_entrada.update_one(
+                    {'usuario_id': usuario_id, 'mensaje_id': ObjectId(mensaje_id), 'leido': False},
+                    {'$set': {'leido': True}}
+                )
+                if resultado.modified_count > 0:
+                    redis_client = db_manager.conectar_redis()
+                    redis_client.hincrby(CLAVE_NO_LEIDOS, usuario_id, -1)
+                    return True, "Mensaje marcado como leído"
+            
             resultado = db.mensajes.update_one(
                 {'_id': ObjectId(mensaje_id)},
                 {'$set': {'leido': True}}
@@ -217,10 +540,50 @@ class MensajeService:
             print(f"❌ Error marcando mensaje: {e}")
             return False, f"Error: {str(e)}"
     
+    @staticmethod
+    def marcar_como_leidos(mensajes_ids, usuario_id):
+        """
+        Marca como leídos los mensajes que el usuario ya vio (los privados
+        dirigidos a él y sus entradas de la bandeja con fan-out), con una
+        escritura por colección, y descuenta las entradas del contador de
+        no leídos
+        
+        Args:
+            mensajes_ids: IDs de los mensajes mostrados
+            usuario_id: Lector
+        
+        Returns:
+            Cantidad de mensajes marcados
+        """
+        if not mensajes_ids:
+            return 0
+        
+        try:
+            db = db_manager.conectar_mongodb()
+            ids = [ObjectId(m) for m in mensajes_ids]
+            
+            privados = db.mensajes.update_many(
+                {'_id': {'$in': ids}, 'destinatario_id': usuario_id, 'leido': False},
+                {'$set': {'leido': True}}
+            )
+            
+            bandeja = db.bandeja_entrada.update_many(
+                {'usuario_id': usuario_id, 'mensaje_id': {'$in': ids}, 'leido': False},
+                {'$set': {'leido': True}}
+            )
+            if bandeja.modified_count:
+                db_manager.conectar_redis().hincrby(CLAVE_NO_LEIDOS, usuario_id, -bandeja.modified_count)
+            
+            return privados.modified_count + bandeja.modified_count
+            
+        except Exception as e:
+            print(f"❌ Error marcando mensajes: {e}")
+            return 0
+    
     @staticmethod
     def contar_mensajes_no_leidos(usuario_id):
         """
-        Cuenta mensajes privados no leídos
+        Cuenta mensajes no leídos (privados y grupales con fan-out)
         
         Returns:
             Número de mensajes no leídos
@@ -233,6 +596,10 @@ class MensajeService:
                 'leido': False
             })
             
+            if MENSAJERIA_CONFIG['fanout_habilitado']:
+                redis_client = db_manager.conectar_redis()
+                count += max(int(redis_client.hget(CLAVE_NO_LEIDOS, usuario_id) or 0), 0)
+            
             return count
             
         except Exception as e:
@@ -278,22 +645,44 @@ class MensajeService:
             Lista de grupos
         """
         try:
+            # Membresía y tamaños desde Redis; solo los datos del grupo por PK en MySQL
+            totales = _leer_espejo(lambda r: _totales_grupos(r, usuario_id))
             cursor = db_manager.get_mysql_cursor()
             
-            cursor.execute("""
-                SELECT g.id, g.nombre, g.descripcion,
-                       COUNT(gm2.usuario_id) as total_miembros
-                FROM grupos g
-                JOIN grupos_miembros gm ON g.id = gm.grupo_id
-                LEFT JOIN grupos_miembros gm2 ON g.id = gm2.grupo_id
-                WHERE gm.usuario_id = %s
-                GROUP BY g.id, g.nombre, g.descripcion
-                ORDER BY g.nombre
-            """, (usuario_id,))
+            if totales is None:
+                cursor.execute("""
+                    SELECT g.id, g.nombre, g.descripcion,
+                           COUNT(gm2.usuario_id) as total_miembros
+                    FROM grupos g
+                    JOIN grupos_miembros gm ON g.id = gm.grupo_id
+                    LEFT JOIN grupos_miembros gm2 ON g.id = gm2.grupo_id
+                    WHERE gm.usuario_id = %s
+                    GROUP BY g.id, g.nombre, g.descripcion
+                    ORDER BY g.nombre
+                """, (usuario_id,))
+                
+                grupos = cursor.fetchall()
+                cursor.close()
+                return grupos
+            
+            if not totales:
+                cursor.close()
+                return []
+            
+            grupos_ids = list(totales)
+            placeholders = ','.join(['%s'] * len(grupos_ids))
+            cursor.execute(f"""
+                SELECT id, nombre, descripcion FROM grupos
+                WHERE id IN ({placeholders})
+                ORDER BY nombre
+            """, tuple(grupos_ids))
             
             grupos = cursor.fetchall()
             cursor.close()
             
+            for grupo in grupos:
+                grupo['total_miembros'] = totales.get(grupo['id'], 0)
+            
             return grupos
             
         except Exception as e:
@@ -328,6 +717,8 @@ class MensajeService:
             db_manager.commit_mysql()
             cursor.close()
             
+            _registrar_membresia(grupo_id, creador_id, nombre_grupo=nombre)
+            
             return True, "Grupo creado exitosamente", grupo_id
             
         except Exception as e:
@@ -346,6 +737,11 @@ class MensajeService:
         try:
             cursor = db_manager.get_mysql_cursor()
             
+            # Evitar el INSERT si el espejo en Redis ya indica que es miembro
+            if _es_miembro(grupo_id, usuario_id):
+                cursor.close()
+                return False, "El usuario ya es miembro del grupo"
+            
             # Verificar que el grupo existe
             cursor.execute("SELECT id FROM grupos WHERE id = %s", (grupo_id,))
             if not cursor.fetchone():
@@ -367,6 +763,15 @@ class MensajeService:
             db_manager.commit_mysql()
             cursor.close()
             
+            _registrar_membresia(grupo_id, usuario_id)
+            
+            # En grupos con fan-out el nuevo miembro recibe lo enviado desde el
+            # paso a fan-out (lo anterior lo lee de la colección de mensajes)
+            desde = MensajeService._grupos_con_fanout([grupo_id]).get(grupo_id)
+            if desde:
+                db = db_manager.conectar_mongodb()
+                MensajeService._copiar_historial(db, grupo_id, [usuario_id], desde)
+            
             return True, "Usuario agregado al grupo"
             
         except Exception as e:
@@ -375,3 +780,176 @@ class MensajeService:
                 return False, "El usuario ya es miembro del grupo"
             print(f"❌ Error agregando miembro: {e}")
             return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def reconstruir_cache_grupos():
+        """
+        Reconstruye el espejo en Redis de la membresía de grupos desde MySQL
+        
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
+            redis_client = db_manager.conectar_redis()
+            
+            # Mientras se reconstruye, las lecturas vuelven a MySQL
+            redis_client.delete(CLAVE_CACHE_GRUPOS_LISTA)
+            
+            claves = list(redis_client.scan_iter(match="grupo:*:miembros", count=1000))
+            claves += list(redis_client.scan_iter(match="usuario:*:grupos", count=1000))
+            claves.append(CLAVE_NOMBRES_GRUPOS)
+            for i in range(0, len(claves), 500):
+                redis_client.delete(*claves[i:i + 500])
+            
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("SELECT id, nombre FROM grupos")
+            nombres = {row['id']: row['nombre'] for row in cursor.fetchall()}
+            cursor.execute("SELECT grupo_id, usuario_id FROM grupos_miembros")
+            membresias = cursor.fetchall()
+            cursor.close()
+            
+            pipe = redis_client.pipeline(transaction=False)
+            for i, row in enumerate(membresias, 1):
+                pipe.sadd(_clave_miembros(row['grupo_id']), row['usuario_id'])
+                pipe.sadd(_clave_grupos(row['usuario_id']), row['grupo_id'])
+                if i % 1000 == 0:
+                    pipe.execute()
+            if nombres:
+                pipe.hset(CLAVE_NOMBRES_GRUPOS, mapping=nombres)
+            pipe.set(CLAVE_CACHE_GRUPOS_LISTA, datetime.now().isoformat())
+            pipe.execute()
+            
+            return True, f"Caché reconstruida: {len(nombres)} grupos, {len(membresias)} membresías"
+            
+        except Exception as e:
+            print(f"❌ Error reconstruyendo caché de grupos: {e}")
+            return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def _grupos_con_fanout(grupos_ids):
+        """
+        Filtra los grupos que usan fan-out on write
+        
+        Returns:
+            Diccionario grupo_id -> momento en que pasó a fan-out
+        """
+        if not MENSAJERIA_CONFIG['fanout_habilitado'] or not grupos_ids:
+            return {}
+        
+        redis_client = db_manager.conectar_redis()
+        marcas = redis_client.hmget(CLAVE_GRUPOS_FANOUT, grupos_ids)
+        return {g: datetime.fromisoformat(desde) for g, desde in zip(grupos_ids, marcas) if desde}
+    
+    @staticmethod
+    def _miembros_fanout(grupo_id):
+        """
+        Decide el modo de entrega de un grupo según su tamaño
+        
+        El modo fan-out es permanente. Se guarda el momento en que se
+        activó: los mensajes anteriores no se copian a las bandejas y se
+        siguen leyendo de la colección de mensajes.
+        
+        Returns:
+            Lista de miembros si el grupo usa fan-out, None si se lee en tiempo de lectura
+        """
+        if not MENSAJERIA_CONFIG['fanout_habilitado']:
+            return None
+        
+        miembros = _miembros_grupo(grupo_id)
+        
+        if MensajeService._grupos_con_fanout([grupo_id]):
+            return miembros
+        
+        if len(miembros) < MENSAJERIA_CONFIG['fanout_min_miembros']:
+            return None
+        
+        # Se marca antes de insertar el mensaje, así su timestamp queda
+        # después del cambio (al milisegundo, la precisión de MongoDB); si
+        # otro proceso lo marcó antes, vale su momento
+        redis_client = db_manager.conectar_redis()
+        redis_client.hsetnx(CLAVE_GRUPOS_FANOUT, grupo_id, datetime.now().isoformat(timespec='milliseconds'))
+        
+        return miembros
+    
+    @staticmethod
+    def _escribir_bandejas(db, mensajes, usuarios_ids, remitente_id=None, leido=False):
+        """
+        Escribe en bloque las entradas de bandeja de varios mensajes para varios usuarios
+        y actualiza los contadores de no leídos
+        """
+        entradas = [
+            {
+                'usuario_id': usuario_id,
+                'mensaje_id': mensaje['_id'],
+                'grupo_id': mensaje['grupo_id'],
+                'remitente_id': mensaje['remitente_id'],
+                'timestamp': mensaje['timestamp'],
+                'leido': leido or usuario_id == remitente_id
+            }
+            for mensaje in mensajes
+            for usuario_id in usuarios_ids
+        ]
+        
+        if not entradas:
+            return
+        
+        try:
+            db.bandeja_entrada.insert_many(entradas, ordered=False)
+        except BulkWriteError as e:
+            # Entradas duplicadas (índice único usuario_id + mensaje_id): ya estaban copiadas
+            if any(error['code'] != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+        
+        no_leidas = [entrada['usuario_id'] for entrada in entradas if not entrada['leido']]
+        if no_leidas:
+            redis_client = db_manager.conectar_redis()
+            pipe = redis_client.pipeline(transaction=False)
+            for usuario_id in no_leidas:
+                pipe.hincrby(CLAVE_NO_LEIDOS, usuario_id, 1)
+            pipe.execute()
+    
+    @staticmethod
+    def _copiar_historial(db, grupo_id, usuarios_ids, desde):
+        """Copia a bandejas (como leídos) los mensajes del grupo desde el paso a fan-out, por lotes"""
+        mensajes = db.mensajes.find(
+            {'grupo_id': grupo_id, 'timestamp': {'$gte': desde}},
+            {'remitente_id': 1, 'grupo_id': 1, 'timestamp': 1}
+        ).sort(ORDEN_MENSAJES)
+        
+        lote = []
+        for mensaje in mensajes:
+            lote.append(mensaje)
+            if len(lote) == 1000:
+                MensajeService._escribir_bandejas(db, lote, usuarios_ids, leido=True)
+                lote = []
+        MensajeService._escribir_bandejas(db, lote, usuarios_ids, leido=True)
+    
+    @staticmethod
+    def _leer_bandeja(db, usuario_id, limite, cursor_pagina=None):
+        """
+        Lee una página de la bandeja con fan-out (una consulta por rango
+        sobre usuario_id + timestamp) y trae los mensajes por _id
+        
+        Returns:
+            Lista de mensajes con el estado 'leido' del usuario
+        """
+        entradas = list(db.bandeja_entrada.find(
+            {'usuario_id': usuario_id, **_filtro_cursor(cursor_pagina, 'mensaje_id')}
+        ).sort(ORDEN_BANDEJA).limit(limite))
+        
+        if not entradas:
+            return []
+        
+        documentos = {
+            m['_id']: m
+            for m in db.mensajes.find({'_id': {'$in': [e['mensaje_id'] for e in entradas]}})
+        }
+        
+        mensajes = []
+        for entrada in entradas:
+            mensaje = documentos.get(entrada['mensaje_id'])
+            if mensaje:
+                mensaje['leido'] = entrada['leido']
+                mensajes.append(mensaje)
+        
+        return mensajes
@@ -1,14 +1,18 @@
 """
-Servicio de notificaciones usando Redis pub/sub
+Servicio de notificaciones usando Redis (listas + streams)
 """
 
 import json
-import threading
 from datetime import datetime
+from config.db_config import EVENTOS_CONFIG
 from utils.db_manager import db_manager
+from utils.event_bus import event_bus, stream_notificaciones
 from utils.logger import logger
+from utils import resiliencia
+from utils.instrumentacion import instrumentar
 
 
+@instrumentar
 class NotificacionService:
     """Servicio para manejar notificaciones en tiempo real"""
     
@@ -24,7 +28,7 @@ class NotificacionService:
             datos: Datos adicionales
         """
         try:
-            redis_client = db_manager.get_redis_client()
+            redis_client = db_manager.conectar_redis()
             
             notificacion = {
                 'usuario_id': usuario_id,
@@ -40,14 +44,17 @@ class NotificacionService:
             redis_client.ltrim(clave, 0, 99)  # Mantener solo las últimas 100
             redis_client.expire(clave, 86400 * 7)  # Expirar en 7 días
             
-            # Publicar en canal (para notificaciones en tiempo real)
-            canal = f"usuario:{usuario_id}"
-            redis_client.publish(canal, json.dumps(notificacion))
+            # Publicar en el stream del usuario (se entrega aunque esté desconectado)
+            event_bus.publicar(
+                stream_notificaciones(usuario_id),
+                notificacion,
+                maxlen=EVENTOS_CONFIG['maxlen_usuario']
+            )
             
-            logger.info(f"Notificación enviada a usuario {usuario_id}: {tipo}")
+            logger.info("Notificación enviada a usuario %s: %s", usuario_id, tipo)
             
         except Exception as e:
-            logger.error(f"Error enviando notificación: {e}")
+            logger.error("Error enviando notificación: %s", e)
     
     @staticmethod
     def obtener_notificaciones(usuario_id: int, cantidad: int = 10) -> list:
@@ -62,7 +69,7 @@ class NotificacionService:
             Lista de notificaciones
         """
         try:
-            redis_client = db_manager.get_redis_client()
+            redis_client = db_manager.conectar_redis()
             clave = f"notificaciones:{usuario_id}"
             
             notificaciones_raw = redis_client.lrange(clave, 0, cantidad - 1)
@@ -78,7 +85,8 @@ class NotificacionService:
             return notificaciones
         
         except Exception as e:
-            logger.error(f"Error obteniendo notificaciones: {e}")
+            resiliencia.relanzar_caida(e)
+            logger.error("Error obteniendo notificaciones: %s", e)
             return []
     
     @staticmethod
@@ -91,12 +99,13 @@ class NotificacionService:
             notificacion_id: ID de la notificación (fecha en ISO)
         """
         try:
-            redis_client = db_manager.get_redis_client()
+            redis_client = db_manager.conectar_redis()
             clave = f"notificaciones_leidas:{usuario_id}"
             redis_client.sadd(clave, notificacion_id)
             redis_client.expire(clave, 86400 * 7)
         except Exception as e:
-            logger.error(f"Error marcando notificación como leída: {e}")
+            resiliencia.relanzar_caida(e)
+            logger.error("Error marcando notificación como leída: %s", e)
     
     @staticmethod
     def contar_no_leidas(usuario_id: int) -> int:
@@ -111,7 +120,7 @@ class NotificacionService:
         """
         try:
             notificaciones = NotificacionService.obtener_notificaciones(usuario_id, 100)
-            redis_client = db_manager.get_redis_client()
+            redis_client = db_manager.conectar_redis()
             clave_leidas = f"notificaciones_leidas:{usuario_id}"
             leidas = redis_client.smembers(clave_leidas)
             
@@ -120,40 +129,41 @@ class NotificacionService:
                 if notif.get('fecha') not in leidas:
                     no_leidas += 1
             
-            return no_leidas
+            return resiliencia.guardar_respaldo(('notificaciones_no_leidas', usuario_id), no_leidas)
         
         except Exception as e:
-            logger.error(f"Error contando notificaciones: {e}")
+            anterior = resiliencia.respaldo(('notificaciones_no_leidas', usuario_id))
+            if anterior:
+                logger.warning("Notificaciones no disponibles (%s); se muestra el último conteo", e)
+                return anterior[0]
+            logger.error("Error contando notificaciones: %s", e)
             return 0
     
     @staticmethod
     def suscribir_notificaciones(usuario_id: int, callback):
         """
-        Suscribe a notificaciones en tiempo real (para uso en threads)
+        Suscribe a notificaciones en tiempo real
+        
+        Usa el hilo de escucha compartido del bus de eventos; las
+        notificaciones enviadas mientras el usuario no estaba conectado
+        se entregan al suscribirse.
         
         Args:
             usuario_id: ID del usuario
             callback: Función a llamar cuando llegue una notificación
+        
+        Returns:
+            Hilo de escucha del bus de eventos
+        """
+        return event_bus.suscribir(stream_notificaciones(usuario_id), callback)
+    
+    @staticmethod
+    def cancelar_suscripcion(usuario_id: int, callback):
         """
-        def escuchar():
-            try:
-                redis_client = db_manager.get_redis_client()
-                pubsub = redis_client.pubsub()
-                canal = f"usuario:{usuario_id}"
-                pubsub.subscribe(canal)
-                
-                for mensaje in pubsub.listen():
-                    if mensaje['type'] == 'message':
-                        try:
-                            notif = json.loads(mensaje['data'])
-                            callback(notif)
-                        except:
-                            continue
-            except Exception as e:
-                logger.error(f"Error en suscripción de notificaciones: {e}")
+        Cancela una suscripción a notificaciones en tiempo real
         
-        thread = threading.Thread(target=escuchar, daemon=True)
-        thread.start()
-        return thread
-
-
+        Args:
+            usuario_id: ID del usuario
+            callback: Función registrada en suscribir_notificaciones
+        """
+        event_bus.cancelar_suscripcion(stream_notificaciones(usuario_id), callback)
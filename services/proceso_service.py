@@ -4,8 +4,13 @@ Servicio de gestión de procesos y solicitudes
 
 import json
 from datetime import datetime
+from config.db_config import PROCESOS_CONFIG
 from utils.db_manager import db_manager
+from utils.event_bus import event_bus, STREAM_PROCESOS
+from utils import cola_procesos, presupuesto, resiliencia
+from utils.instrumentacion import instrumentar
 
+@instrumentar
 class ProcesoService:
     """Servicio para gestión de procesos"""
     
@@ -29,6 +34,7 @@ class ProcesoService:
             return procesos
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error listando procesos: {e}")
             return []
     
@@ -68,7 +74,7 @@ class ProcesoService:
             cursor = db_manager.get_mysql_cursor()
             
             # Verificar que el proceso exista
-            cursor.execute("SELECT costo FROM procesos WHERE id = %s AND activo = TRUE", (proceso_id,))
+            cursor.execute("SELECT costo, tipo FROM procesos WHERE id = %s AND activo = TRUE", (proceso_id,))
             proceso = cursor.fetchone()
             
             if not proceso:
@@ -83,9 +89,8 @@ class ProcesoService:
             cursor.execute(query, (usuario_id, proceso_id, json.dumps(parametros)))
             solicitud_id = cursor.lastrowid
             
-            # Agregar a la cola de Redis
-            redis_client = db_manager.conectar_redis()
-            redis_client.lpush("cola:procesos_pendientes", solicitud_id)
+            # Agregar a la cola de Redis (prioridad según el tipo, turno por usuario)
+            cola_procesos.encolar(solicitud_id, usuario_id, proceso['tipo'])
             
             db_manager.commit_mysql()
             cursor.close()
@@ -94,6 +99,7 @@ class ProcesoService:
             
         except Exception as e:
             db_manager.rollback_mysql()
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error solicitando proceso: {e}")
             return False, f"Error: {str(e)}", None
     
@@ -104,7 +110,8 @@ class ProcesoService:
         
         Args:
             usuario_id: ID del usuario
-            filtro_estado: 'pendiente', 'en_proceso', 'completado', 'error' o None
+            filtro_estado: 'pendiente', 'en_proceso', 'completado', 'error',
+                           'timeout', 'cancelado' o None
             limite: Número máximo de solicitudes
         
         Returns:
@@ -147,6 +154,7 @@ class ProcesoService:
             return solicitudes
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error listando solicitudes: {e}")
             return []
     
@@ -170,15 +178,21 @@ class ProcesoService:
             resultado = cursor.fetchall()
             cursor.close()
             
-            conteos = {'pendiente': 0, 'en_proceso': 0, 'completado': 0, 'error': 0}
+            conteos = {'pendiente': 0, 'en_proceso': 0, 'completado': 0, 'error': 0,
+                       'timeout': 0, 'cancelado': 0}
             for row in resultado:
                 conteos[row['estado']] = row['total']
             
-            return conteos
+            return resiliencia.guardar_respaldo(('solicitudes_por_estado', usuario_id), conteos)
             
         except Exception as e:
+            anterior = resiliencia.respaldo(('solicitudes_por_estado', usuario_id))
+            if anterior:
+                print(f"⚠️ Conteo de solicitudes no disponible ({e}); se muestra el último leído")
+                return anterior[0]
             print(f"❌ Error contando solicitudes: {e}")
-            return {'pendiente': 0, 'en_proceso': 0, 'completado': 0, 'error': 0}
+            return {'pendiente': 0, 'en_proceso': 0, 'completado': 0, 'error': 0,
+                    'timeout': 0, 'cancelado': 0}
     
     @staticmethod
     def obtener_procesos_pendientes(limite=10):
@@ -186,15 +200,10 @@ class ProcesoService:
         Obtiene procesos pendientes de la cola (para ejecutar)
         
         Returns:
-            Lista de IDs de solicitudes pendientes
+            Lista de IDs de solicitudes pendientes, las más antiguas primero
         """
         try:
-            redis_client = db_manager.conectar_redis()
-            
-            # Obtener hasta 'limite' elementos de la cola sin eliminarlos
-            solicitudes_ids = redis_client.lrange("cola:procesos_pendientes", 0, limite - 1)
-            
-            return [int(sid) for sid in solicitudes_ids]
+            return cola_procesos.pendientes(limite)
             
         except Exception as e:
             print(f"❌ Error obteniendo procesos pendientes: {e}")
@@ -203,7 +212,11 @@ class ProcesoService:
     @staticmethod
     def cancelar_solicitud(solicitud_id, usuario_id):
         """
-        Cancela una solicitud pendiente
+        Cancela una solicitud pendiente o en proceso
+        
+        Las pendientes se eliminan; las que están en proceso se marcan en Redis
+        y el worker las detiene en el próximo punto de control, dejándolas en
+        estado 'cancelado'.
         
         Returns:
             (success: bool, mensaje: str)
@@ -211,7 +224,7 @@ class ProcesoService:
         try:
             cursor = db_manager.get_mysql_cursor()
             
-            # Verificar que la solicitud sea del usuario y esté pendiente
+            # Verificar que la solicitud sea del usuario
             cursor.execute("""
                 SELECT estado FROM solicitudes_proceso
                 WHERE id = %s AND usuario_id = %s
@@ -223,16 +236,25 @@ class ProcesoService:
                 cursor.close()
                 return False, "Solicitud no encontrada"
             
+            if solicitud['estado'] == 'en_proceso':
+                cursor.close()
+                redis_client = db_manager.conectar_redis()
+                segundos = max(
+                    PROCESOS_CONFIG['presupuesto_defecto'],
+                    *PROCESOS_CONFIG['presupuesto_segundos'].values()
+                )
+                redis_client.set(presupuesto.clave_cancelacion(solicitud_id), 1, ex=segundos)
+                return True, "Cancelación solicitada, el proceso se detendrá en breve"
+            
             if solicitud['estado'] != 'pendiente':
                 cursor.close()
-                return False, "Solo se pueden cancelar solicitudes pendientes"
+                return False, "Solo se pueden cancelar solicitudes pendientes o en proceso"
             
             # Eliminar de MySQL
             cursor.execute("DELETE FROM solicitudes_proceso WHERE id = %s", (solicitud_id,))
             
             # Eliminar de la cola de Redis
-            redis_client = db_manager.conectar_redis()
-            redis_client.lrem("cola:procesos_pendientes", 0, str(solicitud_id))
+            cola_procesos.quitar(solicitud_id)
             
             db_manager.commit_mysql()
             cursor.close()
@@ -243,3 +265,27 @@ class ProcesoService:
             db_manager.rollback_mysql()
             print(f"❌ Error cancelando solicitud: {e}")
             return False, f"Error: {str(e)}"
+    
+    @staticmethod
+    def suscribir_procesos(callback, grupo=None):
+        """
+        Suscribe a los procesos que terminan (STREAM_PROCESOS)
+        
+        Cada evento trae solicitud_id, usuario_id, tipo, estado y fecha; el
+        stream es de todos los usuarios, así que el callback filtra por
+        usuario_id si hace falta.
+        
+        Args:
+            callback: Función que recibe el evento (dict)
+            grupo: Consumer group compartido para repartir los eventos entre
+                procesos; por defecto el de la sesión, que los recibe todos
+        
+        Returns:
+            Hilo de escucha del bus de eventos
+        """
+        return event_bus.suscribir(STREAM_PROCESOS, callback, grupo)
+    
+    @staticmethod
+    def cancelar_suscripcion(callback, grupo=None):
+        """Cancela una suscripción registrada con suscribir_procesos"""
+        event_bus.cancelar_suscripcion(STREAM_PROCESOS, callback, grupo)
@@ -0,0 +1,276 @@
+"""
+Servicio de procesos programados
+Guarda definiciones recurrentes (expresión cron) en MySQL y crea las
+solicitudes cuando llega su horario, usando un ZSET de Redis como índice
+de próximas ejecuciones
+"""
+
+import json
+import random
+import time
+from datetime import datetime
+from config.db_config import PROGRAMADOR_CONFIG
+from services.proceso_service import ProcesoService
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import cron
+from utils.instrumentacion import instrumentar
+
+# ZSET programado_id -> próxima ejecución (epoch, con jitter)
+CLAVE_PROXIMAS = "programador:proximas"
+# Marca de la última reconciliación del ZSET con MySQL
+CLAVE_SINCRONIZADO = "programador:sincronizado"
+
+
+def _puntaje(fecha, jitter=True):
+    """Epoch de una ejecución, con la demora aleatoria del programador"""
+    puntaje = time.mktime(fecha.timetuple())
+    if jitter:
+        puntaje += random.uniform(0, PROGRAMADOR_CONFIG['jitter_segundos'])
+    return puntaje
+
+
+def _meses_atras(fecha, meses):
+    """Primer día del mes 'meses' meses antes que el de fecha"""
+    total = fecha.year * 12 + fecha.month - 1 - meses
+    return datetime(total // 12, total % 12 + 1, 1)
+
+
+def parametros_ejecucion(parametros, programado_id, fecha):
+    """
+    Parámetros de la solicitud de una ejecución programada
+
+    Con 'meses' en la definición, el período son los últimos meses cerrados
+    antes de la fecha programada (la ventana se desplaza en cada ejecución).
+    """
+    parametros = dict(parametros or {})
+    parametros['programado_id'] = programado_id
+
+    meses = parametros.get('meses')
+    if meses:
+        fin = _meses_atras(fecha, 0)
+        parametros['fecha_inicio'] = _meses_atras(fecha, int(meses)).strftime('%Y-%m-%d')
+        parametros['fecha_fin'] = fin.strftime('%Y-%m-%d')
+
+    return parametros
+
+
+@instrumentar
+class ProgramadorService:
+    """Servicio para procesos recurrentes"""
+
+    @staticmethod
+    def programar(usuario_id, proceso_id, parametros, expresion_cron):
+        """
+        Crea un proceso programado
+
+        Args:
+            parametros: Parámetros del proceso; 'meses' define una ventana móvil
+            expresion_cron: Expresión de 5 campos (minuto hora día mes día_semana)
+
+        Returns:
+            (success: bool, mensaje: str, programado_id: int)
+        """
+        try:
+            proxima = cron.siguiente(expresion_cron)
+        except ValueError as e:
+            return False, str(e), None
+
+        try:
+            cursor = db_manager.get_mysql_cursor()
+
+            cursor.execute("SELECT id FROM procesos WHERE id = %s AND activo = TRUE", (proceso_id,))
+            if not cursor.fetchone():
+                cursor.close()
+                return False, "Proceso no encontrado", None
+
+            cursor.execute("""
+                INSERT INTO procesos_programados
+                    (usuario_id, proceso_id, parametros, expresion_cron, proxima_ejecucion)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (usuario_id, proceso_id, json.dumps(parametros), expresion_cron, proxima))
+            programado_id = cursor.lastrowid
+
+            db_manager.commit_mysql()
+            cursor.close()
+
+            db_manager.conectar_redis().zadd(CLAVE_PROXIMAS, {programado_id: _puntaje(proxima)})
+
+            return True, f"Proceso programado. Próxima ejecución: {proxima:%Y-%m-%d %H:%M}", programado_id
+
+        except Exception as e:
+            db_manager.rollback_mysql()
+            print(f"❌ Error programando proceso: {e}")
+            return False, f"Error: {str(e)}", None
+
+    @staticmethod
+    def listar_programados(usuario_id):
+        """
+        Lista los procesos programados activos de un usuario
+
+        Returns:
+            Lista de programados
+        """
+        try:
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("""
+                SELECT pp.*, p.nombre as proceso_nombre, p.costo
+                FROM procesos_programados pp
+                JOIN procesos p ON pp.proceso_id = p.id
+                WHERE pp.usuario_id = %s AND pp.activo = TRUE
+                ORDER BY pp.proxima_ejecucion
+            """, (usuario_id,))
+            programados = cursor.fetchall()
+            cursor.close()
+            return programados
+
+        except Exception as e:
+            print(f"❌ Error listando procesos programados: {e}")
+            return []
+
+    @staticmethod
+    def cancelar_programado(programado_id, usuario_id):
+        """
+        Desactiva un proceso programado
+
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("""
+                UPDATE procesos_programados SET activo = FALSE
+                WHERE id = %s AND usuario_id = %s AND activo = TRUE
+            """, (programado_id, usuario_id))
+            actualizados = cursor.rowcount
+            db_manager.commit_mysql()
+            cursor.close()
+
+            if not actualizados:
+                return False, "Proceso programado no encontrado"
+
+            db_manager.conectar_redis().zrem(CLAVE_PROXIMAS, programado_id)
+            return True, "Proceso programado cancelado"
+
+        except Exception as e:
+            db_manager.rollback_mysql()
+            print(f"❌ Error cancelando proceso programado: {e}")
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def sincronizar():
+        """
+        Reconcilia el ZSET con MySQL: agrega los programados activos que
+        falten (sin tocar los horarios ya cargados) y quita los inactivos
+        """
+        cursor = db_manager.get_mysql_cursor()
+        cursor.execute("""
+            SELECT id, proxima_ejecucion FROM procesos_programados WHERE activo = TRUE
+        """)
+        activos = {row['id']: row['proxima_ejecucion'] for row in cursor.fetchall()}
+        cursor.close()
+
+        redis_client = db_manager.conectar_redis()
+        cargados = {int(pid) for pid in redis_client.zrange(CLAVE_PROXIMAS, 0, -1)}
+
+        pipe = redis_client.pipeline()
+        if activos:
+            pipe.zadd(CLAVE_PROXIMAS, {pid: _puntaje(fecha) for pid, fecha in activos.items()}, nx=True)
+        sobrantes = cargados - set(activos)
+        if sobrantes:
+            pipe.zrem(CLAVE_PROXIMAS, *sobrantes)
+        pipe.set(CLAVE_SINCRONIZADO, datetime.now().isoformat(), ex=PROGRAMADOR_CONFIG['sincronizar_segundos'])
+        pipe.execute()
+
+    @staticmethod
+    def encolar_vencidos():
+        """
+        Crea las solicitudes de los programados cuyo horario ya llegó
+
+        Cada programado se reclama con ZREM (solo un worker lo obtiene) y se
+        vuelve a verificar en MySQL con bloqueo de fila antes de encolarlo.
+
+        Returns:
+            Cantidad de solicitudes creadas
+        """
+        redis_client = db_manager.conectar_redis()
+        if not redis_client.exists(CLAVE_SINCRONIZADO):
+            ProgramadorService.sincronizar()
+
+        creadas = 0
+        for programado_id in redis_client.zrangebyscore(CLAVE_PROXIMAS, '-inf', time.time(), start=0, num=100):
+            if redis_client.zrem(CLAVE_PROXIMAS, programado_id):
+                creadas += ProgramadorService._ejecutar_programado(int(programado_id))
+        return creadas
+
+    @staticmethod
+    def _ejecutar_programado(programado_id):
+        """
+        Encola una ejecución de un programado ya reclamado y agenda la siguiente
+
+        Returns:
+            1 si se creó la solicitud, 0 si no
+        """
+        redis_client = db_manager.conectar_redis()
+        ahora = datetime.now()
+
+        try:
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("""
+                SELECT * FROM procesos_programados
+                WHERE id = %s AND activo = TRUE
+                FOR UPDATE
+            """, (programado_id,))
+            programado = cursor.fetchone()
+
+            # Cancelado, o ya encolado por otro worker tras una reconciliación
+            if not programado or programado['proxima_ejecucion'] > ahora:
+                db_manager.rollback_mysql()
+                cursor.close()
+                if programado:
+                    redis_client.zadd(CLAVE_PROXIMAS, {programado_id: _puntaje(programado['proxima_ejecucion'])}, nx=True)
+                return 0
+
+            proxima = cron.siguiente(programado['expresion_cron'], ahora)
+            cursor.execute("""
+                UPDATE procesos_programados
+                SET proxima_ejecucion = %s, ultima_ejecucion = %s
+                WHERE id = %s
+            """, (proxima, ahora, programado_id))
+            cursor.close()
+
+            parametros = json.loads(programado['parametros']) if programado['parametros'] else {}
+
+            # La solicitud se confirma en la misma transacción que el nuevo horario
+            success, mensaje, solicitud_id = ProcesoService.solicitar_proceso(
+                programado['usuario_id'],
+                programado['proceso_id'],
+                parametros_ejecucion(parametros, programado_id, programado['proxima_ejecucion'])
+            )
+
+            if not success:
+                logger.warning("Programado %s: %s", programado_id, mensaje, programado_id=programado_id)
+                redis_client.zadd(CLAVE_PROXIMAS, {
+                    programado_id: time.time() + PROGRAMADOR_CONFIG['reintento_segundos']
+                })
+                return 0
+
+            cursor = db_manager.get_mysql_cursor()
+            cursor.execute("""
+                UPDATE procesos_programados SET ultima_solicitud_id = %s WHERE id = %s
+            """, (solicitud_id, programado_id))
+            db_manager.commit_mysql()
+            cursor.close()
+
+            redis_client.zadd(CLAVE_PROXIMAS, {programado_id: _puntaje(proxima)})
+            logger.info("Programado %s: solicitud %s, próxima %s", programado_id, solicitud_id, proxima,
+                        programado_id=programado_id, solicitud_id=solicitud_id)
+            return 1
+
+        except Exception as e:
+            db_manager.rollback_mysql()
+            logger.error("Error ejecutando programado %s", programado_id, excepcion=e, programado_id=programado_id)
+            redis_client.zadd(CLAVE_PROXIMAS, {
+                programado_id: time.time() + PROGRAMADOR_CONFIG['reintento_segundos']
+            })
+            return 0
@@ -0,0 +1,296 @@
+"""
+Servicio de retención de mediciones
+Archiva las mediciones crudas antiguas en archivos NDJSON.gz con manifest,
+mantiene rollups diarios y deja que el índice TTL las elimine de MongoDB
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from bson import ObjectId, json_util
+from config.db_config import RETENCION_CONFIG
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import particiones, presupuesto
+from utils.instrumentacion import instrumentar
+
+# Clave Redis de la última ejecución del archivador
+CLAVE_ULTIMA_RETENCION = "retencion:ultima_ejecucion"
+
+
+def _directorio_archivo():
+    return Path(RETENCION_CONFIG['directorio']) / "mediciones"
+
+
+def _ruta_manifest():
+    return _directorio_archivo() / "manifest.json"
+
+
+def _inicio_dia(fecha):
+    return fecha.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@instrumentar
+class RetencionService:
+    """
+    Servicio de retención por niveles
+
+    Cada lote de mediciones anteriores al corte se procesa como una "parte":
+      1. se marcan las mediciones con archivo_parte
+      2. se escriben en un archivo NDJSON.gz (Extended JSON)
+      3. se agregan en mediciones_diarias (una fila por sensor, día y parte)
+      4. se registran en el manifest
+      5. se les asigna expira_en; el índice TTL las borra pasado ese momento
+
+    Todos los pasos son idempotentes por parte: si el proceso se corta, la
+    próxima ejecución retoma las partes marcadas que no tienen expira_en.
+    Sin expira_en una medición nunca expira, por eso el rollup y el archivo
+    siempre existen antes de que se borren los datos crudos.
+    """
+
+    @staticmethod
+    def fecha_corte():
+        """Inicio del primer día que se conserva como dato crudo"""
+        return _inicio_dia(datetime.now() - timedelta(days=RETENCION_CONFIG['dias_crudos']))
+
+    @staticmethod
+    def ejecucion_vencida():
+        """Indica si corresponde ejecutar el archivador"""
+        ultima = db_manager.conectar_redis().get(CLAVE_ULTIMA_RETENCION)
+        if not ultima:
+            return True
+
+        periodo = timedelta(hours=RETENCION_CONFIG['intervalo_horas'])
+        return datetime.now() - datetime.fromisoformat(ultima) >= periodo
+
+    @staticmethod
+    def archivar():
+        """
+        Archiva todas las mediciones anteriores al corte
+
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
+            db = db_manager.conectar_mongodb()
+            corte = RetencionService.fecha_corte()
+
+            registros = partes = 0
+            for coleccion in particiones.colecciones_en_rango(db, None, corte):
+                archivadas, procesadas = RetencionService._archivar_coleccion(db, coleccion, corte)
+                registros += archivadas
+                partes += procesadas
+
+            eliminadas = RetencionService._eliminar_particiones_archivadas(db, corte)
+
+            db_manager.conectar_redis().set(CLAVE_ULTIMA_RETENCION, datetime.now().isoformat())
+
+            mensaje = f"{registros} mediciones archivadas en {partes} partes"
+            if eliminadas:
+                mensaje += f", {eliminadas} particiones eliminadas"
+            return True, mensaje
+
+        except Exception as e:
+            logger.error("Error archivando mediciones: %s", e)
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def _archivar_coleccion(db, coleccion, corte):
+        """
+        Archiva las mediciones anteriores al corte de una colección
+
+        Returns:
+            (mediciones archivadas, partes procesadas)
+        """
+        # Retomar partes que quedaron a medio procesar
+        retomadas = coleccion.distinct('archivo_parte', {
+            'archivo_parte': {'$exists': True},
+            'expira_en': {'$exists': False}
+        })
+        registros = sum(RetencionService._completar_parte(db, coleccion, parte) for parte in retomadas)
+        partes = len(retomadas)
+
+        primera = coleccion.find_one(
+            {'timestamp': {'$lt': corte}, 'archivo_parte': None},
+            sort=[('timestamp', 1)]
+        )
+
+        dia = _inicio_dia(primera['timestamp']) if primera else corte
+        while dia < corte:
+            rango = {'$gte': dia, '$lt': min(dia + timedelta(days=1), corte)}
+
+            while True:
+                ids = [doc['_id'] for doc in coleccion.find(
+                    {'timestamp': rango, 'archivo_parte': None}, {'_id': 1}
+                ).limit(RETENCION_CONFIG['lote'])]
+                if not ids:
+                    break
+
+                parte = f"{dia:%Y%m%d}-{ObjectId()}"
+                coleccion.update_many(
+                    {'_id': {'$in': ids}, 'archivo_parte': None},
+                    {'$set': {'archivo_parte': parte}}
+                )
+                registros += RetencionService._completar_parte(db, coleccion, parte)
+                partes += 1
+
+            dia += timedelta(days=1)
+
+        return registros, partes
+
+    @staticmethod
+    def _eliminar_particiones_archivadas(db, corte):
+        """
+        Elimina con drop() las particiones mensuales ya archivadas por completo
+        cuyo mes terminó antes del corte menos el período de gracia
+
+        Returns:
+            Cantidad de particiones eliminadas
+        """
+        limite = corte - timedelta(days=RETENCION_CONFIG['dias_gracia'])
+        eliminadas = 0
+
+        for coleccion in particiones.colecciones_en_rango(db, None, limite):
+            mes = particiones.mes_particion(coleccion.name)
+            if mes is None or mes[1] > limite:
+                continue
+            if coleccion.find_one({'expira_en': {'$exists': False}}, {'_id': 1}):
+                continue
+            particiones.eliminar_particion(db, coleccion.name)
+            eliminadas += 1
+
+        return eliminadas
+
+    @staticmethod
+    def _completar_parte(db, coleccion, parte):
+        """
+        Escribe el archivo, el rollup y el manifest de una parte ya marcada,
+        y programa la expiración de sus mediciones
+
+        Returns:
+            Cantidad de mediciones de la parte
+        """
+        dia = datetime.strptime(parte.split('-')[0], '%Y%m%d')
+        relativa = Path(f"{dia:%Y}") / f"{dia:%m}" / f"{dia:%Y-%m-%d}_{parte}.ndjson.gz"
+        ruta = _directorio_archivo() / relativa
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+
+        # Archivo comprimido (escritura atómica)
+        temporal = ruta.with_suffix('.tmp')
+        registros = 0
+        with gzip.open(temporal, 'wt', encoding='utf-8') as archivo:
+            for medicion in coleccion.find({'archivo_parte': parte}).sort('_id', 1):
+                medicion.pop('archivo_parte', None)
+                archivo.write(json_util.dumps(medicion) + "\n")
+                registros += 1
+
+        if registros == 0:
+            temporal.unlink()
+            return 0
+
+        with open(temporal, 'rb') as archivo:
+            sha256 = hashlib.sha256(archivo.read()).hexdigest()
+        os.replace(temporal, ruta)
+
+        # Rollup diario de la parte (reemplaza si se reprocesa)
+        coleccion.aggregate([
+            {'$match': {'archivo_parte': parte}},
+            {
+                '$group': {
+                    '_id': '$sensor_id',
+                    'ciudad': {'$first': '$ciudad'},
+                    'pais': {'$first': '$pais'},
+                    'total_mediciones': {'$sum': 1},
+                    'suma_temperatura': {'$sum': '$temperatura'},
+                    'suma_humedad': {'$sum': '$humedad'},
+                    'temperatura_maxima': {'$max': '$temperatura'},
+                    'temperatura_minima': {'$min': '$temperatura'},
+                    'humedad_maxima': {'$max': '$humedad'},
+                    'humedad_minima': {'$min': '$humedad'}
+                }
+            },
+            {
+                '$project': {
+                    '_id': {'sensor_id': '$_id', 'parte': {'$literal': parte}},
+                    'sensor_id': '$_id',
+                    'dia': {'$literal': dia},
+                    'parte': {'$literal': parte},
+                    'ciudad': 1, 'pais': 1, 'total_mediciones': 1,
+                    'suma_temperatura': 1, 'suma_humedad': 1,
+                    'temperatura_maxima': 1, 'temperatura_minima': 1,
+                    'humedad_maxima': 1, 'humedad_minima': 1
+                }
+            },
+            {'$merge': {'into': 'mediciones_diarias', 'on': '_id',
+                        'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+        ])
+
+        RetencionService._registrar_en_manifest(parte, {
+            'dia': f"{dia:%Y-%m-%d}",
+            'ruta': relativa.as_posix(),
+            'registros': registros,
+            'sha256': sha256,
+            'creado': datetime.now().isoformat()
+        })
+
+        expira_en = datetime.now() + timedelta(days=RETENCION_CONFIG['dias_gracia'])
+        coleccion.update_many({'archivo_parte': parte}, {'$set': {'expira_en': expira_en}})
+
+        return registros
+
+    @staticmethod
+    def _leer_manifest():
+        ruta = _ruta_manifest()
+        if not ruta.exists():
+            return {'version': 1, 'partes': {}}
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+
+    @staticmethod
+    def _registrar_en_manifest(parte, entrada):
+        """Agrega o reemplaza la entrada de una parte (escritura atómica)"""
+        manifest = RetencionService._leer_manifest()
+        manifest['partes'][parte] = entrada
+
+        ruta = _ruta_manifest()
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(manifest, archivo, indent=2, ensure_ascii=False)
+        os.replace(temporal, ruta)
+
+    @staticmethod
+    def leer_archivo(fecha_inicio=None, fecha_fin=None):
+        """
+        Itera las mediciones archivadas de un rango de días (read-through)
+
+        Args:
+            fecha_inicio: Inicio del rango (inclusive) o None
+            fecha_fin: Fin del rango (inclusive) o None
+
+        Yields:
+            Mediciones con el mismo formato que en MongoDB
+        """
+        partes = sorted(
+            RetencionService._leer_manifest()['partes'].values(),
+            key=lambda entrada: entrada['dia']
+        )
+
+        for entrada in partes:
+            dia = datetime.strptime(entrada['dia'], '%Y-%m-%d')
+            if fecha_inicio and dia + timedelta(days=1) <= fecha_inicio:
+                continue
+            if fecha_fin and dia > fecha_fin:
+                continue
+            presupuesto.verificar()
+
+            with gzip.open(_directorio_archivo() / entrada['ruta'], 'rt', encoding='utf-8') as archivo:
+                for linea in archivo:
+                    medicion = json_util.loads(linea)
+                    if fecha_inicio and medicion['timestamp'] < fecha_inicio:
+                        continue
+                    if fecha_fin and medicion['timestamp'] > fecha_fin:
+                        continue
+                    yield medicion
@@ -2,9 +2,18 @@
 Servicio de gestión de sensores
 """
 
+import base64
 from datetime import datetime, timedelta
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
 from utils.db_manager import db_manager
+from utils import contadores, particiones, resiliencia
+from utils.instrumentacion import instrumentar
 
+# Orden de los listados de mediciones (más recientes primero, _id desempata)
+ORDEN_MEDICIONES = [('timestamp', -1), ('_id', -1)]
+
+@instrumentar
 class SensorService:
     """Servicio para gestión de sensores"""
     
@@ -21,7 +30,8 @@ class SensorService:
             Lista de sensores
         """
         try:
-            cursor = db_manager.get_mysql_cursor()
+            # Listado de consulta: se sirve desde la réplica si está configurada
+            cursor = db_manager.get_mysql_cursor(replica=True)
             
             # Construir query
             query = "SELECT * FROM sensores WHERE 1=1"
@@ -44,6 +54,7 @@ class SensorService:
             return sensores
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error listando sensores: {e}")
             return []
     
@@ -67,6 +78,7 @@ class SensorService:
             return sensor
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error obteniendo sensor: {e}")
             return None
     
@@ -138,6 +150,44 @@ class SensorService:
             print(f"❌ Error cambiando estado: {e}")
             return False, f"Error: {str(e)}"
     
+    @staticmethod
+    def registrar_medicion(sensor_id, temperatura, humedad, timestamp=None):
+        """
+        Registra una medición en MongoDB (en la partición del mes si el
+        particionado está habilitado)
+        
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
+            sensor = SensorService.obtener_sensor(sensor_id)
+            
+            if not sensor:
+                return False, "Sensor no encontrado"
+            
+            if sensor['estado'] != 'activo':
+                return False, f"El sensor está {sensor['estado']}"
+            
+            timestamp = timestamp or datetime.now()
+            db = db_manager.conectar_mongodb()
+            
+            particiones.coleccion_escritura(db, timestamp).insert_one({
+                'sensor_id': sensor_id,
+                'timestamp': timestamp,
+                'temperatura': temperatura,
+                'humedad': humedad,
+                'ciudad': sensor['ciudad'],
+                'pais': sensor['pais']
+            })
+            contadores.incrementar('mediciones_ciudad', sensor['ciudad'])
+            
+            return True, "Medición registrada"
+            
+        except Exception as e:
+            resiliencia.relanzar_caida(e)
+            print(f"❌ Error registrando medición: {e}")
+            return False, f"Error: {str(e)}"
+    
     @staticmethod
     def obtener_ultima_medicion(sensor_id):
         """
@@ -149,17 +199,78 @@ class SensorService:
         try:
             db = db_manager.conectar_mongodb()
             
-            medicion = db.mediciones.find_one(
-                {'sensor_id': sensor_id},
-                sort=[('timestamp', -1)]
-            )
+            medicion = particiones.ultima_medicion(db, {'sensor_id': sensor_id})
             
             return medicion
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error obteniendo última medición: {e}")
             return None
     
+    @staticmethod
+    def listar_mediciones(sensor_id, fecha_inicio=None, fecha_fin=None, limite=100, cursor_pagina=None):
+        """
+        Mediciones de un sensor, más recientes primero, paginadas por cursor
+        (timestamp, _id) como los listados de mensajes
+        
+        Args:
+            fecha_inicio: Inicio del rango o None
+            fecha_fin: Fin del rango (inclusive) o None
+            limite: Cantidad de mediciones por página
+            cursor_pagina: Token devuelto con la página anterior o None
+        
+        Returns:
+            (mediciones: list, cursor de la página siguiente o None)
+        
+        Raises:
+            ValueError: cursor_pagina no es un token válido
+        """
+        filtro = {'sensor_id': sensor_id}
+        if cursor_pagina:
+            try:
+                valor = base64.urlsafe_b64decode(cursor_pagina.encode('ascii')).decode('utf-8')
+                timestamp_str, medicion_id = valor.split('|')
+                timestamp = datetime.fromisoformat(timestamp_str)
+                medicion_id = ObjectId(medicion_id)
+            except (ValueError, TypeError, InvalidId) as e:
+                raise ValueError(f"Cursor inválido: {cursor_pagina}") from e
+            fecha_fin = min(fecha_fin, timestamp) if fecha_fin else timestamp
+            # El $nor descarta los empates de timestamp ya devueltos
+            filtro['$nor'] = [{'timestamp': timestamp, '_id': {'$gte': medicion_id}}]
+        
+        try:
+            db = db_manager.conectar_mongodb('informes')
+            
+            rango = {}
+            if fecha_inicio:
+                rango['$gte'] = fecha_inicio
+            if fecha_fin:
+                rango['$lte'] = fecha_fin
+            if rango:
+                filtro['timestamp'] = rango
+            
+            # De la partición más nueva hacia atrás hasta completar la página
+            mediciones = []
+            for coleccion in particiones.colecciones_en_rango(db, fecha_inicio, fecha_fin, descendente=True):
+                faltan = limite - len(mediciones)
+                if faltan <= 0:
+                    break
+                mediciones.extend(coleccion.find(filtro).sort(ORDEN_MEDICIONES).limit(faltan))
+            
+            siguiente = None
+            if len(mediciones) == limite:
+                ultima = mediciones[-1]
+                valor = f"{ultima['timestamp'].isoformat()}|{ultima['_id']}"
+                siguiente = base64.urlsafe_b64encode(valor.encode('utf-8')).decode('ascii')
+            
+            return mediciones, siguiente
+            
+        except Exception as e:
+            resiliencia.relanzar_caida(e)
+            print(f"❌ Error listando mediciones: {e}")
+            return [], None
+    
     @staticmethod
     def obtener_estadisticas_sensor(sensor_id, dias=7):
         """
@@ -169,10 +280,11 @@ class SensorService:
             Diccionario con estadísticas
         """
         try:
-            db = db_manager.conectar_mongodb()
+            db = db_manager.conectar_mongodb('informes')
             
             fecha_inicio = datetime.now() - timedelta(days=dias)
             
+            # Parciales por partición (sumas y conteos, no promedios)
             pipeline = [
                 {
                     '$match': {
@@ -183,10 +295,10 @@ class SensorService:
                 {
                     '$group': {
                         '_id': None,
-                        'temp_promedio': {'$avg': '$temperatura'},
+                        'temp_suma': {'$sum': '$temperatura'},
                         'temp_max': {'$max': '$temperatura'},
                         'temp_min': {'$min': '$temperatura'},
-                        'hum_promedio': {'$avg': '$humedad'},
+                        'hum_suma': {'$sum': '$humedad'},
                         'hum_max': {'$max': '$humedad'},
                         'hum_min': {'$min': '$humedad'},
                         'total_mediciones': {'$sum': 1}
@@ -194,10 +306,25 @@ class SensorService:
                 }
             ]
             
-            resultado = list(db.mediciones.aggregate(pipeline))
+            colecciones = particiones.colecciones_en_rango(db, fecha_inicio)
+            parciales = [
+                item
+                for resultado in particiones.consultar(colecciones, lambda c: list(c.aggregate(pipeline)))
+                for item in resultado
+            ]
             
-            if resultado:
-                stats = resultado[0]
+            if parciales:
+                total = sum(p['total_mediciones'] for p in parciales)
+                stats = {
+                    '_id': None,
+                    'temp_promedio': sum(p['temp_suma'] for p in parciales) / total,
+                    'temp_max': max(p['temp_max'] for p in parciales),
+                    'temp_min': min(p['temp_min'] for p in parciales),
+                    'hum_promedio': sum(p['hum_suma'] for p in parciales) / total,
+                    'hum_max': max(p['hum_max'] for p in parciales),
+                    'hum_min': min(p['hum_min'] for p in parciales),
+                    'total_mediciones': total
+                }
                 # Redondear valores
                 for key in stats:
                     if key != '_id' and key != 'total_mediciones' and stats[key]:
@@ -207,6 +334,7 @@ class SensorService:
                 return None
             
         except Exception as e:
+            resiliencia.relanzar_caida(e)
             print(f"❌ Error obteniendo estadísticas: {e}")
             return None
     
@@ -257,3 +385,45 @@ class SensorService:
         except Exception as e:
             print(f"❌ Error contando sensores: {e}")
             return {'activo': 0, 'inactivo': 0, 'falla': 0}
+    
+    @staticmethod
+    def contar_mediciones_por_ciudad(exacto=False):
+        """
+        Cuenta mediciones agrupadas por ciudad
+        
+        Args:
+            exacto: Recorrer todas las particiones en lugar de usar el contador mantenido
+        
+        Returns:
+            Diccionario ciudad -> cantidad
+        """
+        try:
+            def recalcular():
+                # Crudos sin archivar más los rollups de lo archivado (igual
+                # que el snapshot, que también reconcilia este contador)
+                db = db_manager.conectar_mongodb('informes')
+                pipeline = [
+                    {'$match': {'archivo_parte': None}},
+                    {'$group': {'_id': '$ciudad', 'total': {'$sum': 1}}}
+                ]
+                colecciones = particiones.colecciones_en_rango(db)
+                parciales = particiones.consultar(colecciones, lambda c: list(c.aggregate(pipeline)))
+                parciales.append(db.mediciones_diarias.aggregate([
+                    {'$group': {'_id': '$ciudad', 'total': {'$sum': '$total_mediciones'}}}
+                ]))
+                conteos = {}
+                for parcial in parciales:
+                    for item in parcial:
+                        conteos[item['_id']] = conteos.get(item['_id'], 0) + item['total']
+                return conteos
+            
+            conteos = contadores.leer('mediciones_ciudad', recalcular, exacto)
+            return resiliencia.guardar_respaldo('mediciones_ciudad', conteos)
+            
+        except Exception as e:
+            anterior = resiliencia.respaldo('mediciones_ciudad')
+            if anterior:
+                print(f"⚠️ Conteo de mediciones no disponible ({e}); se muestra el último leído")
+                return anterior[0]
+            print(f"❌ Error contando mediciones: {e}")
+            return {}
@@ -0,0 +1,268 @@
+"""
+Servicio de snapshots de dashboards
+Calcula en segundo plano los indicadores de los dashboards y reportes de
+administración y los guarda en un único hash de Redis; las pantallas solo
+leen ese hash
+"""
+
+import json
+from datetime import datetime, timedelta
+from config.db_config import SNAPSHOT_CONFIG
+from services.alerta_service import AlertaService
+from services.retencion_service import CLAVE_ULTIMA_RETENCION
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import contadores, particiones, resiliencia
+from utils.instrumentacion import instrumentar
+
+CLAVE_SNAPSHOT = "dashboard:snapshot"
+# Parciales de mediciones anteriores al mes en curso
+CLAVE_PARCIALES_CERRADOS = "dashboard:parciales_cerrados"
+
+
+def _agregar_mediciones(db, desde=None, hasta=None):
+    """
+    Conteo por ciudad y sumas de temperatura y humedad de un rango: datos
+    crudos que todavía no pasaron al archivo más los rollups diarios de lo
+    archivado (los crudos archivados se cuentan en su rollup)
+
+    Args:
+        desde: Inicio del rango (inclusive) o None
+        hasta: Fin del rango (exclusivo) o None
+    """
+    rango = {}
+    if desde:
+        rango['$gte'] = desde
+    if hasta:
+        rango['$lt'] = hasta
+
+    filtro = {'archivo_parte': None}
+    if rango:
+        filtro['timestamp'] = rango
+    pipeline = [
+        {'$match': filtro},
+        {
+            '$group': {
+                '_id': '$ciudad',
+                'total': {'$sum': 1},
+                'temp_suma': {'$sum': '$temperatura'},
+                'hum_suma': {'$sum': '$humedad'}
+            }
+        }
+    ]
+    colecciones = particiones.colecciones_en_rango(
+        db, desde, hasta - timedelta(microseconds=1) if hasta else None
+    )
+    parciales = particiones.consultar(colecciones, lambda c: list(c.aggregate(pipeline)))
+
+    parciales.append(db.mediciones_diarias.aggregate([
+        {'$match': {'dia': rango} if rango else {}},
+        {
+            '$group': {
+                '_id': '$ciudad',
+                'total': {'$sum': '$total_mediciones'},
+                'temp_suma': {'$sum': '$suma_temperatura'},
+                'hum_suma': {'$sum': '$suma_humedad'}
+            }
+        }
+    ]))
+
+    resultado = {'por_ciudad': {}, 'temp_suma': 0, 'hum_suma': 0}
+    for parcial in parciales:
+        for item in parcial:
+            por_ciudad = resultado['por_ciudad']
+            por_ciudad[item['_id']] = por_ciudad.get(item['_id'], 0) + item['total']
+            resultado['temp_suma'] += item['temp_suma']
+            resultado['hum_suma'] += item['hum_suma']
+    return resultado
+
+
+@instrumentar
+class SnapshotService:
+    """Servicio de indicadores precalculados"""
+
+    @staticmethod
+    def generar():
+        """
+        Recalcula todos los indicadores y reemplaza el snapshot
+
+        Returns:
+            (success: bool, mensaje: str)
+        """
+        try:
+            indicadores = {}
+            indicadores.update(SnapshotService._indicadores_mysql())
+            indicadores.update(SnapshotService._indicadores_mongodb())
+            indicadores['generado_en'] = datetime.now().isoformat()
+
+            # Un hash por snapshot, reemplazado en una transacción
+            redis_client = db_manager.conectar_redis()
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.delete(CLAVE_SNAPSHOT)
+            pipe.hset(CLAVE_SNAPSHOT, mapping={
+                campo: json.dumps(valor, default=str) for campo, valor in indicadores.items()
+            })
+            pipe.execute()
+
+            return True, f"Snapshot generado ({len(indicadores)} indicadores)"
+
+        except Exception as e:
+            logger.error("Error generando snapshot de dashboards: %s", e)
+            return False, f"Error: {str(e)}"
+
+    @staticmethod
+    def obtener(generar_si_falta=True):
+        """
+        Lee el snapshot (una lectura de Redis)
+
+        Args:
+            generar_si_falta: Generarlo en el momento si todavía no existe
+                (por ejemplo, antes de la primera pasada del worker)
+
+        Returns:
+            Diccionario de indicadores o None (con Redis caído, el último
+            leído por este proceso, si lo hay)
+        """
+        try:
+            datos = db_manager.conectar_redis().hgetall(CLAVE_SNAPSHOT)
+            if not datos and generar_si_falta:
+                success, _ = SnapshotService.generar()
+                if success:
+                    return SnapshotService.obtener(generar_si_falta=False)
+            if not datos:
+                return None
+
+            snapshot = {campo: json.loads(valor) for campo, valor in datos.items()}
+            snapshot['generado_en'] = datetime.fromisoformat(snapshot['generado_en'])
+            return resiliencia.guardar_respaldo(CLAVE_SNAPSHOT, snapshot)
+
+        except Exception as e:
+            anterior = resiliencia.respaldo(CLAVE_SNAPSHOT)
+            if anterior:
+                print(f"⚠️ Snapshot no disponible ({e}); se muestra el último leído")
+                return anterior[0]
+            print(f"❌ Error obteniendo snapshot: {e}")
+            return None
+
+    @staticmethod
+    def vencido():
+        """Indica si corresponde regenerar el snapshot"""
+        generado = db_manager.conectar_redis().hget(CLAVE_SNAPSHOT, 'generado_en')
+        if not generado:
+            return True
+
+        antiguedad = datetime.now() - datetime.fromisoformat(json.loads(generado))
+        return antiguedad.total_seconds() >= SNAPSHOT_CONFIG['intervalo_segundos']
+
+    @staticmethod
+    def _indicadores_mysql():
+        """Conteos y montos de MySQL (una consulta por tabla)"""
+        cursor = db_manager.get_mysql_cursor(replica=True)
+        try:
+            cursor.execute("""
+                SELECT COUNT(*) as total,
+                       COALESCE(SUM(estado = 'activo'), 0) as activos
+                FROM usuarios
+            """)
+            usuarios = cursor.fetchone()
+
+            cursor.execute("SELECT estado, COUNT(*) as total FROM sensores GROUP BY estado")
+            sensores_por_estado = {row['estado']: row['total'] for row in cursor.fetchall()}
+
+            cursor.execute("SELECT estado, COUNT(*) as total FROM solicitudes_proceso GROUP BY estado")
+            solicitudes_por_estado = {row['estado']: row['total'] for row in cursor.fetchall()}
+
+            cursor.execute("""
+                SELECT COUNT(*) as total,
+                       COALESCE(SUM(monto_total), 0) as monto,
+                       COALESCE(SUM(estado = 'pendiente'), 0) as pendientes,
+                       COALESCE(SUM(CASE WHEN estado = 'pendiente' THEN monto_total END), 0) as monto_pendiente,
+                       COALESCE(SUM(CASE WHEN estado = 'pagada' THEN monto_total END), 0) as monto_pagado
+                FROM facturas
+            """)
+            facturas = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT p.nombre, COUNT(s.id) as cantidad
+                FROM procesos p
+                LEFT JOIN solicitudes_proceso s ON p.id = s.proceso_id
+                GROUP BY p.id, p.nombre
+                ORDER BY cantidad DESC
+                LIMIT 10
+            """)
+            procesos_populares = {row['nombre']: row['cantidad'] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        return {
+            'usuarios_total': usuarios['total'],
+            'usuarios_activos': int(usuarios['activos']),
+            'sensores_total': sum(sensores_por_estado.values()),
+            'sensores_por_estado': sensores_por_estado,
+            'solicitudes_total': sum(solicitudes_por_estado.values()),
+            'solicitudes_por_estado': solicitudes_por_estado,
+            'facturas_total': facturas['total'],
+            'facturas_monto': float(facturas['monto']),
+            'facturas_pendientes': int(facturas['pendientes']),
+            'facturas_monto_pendiente': float(facturas['monto_pendiente']),
+            'facturacion_pagada': float(facturas['monto_pagado']),
+            'procesos_populares': procesos_populares
+        }
+
+    @staticmethod
+    def _parciales_cerrados(db, inicio_mes):
+        """
+        Parciales de todo lo anterior al mes en curso, guardados en Redis
+
+        Se vuelven a agregar al cambiar de mes, después de cada pasada del
+        archivador (mueve crudos a rollups) y al vencer
+        SNAPSHOT_CONFIG['cerrados_segundos'] (mediciones con fecha atrasada).
+        """
+        redis_client = db_manager.conectar_redis()
+        version = f"{inicio_mes:%Y%m}|{redis_client.get(CLAVE_ULTIMA_RETENCION) or ''}"
+
+        guardado = redis_client.get(CLAVE_PARCIALES_CERRADOS)
+        if guardado:
+            parciales = json.loads(guardado)
+            if parciales.pop('version', None) == version:
+                return parciales
+
+        parciales = _agregar_mediciones(db, hasta=inicio_mes)
+        redis_client.set(
+            CLAVE_PARCIALES_CERRADOS, json.dumps({**parciales, 'version': version}),
+            ex=SNAPSHOT_CONFIG['cerrados_segundos']
+        )
+        return parciales
+
+    @staticmethod
+    def _indicadores_mongodb():
+        """
+        Mediciones, alertas y mensajes
+
+        Cada pasada agrega solo el mes en curso; lo anterior sale de los
+        parciales de meses cerrados (ver _parciales_cerrados)
+        """
+        db = db_manager.conectar_mongodb('informes')
+
+        inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        cerrados = SnapshotService._parciales_cerrados(db, inicio_mes)
+        actual = _agregar_mediciones(db, desde=inicio_mes)
+
+        por_ciudad = dict(cerrados['por_ciudad'])
+        for ciudad, cantidad in actual['por_ciudad'].items():
+            por_ciudad[ciudad] = por_ciudad.get(ciudad, 0) + cantidad
+        temp_suma = cerrados['temp_suma'] + actual['temp_suma']
+        hum_suma = cerrados['hum_suma'] + actual['hum_suma']
+
+        total = sum(por_ciudad.values())
+        # Los conteos exactos sirven además para reconciliar el contador por ciudad
+        contadores.reemplazar('mediciones_ciudad', por_ciudad)
+
+        return {
+            'mediciones_total': total,
+            'mediciones_por_ciudad': dict(sorted(por_ciudad.items(), key=lambda c: c[1], reverse=True)[:10]),
+            'temperatura_promedio': temp_suma / total if total else None,
+            'humedad_promedio': hum_suma / total if total else None,
+            'alertas_activas': AlertaService.contar_alertas_por_estado()['activa'],
+            'mensajes_total': contadores.total_estimado(db.mensajes)
+        }
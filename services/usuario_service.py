@@ -4,9 +4,11 @@ Funcionalidades administrativas para gestionar usuarios del sistema
 """
 
 from utils.db_manager import db_manager
-import bcrypt
+from utils.instrumentacion import instrumentar
+from services.facturacion_service import FacturacionService
 from datetime import datetime
 
+@instrumentar
 class UsuarioService:
     """Servicio para gestión administrativa de usuarios"""
     
@@ -60,11 +62,15 @@ class UsuarioService:
         try:
             cursor = db_manager.get_mysql_cursor()
             
-            # Información básica
+            # Información básica y roles
             cursor.execute("""
-                SELECT id, nombre_completo, email, estado, fecha_registro
-                FROM usuarios
-                WHERE id = %s
+                SELECT u.id, u.nombre_completo, u.email, u.estado, u.fecha_registro,
+                       GROUP_CONCAT(r.descripcion ORDER BY r.descripcion) as roles
+                FROM usuarios u
+                LEFT JOIN usuarios_roles ur ON ur.usuario_id = u.id
+                LEFT JOIN roles r ON ur.rol_id = r.id
+                WHERE u.id = %s
+                GROUP BY u.id, u.nombre_completo, u.email, u.estado, u.fecha_registro
             """, (usuario_id,))
             
             usuario = cursor.fetchone()
@@ -73,40 +79,7 @@ class UsuarioService:
                 cursor.close()
                 return None
             
-            # Roles
-            cursor.execute("""
-                SELECT r.descripcion
-                FROM usuarios_roles ur
-                JOIN roles r ON ur.rol_id = r.id
-                WHERE ur.usuario_id = %s
-                ORDER BY r.descripcion
-            """, (usuario_id,))
-            
-            roles = [row['descripcion'] for row in cursor.fetchall()]
-            usuario['roles'] = roles
-            
-            # Cuenta corriente
-            cursor.execute("""
-                SELECT saldo
-                FROM cuenta_corriente
-                WHERE usuario_id = %s
-            """, (usuario_id,))
-            
-            cuenta = cursor.fetchone()
-            usuario['saldo'] = cuenta['saldo'] if cuenta else 0.00
-            
-            # Estadísticas de facturación
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(monto_total), 0) as total_facturado,
-                    COALESCE(SUM(CASE WHEN estado = 'pendiente' THEN monto_total ELSE 0 END), 0) as pendiente
-                FROM facturas
-                WHERE usuario_id = %s
-            """, (usuario_id,))
-            
-            facturacion = cursor.fetchone()
-            usuario['total_facturado'] = facturacion['total_facturado']
-            usuario['facturas_pendientes'] = facturacion['pendiente']
+            usuario['roles'] = usuario['roles'].split(',') if usuario['roles'] else []
             
             # Estadísticas de solicitudes
             cursor.execute("""
@@ -124,6 +97,12 @@ class UsuarioService:
             
             cursor.close()
             
+            # Saldo y facturación (contadores materializados)
+            resumen = FacturacionService.obtener_resumen_financiero(usuario_id)
+            usuario['saldo'] = resumen['saldo']
+            usuario['total_facturado'] = resumen['total_facturado']
+            usuario['facturas_pendientes'] = resumen['monto_pendiente']
+            
             return usuario
             
         except Exception as e:
@@ -265,6 +244,7 @@ class UsuarioService:
         """
         try:
             # Hashear la nueva contraseña
+            import bcrypt
             password_hash = bcrypt.hashpw(nueva_password.encode('utf-8'), bcrypt.gensalt())
             
             cursor = db_manager.get_mysql_cursor()
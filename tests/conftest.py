@@ -0,0 +1,52 @@
+"""
+Fixtures comunes: MongoDB y Redis en memoria (mongomock y fakeredis, como
+benchmarks/simulado.py) y estado de módulo limpio entre pruebas
+"""
+
+import pytest
+from config.db_config import LOG_CONFIG
+from utils import contadores, particiones, resiliencia
+from utils.db_manager import db_manager
+
+
+@pytest.fixture(autouse=True, scope='session')
+def directorio_logs(tmp_path_factory):
+    """Los registros de las pruebas no quedan en logs/ del proyecto"""
+    LOG_CONFIG['directorio'] = str(tmp_path_factory.mktemp('logs'))
+
+
+@pytest.fixture(autouse=True)
+def estado_limpio():
+    """Circuitos, respaldos, invalidaciones pendientes y listado de particiones de cada prueba por separado"""
+    resiliencia.reiniciar()
+    particiones._particiones.update(nombres=None, leido=0.0)
+    contadores._pendientes.clear()
+    yield
+    resiliencia.reiniciar()
+    particiones._particiones.update(nombres=None, leido=0.0)
+    contadores._pendientes.clear()
+
+
+@pytest.fixture
+def bases(monkeypatch):
+    """
+    db_manager conectado a MongoDB y Redis en memoria
+
+    Returns:
+        (base de MongoDB, cliente de Redis)
+    """
+    pytest.importorskip('mongomock')
+    pytest.importorskip('fakeredis')
+    from benchmarks import simulado
+
+    for atributo in ('mongo_client', 'mongo_db', 'mongo_dbs_lectura', 'redis_client'):
+        monkeypatch.setattr(db_manager, atributo, getattr(db_manager, atributo))
+    simulado.activar()
+    return db_manager.mongo_db, db_manager.redis_client
+
+
+@pytest.fixture
+def lua(bases):
+    """Scripts Lua en fakeredis (necesitan lupa)"""
+    pytest.importorskip('lupa')
+    return bases
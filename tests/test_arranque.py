@@ -0,0 +1,24 @@
+"""
+Arranque de los puntos de entrada
+Cada uno se importa en un intérprete nuevo con -X importtime (como
+benchmarks/tiempo_importacion.py) y no debe cargar drivers, bcrypt,
+http.server ni servicios. El tiempo no se controla acá: depende de la
+máquina y queda para el benchmark.
+"""
+
+import pytest
+from benchmarks.tiempo_importacion import ENTRADAS, medir, prohibidos_cargados
+
+
+@pytest.mark.parametrize('nombre', list(ENTRADAS))
+def test_no_importa_modulos_pesados(nombre):
+    modulo, prefijos = ENTRADAS[nombre]
+    try:
+        _, modulos = medir(modulo, repeticiones=1)
+    except RuntimeError as e:
+        if 'ModuleNotFoundError' in str(e):
+            pytest.skip(f"falta una dependencia de {modulo}: {e}")
+        raise
+
+    assert modulo in modulos
+    assert prohibidos_cargados(modulos, prefijos) == []
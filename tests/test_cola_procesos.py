@@ -0,0 +1,45 @@
+"""
+Cola de procesos: turnos por usuario dentro de cada prioridad y la cola
+FIFO anterior se sigue vaciando
+"""
+
+import pytest
+from utils import cola_procesos
+
+
+@pytest.fixture
+def una_prioridad(lua, monkeypatch):
+    """Todos los tipos en la prioridad 'normal'"""
+    monkeypatch.setitem(cola_procesos.PROCESOS_CONFIG, 'pesos', {'normal': 1})
+    monkeypatch.setitem(cola_procesos.PROCESOS_CONFIG, 'prioridades', {})
+    monkeypatch.setitem(cola_procesos.PROCESOS_CONFIG, 'prioridad_defecto', 'normal')
+    return lua
+
+
+def _vaciar():
+    vistos = []
+    while (solicitud_id := cola_procesos.desencolar()) is not None:
+        vistos.append(solicitud_id)
+    return vistos
+
+
+def test_turnos_por_usuario(una_prioridad):
+    for solicitud_id in (1, 2, 3):
+        cola_procesos.encolar(solicitud_id, 10, 'informe')
+    cola_procesos.encolar(4, 20, 'informe')
+
+    assert cola_procesos.pendientes() == [1, 2, 3, 4]
+    assert _vaciar() == [1, 4, 2, 3]
+    assert cola_procesos.pendientes() == []
+
+
+def test_quitar(una_prioridad):
+    _, redis_client = una_prioridad
+    cola_procesos.encolar(1, 10, 'informe')
+    cola_procesos.encolar(2, 20, 'informe')
+    redis_client.lpush(cola_procesos.COLA_ANTERIOR, 3)
+
+    cola_procesos.quitar(1)
+    cola_procesos.quitar(3)
+    assert not redis_client.exists(cola_procesos._clave_cola('normal', 10))
+    assert _vaciar() == [2]
@@ -0,0 +1,89 @@
+from datetime import datetime
+from utils import contadores, particiones
+
+
+def _recalcular(conteos, llamadas):
+    def recalcular():
+        llamadas.append(1)
+        return dict(conteos)
+    return recalcular
+
+
+def test_leer_recalcula_una_vez(bases):
+    llamadas = []
+    recalcular = _recalcular({'activa': 3, 'resuelta': 1}, llamadas)
+    assert contadores.leer('alertas', recalcular) == {'activa': 3, 'resuelta': 1}
+    assert contadores.leer('alertas', recalcular) == {'activa': 3, 'resuelta': 1}
+    assert llamadas == [1]
+
+    contadores.leer('alertas', recalcular, exacto=True)
+    assert llamadas == [1, 1]
+
+
+def test_contador_vacio_queda_armado(bases):
+    llamadas = []
+    assert contadores.leer('alertas', _recalcular({}, llamadas)) == {}
+    assert contadores.leer('alertas', _recalcular({}, llamadas)) == {}
+    assert llamadas == [1]
+
+
+def test_reemplazar_vence(bases):
+    _, redis_client = bases
+    contadores.reemplazar('mediciones_ciudad', {'Córdoba': 2})
+    ttl = redis_client.ttl(contadores._clave('mediciones_ciudad'))
+    assert 0 < ttl <= contadores.CONTADORES_CONFIG['reconciliar_segundos']
+
+
+def test_incrementar_solo_si_existe(lua):
+    _, redis_client = lua
+    contadores.incrementar('mediciones_ciudad', 'Rosario')
+    assert not redis_client.exists(contadores._clave('mediciones_ciudad'))
+
+    contadores.reemplazar('mediciones_ciudad', {'Rosario': 4})
+    contadores.incrementar('mediciones_ciudad', 'Rosario')
+    contadores.incrementar('mediciones_ciudad', 'Salta', 2)
+    assert contadores.leer('mediciones_ciudad', dict) == {'Rosario': 5, 'Salta': 2}
+
+
+def test_mover(lua):
+    contadores.reemplazar('alertas', {'activa': 2, 'resuelta': 0})
+    contadores.mover('alertas', 'activa', 'resuelta')
+    assert contadores.leer('alertas', dict) == {'activa': 1, 'resuelta': 1}
+
+
+def test_totales_estimados(bases):
+    db, _ = bases
+    db.mensajes.insert_many([{'n': i} for i in range(3)])
+    assert contadores.total_estimado(db.mensajes) == 3
+
+    db[particiones.COLECCION_BASE].insert_one({'timestamp': datetime(2023, 12, 1)})
+    db[particiones.nombre_particion(datetime(2024, 1, 5))].insert_many([{'n': i} for i in range(2)])
+    db[particiones.nombre_particion(datetime(2024, 2, 5))].insert_one({'n': 0})
+    assert contadores.total_mediciones(db) == 4
+
+
+def test_error_al_mantener_invalida_el_contador(lua, monkeypatch):
+    _, redis_client = lua
+    contadores.reemplazar('alertas', {'activa': 2, 'resuelta': 0})
+
+    def caido(*args, **kwargs):
+        raise ConnectionError("redis no responde")
+    monkeypatch.setattr(contadores, '_sumar', caido)
+    contadores.mover('alertas', 'activa', 'resuelta')
+    assert not redis_client.exists(contadores._clave('alertas'))
+
+
+def test_invalidacion_pendiente_con_redis_caido(lua, monkeypatch):
+    _, redis_client = lua
+    contadores.reemplazar('controles', {'ok': 1})
+
+    def caido():
+        raise ConnectionError("redis no responde")
+    with monkeypatch.context() as parche:
+        parche.setattr(contadores.db_manager, 'conectar_redis', caido)
+        contadores.incrementar('controles', 'ok')
+    assert redis_client.exists(contadores._clave('controles'))
+
+    # El próximo acceso con Redis disponible descarta el contador desviado
+    assert contadores.leer('controles', lambda: {'ok': 5}) == {'ok': 5}
+    assert not contadores._pendientes
@@ -0,0 +1,70 @@
+from datetime import datetime
+import pytest
+from utils import cron
+
+
+def test_parsear_listas_rangos_y_pasos():
+    resultado = cron.parsear("*/15 8-10 1,15 * 1-5")
+    assert resultado['minutos'] == {0, 15, 30, 45}
+    assert resultado['horas'] == {8, 9, 10}
+    assert resultado['dias'] == {1, 15}
+    assert resultado['meses'] == set(range(1, 13))
+    assert resultado['dias_semana'] == {1, 2, 3, 4, 5}
+    assert resultado['dia_restringido'] and resultado['semana_restringida']
+
+
+def test_parsear_paso_desde_un_valor():
+    assert cron.parsear("5/20 * * * *")['minutos'] == {5, 25, 45}
+
+
+def test_siete_es_domingo():
+    assert cron.parsear("0 0 * * 7")['dias_semana'] == {0}
+
+
+@pytest.mark.parametrize('expresion', [
+    "* * * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "* * * 13 *",
+    "*/0 * * * *",
+    "5-1 * * * *",
+    "a * * * *",
+])
+def test_parsear_invalidas(expresion):
+    with pytest.raises(ValueError):
+        cron.parsear(expresion)
+
+
+def test_siguiente_es_posterior_y_al_minuto():
+    desde = datetime(2024, 5, 10, 12, 0, 30)
+    assert cron.siguiente("* * * * *", desde) == datetime(2024, 5, 10, 12, 1)
+    assert cron.siguiente("*/15 * * * *", datetime(2024, 5, 10, 12, 15)) == datetime(2024, 5, 10, 12, 30)
+
+
+def test_siguiente_cambia_de_dia_mes_y_año():
+    assert cron.siguiente("30 2 * * *", datetime(2024, 5, 10, 3, 0)) == datetime(2024, 5, 11, 2, 30)
+    assert cron.siguiente("0 0 1 * *", datetime(2024, 5, 10)) == datetime(2024, 6, 1)
+    assert cron.siguiente("0 0 1 1 *", datetime(2024, 12, 31, 23, 59)) == datetime(2025, 1, 1)
+
+
+def test_siguiente_29_de_febrero():
+    assert cron.siguiente("0 12 29 2 *", datetime(2025, 3, 1)) == datetime(2028, 2, 29, 12)
+
+
+def test_siguiente_dia_de_semana():
+    # 2024-05-10 es viernes
+    assert cron.siguiente("0 9 * * 1", datetime(2024, 5, 10)) == datetime(2024, 5, 13, 9)
+    assert cron.siguiente("0 9 * * 0", datetime(2024, 5, 10)) == datetime(2024, 5, 12, 9)
+
+
+def test_siguiente_dia_del_mes_o_de_la_semana():
+    # Con ambos campos restringidos basta con que coincida uno
+    desde = datetime(2024, 5, 10)
+    assert cron.siguiente("0 0 20 * 1", desde) == datetime(2024, 5, 13)
+    assert cron.siguiente("0 0 11 * 1", desde) == datetime(2024, 5, 11)
+
+
+def test_siguiente_nunca_ocurre():
+    with pytest.raises(ValueError):
+        cron.siguiente("0 0 31 2 *", datetime(2024, 1, 1))
@@ -0,0 +1,102 @@
+"""
+Paginación por cursor (timestamp, _id): cada elemento aparece una sola vez
+y en orden aunque varios compartan timestamp o estén en particiones distintas
+"""
+
+from datetime import datetime, timedelta
+import pytest
+
+pytest.importorskip('pymongo')
+pytest.importorskip('redis')
+
+from bson import ObjectId
+from services.mensaje_service import _codificar_cursor, _filtro_cursor
+from services.sensor_service import SensorService
+from utils import particiones
+
+BASE = datetime(2024, 1, 31, 23, 58)
+
+
+def _paginas(leer, limite):
+    """Recorre todas las páginas; leer(cursor, limite) -> (elementos, siguiente)"""
+    vistos, cursor = [], None
+    while True:
+        pagina, cursor = leer(cursor, limite)
+        vistos.extend(pagina)
+        if not cursor:
+            return vistos
+
+
+def _mensajes(campo_id='_id'):
+    # Tres timestamps, con empates, insertados desordenados
+    timestamps = [BASE + timedelta(minutes=i % 3) for i in range(10)]
+    return [{campo_id: ObjectId(), 'timestamp': ts} for ts in timestamps]
+
+
+def test_filtro_cursor_vacio():
+    assert _filtro_cursor(None) == {}
+    assert _filtro_cursor('') == {}
+
+
+@pytest.mark.parametrize('campo_id', ['_id', 'mensaje_id'])
+@pytest.mark.parametrize('limite', [1, 3, 4, 10])
+def test_filtro_cursor_recorre_todo(bases, campo_id, limite):
+    db, _ = bases
+    db.bandeja.insert_many(_mensajes(campo_id))
+    orden = [('timestamp', -1), (campo_id, -1)]
+
+    def leer(cursor, limite):
+        pagina = list(db.bandeja.find(_filtro_cursor(cursor, campo_id)).sort(orden).limit(limite))
+        if len(pagina) < limite:
+            return pagina, None
+        ultimo = pagina[-1]
+        return pagina, _codificar_cursor({'timestamp': ultimo['timestamp'], '_id': ultimo[campo_id]})
+
+    esperados = list(db.bandeja.find().sort(orden))
+    assert _paginas(leer, limite) == esperados
+
+
+def _cargar_mediciones(db, sensor_id=1, otro_sensor=2):
+    """Mediciones a ambos lados de un cambio de mes, con timestamps repetidos"""
+    mediciones = []
+    for i in range(12):
+        timestamp = BASE + timedelta(minutes=i % 4)
+        for sensor in (sensor_id, otro_sensor):
+            medicion = {'_id': ObjectId(), 'sensor_id': sensor, 'timestamp': timestamp,
+                        'temperatura': 20.0, 'humedad': 50.0}
+            db[particiones.nombre_particion(timestamp)].insert_one(medicion)
+            if sensor == sensor_id:
+                mediciones.append(medicion)
+    mediciones.sort(key=lambda m: (m['timestamp'], m['_id']), reverse=True)
+    return mediciones
+
+
+@pytest.mark.parametrize('limite', [1, 5, 12])
+def test_listar_mediciones_recorre_particiones(bases, limite):
+    db, _ = bases
+    esperadas = _cargar_mediciones(db)
+    assert len({particiones.nombre_particion(m['timestamp']) for m in esperadas}) == 2
+
+    vistas = _paginas(
+        lambda cursor, limite: SensorService.listar_mediciones(1, limite=limite, cursor_pagina=cursor),
+        limite
+    )
+    assert [m['_id'] for m in vistas] == [m['_id'] for m in esperadas]
+
+
+def test_listar_mediciones_con_rango(bases):
+    db, _ = bases
+    desde, hasta = BASE + timedelta(minutes=1), BASE + timedelta(minutes=2)
+    esperadas = [m for m in _cargar_mediciones(db) if desde <= m['timestamp'] <= hasta]
+
+    vistas = _paginas(
+        lambda cursor, limite: SensorService.listar_mediciones(1, desde, hasta, limite, cursor),
+        2
+    )
+    assert [m['_id'] for m in vistas] == [m['_id'] for m in esperadas]
+
+
+@pytest.mark.parametrize('cursor', ['no-es-base64!', 'c2luLXNlcGFyYWRvcg==', 'eHx5', 'MjAyNC0wMS0wMXx4eXo='])
+def test_listar_mediciones_cursor_invalido(cursor):
+    with pytest.raises(ValueError):
+        SensorService.listar_mediciones(1, cursor_pagina=cursor)
@@ -0,0 +1,55 @@
+"""
+Lock del ciclo de facturación: cada worker libera solo el lock que tomó
+"""
+
+import pytest
+
+pytest.importorskip('mysql.connector')
+
+from services import facturacion_service
+from services.facturacion_service import FacturacionService, CLAVE_LOCK_CICLO
+
+
+class CursorSinSolicitudes:
+    """Cursor sin solicitudes por facturar; al consultar ejecuta el efecto dado"""
+
+    def __init__(self, efecto):
+        self.efecto = efecto
+
+    def execute(self, consulta, parametros=None):
+        self.efecto()
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def ciclo(lua, monkeypatch):
+    """Ejecuta facturar_ciclo corriendo efecto() en medio del ciclo"""
+    _, redis_client = lua
+    monkeypatch.setattr(facturacion_service.db_manager, 'commit_mysql', lambda: None)
+    monkeypatch.setattr(facturacion_service.db_manager, 'rollback_mysql', lambda: None)
+
+    def ejecutar(efecto=lambda: None):
+        monkeypatch.setattr(facturacion_service.db_manager, 'get_mysql_cursor',
+                            lambda *a, **k: CursorSinSolicitudes(efecto))
+        return FacturacionService.facturar_ciclo()
+    return redis_client, ejecutar
+
+
+def test_libera_su_lock(ciclo):
+    redis_client, ejecutar = ciclo
+    assert ejecutar()[0]
+    assert not redis_client.exists(CLAVE_LOCK_CICLO)
+
+
+def test_no_libera_el_lock_de_otro_worker(ciclo):
+    redis_client, ejecutar = ciclo
+
+    # El lock vence a mitad del ciclo y lo toma otro worker
+    assert ejecutar(lambda: redis_client.set(CLAVE_LOCK_CICLO, "otro-worker"))[0]
+    assert redis_client.get(CLAVE_LOCK_CICLO) == "otro-worker"
+    assert not ejecutar()[0]
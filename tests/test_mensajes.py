@@ -0,0 +1,129 @@
+"""
+Lectura de mensajes: con Redis caído la membresía y los nombres de los
+grupos salen de MySQL (cursor simulado), y al pasar un grupo a fan-out
+la bandeja sigue mostrando todo su historial
+"""
+
+from datetime import datetime, timedelta
+import pytest
+
+pytest.importorskip('pymongo')
+redis = pytest.importorskip('redis')
+
+from services import mensaje_service
+from services.mensaje_service import MensajeService
+
+
+class CursorMySQL:
+    """Cursor que responde según la tabla consultada"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.resultado = []
+
+    def execute(self, consulta, parametros=None):
+        tabla = next(t for t in self.filas if f"FROM {t} " in consulta + " ")
+        self.resultado = self.filas[tabla]
+
+    def fetchall(self):
+        return list(self.resultado)
+
+    def fetchone(self):
+        return self.resultado[0] if self.resultado else None
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def mysql(bases, monkeypatch):
+    """Grupo 7 con los usuarios 1 y 2"""
+    filas = {
+        'grupos_miembros': [{'grupo_id': 7, 'usuario_id': 1}, {'grupo_id': 7, 'usuario_id': 2}],
+        'grupos': [{'id': 7, 'nombre': "Técnicos"}],
+        'usuarios': [{'id': 2, 'nombre_completo': "Ana", 'email': "ana@ejemplo.com"}],
+    }
+    monkeypatch.setattr(mensaje_service.db_manager, 'get_mysql_cursor', lambda *a, **k: CursorMySQL(filas))
+    return bases[0]
+
+
+@pytest.fixture
+def redis_caido(mysql, monkeypatch):
+    db = mysql
+
+    def caido():
+        raise redis.ConnectionError("redis no responde")
+    monkeypatch.setattr(mensaje_service.db_manager, 'conectar_redis', caido)
+    monkeypatch.setattr(mensaje_service._cache_usuarios, 'obtener', lambda clave: None)
+    return db
+
+
+def test_recibidos_sin_redis(redis_caido):
+    ahora = datetime.now()
+    redis_caido.mensajes.insert_many([
+        {'remitente_id': 2, 'destinatario_id': None, 'grupo_id': 7, 'timestamp': ahora,
+         'contenido': "grupal", 'tipo': 'grupal'},
+        {'remitente_id': 2, 'destinatario_id': 1, 'grupo_id': None, 'timestamp': ahora - timedelta(minutes=1),
+         'contenido': "privado", 'tipo': 'privado', 'leido': False},
+    ])
+
+    mensajes = MensajeService.listar_mensajes_recibidos(1)
+    assert [m['contenido'] for m in mensajes] == ["grupal", "privado"]
+    assert mensajes[0]['grupo_nombre'] == "Técnicos"
+    assert mensajes[1]['remitente_nombre'] == "Ana"
+
+
+def test_enviados_sin_redis(redis_caido):
+    redis_caido.mensajes.insert_one({
+        'remitente_id': 1, 'destinatario_id': None, 'grupo_id': 7, 'timestamp': datetime.now(),
+        'contenido': "grupal", 'tipo': 'grupal'
+    })
+
+    mensajes = MensajeService.listar_mensajes_enviados(1)
+    assert [m['grupo_nombre'] for m in mensajes] == ["Técnicos"]
+
+
+def _recorrer_bandeja(usuario_id, limite):
+    vistos, cursor = [], None
+    while True:
+        pagina = MensajeService.listar_mensajes_recibidos(usuario_id, limite, cursor)
+        vistos.extend(pagina)
+        cursor = MensajeService.siguiente_cursor(pagina, limite)
+        if not cursor:
+            return vistos
+
+
+def test_paso_a_fanout_conserva_el_historial(mysql, monkeypatch):
+    monkeypatch.setitem(mensaje_service.MENSAJERIA_CONFIG, 'fanout_habilitado', True)
+    monkeypatch.setitem(mensaje_service.MENSAJERIA_CONFIG, 'fanout_min_miembros', 2)
+    inicio = datetime.now() - timedelta(days=1)
+    mysql.mensajes.insert_many([
+        {'remitente_id': 2, 'destinatario_id': None, 'grupo_id': 7, 'timestamp': inicio + timedelta(seconds=i),
+         'contenido': f"anterior {i}", 'tipo': 'grupal'}
+        for i in range(250)
+    ])
+
+    assert MensajeService.enviar_mensaje_grupal(2, 7, "primero con fan-out")[0]
+    assert 7 in MensajeService._grupos_con_fanout([7])
+    assert MensajeService.enviar_mensaje_grupal(2, 7, "segundo con fan-out")[0]
+    assert mysql.bandeja_entrada.count_documents({'usuario_id': 1}) == 2
+
+    mensajes = _recorrer_bandeja(1, 40)
+    contenidos = [m['contenido'] for m in mensajes]
+    assert len(contenidos) == 252 == len({m['_id'] for m in mensajes})
+    assert contenidos[:2] == ["segundo con fan-out", "primero con fan-out"]
+    assert contenidos[-1] == "anterior 0"
+
+
+def test_nuevo_miembro_recibe_lo_posterior_al_fanout(mysql, monkeypatch):
+    monkeypatch.setitem(mensaje_service.MENSAJERIA_CONFIG, 'fanout_habilitado', True)
+    monkeypatch.setitem(mensaje_service.MENSAJERIA_CONFIG, 'fanout_min_miembros', 2)
+    mysql.mensajes.insert_one({'remitente_id': 2, 'destinatario_id': None, 'grupo_id': 7,
+                               'timestamp': datetime.now() - timedelta(hours=1),
+                               'contenido': "anterior", 'tipo': 'grupal'})
+    MensajeService.enviar_mensaje_grupal(2, 7, "con fan-out")
+
+    desde = MensajeService._grupos_con_fanout([7])[7]
+    MensajeService._copiar_historial(mysql, 7, [3], desde)
+    copiados = list(mysql.bandeja_entrada.find({'usuario_id': 3}))
+    assert [c['leido'] for c in copiados] == [True]
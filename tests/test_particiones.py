@@ -0,0 +1,44 @@
+from datetime import datetime
+import pytest
+from utils import particiones
+
+
+class BaseContada:
+    """Base que cuenta los list_collection_names"""
+
+    def __init__(self, nombres):
+        self.nombres = nombres
+        self.listados = 0
+
+    def list_collection_names(self):
+        self.listados += 1
+        return list(self.nombres)
+
+
+def _envejecer(segundos):
+    particiones._particiones['leido'] -= segundos
+
+
+@pytest.mark.parametrize('habilitado, listados', [(True, 2), (False, 1)])
+def test_relectura_sin_mes_actual(monkeypatch, habilitado, listados):
+    monkeypatch.setitem(particiones.PARTICIONES_CONFIG, 'habilitado', habilitado)
+    db = BaseContada(['mediciones', 'mediciones_200001'])
+
+    particiones._listar_particiones(db)
+    _envejecer(particiones._TTL_SIN_MES_ACTUAL + 1)
+    particiones._listar_particiones(db)
+    assert db.listados == listados
+
+    _envejecer(particiones._TTL_LISTADO + 1)
+    particiones._listar_particiones(db)
+    assert db.listados == listados + 1
+
+
+def test_con_mes_actual_vale_el_ttl_normal(monkeypatch):
+    monkeypatch.setitem(particiones.PARTICIONES_CONFIG, 'habilitado', True)
+    db = BaseContada([particiones.nombre_particion(datetime.now())])
+
+    particiones._listar_particiones(db)
+    _envejecer(particiones._TTL_SIN_MES_ACTUAL + 1)
+    assert particiones._listar_particiones(db) == [particiones.nombre_particion(datetime.now())]
+    assert db.listados == 1
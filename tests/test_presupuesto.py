@@ -0,0 +1,67 @@
+import time
+import pytest
+from utils import presupuesto
+
+
+def test_sin_presupuesto_no_limita():
+    presupuesto.verificar()
+    assert presupuesto.restante_ms() is None
+    assert presupuesto.opciones_mongo() == {}
+    assert presupuesto.hint_mysql() == ""
+
+
+def test_tiempo_restante(bases):
+    with presupuesto.limitar(1, 30):
+        ms = presupuesto.restante_ms()
+        assert 0 < ms <= 30000
+        assert 0 < presupuesto.opciones_mongo()['maxTimeMS'] <= 30000
+        assert presupuesto.hint_mysql().startswith("/*+ MAX_EXECUTION_TIME(")
+    assert presupuesto.restante_ms() is None
+
+
+def test_tiempo_agotado(bases):
+    with presupuesto.limitar(1, 0):
+        with pytest.raises(presupuesto.TiempoAgotado):
+            presupuesto.verificar()
+        with pytest.raises(presupuesto.TiempoAgotado):
+            presupuesto.opciones_mongo()
+
+
+def test_cancelacion(bases):
+    _, redis_client = bases
+    with presupuesto.limitar(7, 30):
+        presupuesto.verificar()
+        redis_client.set(presupuesto.clave_cancelacion(7), 1)
+        with pytest.raises(presupuesto.ProcesoCancelado):
+            presupuesto.verificar()
+        # La marca es de una solicitud: no afecta a otra
+        with presupuesto.limitar(8, 30):
+            presupuesto.verificar()
+
+
+def test_presupuestos_anidados(bases):
+    with presupuesto.limitar(1, 30):
+        with presupuesto.limitar(2, 0):
+            time.sleep(0.001)
+            with pytest.raises(presupuesto.TiempoAgotado):
+                presupuesto.verificar()
+        presupuesto.verificar()
+
+
+def test_segundos_por_tipo(monkeypatch):
+    monkeypatch.setitem(presupuesto.PROCESOS_CONFIG, 'presupuesto_segundos', {'informe': 120})
+    monkeypatch.setitem(presupuesto.PROCESOS_CONFIG, 'presupuesto_defecto', 60)
+    assert presupuesto.segundos_para('informe') == 120
+    assert presupuesto.segundos_para('otro') == 60
+
+
+def test_es_timeout():
+    pytest.importorskip('mysql.connector')
+    errores = pytest.importorskip('pymongo.errors')
+    from mysql.connector import errorcode, errors
+
+    assert presupuesto.es_timeout(presupuesto.TiempoAgotado("x"))
+    assert presupuesto.es_timeout(errores.ExecutionTimeout("x"))
+    assert presupuesto.es_timeout(errors.DatabaseError(errno=errorcode.ER_QUERY_TIMEOUT))
+    assert not presupuesto.es_timeout(errors.DatabaseError(errno=errorcode.ER_DUP_ENTRY))
+    assert not presupuesto.es_timeout(ValueError("x"))
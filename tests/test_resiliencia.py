@@ -0,0 +1,165 @@
+import pytest
+from utils import resiliencia
+
+
+def _caido():
+    raise ConnectionError("sin respuesta")
+
+
+def _ok():
+    pass
+
+
+@pytest.fixture
+def config(monkeypatch):
+    for clave, valor in {'fallas_para_abrir': 3, 'verificar_segundos': 5,
+                         'espera_base_segundos': 2, 'espera_maxima_segundos': 60}.items():
+        monkeypatch.setitem(resiliencia.RESILIENCIA_CONFIG, clave, valor)
+
+
+def _vencer_espera(circuito):
+    circuito.reintento_en = 0.0
+
+
+def test_abre_tras_fallas_seguidas(config):
+    circuito = resiliencia.circuito('mongodb')
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            circuito.verificar(_caido)
+        assert circuito.estado == resiliencia.CERRADO
+
+    with pytest.raises(ConnectionError):
+        circuito.verificar(_caido)
+    assert circuito.estado == resiliencia.ABIERTO
+    assert 1 <= circuito.restante() <= 2
+    assert resiliencia.caidos(['mongodb', 'redis']) == ['mongodb']
+
+
+def test_abierto_no_toca_la_base(config):
+    circuito = resiliencia.circuito('redis')
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            circuito.verificar(_caido)
+
+    llamadas = []
+    with pytest.raises(resiliencia.CircuitoAbierto) as error:
+        circuito.verificar(lambda: llamadas.append(1))
+    assert llamadas == []
+    assert error.value.motor == 'redis'
+    assert not resiliencia.es_error_de_conexion(error.value)
+
+
+def test_exito_reinicia_las_fallas(config):
+    circuito = resiliencia.circuito('mysql')
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            circuito.verificar(_caido)
+    circuito.verificar(_ok)
+    assert circuito.fallas == 0
+
+    with pytest.raises(ConnectionError):
+        circuito.verificar(_caido, forzar=True)
+    assert circuito.estado == resiliencia.CERRADO
+
+
+def test_verificacion_periodica(config):
+    circuito = resiliencia.circuito('mysql')
+    llamadas = []
+    circuito.verificar(lambda: llamadas.append(1))
+    circuito.verificar(lambda: llamadas.append(1))
+    assert llamadas == [1]
+    circuito.verificar(lambda: llamadas.append(1), forzar=True)
+    assert llamadas == [1, 1]
+
+
+def test_prueba_semiabierta(config):
+    circuito = resiliencia.circuito('mongodb')
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            circuito.verificar(_caido)
+
+    # La prueba falla: se reabre con el doble de espera
+    _vencer_espera(circuito)
+    with pytest.raises(ConnectionError):
+        circuito.verificar(_caido)
+    assert circuito.estado == resiliencia.ABIERTO
+    assert circuito.aperturas == 2
+    assert 2 <= circuito.restante() <= 4
+
+    # La prueba sale bien: se cierra
+    _vencer_espera(circuito)
+    circuito.verificar(_ok)
+    assert circuito.estado == resiliencia.CERRADO
+    assert circuito.aperturas == 0
+    assert resiliencia.caidos(['mongodb']) == []
+
+
+def test_una_sola_prueba_a_la_vez(config):
+    circuito = resiliencia.circuito('redis')
+    circuito.estado = resiliencia.SEMIABIERTO
+    with pytest.raises(resiliencia.CircuitoAbierto):
+        circuito.verificar(_ok)
+
+
+def test_espera_maxima(config, monkeypatch):
+    monkeypatch.setitem(resiliencia.RESILIENCIA_CONFIG, 'espera_maxima_segundos', 3)
+    circuito = resiliencia.circuito('mysql')
+    circuito.aperturas = 10
+    circuito.fallas = 2
+    circuito._falla(ConnectionError("x"))
+    assert circuito.restante() <= 3
+
+
+def test_reportar_error_solo_cuenta_conexion(config):
+    for _ in range(3):
+        resiliencia.reportar_error('mysql', ValueError("consulta inválida"))
+    assert resiliencia.circuito('mysql').fallas == 0
+
+    for _ in range(3):
+        resiliencia.reportar_error('mysql', TimeoutError("timeout"))
+    assert resiliencia.circuito('mysql').estado == resiliencia.ABIERTO
+
+
+def test_errores_de_conexion_de_drivers():
+    pytest.importorskip('mysql.connector')
+    pytest.importorskip('pymongo')
+    pytest.importorskip('redis')
+    from mysql.connector import errors
+    from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+    import redis
+
+    assert resiliencia.es_error_de_conexion(ServerSelectionTimeoutError("x"))
+    assert resiliencia.es_error_de_conexion(redis.ConnectionError("x"))
+    assert resiliencia.es_error_de_conexion(errors.OperationalError(errno=2013))
+    assert resiliencia.es_error_de_conexion(errors.InterfaceError(errno=2003))
+    assert not resiliencia.es_error_de_conexion(errors.ProgrammingError(errno=1064))
+    assert not resiliencia.es_error_de_conexion(OperationFailure("x"))
+    assert not resiliencia.es_error_de_conexion(redis.ResponseError("x"))
+
+
+def test_relanzar_caida_solo_si_se_pide():
+    resiliencia.relanzar_caida(ConnectionError("x"))
+    with resiliencia.propagar_caidas():
+        resiliencia.relanzar_caida(ValueError("x"))
+        with pytest.raises(resiliencia.CircuitoAbierto):
+            resiliencia.relanzar_caida(resiliencia.CircuitoAbierto('redis', 1))
+        with pytest.raises(ConnectionError):
+            resiliencia.relanzar_caida(ConnectionError("x"))
+    resiliencia.relanzar_caida(ConnectionError("x"))
+
+
+def test_respaldos(monkeypatch):
+    monkeypatch.setattr(resiliencia, 'CAPACIDAD_RESPALDOS', 2)
+    assert resiliencia.respaldo('a') is None
+    assert resiliencia.guardar_respaldo('a', 1) == 1
+    resiliencia.guardar_respaldo('b', 2)
+    resiliencia.guardar_respaldo('a', 3)
+    resiliencia.guardar_respaldo('c', 4)
+
+    # Se descarta el menos usado
+    assert resiliencia.respaldo('b') is None
+    assert resiliencia.respaldo('a')[0] == 3
+    assert resiliencia.respaldo('c')[0] == 4
+
+    resiliencia.reiniciar()
+    assert resiliencia.respaldo('a') is None
@@ -6,8 +6,12 @@ Funciones administrativas del sistema (solo administradores)
 from services.ejecucion_service import EjecucionService
 from services.auth_service import AuthService
 from services.proceso_service import ProcesoService
+from services.facturacion_service import FacturacionService
+from services.snapshot_service import SnapshotService
+from config.db_config import FACTURACION_CONFIG
 from utils.menu import *
 from utils.db_manager import db_manager
+from utils import cola_procesos, instrumentacion
 from colorama import Fore
 
 
@@ -29,7 +33,14 @@ class AdminMenu:
             # Mostrar procesos pendientes
             pendientes_ids = ProcesoService.obtener_procesos_pendientes(10)
             
-            print(f"{Fore.YELLOW}Procesos en cola: {len(pendientes_ids)}\n")
+            metricas = cola_procesos.metricas()
+            total = sum(m['solicitudes'] for m in metricas.values())
+            print(f"{Fore.YELLOW}Procesos en cola: {total}")
+            for prioridad, m in metricas.items():
+                p95 = f"{m['espera_p95']:.1f}s" if m['espera_p95'] is not None else "-"
+                print(f"  {prioridad:<12} {m['solicitudes']:>4} solicitudes  "
+                      f"{m['usuarios']:>3} usuarios  espera máx {m['espera_maxima']:.0f}s  p95 {p95}")
+            print()
             
             if pendientes_ids:
                 cursor = db_manager.get_mysql_cursor()
@@ -54,6 +65,7 @@ class AdminMenu:
             opciones = [
                 (1, "Ejecutar Siguiente Proceso"),
                 (2, "Ejecutar TODOS los Procesos"),
+                (3, "Ejecutar Ciclo de Facturación"),
             ]
             
             seleccion = mostrar_menu("EJECUTAR PROCESOS PENDIENTES", opciones)
@@ -64,6 +76,8 @@ class AdminMenu:
                 self.ejecutar_un_proceso()
             elif seleccion == '2':
                 self.ejecutar_todos_procesos()
+            elif seleccion == '3':
+                self.ejecutar_ciclo_facturacion()
             else:
                 mostrar_error("Opción inválida")
                 pausar()
@@ -79,7 +93,27 @@ class AdminMenu:
         
         if success:
             mostrar_exito(mensaje)
-            mostrar_info("Factura generada automáticamente")
+            if FACTURACION_CONFIG['modo'] == 'inmediato':
+                mostrar_info("Factura generada automáticamente")
+            else:
+                mostrar_info("Se facturará en el próximo ciclo de facturación")
+        else:
+            mostrar_error(mensaje)
+        
+        pausar()
+    
+    def ejecutar_ciclo_facturacion(self):
+        """Emite las facturas del período sin esperar al worker"""
+        limpiar_pantalla()
+        mostrar_subtitulo("CICLO DE FACTURACIÓN")
+        
+        if not confirmar("¿Facturar ahora todas las solicitudes completadas pendientes?"):
+            return
+        
+        success, mensaje, _ = FacturacionService.facturar_ciclo()
+        
+        if success:
+            mostrar_exito(mensaje)
         else:
             mostrar_error(mensaje)
         
@@ -163,6 +197,9 @@ class AdminMenu:
                 (3, "Estadísticas de Mediciones"),
                 (4, "Estadísticas de Procesos"),
                 (5, "Estadísticas Financieras"),
+                (6, "Regenerar Indicadores"),
+                (7, "Métricas de Consultas"),
+                (8, "Estado de Conexiones"),
             ]
             
             seleccion = mostrar_menu("REPORTES DEL SISTEMA", opciones)
@@ -179,6 +216,12 @@ class AdminMenu:
                 self.reporte_procesos()
             elif seleccion == '5':
                 self.reporte_financiero()
+            elif seleccion == '6':
+                self.regenerar_indicadores()
+            elif seleccion == '7':
+                self.metricas_consultas()
+            elif seleccion == '8':
+                self.estado_conexiones()
             else:
                 mostrar_error("Opción inválida")
                 pausar()
@@ -188,78 +231,46 @@ class AdminMenu:
         limpiar_pantalla()
         mostrar_titulo("RESUMEN GENERAL DEL SISTEMA")
         
-        cursor = db_manager.get_mysql_cursor()
-        db = db_manager.conectar_mongodb()
-        
-        # Usuarios
-        cursor.execute("SELECT COUNT(*) as total FROM usuarios WHERE estado = 'activo'")
-        total_usuarios = cursor.fetchone()['total']
-        
-        # Sensores
-        cursor.execute("SELECT COUNT(*) as total FROM sensores")
-        total_sensores = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM sensores WHERE estado = 'activo'")
-        sensores_activos = cursor.fetchone()['total']
-        
-        # Procesos
-        cursor.execute("SELECT COUNT(*) as total FROM solicitudes_proceso")
-        total_solicitudes = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM solicitudes_proceso WHERE estado = 'pendiente'")
-        solicitudes_pendientes = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM solicitudes_proceso WHERE estado = 'completado'")
-        solicitudes_completadas = cursor.fetchone()['total']
-        
-        # Facturas
-        cursor.execute("SELECT COUNT(*) as total, COALESCE(SUM(monto_total), 0) as monto FROM facturas")
-        facturas_data = cursor.fetchone()
-        
-        cursor.execute("SELECT COUNT(*) as total, COALESCE(SUM(monto_total), 0) as monto FROM facturas WHERE estado = 'pendiente'")
-        facturas_pendientes = cursor.fetchone()
-        
-        cursor.close()
-        
-        # Mediciones
-        total_mediciones = db.mediciones.count_documents({})
-        
-        # Alertas
-        alertas_activas = db.alertas.count_documents({'estado': 'activa'})
+        snapshot = SnapshotService.obtener()
+        if not snapshot:
+            mostrar_error("Los indicadores no están disponibles")
+            pausar()
+            return
         
-        # Mensajes
-        total_mensajes = db.mensajes.count_documents({})
+        por_estado = snapshot['solicitudes_por_estado']
+        sensores_activos = snapshot['sensores_por_estado'].get('activo', 0)
         
         # Mostrar reporte
         print(f"\n{Fore.CYAN}{'=' * 60}")
         print(f"{Fore.GREEN}USUARIOS:")
-        print(f"  Total usuarios activos: {total_usuarios}")
+        print(f"  Total usuarios activos: {snapshot['usuarios_activos']}")
         
         print(f"\n{Fore.GREEN}SENSORES:")
-        print(f"  Total sensores: {total_sensores}")
+        print(f"  Total sensores: {snapshot['sensores_total']}")
         print(f"  Activos: {sensores_activos}")
-        print(f"  Inactivos/Falla: {total_sensores - sensores_activos}")
+        print(f"  Inactivos/Falla: {snapshot['sensores_total'] - sensores_activos}")
         
         print(f"\n{Fore.GREEN}MEDICIONES:")
-        print(f"  Total mediciones registradas: {total_mediciones:,}")
+        print(f"  Total mediciones registradas: {snapshot['mediciones_total']:,}")
         
         print(f"\n{Fore.GREEN}PROCESOS:")
-        print(f"  Total solicitudes: {total_solicitudes}")
-        print(f"  Pendientes: {solicitudes_pendientes}")
-        print(f"  Completadas: {solicitudes_completadas}")
+        print(f"  Total solicitudes: {snapshot['solicitudes_total']}")
+        print(f"  Pendientes: {por_estado.get('pendiente', 0)}")
+        print(f"  Completadas: {por_estado.get('completado', 0)}")
         
         print(f"\n{Fore.GREEN}FACTURACIÓN:")
-        print(f"  Total facturas: {facturas_data['total']}")
-        print(f"  Monto total facturado: ${facturas_data['monto']:.2f}")
-        print(f"  Facturas pendientes: {facturas_pendientes['total']} (${facturas_pendientes['monto']:.2f})")
+        print(f"  Total facturas: {snapshot['facturas_total']}")
+        print(f"  Monto total facturado: ${snapshot['facturas_monto']:.2f}")
+        print(f"  Facturas pendientes: {snapshot['facturas_pendientes']} (${snapshot['facturas_monto_pendiente']:.2f})")
         
         print(f"\n{Fore.GREEN}ALERTAS:")
-        print(f"  Alertas activas: {alertas_activas}")
+        print(f"  Alertas activas: {snapshot['alertas_activas']}")
         
         print(f"\n{Fore.GREEN}MENSAJERÍA:")
-        print(f"  Total mensajes: {total_mensajes}")
+        print(f"  Total mensajes: {snapshot['mensajes_total']}")
         
-        print(f"{Fore.CYAN}{'=' * 60}\n")
+        print(f"{Fore.CYAN}{'=' * 60}")
+        print(f"Datos al {snapshot['generado_en']:%d/%m/%Y %H:%M:%S}\n")
         
         pausar()
     
@@ -306,51 +317,102 @@ class AdminMenu:
         limpiar_pantalla()
         mostrar_titulo("ESTADÍSTICAS DE MEDICIONES")
         
-        db = db_manager.conectar_mongodb()
-        
-        # Total
-        total = db.mediciones.count_documents({})
-        
-        # Por ciudad (top 10)
-        pipeline = [
-            {
-                '$group': {
-                    '_id': '$ciudad',
-                    'total': {'$sum': 1}
-                }
-            },
-            {'$sort': {'total': -1}},
-            {'$limit': 10}
-        ]
-        
-        por_ciudad = list(db.mediciones.aggregate(pipeline))
-        
-        # Promedios generales
-        pipeline = [
-            {
-                '$group': {
-                    '_id': None,
-                    'temp_promedio': {'$avg': '$temperatura'},
-                    'hum_promedio': {'$avg': '$humedad'}
-                }
-            }
-        ]
-        
-        promedios = list(db.mediciones.aggregate(pipeline))
+        snapshot = SnapshotService.obtener()
+        if not snapshot:
+            mostrar_error("Los indicadores no están disponibles")
+            pausar()
+            return
         
-        print(f"\n{Fore.GREEN}Total mediciones: {total:,}\n")
+        print(f"\n{Fore.GREEN}Total mediciones: {snapshot['mediciones_total']:,}\n")
         
-        if promedios:
+        if snapshot['temperatura_promedio'] is not None:
             print(f"{Fore.YELLOW}Promedios Generales:")
-            print(f"  Temperatura: {promedios[0]['temp_promedio']:.2f}°C")
-            print(f"  Humedad: {promedios[0]['hum_promedio']:.2f}%\n")
+            print(f"  Temperatura: {snapshot['temperatura_promedio']:.2f}°C")
+            print(f"  Humedad: {snapshot['humedad_promedio']:.2f}%\n")
         
-        if por_ciudad:
+        if snapshot['mediciones_por_ciudad']:
             print(f"{Fore.YELLOW}Top 10 Ciudades con más mediciones:")
             headers = ['Ciudad', 'Total Mediciones']
-            filas = [[c['_id'], f"{c['total']:,}"] for c in por_ciudad]
+            filas = [[ciudad, f"{total:,}"] for ciudad, total in snapshot['mediciones_por_ciudad'].items()]
             mostrar_tabla(headers, filas)
         
+        mostrar_info(f"Datos al {snapshot['generado_en']:%d/%m/%Y %H:%M:%S}")
+        pausar()
+    
+    def regenerar_indicadores(self):
+        """Recalcula el snapshot de indicadores sin esperar al worker"""
+        limpiar_pantalla()
+        mostrar_subtitulo("REGENERAR INDICADORES")
+        
+        success, mensaje = SnapshotService.generar()
+        
+        if success:
+            mostrar_exito(mensaje)
+        else:
+            mostrar_error(mensaje)
+        
+        pausar()
+    
+    def metricas_consultas(self):
+        """Consultas por operación y tiempo por llamada a bases de datos (de esta sesión)"""
+        limpiar_pantalla()
+        mostrar_titulo("MÉTRICAS DE CONSULTAS")
+        
+        metricas = instrumentacion.resumen()
+        if not metricas['llamadas']:
+            mostrar_info("Todavía no se registraron consultas (o la instrumentación está deshabilitada)")
+            pausar()
+            return
+        
+        # Un N+1 aparece como muchas consultas por llamada
+        print(f"{Fore.YELLOW}Operaciones con más consultas por llamada:")
+        operaciones = sorted(metricas['operaciones'], key=lambda o: o['consultas_por_llamada'], reverse=True)[:15]
+        headers = ['Operación', 'Llamadas', 'Consultas/llamada', 'Máximo']
+        filas = [
+            [o['origen'], o['llamadas'], f"{o['consultas_por_llamada']:.1f}", o['maximo_consultas']]
+            for o in operaciones
+        ]
+        mostrar_tabla(headers, filas)
+        
+        print(f"\n{Fore.YELLOW}Consultas con más tiempo acumulado:")
+        llamadas = sorted(metricas['llamadas'], key=lambda l: l['segundos'], reverse=True)[:15]
+        headers = ['Motor', 'Operación', 'Origen', 'Llamadas', 'Total (ms)', 'Prom. (ms)', 'Resultados', 'Errores']
+        filas = [
+            [l['motor'], l['operacion'], l['origen'], l['llamadas'],
+             f"{l['segundos'] * 1000:.1f}", f"{l['segundos'] * 1000 / l['llamadas']:.2f}",
+             l['resultados'], l['errores']]
+            for l in llamadas
+        ]
+        mostrar_tabla(headers, filas)
+        
+        pausar()
+    
+    def estado_conexiones(self):
+        """Ping a cada base y estado de los circuitos de este proceso"""
+        limpiar_pantalla()
+        mostrar_titulo("ESTADO DE CONEXIONES")
+        
+        salud = db_manager.verificar_salud()
+        circuitos = salud.pop('circuitos')
+        
+        headers = ['Motor', 'Estado', 'Latencia (ms)', 'Circuito', 'Fallas', 'Reintento en (s)']
+        filas = []
+        for motor, resultado in salud.items():
+            circuito = circuitos.get(motor, {})
+            filas.append([
+                motor,
+                f"{Fore.GREEN}OK" if resultado['ok'] else f"{Fore.RED}CAÍDO",
+                resultado.get('latencia_ms', '-'),
+                circuito.get('estado', '-'),
+                circuito.get('fallas', 0),
+                circuito.get('reintento_en_segundos') or '-'
+            ])
+        mostrar_tabla(headers, filas)
+        
+        for motor, resultado in salud.items():
+            if not resultado['ok']:
+                mostrar_error(f"{motor}: {resultado['error']}")
+        
         pausar()
     
     def reporte_procesos(self):
@@ -20,11 +20,12 @@ class AlertaMenu:
     
     def mostrar_menu(self):
         """Ver alertas del sistema"""
+        exacto = False
         while True:
             limpiar_pantalla()
             
-            # Mostrar resumen
-            conteos = AlertaService.contar_alertas_por_estado()
+            # Mostrar resumen (contador mantenido salvo que se pida el exacto)
+            conteos = AlertaService.contar_alertas_por_estado(exacto)
             print(f"{Fore.YELLOW}Resumen de Alertas:")
             print(f"  Activas: {conteos['activa']}")
             print(f"  Resueltas: {conteos['resuelta']}\n")
@@ -33,15 +34,17 @@ class AlertaMenu:
                 (1, "Ver Todas las Alertas"),
                 (2, "Ver Alertas Activas"),
                 (3, "Ver Alertas Resueltas"),
+                (4, "Recalcular Conteos Exactos"),
             ]
             
             if 'administrador' in self.user_data['roles']:
                 opciones.extend([
-                    (4, "Crear Nueva Alerta"),
-                    (5, "Resolver Alerta"),
+                    (5, "Crear Nueva Alerta"),
+                    (6, "Resolver Alerta"),
                 ])
             
             seleccion = mostrar_menu("ALERTAS DEL SISTEMA", opciones)
+            exacto = False
             
             if seleccion == '0':
                 break
@@ -51,9 +54,11 @@ class AlertaMenu:
                 self.listar_alertas('activa')
             elif seleccion == '3':
                 self.listar_alertas('resuelta')
-            elif seleccion == '4' and 'administrador' in self.user_data['roles']:
-                self.crear_alerta()
+            elif seleccion == '4':
+                exacto = True
             elif seleccion == '5' and 'administrador' in self.user_data['roles']:
+                self.crear_alerta()
+            elif seleccion == '6' and 'administrador' in self.user_data['roles']:
                 self.resolver_alerta()
             else:
                 mostrar_error("Opción inválida")
@@ -1,24 +1,13 @@
 """
 Aplicación principal del sistema de sensores
 Coordina todos los menús y la navegación
+Los menús (y con ellos sus servicios y drivers) se importan recién cuando
+se eligen, y las conexiones se abren en el primer uso de cada base
 """
 
-from services.auth_service import AuthService
+import importlib
 from utils.menu import *
 from utils.db_manager import db_manager
-
-# Import de módulos UI
-from ui.auth_menu import AuthMenu
-from ui.proceso_menu import ProcesoMenu
-from ui.facturacion_menu import FacturacionMenu
-from ui.mensajeria_menu import MensajeriaMenu
-from ui.sensor_menu import SensorMenu
-from ui.alerta_menu import AlertaMenu
-from ui.control_menu import ControlMenu
-from ui.admin_menu import AdminMenu
-from ui.dashboard_menu import DashboardMenu
-from ui.notificacion_menu import NotificacionMenu
-from services.notificacion_service import NotificacionService
 from utils.logger import logger
 
 
@@ -29,9 +18,16 @@ class SistemaSensores:
         self.session_id = None
         self.user_data = None
         self.ejecutando = True
+        self.conexiones_verificadas = False
     
     def verificar_conexiones(self):
-        """Verifica que las conexiones a las bases de datos funcionen"""
+        """
+        Verifica las conexiones que necesitan el login y el registro
+        (MySQL y Redis); MongoDB se conecta con el primer menú que lo usa
+        """
+        if self.conexiones_verificadas:
+            return True
+        
         try:
             mostrar_info("Verificando conexiones a bases de datos...")
             
@@ -39,19 +35,18 @@ class SistemaSensores:
             db_manager.conectar_mysql()
             mostrar_exito("MySQL conectado")
             
-            # MongoDB
-            db_manager.conectar_mongodb()
-            mostrar_exito("MongoDB conectado")
-            
             # Redis
             db_manager.conectar_redis()
             mostrar_exito("Redis conectado")
             
             print()
+            self.conexiones_verificadas = True
             return True
             
         except Exception as e:
             mostrar_error(f"Error en conexiones: {e}")
+            mostrar_info("Verifique que Docker esté ejecutando los contenedores")
+            pausar()
             return False
     
     def run(self):
@@ -61,14 +56,13 @@ class SistemaSensores:
         mostrar_info("Trabajo Práctico - Persistencia Políglota")
         mostrar_info("Ingeniería de Datos II\n")
         
-        if not self.verificar_conexiones():
-            mostrar_error("No se pudo conectar a las bases de datos")
-            mostrar_info("Verifique que Docker esté ejecutando los contenedores")
-            return
-        
         pausar()
         self.menu_principal()
     
+    def _abrir_menu(self, modulo, clase):
+        """Importa el menú elegido (la primera vez) y lo crea para el usuario"""
+        return getattr(importlib.import_module(f"ui.{modulo}"), clase)(self.user_data)
+    
     def menu_principal(self):
         """Menú principal (sin autenticación)"""
         while self.ejecutando:
@@ -94,20 +88,32 @@ class SistemaSensores:
     
     def iniciar_sesion(self):
         """Proceso de inicio de sesión"""
+        if not self.verificar_conexiones():
+            return
+        
+        from ui.auth_menu import AuthMenu
         success, session_id, user_data = AuthMenu.iniciar_sesion()
         
         if success:
             self.session_id = session_id
             self.user_data = user_data
             logger.log_operacion("Inicio de sesión", user_data['user_id'])
-            self.menu_usuario()
+            # Los registros de la sesión llevan el id del usuario
+            with logger.contexto(usuario_id=user_data['user_id']):
+                self.menu_usuario()
     
     def registrar_usuario(self):
         """Registro de nuevo usuario"""
+        if not self.verificar_conexiones():
+            return
+        
+        from ui.auth_menu import AuthMenu
         AuthMenu.registrar_usuario()
     
     def menu_usuario(self):
         """Menú principal para usuario autenticado"""
+        from services.notificacion_service import NotificacionService
+        
         while self.session_id:
             limpiar_pantalla()
             mostrar_usuario_info(self.user_data)
@@ -148,43 +154,43 @@ class SistemaSensores:
             seleccion = mostrar_menu("MENÚ PRINCIPAL", opciones, mostrar_salir=False)
             
             if seleccion == '1':
-                menu = DashboardMenu(self.user_data)
+                menu = self._abrir_menu('dashboard_menu', 'DashboardMenu')
                 menu.mostrar_menu()
             elif seleccion == '2':
-                menu = ProcesoMenu(self.user_data)
+                menu = self._abrir_menu('proceso_menu', 'ProcesoMenu')
                 menu.mostrar_menu()
             elif seleccion == '3':
-                menu = ProcesoMenu(self.user_data)
+                menu = self._abrir_menu('proceso_menu', 'ProcesoMenu')
                 menu.ver_mis_solicitudes()
             elif seleccion == '4':
-                menu = FacturacionMenu(self.user_data)
+                menu = self._abrir_menu('facturacion_menu', 'FacturacionMenu')
                 menu.mostrar_menu()
             elif seleccion == '5':
-                menu = MensajeriaMenu(self.user_data)
+                menu = self._abrir_menu('mensajeria_menu', 'MensajeriaMenu')
                 menu.mostrar_menu()
             elif seleccion == '6':
-                menu = NotificacionMenu(self.user_data)
+                menu = self._abrir_menu('notificacion_menu', 'NotificacionMenu')
                 menu.mostrar_menu()
             elif seleccion == '7' and ('tecnico' in self.user_data['roles'] or 'administrador' in self.user_data['roles']):
-                menu = SensorMenu(self.user_data)
+                menu = self._abrir_menu('sensor_menu', 'SensorMenu')
                 menu.mostrar_menu()
             elif seleccion == '8' and ('tecnico' in self.user_data['roles'] or 'administrador' in self.user_data['roles']):
-                menu = AlertaMenu(self.user_data)
+                menu = self._abrir_menu('alerta_menu', 'AlertaMenu')
                 menu.mostrar_menu()
             elif seleccion == '9' and ('tecnico' in self.user_data['roles'] or 'administrador' in self.user_data['roles']):
-                menu = ControlMenu(self.user_data)
+                menu = self._abrir_menu('control_menu', 'ControlMenu')
                 menu.mostrar_menu()
             elif seleccion == '10' and 'administrador' in self.user_data['roles']:
-                menu = AdminMenu(self.user_data)
+                menu = self._abrir_menu('admin_menu', 'AdminMenu')
                 menu.menu_ejecutar_procesos()
             elif seleccion == '11' and 'administrador' in self.user_data['roles']:
-                menu = AdminMenu(self.user_data)
+                menu = self._abrir_menu('admin_menu', 'AdminMenu')
                 menu.gestion_usuarios()
             elif seleccion == '12' and 'administrador' in self.user_data['roles']:
-                menu = AdminMenu(self.user_data)
+                menu = self._abrir_menu('admin_menu', 'AdminMenu')
                 menu.ver_sesiones_activas()
             elif seleccion == '13' and 'administrador' in self.user_data['roles']:
-                menu = AdminMenu(self.user_data)
+                menu = self._abrir_menu('admin_menu', 'AdminMenu')
                 menu.reportes_sistema()
             elif seleccion == '99':
                 self.cerrar_sesion()
@@ -195,6 +201,7 @@ class SistemaSensores:
     def cerrar_sesion(self):
         """Cierra la sesión del usuario"""
         if self.session_id:
+            from services.auth_service import AuthService
             AuthService.logout(self.session_id)
             mostrar_info("Sesión cerrada correctamente")
             self.session_id = None
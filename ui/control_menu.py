@@ -21,13 +21,15 @@ class ControlMenu:
     
     def mostrar_menu(self):
         """Control de funcionamiento de sensores"""
+        exacto = False
         while True:
             limpiar_pantalla()
             
-            # Mostrar estadísticas
-            stats = ControlService.obtener_estadisticas_controles()
+            # Mostrar estadísticas (total estimado salvo que se pida el exacto)
+            stats = ControlService.obtener_estadisticas_controles(exacto)
             print(f"{Fore.YELLOW}Estadísticas de Controles:")
-            print(f"  Total controles registrados: {stats['total']}")
+            etiqueta = "" if exacto else " (estimado)"
+            print(f"  Total controles registrados{etiqueta}: {stats['total']}")
             print(f"  Controles últimos 7 días: {stats['ultimos_7_dias']}")
             if stats['por_estado']:
                 print(f"  Por estado: {stats['por_estado']}\n")
@@ -36,9 +38,11 @@ class ControlMenu:
                 (1, "Ver Todos los Controles"),
                 (2, "Ver Controles de un Sensor"),
                 (3, "Registrar Nuevo Control"),
+                (4, "Recalcular Conteos Exactos"),
             ]
             
             seleccion = mostrar_menu("CONTROL DE FUNCIONAMIENTO", opciones)
+            exacto = False
             
             if seleccion == '0':
                 break
@@ -48,6 +52,8 @@ class ControlMenu:
                 self.ver_controles_sensor()
             elif seleccion == '3':
                 self.registrar_control()
+            elif seleccion == '4':
+                exacto = True
             else:
                 mostrar_error("Opción inválida")
                 pausar()
@@ -7,9 +7,9 @@ from services.facturacion_service import FacturacionService
 from services.sensor_service import SensorService
 from services.alerta_service import AlertaService
 from services.notificacion_service import NotificacionService
+from services.snapshot_service import SnapshotService
 from utils.menu import *
 from utils.visualizacion import *
-from utils.db_manager import db_manager
 from colorama import Fore
 
 
@@ -195,6 +195,12 @@ class DashboardMenu:
         if por_pais:
             grafico_barras_horizontal(por_pais, "Sensores por País")
         
+        # Mediciones por ciudad (contador mantenido, sin recorrer las particiones)
+        por_ciudad = SensorService.contar_mediciones_por_ciudad()
+        if por_ciudad:
+            top = dict(sorted(por_ciudad.items(), key=lambda c: c[1], reverse=True)[:10])
+            grafico_barras_horizontal(top, "Mediciones por Ciudad")
+        
         pausar()
     
     def estadisticas_financieras(self):
@@ -238,42 +244,24 @@ class DashboardMenu:
         limpiar_pantalla()
         mostrar_titulo("DASHBOARD ADMINISTRATIVO")
         
-        # Estadísticas del sistema
-        cursor = db_manager.get_mysql_cursor()
-        
-        # Total usuarios
-        cursor.execute("SELECT COUNT(*) as total FROM usuarios")
-        total_usuarios = cursor.fetchone()['total']
-        
-        # Total sensores
-        cursor.execute("SELECT COUNT(*) as total FROM sensores")
-        total_sensores = cursor.fetchone()['total']
-        
-        # Total solicitudes
-        cursor.execute("SELECT COUNT(*) as total FROM solicitudes")
-        total_solicitudes = cursor.fetchone()['total']
-        
-        # Solicitudes por estado
-        cursor.execute("""
-            SELECT estado, COUNT(*) as total 
-            FROM solicitudes 
-            GROUP BY estado
-        """)
-        solicitudes_estado = {row['estado']: row['total'] for row in cursor.fetchall()}
-        
-        cursor.close()
+        snapshot = SnapshotService.obtener()
+        if not snapshot:
+            mostrar_error("Los indicadores no están disponibles")
+            pausar()
+            return
         
         stats = {
-            'Total Usuarios': total_usuarios,
-            'Total Sensores': total_sensores,
-            'Total Solicitudes': total_solicitudes,
+            'Total Usuarios': snapshot['usuarios_total'],
+            'Total Sensores': snapshot['sensores_total'],
+            'Total Solicitudes': snapshot['solicitudes_total'],
         }
         
         mostrar_estadisticas_box(stats, "Estadísticas del Sistema")
         
-        if solicitudes_estado:
-            grafico_barras_horizontal(solicitudes_estado, "Solicitudes por Estado (Sistema)")
+        if snapshot['solicitudes_por_estado']:
+            grafico_barras_horizontal(snapshot['solicitudes_por_estado'], "Solicitudes por Estado (Sistema)")
         
+        mostrar_info(f"Datos al {snapshot['generado_en']:%d/%m/%Y %H:%M:%S}")
         pausar()
     
     def estadisticas_sistema(self):
@@ -281,34 +269,20 @@ class DashboardMenu:
         limpiar_pantalla()
         mostrar_titulo("ESTADÍSTICAS DEL SISTEMA")
         
-        cursor = db_manager.get_mysql_cursor()
-        
-        # Facturación total
-        cursor.execute("SELECT SUM(monto_total) as total FROM facturas WHERE estado = 'pagada'")
-        facturacion_total = cursor.fetchone()['total'] or 0
-        
-        # Procesos más solicitados
-        cursor.execute("""
-            SELECT p.nombre, COUNT(s.id) as cantidad
-            FROM procesos p
-            LEFT JOIN solicitudes s ON p.id = s.proceso_id
-            GROUP BY p.id, p.nombre
-            ORDER BY cantidad DESC
-            LIMIT 10
-        """)
-        procesos_populares = {row['nombre']: row['cantidad'] for row in cursor.fetchall()}
-        
-        cursor.close()
+        snapshot = SnapshotService.obtener()
+        if not snapshot:
+            mostrar_error("Los indicadores no están disponibles")
+            pausar()
+            return
         
         stats = {
-            'Facturación Total': f"${facturacion_total:.2f}",
+            'Facturación Total': f"${snapshot['facturacion_pagada']:.2f}",
         }
         
         mostrar_estadisticas_box(stats, "Resumen Financiero del Sistema")
         
-        if procesos_populares:
-            grafico_barras_horizontal(procesos_populares, "Procesos Más Solicitados")
+        if snapshot['procesos_populares']:
+            grafico_barras_horizontal(snapshot['procesos_populares'], "Procesos Más Solicitados")
         
+        mostrar_info(f"Datos al {snapshot['generado_en']:%d/%m/%Y %H:%M:%S}")
         pausar()
-
-
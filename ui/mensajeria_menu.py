@@ -7,6 +7,9 @@ from services.mensaje_service import MensajeService
 from utils.menu import *
 from colorama import Fore
 
+# Mensajes por página en las bandejas
+MENSAJES_POR_PAGINA = 20
+
 
 class MensajeriaMenu:
     """Menú de mensajería del sistema"""
@@ -62,17 +65,14 @@ class MensajeriaMenu:
     
     def ver_mensajes_recibidos(self):
         """Ver mensajes recibidos"""
-        limpiar_pantalla()
-        mostrar_titulo("MENSAJES RECIBIDOS")
-        
-        mensajes = MensajeService.listar_mensajes_recibidos(self.user_data['user_id'])
+        def obtener_pagina(cursor_pagina):
+            mensajes = MensajeService.listar_mensajes_recibidos(
+                self.user_data['user_id'], MENSAJES_POR_PAGINA, cursor_pagina
+            )
+            return mensajes, MensajeService.siguiente_cursor(mensajes, MENSAJES_POR_PAGINA)
         
-        if not mensajes:
-            mostrar_info("No hay mensajes")
-        else:
-            print(f"{Fore.CYAN}Total: {len(mensajes)} mensajes\n")
-            
-            for i, m in enumerate(mensajes[:20], 1):  # Mostrar máximo 20
+        def mostrar_mensajes(mensajes, numero_inicial):
+            for i, m in enumerate(mensajes, numero_inicial):
                 leido_mark = '' if m.get('leido', True) else f"{Fore.RED}[NUEVO] "
                 
                 if m['tipo'] == 'privado':
@@ -83,22 +83,24 @@ class MensajeriaMenu:
                 print(f"   {str(m['timestamp'])[:19]}")
                 print(f"   {Fore.WHITE}{m['contenido'][:80]}{'...' if len(m['contenido']) > 80 else ''}")
                 print()
+            
+            # Los mensajes mostrados quedan leídos (y bajan el contador del menú)
+            MensajeService.marcar_como_leidos(
+                [m['_id'] for m in mensajes if not m.get('leido', True)], self.user_data['user_id']
+            )
         
-        pausar()
+        navegar_por_cursor("MENSAJES RECIBIDOS", obtener_pagina, mostrar_mensajes)
     
     def ver_mensajes_enviados(self):
         """Ver mensajes enviados"""
-        limpiar_pantalla()
-        mostrar_titulo("MENSAJES ENVIADOS")
-        
-        mensajes = MensajeService.listar_mensajes_enviados(self.user_data['user_id'])
+        def obtener_pagina(cursor_pagina):
+            mensajes = MensajeService.listar_mensajes_enviados(
+                self.user_data['user_id'], MENSAJES_POR_PAGINA, cursor_pagina
+            )
+            return mensajes, MensajeService.siguiente_cursor(mensajes, MENSAJES_POR_PAGINA)
         
-        if not mensajes:
-            mostrar_info("No hay mensajes enviados")
-        else:
-            print(f"{Fore.CYAN}Total: {len(mensajes)} mensajes\n")
-            
-            for i, m in enumerate(mensajes[:20], 1):
+        def mostrar_mensajes(mensajes, numero_inicial):
+            for i, m in enumerate(mensajes, numero_inicial):
                 if m['tipo'] == 'privado':
                     print(f"{i}. Para: {m.get('destinatario_nombre', 'Desconocido')}")
                 else:
@@ -108,7 +110,7 @@ class MensajeriaMenu:
                 print(f"   {Fore.WHITE}{m['contenido'][:80]}{'...' if len(m['contenido']) > 80 else ''}")
                 print()
         
-        pausar()
+        navegar_por_cursor("MENSAJES ENVIADOS", obtener_pagina, mostrar_mensajes)
     
     def enviar_mensaje_privado(self):
         """Enviar mensaje privado"""
@@ -4,6 +4,7 @@ Gestiona solicitudes de procesos por parte de usuarios
 """
 
 from services.proceso_service import ProcesoService
+from services.programador_service import ProgramadorService
 from utils.menu import *
 from utils.exportador import exportar_resultado_proceso
 from utils.visualizacion import grafico_temperatura, grafico_barras_horizontal, grafico_comparativo
@@ -29,6 +30,8 @@ class ProcesoMenu:
             opciones = [
                 (1, "Ver Procesos Disponibles"),
                 (2, "Solicitar Nuevo Proceso"),
+                (3, "Programar Proceso Periódico"),
+                (4, "Mis Procesos Programados"),
             ]
             
             seleccion = mostrar_menu("GESTIÓN DE PROCESOS", opciones)
@@ -39,6 +42,10 @@ class ProcesoMenu:
                 self.ver_procesos_disponibles()
             elif seleccion == '2':
                 self.solicitar_proceso()
+            elif seleccion == '3':
+                self.programar_proceso()
+            elif seleccion == '4':
+                self.ver_programados()
             else:
                 mostrar_error("Opción inválida")
                 pausar()
@@ -270,6 +277,115 @@ class ProcesoMenu:
         
         pausar()
     
+    def programar_proceso(self):
+        """Programa un informe recurrente"""
+        limpiar_pantalla()
+        mostrar_titulo("PROGRAMAR PROCESO PERIÓDICO")
+        
+        procesos = [
+            p for p in ProcesoService.listar_procesos_disponibles()
+            if p['tipo'] == 'proceso_periodico_mensual' or 'informe' in p['tipo']
+        ]
+        
+        if not procesos:
+            mostrar_error("No hay procesos disponibles para programar")
+            pausar()
+            return
+        
+        headers = ['ID', 'Nombre', 'Costo por ejecución']
+        filas = [[p['id'], p['nombre'], f"${p['costo']:.2f}"] for p in procesos]
+        mostrar_tabla(headers, filas)
+        
+        proceso_id = solicitar_entrada("ID del proceso a programar", validador=lambda x: validar_id(x, "ID del proceso"))
+        proceso = next((p for p in procesos if p['id'] == proceso_id), None)
+        if not proceso:
+            mostrar_error("Proceso no válido")
+            pausar()
+            return
+        
+        parametros = {}
+        ciudad = solicitar_entrada("Ciudad (Enter para todas)", str, permitir_vacio=True)
+        if ciudad:
+            parametros['ciudad'] = ciudad
+        else:
+            pais = solicitar_entrada("País (Enter para todos)", str, permitir_vacio=True)
+            if pais:
+                parametros['pais'] = pais
+        
+        while True:
+            meses_str = solicitar_entrada("Meses cerrados que cubre cada ejecución (1-12)", str)
+            es_valido, mensaje, meses = validar_numero_positivo(meses_str, int, min_valor=1, max_valor=12)
+            if es_valido:
+                parametros['meses'] = meses
+                break
+            mostrar_error(mensaje)
+        
+        print(f"\n{Fore.CYAN}Frecuencia:{Fore.RESET}")
+        print("  [1] Mensual (día 1 a las 00:00)")
+        print("  [2] Semanal (lunes a las 00:00)")
+        print("  [3] Diaria (00:00)")
+        print("  [4] Expresión cron personalizada")
+        frecuencias = {1: "0 0 1 * *", 2: "0 0 * * 1", 3: "0 0 * * *"}
+        
+        opcion = solicitar_entrada("\nSeleccione opción", int)
+        if opcion == 4:
+            expresion = solicitar_entrada("Expresión (minuto hora día mes día_semana)", str)
+        elif opcion in frecuencias:
+            expresion = frecuencias[opcion]
+        else:
+            mostrar_error("Opción inválida")
+            pausar()
+            return
+        
+        if confirmar(f"\n¿Programar '{proceso['nombre']}' ({expresion}), ${proceso['costo']:.2f} por ejecución?"):
+            success, mensaje, _ = ProgramadorService.programar(
+                self.user_data['user_id'], proceso_id, parametros, expresion
+            )
+            if success:
+                mostrar_exito(mensaje)
+            else:
+                mostrar_error(mensaje)
+        
+        pausar()
+    
+    def ver_programados(self):
+        """Lista los procesos programados y permite cancelarlos"""
+        limpiar_pantalla()
+        mostrar_titulo("MIS PROCESOS PROGRAMADOS")
+        
+        programados = ProgramadorService.listar_programados(self.user_data['user_id'])
+        
+        if not programados:
+            mostrar_info("No tiene procesos programados")
+            pausar()
+            return
+        
+        headers = ['ID', 'Proceso', 'Frecuencia', 'Próxima', 'Última']
+        filas = [
+            [
+                p['id'],
+                p['proceso_nombre'][:30],
+                p['expresion_cron'],
+                str(p['proxima_ejecucion'])[:16],
+                str(p['ultima_ejecucion'])[:16] if p['ultima_ejecucion'] else '-'
+            ]
+            for p in programados
+        ]
+        mostrar_tabla(headers, filas)
+        
+        if confirmar("¿Desea cancelar un proceso programado?"):
+            programado_id = solicitar_entrada("ID del programado", validador=lambda x: validar_id(x, "ID del programado"))
+            if programado_id:
+                success, mensaje = ProgramadorService.cancelar_programado(
+                    programado_id, self.user_data['user_id']
+                )
+                if success:
+                    mostrar_exito(mensaje)
+                else:
+                    mostrar_error(mensaje)
+        
+        pausar()
+    
     def ver_mis_solicitudes(self):
         """Ver solicitudes del usuario"""
         while True:
@@ -282,7 +398,9 @@ class ProcesoMenu:
             print(f"  Pendientes: {conteos['pendiente']}")
             print(f"  En proceso: {conteos['en_proceso']}")
             print(f"  Completadas: {conteos['completado']}")
-            print(f"  Con error: {conteos['error']}\n")
+            print(f"  Con error: {conteos['error']}")
+            print(f"  Tiempo agotado: {conteos['timeout']}")
+            print(f"  Canceladas: {conteos['cancelado']}\n")
             
             opciones = [
                 (1, "Ver Todas"),
@@ -451,6 +569,13 @@ class ProcesoMenu:
             if 'resultado' in solicitud and 'error' in solicitud['resultado']:
                 print(f"Error: {solicitud['resultado']['error']}")
         
+        elif solicitud['estado'] == 'timeout':
+            print(f"\n{Fore.RED}⌛ El proceso superó su tiempo máximo de ejecución{Fore.RESET}")
+            print("Acote el rango de fechas o la zona y vuelva a solicitarlo")
+        
+        elif solicitud['estado'] == 'cancelado':
+            print(f"\n{Fore.YELLOW}🚫 El proceso fue cancelado{Fore.RESET}")
+        
         elif solicitud['estado'] == 'pendiente':
             print(f"\n{Fore.YELLOW}⏳ La solicitud está pendiente de ejecución{Fore.RESET}")
         
@@ -513,7 +638,7 @@ class ProcesoMenu:
         pausar()
     
     def cancelar_solicitud(self):
-        """Cancela una solicitud pendiente"""
+        """Cancela una solicitud pendiente o en proceso"""
         limpiar_pantalla()
         mostrar_subtitulo("CANCELAR SOLICITUD")
         
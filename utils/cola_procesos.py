@@ -0,0 +1,207 @@
+"""
+Cola de procesos con prioridades y turnos por usuario
+Cada prioridad tiene una lista de usuarios en espera y una cola FIFO por
+usuario; al desencolar se atiende al primer usuario de la lista y se lo
+pasa al final (round-robin), así nadie espera detrás de los 500 informes
+de otro usuario. Las prioridades se alternan por pesos (PROCESOS_CONFIG).
+
+Todas las claves llevan el hash tag {cola:procesos}: caen en el mismo slot
+de Redis Cluster y los scripts Lua reciben en KEYS las que se conocen de
+antemano (las colas por usuario que elige el script se arman con el mismo
+prefijo, así que están en ese slot).
+"""
+
+import time
+from config.db_config import PROCESOS_CONFIG
+from utils.db_manager import db_manager
+
+PREFIJO = "{cola:procesos}"
+# Solicitud -> "prioridad:usuario:timestamp" de las solicitudes encoladas
+CLAVE_ENCOLADAS = f"{PREFIJO}:encoladas"
+CLAVE_TURNO = f"{PREFIJO}:turno"
+# Cola FIFO anterior: se sigue vaciando por si quedaron solicitudes
+COLA_ANTERIOR = "cola:procesos_pendientes"
+# Esperas recientes que se conservan por prioridad para las métricas
+_MUESTRAS_ESPERA = 500
+
+# KEYS: encoladas, usuarios de la prioridad, cola del usuario
+# ARGV: usuario, solicitud, info
+_LUA_ENCOLAR = """
+redis.call('RPUSH', KEYS[3], ARGV[2])
+if not redis.call('LPOS', KEYS[2], ARGV[1]) then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+"""
+
+# KEYS: encoladas y la lista de usuarios de cada prioridad, en orden
+# ARGV: prefijo de las colas por usuario de cada prioridad, en el mismo orden
+_LUA_DESENCOLAR = """
+for i = 2, #KEYS do
+    local usuarios = KEYS[i]
+    local usuario = redis.call('LPOP', usuarios)
+    while usuario do
+        local cola = ARGV[i - 1] .. usuario
+        local solicitud = redis.call('LPOP', cola)
+        if solicitud then
+            if redis.call('LLEN', cola) > 0 then
+                redis.call('RPUSH', usuarios, usuario)
+            end
+            local info = redis.call('HGET', KEYS[1], solicitud)
+            redis.call('HDEL', KEYS[1], solicitud)
+            return {solicitud, info or ''}
+        end
+        usuario = redis.call('LPOP', usuarios)
+    end
+end
+return false
+"""
+
+# KEYS: encoladas, usuarios de la prioridad, cola del usuario
+# ARGV: solicitud, usuario, info leída antes (si cambió no se toca nada)
+_LUA_QUITAR = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[3] then
+    return 0
+end
+redis.call('LREM', KEYS[3], 0, ARGV[1])
+if redis.call('LLEN', KEYS[3]) == 0 then
+    redis.call('LREM', KEYS[2], 0, ARGV[2])
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def prioridades():
+    """Prioridades de mayor a menor"""
+    return list(PROCESOS_CONFIG['pesos'])
+
+
+def prioridad_de(tipo):
+    """Prioridad de un tipo de proceso"""
+    return PROCESOS_CONFIG['prioridades'].get(tipo, PROCESOS_CONFIG['prioridad_defecto'])
+
+
+def _clave_usuarios(prioridad):
+    return f"{PREFIJO}:{prioridad}:usuarios"
+
+
+def _clave_cola(prioridad, usuario_id):
+    return f"{PREFIJO}:{prioridad}:usuario:{usuario_id}"
+
+
+def _ciclo():
+    """Turnos de un ciclo intercalando las prioridades según su peso"""
+    pesos = PROCESOS_CONFIG['pesos']
+    return [
+        prioridad
+        for vuelta in range(max(pesos.values()))
+        for prioridad, peso in pesos.items()
+        if vuelta < peso
+    ]
+
+
+def encolar(solicitud_id, usuario_id, tipo):
+    """Agrega una solicitud al final de la cola de su usuario en su prioridad"""
+    prioridad = prioridad_de(tipo)
+    db_manager.conectar_redis().register_script(_LUA_ENCOLAR)(
+        keys=[CLAVE_ENCOLADAS, _clave_usuarios(prioridad), _clave_cola(prioridad, usuario_id)],
+        args=[usuario_id, solicitud_id, f"{prioridad}:{usuario_id}:{time.time()}"]
+    )
+
+
+def desencolar():
+    """
+    Saca la próxima solicitud a ejecutar
+
+    Returns:
+        ID de la solicitud o None si no hay
+    """
+    redis_client = db_manager.conectar_redis()
+
+    # La prioridad del turno va primero; si está vacía, el resto en orden
+    ciclo = _ciclo()
+    turno = ciclo[redis_client.incr(CLAVE_TURNO) % len(ciclo)]
+    orden = [turno] + [p for p in prioridades() if p != turno]
+
+    respuesta = redis_client.register_script(_LUA_DESENCOLAR)(
+        keys=[CLAVE_ENCOLADAS, *(_clave_usuarios(p) for p in orden)],
+        args=[_clave_cola(p, '') for p in orden]
+    )
+    if not respuesta:
+        solicitud_id = redis_client.rpop(COLA_ANTERIOR)
+        return int(solicitud_id) if solicitud_id else None
+
+    solicitud_id, info = respuesta
+    if info:
+        prioridad, _, encolada = info.split(':')
+        clave = f"{PREFIJO}:{prioridad}:esperas"
+        pipe = redis_client.pipeline()
+        pipe.lpush(clave, round(time.time() - float(encolada), 3))
+        pipe.ltrim(clave, 0, _MUESTRAS_ESPERA - 1)
+        pipe.execute()
+
+    return int(solicitud_id)
+
+
+def quitar(solicitud_id):
+    """Quita una solicitud que todavía no se ejecutó"""
+    redis_client = db_manager.conectar_redis()
+    info = redis_client.hget(CLAVE_ENCOLADAS, solicitud_id)
+    if info:
+        prioridad, usuario_id, _ = info.split(':')
+        redis_client.register_script(_LUA_QUITAR)(
+            keys=[CLAVE_ENCOLADAS, _clave_usuarios(prioridad), _clave_cola(prioridad, usuario_id)],
+            args=[solicitud_id, usuario_id, info]
+        )
+    redis_client.lrem(COLA_ANTERIOR, 0, str(solicitud_id))
+
+
+def pendientes(limite=10):
+    """
+    Solicitudes encoladas, las más antiguas primero
+
+    Returns:
+        Lista de IDs
+    """
+    redis_client = db_manager.conectar_redis()
+    encoladas = redis_client.hgetall(CLAVE_ENCOLADAS)
+    ordenadas = sorted(encoladas, key=lambda sid: float(encoladas[sid].rsplit(':', 1)[1]))
+    anteriores = redis_client.lrange(COLA_ANTERIOR, 0, -1)[::-1]
+    return [int(sid) for sid in (anteriores + ordenadas)[:limite]]
+
+
+def metricas():
+    """
+    Profundidad y esperas por prioridad
+
+    Returns:
+        Diccionario prioridad -> {solicitudes, usuarios, espera_maxima,
+        espera_p50, espera_p95} con las esperas en segundos
+    """
+    redis_client = db_manager.conectar_redis()
+    ahora = time.time()
+
+    resultado = {
+        prioridad: {'solicitudes': 0, 'usuarios': 0, 'espera_maxima': 0.0}
+        for prioridad in prioridades()
+    }
+    for info in redis_client.hvals(CLAVE_ENCOLADAS):
+        prioridad, _, encolada = info.split(':')
+        datos = resultado.setdefault(prioridad, {'solicitudes': 0, 'usuarios': 0, 'espera_maxima': 0.0})
+        datos['solicitudes'] += 1
+        datos['espera_maxima'] = max(datos['espera_maxima'], round(ahora - float(encolada), 1))
+
+    pipe = redis_client.pipeline()
+    for prioridad in resultado:
+        pipe.llen(_clave_usuarios(prioridad))
+        pipe.lrange(f"{PREFIJO}:{prioridad}:esperas", 0, -1)
+    respuestas = pipe.execute()
+
+    for i, prioridad in enumerate(resultado):
+        resultado[prioridad]['usuarios'] = respuestas[2 * i]
+        esperas = sorted(float(e) for e in respuestas[2 * i + 1])
+        resultado[prioridad]['espera_p50'] = esperas[len(esperas) // 2] if esperas else None
+        resultado[prioridad]['espera_p95'] = esperas[int(len(esperas) * 0.95)] if esperas else None
+
+    return resultado
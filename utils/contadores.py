@@ -0,0 +1,128 @@
+"""
+Conteos baratos para pantallas de uso frecuente
+Totales sin filtro con estimated_document_count (metadatos de la colección)
+y contadores mantenidos en Redis para los filtros comunes (por estado, por
+ciudad); el conteo exacto se calcula solo a pedido
+
+Mantener un contador es secundario a la escritura que cuenta: si Redis
+falla, incrementar y mover no lanzan; el contador se invalida para que el
+próximo leer lo recalcule
+"""
+
+import threading
+from config.db_config import CONTADORES_CONFIG
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import particiones
+
+# Solo incrementa si el contador existe: un hash a medio armar se tomaría
+# como completo y nunca se reconstruiría
+_LUA_INCREMENTAR = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+end
+return false
+"""
+
+
+# Contadores que no se pudieron invalidar (Redis caído): se borran en el
+# próximo acceso de este proceso
+_pendientes = set()
+_lock_pendientes = threading.Lock()
+
+
+def _clave(nombre):
+    return f"contadores:{nombre}"
+
+
+def _invalidar(nombre, error):
+    """Descarta un contador que quedó desviado por un error al mantenerlo"""
+    logger.warning("Contador %s invalidado: %s", nombre, error)
+    try:
+        db_manager.conectar_redis().delete(_clave(nombre))
+    except Exception:
+        with _lock_pendientes:
+            _pendientes.add(nombre)
+
+
+def _invalidar_pendientes(redis_client):
+    """Borra los contadores que quedaron sin invalidar"""
+    with _lock_pendientes:
+        nombres = list(_pendientes)
+    if not nombres:
+        return
+    redis_client.delete(*(_clave(nombre) for nombre in nombres))
+    with _lock_pendientes:
+        _pendientes.difference_update(nombres)
+
+
+def total_estimado(coleccion):
+    """Total de documentos de una colección sin recorrerla"""
+    return coleccion.estimated_document_count()
+
+
+def total_mediciones(db):
+    """Total estimado de mediciones, sumando cada partición"""
+    return sum(particiones.consultar(particiones.colecciones_en_rango(db), total_estimado))
+
+
+def _sumar(redis_client, nombre, campo, cantidad):
+    redis_client.register_script(_LUA_INCREMENTAR)(keys=[_clave(nombre)], args=[campo, cantidad])
+
+
+def incrementar(nombre, campo, cantidad=1):
+    """Suma al contador de un campo (si el contador ya está armado); no lanza"""
+    try:
+        redis_client = db_manager.conectar_redis()
+        _invalidar_pendientes(redis_client)
+        _sumar(redis_client, nombre, campo, cantidad)
+    except Exception as e:
+        _invalidar(nombre, e)
+
+
+def mover(nombre, origen, destino, cantidad=1):
+    """Pasa cantidad de un campo a otro (por ejemplo, activa -> resuelta); no lanza"""
+    try:
+        redis_client = db_manager.conectar_redis()
+        _invalidar_pendientes(redis_client)
+        _sumar(redis_client, nombre, origen, -cantidad)
+        _sumar(redis_client, nombre, destino, cantidad)
+    except Exception as e:
+        _invalidar(nombre, e)
+
+
+def reemplazar(nombre, conteos):
+    """Guarda conteos exactos; vencen para que se reconcilien periódicamente"""
+    redis_client = db_manager.conectar_redis()
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(_clave(nombre))
+    # Marca de contador armado aunque no haya conteos
+    pipe.hset(_clave(nombre), mapping={'_': 0, **{str(k): v for k, v in conteos.items()}})
+    pipe.expire(_clave(nombre), CONTADORES_CONFIG['reconciliar_segundos'])
+    pipe.execute()
+
+
+def leer(nombre, recalcular, exacto=False):
+    """
+    Conteos de un contador mantenido
+
+    Args:
+        nombre: Nombre del contador
+        recalcular: Función sin argumentos que devuelve los conteos exactos
+            ({valor: cantidad}); se usa si el contador no existe o venció
+        exacto: Recalcular siempre (y corregir el contador)
+
+    Returns:
+        Diccionario valor -> cantidad
+    """
+    if not exacto:
+        redis_client = db_manager.conectar_redis()
+        _invalidar_pendientes(redis_client)
+        datos = redis_client.hgetall(_clave(nombre))
+        if datos:
+            datos.pop('_', None)
+            return {campo: int(valor) for campo, valor in datos.items()}
+
+    conteos = recalcular()
+    reemplazar(nombre, conteos)
+    return conteos
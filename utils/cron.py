@@ -0,0 +1,116 @@
+"""
+Expresiones cron de 5 campos (minuto hora día mes día_semana)
+Admite *, listas (1,15), rangos (1-5) y pasos (*/15, 0-30/10);
+el día de la semana va de 0 (domingo) a 6 (7 también es domingo)
+"""
+
+from datetime import datetime, timedelta
+
+# (mínimo, máximo) de cada campo
+_LIMITES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# Años que se recorren antes de considerar que la expresión no ocurre nunca
+_HORIZONTE_AÑOS = 5
+
+
+def _campo(texto, minimo, maximo):
+    """Conjunto de valores de un campo"""
+    valores = set()
+    for parte in texto.split(','):
+        rango, _, paso = parte.partition('/')
+        paso = int(paso) if paso else 1
+        if paso < 1:
+            raise ValueError(f"Paso inválido: {parte}")
+
+        if rango == '*':
+            inicio, fin = minimo, maximo
+        elif '-' in rango:
+            inicio, fin = (int(v) for v in rango.split('-', 1))
+        else:
+            inicio = int(rango)
+            fin = maximo if paso > 1 else inicio
+
+        if not minimo <= inicio <= fin <= maximo:
+            raise ValueError(f"Valor fuera de rango ({minimo}-{maximo}): {parte}")
+        valores.update(range(inicio, fin + 1, paso))
+    return valores
+
+
+def parsear(expresion):
+    """
+    Valida y descompone una expresión cron
+
+    Returns:
+        Diccionario con los conjuntos de valores de cada campo y si el día
+        del mes / de la semana están restringidos
+
+    Raises:
+        ValueError si la expresión es inválida
+    """
+    campos = expresion.split()
+    if len(campos) != 5:
+        raise ValueError("La expresión debe tener 5 campos: minuto hora día mes día_semana")
+
+    try:
+        minutos, horas, dias, meses, dias_semana = (
+            _campo(texto, *limites) for texto, limites in zip(campos, _LIMITES)
+        )
+    except ValueError as e:
+        raise ValueError(f"Expresión cron inválida '{expresion}': {e}")
+
+    # 7 es domingo, igual que 0
+    if 7 in dias_semana:
+        dias_semana = (dias_semana - {7}) | {0}
+
+    return {
+        'minutos': minutos,
+        'horas': horas,
+        'dias': dias,
+        'meses': meses,
+        'dias_semana': dias_semana,
+        'dia_restringido': campos[2] != '*',
+        'semana_restringida': campos[4] != '*'
+    }
+
+
+def _coincide_dia(cron, fecha):
+    """Regla de cron: si ambos campos de día están restringidos basta con uno"""
+    en_mes = fecha.day in cron['dias']
+    # isoweekday: lunes=1 ... domingo=7 -> domingo=0
+    en_semana = fecha.isoweekday() % 7 in cron['dias_semana']
+    if cron['dia_restringido'] and cron['semana_restringida']:
+        return en_mes or en_semana
+    return en_mes and en_semana
+
+
+def siguiente(expresion, desde=None):
+    """
+    Próxima fecha (al minuto) posterior a 'desde' que cumple la expresión
+
+    Avanza por mes, día y hora completos cuando no coinciden, así que el
+    costo depende de la cantidad de saltos y no de los minutos recorridos.
+
+    Raises:
+        ValueError si la expresión es inválida o no ocurre nunca
+    """
+    cron = parsear(expresion)
+    fecha = (desde or datetime.now()).replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limite = fecha + timedelta(days=366 * _HORIZONTE_AÑOS)
+
+    while fecha < limite:
+        if fecha.month not in cron['meses']:
+            año, mes = (fecha.year + 1, 1) if fecha.month == 12 else (fecha.year, fecha.month + 1)
+            fecha = datetime(año, mes, 1)
+            continue
+        if not _coincide_dia(cron, fecha):
+            fecha = datetime(fecha.year, fecha.month, fecha.day) + timedelta(days=1)
+            continue
+        if fecha.hour not in cron['horas']:
+            fecha = fecha.replace(minute=0) + timedelta(hours=1)
+            continue
+        if fecha.minute not in cron['minutos']:
+            fecha += timedelta(minutes=1)
+            continue
+        return fecha
+
+    raise ValueError(f"La expresión '{expresion}' no ocurre en los próximos {_HORIZONTE_AÑOS} años")
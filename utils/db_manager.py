@@ -1,11 +1,17 @@
 """
 Manejador centralizado de conexiones a bases de datos
+Los drivers se importan y las conexiones se abren en el primer uso de cada
+motor: un proceso que solo usa Redis no carga mysql.connector ni pymongo
+Las conexiones abiertas se verifican periódicamente y cada motor tiene un
+circuito (utils/resiliencia.py) que corta los intentos mientras está caído
 """
 
-import mysql.connector
-from pymongo import MongoClient
-import redis
-from config.db_config import MYSQL_CONFIG, MONGODB_CONFIG, REDIS_CONFIG
+import time
+from config.db_config import (
+    MYSQL_CONFIG, MYSQL_REPLICA_CONFIG, MONGODB_CONFIG, MONGODB_LECTURA_CONFIG, REDIS_CONFIG,
+    RESILIENCIA_CONFIG
+)
+from utils import instrumentacion, resiliencia
 
 class DatabaseManager:
     """Clase singleton para manejar conexiones a las bases de datos"""
@@ -23,48 +29,160 @@ class DatabaseManager:
             return
         
         self.mysql_conn = None
+        self.mysql_replica_conn = None
         self.mongo_client = None
+        self.mongo_dbs_lectura = {}
         self.mongo_db = None
         self.redis_client = None
         self._initialized = True
     
     def conectar_mysql(self):
-        """Conecta a MySQL"""
-        try:
+        """Conecta a MySQL (y reconecta si la verificación periódica falla)"""
+        import mysql.connector
+        
+        def verificar():
+            # is_connected hace el ping
             if self.mysql_conn is None or not self.mysql_conn.is_connected():
-                self.mysql_conn = mysql.connector.connect(**MYSQL_CONFIG)
+                self.mysql_conn = mysql.connector.connect(
+                    **MYSQL_CONFIG, connection_timeout=RESILIENCIA_CONFIG['timeout_conexion_segundos']
+                )
+        
+        try:
+            resiliencia.circuito('mysql').verificar(verificar, forzar=self.mysql_conn is None)
             return self.mysql_conn
         except mysql.connector.Error as e:
             print(f"❌ Error conectando a MySQL: {e}")
             raise
     
-    def conectar_mongodb(self):
-        """Conecta a MongoDB"""
+    def conectar_mysql_replica(self):
+        """
+        Conecta a la réplica de lectura de MySQL
+        
+        Sin réplica configurada (o si no responde) devuelve la conexión principal.
+        """
+        if not MYSQL_REPLICA_CONFIG['host']:
+            return self.conectar_mysql()
+        
+        import mysql.connector
+        
+        def verificar():
+            if self.mysql_replica_conn is None or not self.mysql_replica_conn.is_connected():
+                self.mysql_replica_conn = mysql.connector.connect(
+                    **MYSQL_REPLICA_CONFIG, connection_timeout=RESILIENCIA_CONFIG['timeout_conexion_segundos']
+                )
+        
         try:
+            resiliencia.circuito('mysql_replica').verificar(verificar, forzar=self.mysql_replica_conn is None)
+            return self.mysql_replica_conn
+        except resiliencia.CircuitoAbierto:
+            # Mientras la réplica está caída se lee del primario sin reintentarla
+            return self.conectar_mysql()
+        except mysql.connector.Error as e:
+            print(f"⚠️ Réplica MySQL no disponible, usando el primario: {e}")
+            return self.conectar_mysql()
+    
+    def conectar_mongodb(self, carga='primario'):
+        """
+        Conecta a MongoDB
+        
+        Args:
+            carga: Tipo de carga de MONGODB_LECTURA_CONFIG ('primario', 'informes');
+                   define la preferencia de lectura sobre el mismo cliente
+        """
+        def verificar():
+            # El cliente reconecta solo; el ping detecta que el servidor no responde
             if self.mongo_client is None:
+                from pymongo import MongoClient
                 connection_string = f"mongodb://{MONGODB_CONFIG['username']}:{MONGODB_CONFIG['password']}@{MONGODB_CONFIG['host']}:{MONGODB_CONFIG['port']}/"
-                self.mongo_client = MongoClient(connection_string)
+                timeout_ms = RESILIENCIA_CONFIG['timeout_conexion_segundos'] * 1000
+                opciones = {'serverSelectionTimeoutMS': timeout_ms, 'connectTimeoutMS': timeout_ms}
+                if MONGODB_LECTURA_CONFIG['replica_set']:
+                    opciones['replicaSet'] = MONGODB_LECTURA_CONFIG['replica_set']
+                self.mongo_client = MongoClient(connection_string, **opciones)
                 self.mongo_db = self.mongo_client[MONGODB_CONFIG['database']]
-            return self.mongo_db
+                self.mongo_dbs_lectura = {}
+            self.mongo_client.admin.command('ping')
+        
+        try:
+            resiliencia.circuito('mongodb').verificar(verificar, forzar=self.mongo_client is None)
+            
+            if carga == 'primario':
+                return instrumentacion.base_mongo(self.mongo_db)
+            
+            if carga not in self.mongo_dbs_lectura:
+                from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+                config = MONGODB_LECTURA_CONFIG['cargas'][carga]
+                preferencia = make_read_preference(
+                    read_pref_mode_from_name(config['modo']),
+                    None,
+                    max_staleness=config.get('max_staleness', -1)
+                )
+                self.mongo_dbs_lectura[carga] = self.mongo_db.with_options(read_preference=preferencia)
+            return instrumentacion.base_mongo(self.mongo_dbs_lectura[carga])
+        except resiliencia.CircuitoAbierto:
+            raise
         except Exception as e:
             print(f"❌ Error conectando a MongoDB: {e}")
             raise
     
     def conectar_redis(self):
-        """Conecta a Redis"""
-        try:
+        """Conecta a Redis (los comandos se reintentan con backoff ante un corte)"""
+        import redis
+        
+        def verificar():
             if self.redis_client is None:
-                self.redis_client = redis.Redis(**REDIS_CONFIG)
-                self.redis_client.ping()
-            return self.redis_client
+                from redis.backoff import ExponentialBackoff
+                from redis.retry import Retry
+                self.redis_client = redis.Redis(
+                    **REDIS_CONFIG,
+                    socket_connect_timeout=RESILIENCIA_CONFIG['timeout_conexion_segundos'],
+                    retry=Retry(ExponentialBackoff(cap=2, base=0.1), RESILIENCIA_CONFIG['reintentos_redis']),
+                    retry_on_error=[redis.ConnectionError, redis.TimeoutError]
+                )
+            self.redis_client.ping()
+        
+        try:
+            resiliencia.circuito('redis').verificar(verificar, forzar=self.redis_client is None)
+            return instrumentacion.cliente_redis(self.redis_client)
         except redis.RedisError as e:
             print(f"❌ Error conectando a Redis: {e}")
             raise
     
-    def get_mysql_cursor(self, dictionary=True):
-        """Obtiene un cursor de MySQL"""
-        conn = self.conectar_mysql()
-        return conn.cursor(dictionary=dictionary)
+    def get_mysql_cursor(self, dictionary=True, replica=False):
+        """
+        Obtiene un cursor de MySQL
+        
+        Args:
+            replica: Leer de la réplica (solo consultas; no hay commit)
+        """
+        conn = self.conectar_mysql_replica() if replica else self.conectar_mysql()
+        circuito = 'mysql_replica' if replica and conn is self.mysql_replica_conn else 'mysql'
+        return instrumentacion.cursor_mysql(conn.cursor(dictionary=dictionary), circuito)
+    
+    def verificar_salud(self):
+        """
+        Verifica cada motor con un ping, sin esperar el intervalo de verificación
+        
+        Returns:
+            Diccionario motor -> {ok, latencia_ms, error} más el estado de los circuitos
+        """
+        verificaciones = {
+            'mysql': self.conectar_mysql,
+            'mongodb': self.conectar_mongodb,
+            'redis': self.conectar_redis
+        }
+        salud = {}
+        for motor, conectar in verificaciones.items():
+            # Vencer el intervalo fuerza el ping (un circuito abierto no se toca)
+            resiliencia.circuito(motor).verificado_en = 0.0
+            inicio = time.perf_counter()
+            try:
+                conectar()
+                salud[motor] = {'ok': True, 'latencia_ms': round((time.perf_counter() - inicio) * 1000, 1)}
+            except Exception as e:
+                salud[motor] = {'ok': False, 'error': str(e)}
+        salud['circuitos'] = resiliencia.estado()
+        return salud
     
     def commit_mysql(self):
         """Hace commit en MySQL"""
@@ -82,10 +200,15 @@ class DatabaseManager:
             self.mysql_conn.close()
             self.mysql_conn = None
         
+        if self.mysql_replica_conn and self.mysql_replica_conn.is_connected():
+            self.mysql_replica_conn.close()
+            self.mysql_replica_conn = None
+        
         if self.mongo_client:
             self.mongo_client.close()
             self.mongo_client = None
             self.mongo_db = None
+            self.mongo_dbs_lectura = {}
         
         if self.redis_client:
             self.redis_client.close()
@@ -0,0 +1,312 @@
+"""
+Bus de eventos sobre Redis Streams
+Publica eventos con XADD y los entrega a callbacks usando consumer groups
+
+Cada sesión (proceso) lee con su propio consumer group, así todas las
+sesiones abiertas de un usuario reciben cada evento. El grupo de una
+sesión nueva arranca en el último evento que entregó la anterior
+(CLAVE_ENTREGADOS): lo publicado mientras el usuario no estaba conectado
+se entrega al suscribirse. Al cancelar la suscripción el grupo se elimina.
+Con un grupo explícito (suscribir(..., grupo=...)) los eventos se reparten
+entre los procesos que lo comparten, por ejemplo varios workers.
+
+Streams: notificaciones por usuario, procesos terminados (STREAM_PROCESOS)
+y alertas creadas (STREAM_ALERTAS).
+"""
+
+import json
+import os
+import socket
+import threading
+from config.db_config import REDIS_CONFIG, EVENTOS_CONFIG
+from utils.db_manager import db_manager
+from utils.logger import logger
+
+# Streams del sistema
+STREAM_PROCESOS = "eventos:procesos"
+STREAM_ALERTAS = "eventos:alertas"
+
+# Stream -> ID del último evento entregado por una sesión
+CLAVE_ENTREGADOS = "eventos:entregados"
+
+
+def stream_notificaciones(usuario_id: int) -> str:
+    """Nombre del stream de notificaciones de un usuario"""
+    return f"eventos:notificaciones:{usuario_id}"
+
+
+class EventBus:
+    """
+    Clase singleton que publica eventos en Redis Streams y mantiene
+    un único hilo de escucha por proceso que despacha a los callbacks
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(EventBus, cls).__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._suscripciones = {}   # (grupo, stream) -> [callbacks]
+        self._por_reclamar = set() # (grupo, stream) con pendientes a re-entregar
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._cliente = None
+        self.consumidor = f"{socket.gethostname()}-{os.getpid()}"
+        self.grupo_sesion = f"{EVENTOS_CONFIG['grupo']}:{self.consumidor}"
+        self._initialized = True
+
+    def publicar(self, stream: str, evento: dict, maxlen: int = None):
+        """
+        Publica un evento en un stream (XADD con MAXLEN aproximado)
+
+        Args:
+            stream: Nombre del stream
+            evento: Datos del evento (serializables a JSON)
+            maxlen: Longitud máxima aproximada del stream
+
+        Returns:
+            ID del evento o None si falló
+        """
+        try:
+            redis_client = db_manager.conectar_redis()
+            return redis_client.xadd(
+                stream,
+                {'evento': json.dumps(evento, default=str)},
+                maxlen=maxlen or EVENTOS_CONFIG['maxlen'],
+                approximate=True
+            )
+        except Exception as e:
+            logger.error("Error publicando evento en %s: %s", stream, e)
+            return None
+
+    def suscribir(self, stream: str, callback, grupo: str = None):
+        """
+        Registra un callback para un stream y arranca el hilo de escucha
+
+        Los eventos publicados mientras no había suscriptores se entregan
+        al suscribirse: el grupo de la sesión arranca donde terminó la
+        sesión anterior.
+
+        Args:
+            stream: Nombre del stream
+            callback: Función que recibe el evento (dict)
+            grupo: Consumer group compartido, para repartir los eventos
+                entre procesos (por defecto el de esta sesión, que los
+                recibe todos)
+
+        Returns:
+            Hilo de escucha
+        """
+        grupo = grupo or self.grupo_sesion
+
+        with self._lock:
+            self._suscripciones.setdefault((grupo, stream), []).append(callback)
+            self._por_reclamar.add((grupo, stream))
+
+        self._iniciar_hilo()
+        return self._hilo
+
+    def cancelar_suscripcion(self, stream: str, callback, grupo: str = None):
+        """Quita un callback de un stream (sin callbacks, elimina el grupo de la sesión)"""
+        grupo = grupo or self.grupo_sesion
+
+        with self._lock:
+            callbacks = self._suscripciones.get((grupo, stream), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if callbacks:
+                return
+            self._suscripciones.pop((grupo, stream), None)
+            self._por_reclamar.discard((grupo, stream))
+
+        if grupo == self.grupo_sesion:
+            self._eliminar_grupos([stream])
+
+    def detener(self):
+        """Detiene el hilo de escucha y elimina los grupos de la sesión"""
+        self._detener.set()
+        if self._hilo and self._hilo.is_alive():
+            self._hilo.join(timeout=EVENTOS_CONFIG['block_ms'] / 1000 + 1)
+        self._hilo = None
+        self._cerrar_cliente()
+
+        with self._lock:
+            streams = [stream for grupo, stream in self._suscripciones if grupo == self.grupo_sesion]
+        self._eliminar_grupos(streams)
+
+    def _eliminar_grupos(self, streams):
+        """XGROUP DESTROY del grupo de la sesión en cada stream"""
+        if not streams:
+            return
+        try:
+            redis_client = db_manager.conectar_redis()
+            for stream in streams:
+                redis_client.xgroup_destroy(stream, self.grupo_sesion)
+        except Exception as e:
+            logger.warning("No se pudo eliminar el grupo %s: %s", self.grupo_sesion, e)
+
+    def _iniciar_hilo(self):
+        """Arranca el hilo de escucha si no está corriendo"""
+        with self._lock:
+            if self._hilo and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._escuchar, name="event-bus", daemon=True)
+            self._hilo.start()
+
+    def _conectar(self):
+        """Conexión dedicada del hilo (las lecturas bloqueantes no comparten el cliente global)"""
+        if self._cliente is None:
+            import redis
+            self._cliente = redis.Redis(**REDIS_CONFIG)
+            self._cliente.ping()
+        return self._cliente
+
+    def _cerrar_cliente(self):
+        if self._cliente is not None:
+            try:
+                self._cliente.close()
+            except Exception:
+                pass
+            self._cliente = None
+
+    def _asegurar_grupo(self, redis_client, grupo, stream):
+        """
+        Crea el consumer group si no existe: el de la sesión desde el último
+        evento entregado por una sesión anterior, los compartidos desde el
+        inicio del stream
+        """
+        import redis
+
+        desde = '0'
+        if grupo == self.grupo_sesion:
+            desde = redis_client.hget(CLAVE_ENTREGADOS, stream) or '0'
+
+        try:
+            redis_client.xgroup_create(stream, grupo, id=desde, mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def _escuchar(self):
+        """Bucle del hilo: lee de todos los streams suscriptos y despacha"""
+        # El driver se importa con el primer suscriptor, no al importar el módulo
+        import redis
+
+        espera = 1
+
+        while not self._detener.is_set():
+            try:
+                redis_client = self._conectar()
+
+                with self._lock:
+                    por_reclamar = list(self._por_reclamar)
+                    self._por_reclamar.clear()
+                    por_grupo = {}
+                    for grupo, stream in self._suscripciones:
+                        por_grupo.setdefault(grupo, []).append(stream)
+
+                # Re-entregar lo que quedó sin confirmar (reconexión o suscripción nueva)
+                for grupo, stream in por_reclamar:
+                    self._asegurar_grupo(redis_client, grupo, stream)
+                    self._reentregar_pendientes(redis_client, grupo, stream)
+
+                if not por_grupo:
+                    self._detener.wait(0.5)
+                    continue
+
+                # Un XREADGROUP por grupo, repartiendo el tiempo de bloqueo
+                block = max(100, EVENTOS_CONFIG['block_ms'] // len(por_grupo))
+                for grupo, streams in por_grupo.items():
+                    respuesta = redis_client.xreadgroup(
+                        grupo, self.consumidor,
+                        {stream: '>' for stream in streams},
+                        count=100, block=block
+                    )
+                    self._despachar(redis_client, grupo, respuesta)
+
+                espera = 1
+
+            except redis.ResponseError as e:
+                if 'NOGROUP' in str(e):
+                    # El stream o el grupo fueron eliminados: recrearlos
+                    with self._lock:
+                        self._por_reclamar.update(self._suscripciones.keys())
+                    continue
+                logger.error("Error en bus de eventos: %s", e)
+                self._detener.wait(espera)
+                espera = min(espera * 2, 30)
+
+            except redis.RedisError as e:
+                logger.warning("Bus de eventos desconectado, reintentando en %ss: %s", espera, e)
+                self._cerrar_cliente()
+                with self._lock:
+                    self._por_reclamar.update(self._suscripciones.keys())
+                self._detener.wait(espera)
+                espera = min(espera * 2, 30)
+
+    def _reentregar_pendientes(self, redis_client, grupo, stream):
+        """Reclama eventos abandonados por otros consumidores y re-entrega los propios"""
+        redis_client.xautoclaim(
+            stream, grupo, self.consumidor,
+            min_idle_time=EVENTOS_CONFIG['reclamo_ms'],
+            start_id='0-0', count=100
+        )
+
+        ultimo_id = '0'
+        while True:
+            respuesta = redis_client.xreadgroup(
+                grupo, self.consumidor, {stream: ultimo_id}, count=100
+            )
+            if not respuesta or not respuesta[0][1]:
+                break
+            self._despachar(redis_client, grupo, respuesta)
+            ultimo_id = respuesta[0][1][-1][0]
+
+    def _despachar(self, redis_client, grupo, respuesta):
+        """Entrega los eventos a los callbacks y confirma (XACK) los procesados"""
+        for stream, eventos in respuesta or []:
+            with self._lock:
+                callbacks = list(self._suscripciones.get((grupo, stream), []))
+            ultimo_entregado = None
+
+            for evento_id, campos in eventos:
+                if not campos:
+                    # Evento recortado por MAXLEN mientras estaba pendiente
+                    redis_client.xack(stream, grupo, evento_id)
+                    continue
+
+                try:
+                    evento = json.loads(campos.get('evento', '{}'))
+                except ValueError:
+                    redis_client.xack(stream, grupo, evento_id)
+                    continue
+
+                entregado = True
+                for callback in callbacks:
+                    try:
+                        callback(evento)
+                    except Exception as e:
+                        entregado = False
+                        logger.error("Error en callback de %s: %s", stream, e)
+
+                # Sin confirmar queda pendiente y se re-entrega en la próxima reconexión
+                if entregado:
+                    redis_client.xack(stream, grupo, evento_id)
+                    ultimo_entregado = evento_id
+
+            # La próxima sesión del usuario arranca después de lo ya entregado
+            if ultimo_entregado and grupo == self.grupo_sesion:
+                redis_client.hset(CLAVE_ENTREGADOS, stream, ultimo_entregado)
+
+
+# Instancia global
+event_bus = EventBus()
@@ -0,0 +1,568 @@
+"""
+Instrumentación de las llamadas a bases de datos
+Envuelve los cursores MySQL, las colecciones MongoDB y el cliente Redis que
+entrega db_manager y registra por (motor, operación, origen) la cantidad de
+llamadas, errores, filas/documentos devueltos y un histograma de latencia.
+
+El origen es el método de servicio en curso (clases marcadas con
+@instrumentar). Además se registra cuántas consultas hace cada llamada a
+un método: un N+1 aparece como un pico de consultas por operación.
+
+Las métricas se exportan en formato de texto de Prometheus (servir) o como
+volcado JSON periódico (volcar_json). Los errores de conexión se informan
+además al circuito del motor (utils/resiliencia.py).
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from config.db_config import INSTRUMENTACION_CONFIG
+from utils import resiliencia
+
+# Límites de los histogramas
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+# Métodos de pymongo que se miden (el resto se delega sin medir)
+OPERACIONES_MONGO = {
+    'find', 'find_one', 'aggregate', 'count_documents', 'estimated_document_count',
+    'distinct', 'insert_one', 'insert_many', 'update_one', 'update_many',
+    'replace_one', 'delete_one', 'delete_many', 'bulk_write',
+    'find_one_and_update', 'find_one_and_delete', 'find_one_and_replace'
+}
+
+_SIN_ORIGEN = "-"
+_COMENTARIO_SQL = re.compile(r"^\s*(/\*.*?\*/\s*)*", re.S)
+
+_lock = threading.Lock()
+_llamadas = {}
+_operaciones = {}
+_ultimo_volcado = {'momento': time.monotonic()}
+
+# Operación de servicio en curso (se copia a los hilos de particiones.consultar)
+_operacion = contextvars.ContextVar('operacion_instrumentada', default=None)
+
+
+class _Histograma:
+    """Conteos acumulados por bucket, suma y total"""
+
+    __slots__ = ('limites', 'buckets', 'suma', 'total', 'maximo')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.buckets = [0] * len(limites)
+        self.suma = 0
+        self.total = 0
+        self.maximo = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.buckets[i] += 1
+                break
+        self.suma += valor
+        self.total += 1
+        self.maximo = max(self.maximo, valor)
+
+    def acumulados(self):
+        """(límite, conteo acumulado) al estilo Prometheus, con +Inf al final"""
+        acumulado = 0
+        for limite, cantidad in zip(self.limites, self.buckets):
+            acumulado += cantidad
+            yield limite, acumulado
+        yield '+Inf', self.total
+
+
+class _Llamadas:
+    __slots__ = ('latencia', 'errores', 'resultados')
+
+    def __init__(self):
+        self.latencia = _Histograma(BUCKETS_SEGUNDOS)
+        self.errores = 0
+        self.resultados = 0
+
+
+class _Operacion:
+    """
+    Método de servicio en ejecución; cuenta las consultas que hace, incluidas
+    las de otros métodos instrumentados que llame
+    """
+
+    __slots__ = ('nombre', 'consultas', 'padre')
+
+    def __init__(self, nombre, padre):
+        self.nombre = nombre
+        self.consultas = 0
+        self.padre = padre
+
+
+class _Medicion:
+    """
+    Una llamada en curso; los cursores suman el tiempo y las filas de cada
+    fetch y la medición se registra una sola vez al terminar
+    """
+
+    __slots__ = ('clave', 'circuito', 'segundos', 'resultados', 'error', 'abierta')
+
+    def __init__(self, motor, operacion, circuito=None):
+        actual = _operacion.get()
+        self.clave = (motor, operacion, actual.nombre if actual else _SIN_ORIGEN)
+        self.circuito = circuito or motor
+        self.segundos = 0.0
+        self.resultados = 0
+        self.error = False
+        self.abierta = True
+        with _lock:
+            while actual:
+                actual.consultas += 1
+                actual = actual.padre
+
+    def fallar(self, error):
+        """Marca la llamada con error; los de conexión van al circuito del motor"""
+        self.error = True
+        resiliencia.reportar_error(self.circuito, error)
+
+    def finalizar(self):
+        if not self.abierta:
+            return
+        self.abierta = False
+        with _lock:
+            llamadas = _llamadas.get(self.clave)
+            if llamadas is None:
+                llamadas = _llamadas[self.clave] = _Llamadas()
+            llamadas.latencia.observar(self.segundos)
+            llamadas.resultados += self.resultados
+            if self.error:
+                llamadas.errores += 1
+
+
+def _medir(motor, operacion, funcion, *args, **kwargs):
+    """Ejecuta una llamada sin cursor y la registra"""
+    medicion = _Medicion(motor, operacion)
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion(*args, **kwargs)
+    except Exception as e:
+        medicion.segundos = time.perf_counter() - inicio
+        medicion.fallar(e)
+        medicion.finalizar()
+        raise
+    medicion.segundos = time.perf_counter() - inicio
+    if isinstance(resultado, (list, dict)):
+        medicion.resultados = len(resultado)
+    elif resultado is not None and not isinstance(resultado, (int, float, bool, str)):
+        medicion.resultados = 1
+    medicion.finalizar()
+    return resultado
+
+
+def _envolver_metodo(nombre, funcion):
+    @functools.wraps(funcion)
+    def envuelto(*args, **kwargs):
+        operacion = _Operacion(nombre, _operacion.get())
+        token = _operacion.set(operacion)
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            _operacion.reset(token)
+            with _lock:
+                histograma = _operaciones.get(nombre)
+                if histograma is None:
+                    histograma = _operaciones[nombre] = _Histograma(BUCKETS_CONSULTAS)
+                histograma.observar(operacion.consultas)
+    return envuelto
+
+
+def instrumentar(clase):
+    """
+    Decorador de clase: cada método estático pasa a ser un origen de
+    métricas (Clase.metodo). Los generadores se dejan como están porque su
+    cuerpo corre después de retornar.
+    """
+    if not INSTRUMENTACION_CONFIG['habilitado']:
+        return clase
+
+    for nombre, atributo in list(vars(clase).items()):
+        if isinstance(atributo, staticmethod) and not inspect.isgeneratorfunction(atributo.__func__):
+            setattr(clase, nombre, staticmethod(
+                _envolver_metodo(f"{clase.__name__}.{nombre}", atributo.__func__)
+            ))
+    return clase
+
+
+class _CursorMySQL:
+    """Cursor que mide cada execute junto con sus fetch"""
+
+    _cursor = None
+    _circuito = None
+    _medicion = None
+
+    def __init__(self, cursor, circuito):
+        self._cursor = cursor
+        self._circuito = circuito
+        self._medicion = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def _terminar(self):
+        if self._medicion:
+            self._medicion.finalizar()
+            self._medicion = None
+
+    def _ejecutar(self, metodo, consulta, *args, **kwargs):
+        self._terminar()
+        sentencia = _COMENTARIO_SQL.sub('', consulta, count=1).split(None, 1)
+        self._medicion = _Medicion('mysql', sentencia[0].lower() if sentencia else metodo, self._circuito)
+        inicio = time.perf_counter()
+        try:
+            return getattr(self._cursor, metodo)(consulta, *args, **kwargs)
+        except Exception as e:
+            self._medicion.fallar(e)
+            raise
+        finally:
+            self._medicion.segundos += time.perf_counter() - inicio
+            if self._cursor.rowcount and self._cursor.rowcount > 0 and not self._cursor.with_rows:
+                self._medicion.resultados += self._cursor.rowcount
+
+    def execute(self, consulta, *args, **kwargs):
+        return self._ejecutar('execute', consulta, *args, **kwargs)
+
+    def executemany(self, consulta, *args, **kwargs):
+        return self._ejecutar('executemany', consulta, *args, **kwargs)
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            resultado = getattr(self._cursor, metodo)(*args)
+        except Exception as e:
+            if self._medicion:
+                self._medicion.fallar(e)
+            raise
+        if self._medicion:
+            self._medicion.segundos += time.perf_counter() - inicio
+            if isinstance(resultado, list):
+                self._medicion.resultados += len(resultado)
+            elif resultado is not None:
+                self._medicion.resultados += 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer('fetchone')
+
+    def fetchall(self):
+        return self._leer('fetchall')
+
+    def fetchmany(self, *args):
+        return self._leer('fetchmany', *args)
+
+    def close(self):
+        self._terminar()
+        return self._cursor.close()
+
+    def __del__(self):
+        self._terminar()
+
+
+def cursor_mysql(cursor, circuito='mysql'):
+    """
+    Cursor MySQL instrumentado (o el original si está deshabilitado)
+
+    Args:
+        circuito: Circuito al que se informan los errores de conexión
+            ('mysql' o 'mysql_replica')
+    """
+    return _CursorMySQL(cursor, circuito) if INSTRUMENTACION_CONFIG['habilitado'] else cursor
+
+
+class _CursorMongo:
+    """Cursor de find/aggregate: mide la llamada más la lectura de los documentos"""
+
+    _cursor = None
+    _medicion = None
+
+    def __init__(self, cursor, medicion):
+        self._cursor = cursor
+        self._medicion = medicion
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._cursor, nombre)
+        if not callable(atributo):
+            return atributo
+
+        # sort(), limit(), etc. devuelven el mismo cursor: seguir envuelto
+        def encadenar(*args, **kwargs):
+            resultado = atributo(*args, **kwargs)
+            return self if resultado is self._cursor else resultado
+        return encadenar
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            documento = next(self._cursor)
+        except StopIteration:
+            self._medicion.segundos += time.perf_counter() - inicio
+            self._medicion.finalizar()
+            raise
+        except Exception as e:
+            self._medicion.fallar(e)
+            self._medicion.finalizar()
+            raise
+        self._medicion.segundos += time.perf_counter() - inicio
+        self._medicion.resultados += 1
+        return documento
+
+    def close(self):
+        self._medicion.finalizar()
+        return self._cursor.close()
+
+    def __del__(self):
+        if self._medicion:
+            self._medicion.finalizar()
+
+
+class _ColeccionMongo:
+    """Colección con las operaciones de OPERACIONES_MONGO medidas"""
+
+    def __init__(self, coleccion):
+        self._coleccion = coleccion
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._coleccion, nombre)
+        if nombre not in OPERACIONES_MONGO:
+            return atributo
+
+        if nombre in ('find', 'aggregate'):
+            def con_cursor(*args, **kwargs):
+                medicion = _Medicion('mongodb', f"{self._coleccion.name}.{nombre}")
+                inicio = time.perf_counter()
+                try:
+                    cursor = atributo(*args, **kwargs)
+                except Exception as e:
+                    medicion.segundos = time.perf_counter() - inicio
+                    medicion.fallar(e)
+                    medicion.finalizar()
+                    raise
+                medicion.segundos = time.perf_counter() - inicio
+                return _CursorMongo(cursor, medicion)
+            return con_cursor
+
+        return functools.partial(_medir, 'mongodb', f"{self._coleccion.name}.{nombre}", atributo)
+
+
+class _BaseMongo:
+    """Base de datos cuyas colecciones salen instrumentadas"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._db, nombre)
+        return _ColeccionMongo(atributo) if _es_coleccion(atributo) else atributo
+
+    def __getitem__(self, nombre):
+        return _ColeccionMongo(self._db[nombre])
+
+    def get_collection(self, nombre, *args, **kwargs):
+        return _ColeccionMongo(self._db.get_collection(nombre, *args, **kwargs))
+
+
+def _es_coleccion(objeto):
+    # Por nombre: vale para pymongo y para mongomock (benchmarks --simulado)
+    return type(objeto).__name__ == 'Collection'
+
+
+def base_mongo(db):
+    """Base MongoDB instrumentada (o la original si está deshabilitado)"""
+    return _BaseMongo(db) if INSTRUMENTACION_CONFIG['habilitado'] else db
+
+
+class _PipelineRedis:
+    """Pipeline: se mide el execute (un viaje por todos los comandos)"""
+
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+
+    def __getattr__(self, nombre):
+        return getattr(self._pipeline, nombre)
+
+    def execute(self, *args, **kwargs):
+        return _medir('redis', 'pipeline', self._pipeline.execute, *args, **kwargs)
+
+
+class _ScriptRedis:
+    def __init__(self, script):
+        self._script = script
+
+    def __call__(self, *args, **kwargs):
+        return _medir('redis', 'evalsha', self._script, *args, **kwargs)
+
+
+class _ClienteRedis:
+    """Cliente Redis con cada comando medido"""
+
+    def __init__(self, cliente):
+        self._cliente = cliente
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._cliente, nombre)
+        if not callable(atributo) or nombre.startswith('_') or nombre in ('close', 'scan_iter'):
+            return atributo
+        if nombre == 'pipeline':
+            return lambda *args, **kwargs: _PipelineRedis(atributo(*args, **kwargs))
+        if nombre == 'register_script':
+            return lambda *args, **kwargs: _ScriptRedis(atributo(*args, **kwargs))
+        return functools.partial(_medir, 'redis', nombre, atributo)
+
+
+def cliente_redis(cliente):
+    """Cliente Redis instrumentado (o el original si está deshabilitado)"""
+    return _ClienteRedis(cliente) if INSTRUMENTACION_CONFIG['habilitado'] else cliente
+
+
+def resumen():
+    """
+    Métricas acumuladas del proceso
+
+    Returns:
+        Diccionario con 'llamadas' (por motor, operación y origen) y
+        'operaciones' (consultas por llamada a cada método de servicio)
+    """
+    with _lock:
+        llamadas = [
+            {
+                'motor': motor, 'operacion': operacion, 'origen': origen,
+                'llamadas': datos.latencia.total, 'errores': datos.errores,
+                'resultados': datos.resultados,
+                'segundos': round(datos.latencia.suma, 6),
+                'maximo_segundos': round(datos.latencia.maximo, 6),
+                'buckets': dict(datos.latencia.acumulados())
+            }
+            for (motor, operacion, origen), datos in _llamadas.items()
+        ]
+        operaciones = [
+            {
+                'origen': origen, 'llamadas': datos.total, 'consultas': datos.suma,
+                'consultas_por_llamada': round(datos.suma / datos.total, 2) if datos.total else 0,
+                'maximo_consultas': datos.maximo
+            }
+            for origen, datos in _operaciones.items()
+        ]
+    return {'pid': os.getpid(), 'llamadas': llamadas, 'operaciones': operaciones}
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(**valores):
+    return ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in valores.items())
+
+
+def prometheus():
+    """Métricas en formato de texto de Prometheus"""
+    lineas = [
+        "# HELP sensores_db_segundos Latencia de las llamadas a bases de datos",
+        "# TYPE sensores_db_segundos histogram"
+    ]
+    errores = []
+    resultados = []
+    with _lock:
+        for (motor, operacion, origen), datos in sorted(_llamadas.items()):
+            etiquetas = _etiquetas(motor=motor, operacion=operacion, origen=origen)
+            for limite, acumulado in datos.latencia.acumulados():
+                lineas.append(f'sensores_db_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"sensores_db_segundos_sum{{{etiquetas}}} {datos.latencia.suma}")
+            lineas.append(f"sensores_db_segundos_count{{{etiquetas}}} {datos.latencia.total}")
+            errores.append(f"sensores_db_errores_total{{{etiquetas}}} {datos.errores}")
+            resultados.append(f"sensores_db_resultados_total{{{etiquetas}}} {datos.resultados}")
+
+        lineas += ["# HELP sensores_db_errores_total Llamadas a bases de datos con error",
+                   "# TYPE sensores_db_errores_total counter"] + errores
+        lineas += ["# HELP sensores_db_resultados_total Filas o documentos devueltos o modificados",
+                   "# TYPE sensores_db_resultados_total counter"] + resultados
+
+        lineas += ["# HELP sensores_operacion_consultas Consultas por llamada a un método de servicio",
+                   "# TYPE sensores_operacion_consultas histogram"]
+        for origen, datos in sorted(_operaciones.items()):
+            etiquetas = _etiquetas(origen=origen)
+            for limite, acumulado in datos.acumulados():
+                lineas.append(f'sensores_operacion_consultas_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"sensores_operacion_consultas_sum{{{etiquetas}}} {datos.suma}")
+            lineas.append(f"sensores_operacion_consultas_count{{{etiquetas}}} {datos.total}")
+
+    return "\n".join(lineas) + "\n"
+
+
+def servir(puerto=None):
+    """
+    Expone /metrics en un hilo de fondo (http.server se importa solo aquí)
+
+    Returns:
+        El servidor HTTP (None si no hay puerto configurado)
+    """
+    puerto = puerto or INSTRUMENTACION_CONFIG['puerto']
+    if not puerto or not INSTRUMENTACION_CONFIG['habilitado']:
+        return None
+
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _ManejadorMetricas(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('0.0.0.0', puerto), _ManejadorMetricas)
+    threading.Thread(target=servidor.serve_forever, name='metricas', daemon=True).start()
+    return servidor
+
+
+def volcar_json(directorio=None):
+    """
+    Escribe el resumen en metricas_<pid>.json (acumulado, escritura atómica)
+
+    Returns:
+        Ruta del archivo
+    """
+    directorio = Path(directorio or INSTRUMENTACION_CONFIG['directorio'])
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta = directorio / f"metricas_{os.getpid()}.json"
+    temporal = ruta.with_suffix('.tmp')
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump({'generado_en': time.time(), **resumen()}, archivo, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+    _ultimo_volcado['momento'] = time.monotonic()
+    return ruta
+
+
+def volcado_vencido():
+    """Indica si corresponde un nuevo volcado JSON"""
+    if not INSTRUMENTACION_CONFIG['habilitado'] or not INSTRUMENTACION_CONFIG['volcado_segundos']:
+        return False
+    return time.monotonic() - _ultimo_volcado['momento'] >= INSTRUMENTACION_CONFIG['volcado_segundos']
+
+
+def reiniciar():
+    """Descarta las métricas acumuladas"""
+    with _lock:
+        _llamadas.clear()
+        _operaciones.clear()
@@ -1,11 +1,111 @@
 """
 Sistema de logging para el sistema de sensores
+Registros estructurados (una línea JSON por evento) escritos por un hilo
+aparte: el código que loguea solo encola el registro, y el formateo, la
+escritura a disco y la rotación diaria con compresión ocurren en el
+QueueListener. Los ids de correlación (solicitud_id, usuario_id, ...) se
+toman del contexto en curso (ver contexto y agregar_contexto).
+El directorio, los handlers y el hilo se crean con el primer registro, no
+al importar el módulo.
 """
 
+import atexit
+import contextvars
+import json
 import logging
-from datetime import datetime
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from pathlib import Path
-from colorama import Fore, Style
+from config.db_config import LOG_CONFIG
+
+# Ids de correlación del contexto en curso (se copian a los hilos con
+# contextvars.copy_context, como en particiones.consultar)
+_contexto = contextvars.ContextVar('contexto_log', default={})
+
+# Atributos estándar de LogRecord que no se repiten como campos del JSON
+_ATRIBUTOS_RECORD = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'contexto', 'campos'}
+
+# Argumentos que se pueden formatear más tarde en el hilo de escritura
+# (no cambian entre que se encola el registro y se escribe)
+_ESCALARES = (str, bytes, int, float, type(None), datetime, date, timedelta, Decimal)
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro: momento, nivel, mensaje, contexto y campos"""
+
+    def format(self, record):
+        evento = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'hilo': record.threadName,
+            **getattr(record, 'contexto', {}),
+            **getattr(record, 'campos', {})
+        }
+        evento.update({
+            clave: valor for clave, valor in vars(record).items()
+            if clave not in _ATRIBUTOS_RECORD and clave not in evento
+        })
+        if record.exc_info:
+            evento['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+class _ColaNoBloqueante(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin formatear: el mensaje se arma (record.getMessage)
+    en el hilo de escritura. Si algún argumento no es un escalar inmutable
+    (un dict, una lista, una excepción) el mensaje se arma antes de
+    encolar, para no escribir el objeto como quedó después de modificarse.
+    Si la cola está llena el registro se descarta y se informa la cantidad
+    en el siguiente que entra.
+    """
+
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+        self._lock_descartes = threading.Lock()
+
+    def prepare(self, record):
+        record.contexto = _contexto.get()
+        args = record.args.values() if isinstance(record.args, dict) else record.args or ()
+        if not all(isinstance(arg, _ESCALARES) for arg in args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        with self._lock_descartes:
+            if self.descartados:
+                record.descartados_previos = self.descartados
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_descartes:
+                self.descartados += 1
+            return
+        if getattr(record, 'descartados_previos', None):
+            with self._lock_descartes:
+                self.descartados -= record.descartados_previos
+
+
+def _nombre_comprimido(nombre):
+    return nombre + ".gz"
+
+
+def _comprimir(origen, destino):
+    """Rotador: comprime el archivo rotado (corre en el hilo de escritura)"""
+    import gzip
+    with open(origen, 'rb') as entrada, gzip.open(destino, 'wb') as salida:
+        shutil.copyfileobj(entrada, salida)
+    os.remove(origen)
 
 
 class SistemaLogger:
@@ -13,82 +113,130 @@ class SistemaLogger:
     
     _instancia = None
     _logger = None
+    _listener = None
+    _lock_inicio = threading.Lock()
     
     def __new__(cls):
         if cls._instancia is None:
             cls._instancia = super(SistemaLogger, cls).__new__(cls)
-            cls._instancia._inicializar()
         return cls._instancia
     
+    def _asegurar(self):
+        """Inicializa el logger con el primer registro"""
+        if self._logger is None:
+            with self._lock_inicio:
+                if self._logger is None:
+                    self._inicializar()
+        return self._logger
+    
     def _inicializar(self):
         """Inicializa el logger"""
         # Crear directorio de logs
-        directorio_logs = Path("logs")
-        directorio_logs.mkdir(exist_ok=True)
+        directorio_logs = Path(LOG_CONFIG['directorio'])
+        directorio_logs.mkdir(parents=True, exist_ok=True)
         
-        # Configurar logger
-        self._logger = logging.getLogger('sistema_sensores')
-        self._logger.setLevel(logging.INFO)
+        # Configurar logger (se publica en self._logger al final, ya con handlers)
+        log = logging.getLogger('sistema_sensores')
+        log.setLevel(LOG_CONFIG['nivel'])
+        log.propagate = False
         
         # Evitar duplicados
-        if not self._logger.handlers:
-            # Handler para archivo
-            archivo_log = directorio_logs / f"sistema_{datetime.now().strftime('%Y%m%d')}.log"
-            file_handler = logging.FileHandler(archivo_log, encoding='utf-8')
-            file_handler.setLevel(logging.INFO)
+        if not log.handlers:
+            # Archivo JSON que rota a medianoche; los rotados se comprimen
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                directorio_logs / "sistema.log",
+                when='midnight',
+                backupCount=LOG_CONFIG['dias_retencion'],
+                encoding='utf-8',
+                delay=True
+            )
+            file_handler.namer = _nombre_comprimido
+            file_handler.rotator = _comprimir
+            file_handler.setFormatter(FormatoJSON())
             
-            # Handler para consola (solo en modo debug)
+            # Handler para consola (solo advertencias y errores)
             console_handler = logging.StreamHandler()
             console_handler.setLevel(logging.WARNING)
-            
-            # Formato
-            formato = logging.Formatter(
+            console_handler.setFormatter(logging.Formatter(
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S'
-            )
+            ))
             
-            file_handler.setFormatter(formato)
-            console_handler.setFormatter(formato)
-            
-            self._logger.addHandler(file_handler)
-            self._logger.addHandler(console_handler)
+            # El logger solo encola; el listener escribe desde su hilo
+            cola = queue.Queue(maxsize=LOG_CONFIG['cola_maxima'])
+            log.addHandler(_ColaNoBloqueante(cola))
+            self._listener = logging.handlers.QueueListener(
+                cola, file_handler, console_handler, respect_handler_level=True
+            )
+            self._listener.start()
+            atexit.register(self.detener)
+        
+        self._logger = log
+    
+    def detener(self):
+        """Vacía la cola y detiene el hilo de escritura"""
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
     
-    def info(self, mensaje: str, usuario_id: int = None):
-        """Registra un mensaje informativo"""
+    def _registrar(self, nivel, mensaje, args, usuario_id, campos, exc_info=None):
+        # El chequeo de nivel evita crear el registro si no se va a escribir
+        log = self._asegurar()
+        if not log.isEnabledFor(nivel):
+            return
         if usuario_id:
-            mensaje = f"[Usuario {usuario_id}] {mensaje}"
-        self._logger.info(mensaje)
+            campos = {'usuario_id': usuario_id, **campos}
+        log.log(nivel, mensaje, *args, exc_info=exc_info, extra={'campos': campos})
+    
+    def info(self, mensaje: str, *args, usuario_id: int = None, **campos):
+        """
+        Registra un mensaje informativo
+        
+        Args:
+            mensaje: Texto con %s para los args (se arma solo si se escribe)
+            campos: Campos adicionales del registro JSON
+        """
+        self._registrar(logging.INFO, mensaje, args, usuario_id, campos)
     
-    def warning(self, mensaje: str, usuario_id: int = None):
+    def warning(self, mensaje: str, *args, usuario_id: int = None, **campos):
         """Registra una advertencia"""
-        if usuario_id:
-            mensaje = f"[Usuario {usuario_id}] {mensaje}"
-        self._logger.warning(mensaje)
+        self._registrar(logging.WARNING, mensaje, args, usuario_id, campos)
     
-    def error(self, mensaje: str, usuario_id: int = None, excepcion: Exception = None):
-        """Registra un error"""
-        if usuario_id:
-            mensaje = f"[Usuario {usuario_id}] {mensaje}"
-        if excepcion:
-            mensaje = f"{mensaje} - {str(excepcion)}"
-        self._logger.error(mensaje, exc_info=excepcion is not None)
+    def error(self, mensaje: str, *args, usuario_id: int = None, excepcion: Exception = None, **campos):
+        """Registra un error (con el traceback de la excepción, si se indica)"""
+        exc_info = (type(excepcion), excepcion, excepcion.__traceback__) if excepcion else None
+        self._registrar(logging.ERROR, mensaje, args, usuario_id, campos, exc_info)
     
-    def debug(self, mensaje: str, usuario_id: int = None):
+    def debug(self, mensaje: str, *args, usuario_id: int = None, **campos):
         """Registra un mensaje de debug"""
-        if usuario_id:
-            mensaje = f"[Usuario {usuario_id}] {mensaje}"
-        self._logger.debug(mensaje)
+        self._registrar(logging.DEBUG, mensaje, args, usuario_id, campos)
     
     def log_operacion(self, operacion: str, usuario_id: int, detalles: dict = None):
-        """Registra una operación del sistema"""
-        mensaje = f"Operación: {operacion}"
-        if detalles:
-            detalles_str = ", ".join([f"{k}={v}" for k, v in detalles.items()])
-            mensaje = f"{mensaje} - {detalles_str}"
-        self.info(mensaje, usuario_id)
+        """Registra una operación del sistema (los detalles van como campos)"""
+        self._registrar(logging.INFO, "Operación: %s", (operacion,), usuario_id,
+                        {'operacion': operacion, **(detalles or {})})
+    
+    @staticmethod
+    @contextmanager
+    def contexto(**ids):
+        """
+        Ids de correlación para todos los registros del bloque
+        
+        Ejemplo:
+            with logger.contexto(solicitud_id=15, usuario_id=3):
+                ...
+        """
+        token = _contexto.set({**_contexto.get(), **ids})
+        try:
+            yield
+        finally:
+            _contexto.reset(token)
+    
+    @staticmethod
+    def agregar_contexto(**ids):
+        """Suma ids al contexto en curso (dentro de un bloque contexto, hasta que termine)"""
+        _contexto.set({**_contexto.get(), **ids})
 
 
 # Instancia global
 logger = SistemaLogger()
-
-
@@ -176,3 +176,56 @@ def mostrar_usuario_info(user_data):
     print(f"\n{Fore.GREEN}Usuario: {user_data['nombre']}")
     print(f"{Fore.GREEN}Email: {user_data['email']}")
     print(f"{Fore.GREEN}Rol(es): {', '.join(user_data['roles'])}\n")
+
+def navegar_por_cursor(titulo, obtener_pagina, mostrar_items):
+    """
+    Navega una lista paginada por cursor (keyset), pidiendo cada página al servicio
+    
+    Args:
+        titulo: Título de la pantalla
+        obtener_pagina: Función cursor -> (items, siguiente_cursor); cursor None es la primera página
+        mostrar_items: Función que imprime los items de una página; recibe (items, numero_inicial)
+    """
+    # Pila de cursores de las páginas visitadas (para volver atrás)
+    cursores = [None]
+    numero_inicial = [1]
+    
+    while True:
+        limpiar_pantalla()
+        mostrar_titulo(titulo)
+        
+        items, siguiente = obtener_pagina(cursores[-1])
+        
+        if not items and len(cursores) == 1:
+            mostrar_info("No hay elementos para mostrar")
+            pausar()
+            return
+        
+        mostrar_items(items, numero_inicial[-1])
+        print(f"{Fore.YELLOW}Página {len(cursores)}{Style.RESET_ALL}\n")
+        
+        opciones = []
+        if siguiente:
+            opciones.append((1, "Página siguiente"))
+        if len(cursores) > 1:
+            opciones.append((2, "Página anterior"))
+        
+        if not opciones:
+            pausar()
+            return
+        
+        for opcion, descripcion in opciones:
+            print(f"  {Fore.GREEN}{opcion}.{Style.RESET_ALL} {descripcion}")
+        print(f"  {Fore.RED}0.{Style.RESET_ALL} Volver")
+        print()
+        
+        seleccion = solicitar_entrada("Seleccione una opción", str, [str(o) for o, _ in opciones] + ['0'])
+        
+        if seleccion == '1':
+            cursores.append(siguiente)
+            numero_inicial.append(numero_inicial[-1] + len(items))
+        elif seleccion == '2':
+            cursores.pop()
+            numero_inicial.pop()
+        else:
+            return
@@ -0,0 +1,204 @@
+"""
+Router de particiones mensuales de mediciones
+Las escrituras van a mediciones_YYYYMM y las consultas solo tocan las
+particiones que intersectan el rango pedido, en paralelo
+"""
+
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from config.db_config import PARTICIONES_CONFIG, SHARDING_CONFIG
+
+# La colección original sigue consultándose: conserva lo escrito antes de
+# particionar (y todo, si el particionado está deshabilitado)
+COLECCION_BASE = "mediciones"
+PATRON_PARTICION = re.compile(r"^mediciones_(\d{4})(\d{2})$")
+
+# Mismos índices que la colección base
+INDICES_PARTICION = [
+    ([('sensor_id', ASCENDING), ('timestamp', DESCENDING)], {'name': 'idx_sensor_timestamp'}),
+    ([('ciudad', ASCENDING), ('timestamp', DESCENDING)], {'name': 'idx_ciudad_timestamp'}),
+    ([('pais', ASCENDING), ('timestamp', DESCENDING)], {'name': 'idx_pais_timestamp'}),
+    ([('timestamp', ASCENDING)], {'name': 'idx_timestamp'}),
+    ([('archivo_parte', ASCENDING)], {'name': 'idx_archivo_parte', 'sparse': True}),
+    ([('expira_en', ASCENDING)], {'name': 'idx_expira_en', 'expireAfterSeconds': 0}),
+]
+
+# Segundos que se reutiliza el listado de particiones existentes
+_TTL_LISTADO = 60
+# Mientras falte la partición del mes en curso (la crea el primer proceso
+# que escribe en el mes) el listado se relee con este intervalo
+_TTL_SIN_MES_ACTUAL = 2
+
+_lock = threading.Lock()
+_particiones = {'nombres': None, 'leido': 0.0}
+_executor = None
+
+
+def nombre_particion(fecha):
+    """Nombre de la partición mensual de una fecha"""
+    return f"mediciones_{fecha:%Y%m}"
+
+
+def mes_particion(nombre):
+    """
+    Mes que cubre una partición
+
+    Returns:
+        (inicio, fin) del mes, o None si el nombre no es una partición
+    """
+    coincidencia = PATRON_PARTICION.match(nombre)
+    if not coincidencia:
+        return None
+
+    año, mes = int(coincidencia.group(1)), int(coincidencia.group(2))
+    inicio = datetime(año, mes, 1)
+    fin = datetime(año + 1, 1, 1) if mes == 12 else datetime(año, mes + 1, 1)
+    return inicio, fin
+
+
+def _listar_particiones(db):
+    """
+    Nombres de las particiones existentes (con caché corta)
+
+    Con el particionado habilitado, si el listado no tiene la partición del
+    mes en curso se relee antes: al cambiar de mes otro proceso puede
+    haberla creado y las lecturas no deben esperar el vencimiento normal
+    para verla.
+    """
+    with _lock:
+        antiguedad = time.time() - _particiones['leido']
+        vencido = (
+            _particiones['nombres'] is None
+            or antiguedad > _TTL_LISTADO
+            or (PARTICIONES_CONFIG['habilitado']
+                and antiguedad > _TTL_SIN_MES_ACTUAL
+                and nombre_particion(datetime.now()) not in _particiones['nombres'])
+        )
+        if vencido:
+            _particiones['nombres'] = sorted(
+                nombre for nombre in db.list_collection_names()
+                if PATRON_PARTICION.match(nombre)
+            )
+            _particiones['leido'] = time.time()
+        return list(_particiones['nombres'])
+
+
+def coleccion_escritura(db, fecha):
+    """
+    Colección donde se escribe una medición
+
+    Crea los índices la primera vez que se usa una partición nueva.
+    """
+    if not PARTICIONES_CONFIG['habilitado']:
+        return db[COLECCION_BASE]
+
+    nombre = nombre_particion(fecha)
+    if nombre not in _listar_particiones(db):
+        for claves, opciones in INDICES_PARTICION:
+            db[nombre].create_index(claves, **opciones)
+        if SHARDING_CONFIG['habilitado']:
+            fragmentar_coleccion(db, nombre)
+        with _lock:
+            _particiones['nombres'] = None
+
+    return db[nombre]
+
+
+def fragmentar_coleccion(db, nombre):
+    """
+    Shardea una colección de mediciones con la clave configurada
+    (no hace nada si ya está shardeada)
+    """
+    clave = SHARDING_CONFIG['clave_mediciones']
+    db[nombre].create_index(clave, name='idx_clave_shard')
+
+    espacio = f"{db.name}.{nombre}"
+    if db.client.config.collections.find_one({'_id': espacio, 'dropped': {'$ne': True}}):
+        return
+
+    db.client.admin.command('shardCollection', espacio, key=dict(clave))
+
+
+def colecciones_en_rango(db, fecha_inicio=None, fecha_fin=None, descendente=False):
+    """
+    Colecciones que pueden tener mediciones del rango (poda de particiones)
+
+    Args:
+        fecha_inicio: Inicio del rango o None
+        fecha_fin: Fin del rango (inclusive) o None
+        descendente: Más recientes primero (la base queda al final)
+
+    Returns:
+        Lista de colecciones
+    """
+    colecciones = []
+    for nombre in _listar_particiones(db):
+        inicio, fin = mes_particion(nombre)
+        if fecha_inicio and fin <= fecha_inicio:
+            continue
+        if fecha_fin and inicio > fecha_fin:
+            continue
+        colecciones.append(db[nombre])
+
+    if descendente:
+        colecciones.reverse()
+        colecciones.append(db[COLECCION_BASE])
+    else:
+        colecciones.insert(0, db[COLECCION_BASE])
+
+    return colecciones
+
+
+def consultar(colecciones, funcion):
+    """
+    Ejecuta una consulta sobre cada colección en paralelo
+
+    Args:
+        colecciones: Colecciones a consultar
+        funcion: Recibe una colección y devuelve su resultado parcial
+
+    Returns:
+        Lista de resultados parciales, en el orden de las colecciones
+    """
+    global _executor
+
+    if len(colecciones) == 1:
+        return [funcion(colecciones[0])]
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=PARTICIONES_CONFIG['hilos'], thread_name_prefix="particiones"
+            )
+
+    # Cada tarea corre en una copia del contexto de quien consulta
+    # (por ejemplo, el presupuesto de tiempo del proceso en ejecución)
+    futuros = [
+        _executor.submit(contextvars.copy_context().run, funcion, coleccion)
+        for coleccion in colecciones
+    ]
+    return [futuro.result() for futuro in futuros]
+
+
+def ultima_medicion(db, filtro):
+    """Medición más reciente que cumple el filtro, buscando de la partición más nueva hacia atrás"""
+    for coleccion in colecciones_en_rango(db, descendente=True):
+        medicion = coleccion.find_one(filtro, sort=[('timestamp', -1)])
+        if medicion:
+            return medicion
+    return None
+
+
+def eliminar_particion(db, nombre):
+    """Elimina una partición completa (drop en lugar de borrar documento por documento)"""
+    if not PATRON_PARTICION.match(nombre):
+        raise ValueError(f"{nombre} no es una partición de mediciones")
+
+    db[nombre].drop()
+    with _lock:
+        _particiones['nombres'] = None
@@ -0,0 +1,96 @@
+"""
+Presupuesto de tiempo y cancelación de procesos
+Cada ejecución corre con un límite según su tipo; las consultas lo reciben
+como maxTimeMS (MongoDB) o MAX_EXECUTION_TIME (MySQL) y los bucles largos
+lo verifican junto con la marca de cancelación en Redis
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from config.db_config import PROCESOS_CONFIG
+from utils.db_manager import db_manager
+
+# Presupuesto de la ejecución en curso (se copia a los hilos de particiones.consultar)
+_actual = contextvars.ContextVar('presupuesto', default=None)
+
+
+class TiempoAgotado(Exception):
+    """El proceso superó su presupuesto de tiempo"""
+
+
+class ProcesoCancelado(Exception):
+    """El usuario canceló el proceso mientras se ejecutaba"""
+
+
+def clave_cancelacion(solicitud_id):
+    """Clave Redis que marca una solicitud en proceso como cancelada"""
+    return f"proceso:cancelar:{solicitud_id}"
+
+
+def segundos_para(tipo):
+    """Presupuesto en segundos de un tipo de proceso"""
+    return PROCESOS_CONFIG['presupuesto_segundos'].get(tipo, PROCESOS_CONFIG['presupuesto_defecto'])
+
+
+@contextmanager
+def limitar(solicitud_id, segundos):
+    """Establece el presupuesto de la ejecución de una solicitud"""
+    token = _actual.set({
+        'solicitud_id': solicitud_id,
+        'segundos': segundos,
+        'limite': time.monotonic() + segundos
+    })
+    try:
+        yield
+    finally:
+        _actual.reset(token)
+
+
+def verificar():
+    """
+    Corta la ejecución si se agotó el tiempo o si el usuario la canceló
+    (sin presupuesto activo no hace nada)
+
+    Raises:
+        TiempoAgotado, ProcesoCancelado
+    """
+    presupuesto = _actual.get()
+    if presupuesto is None:
+        return
+
+    if time.monotonic() >= presupuesto['limite']:
+        raise TiempoAgotado(f"Se superó el tiempo máximo de {presupuesto['segundos']} segundos")
+
+    if db_manager.conectar_redis().exists(clave_cancelacion(presupuesto['solicitud_id'])):
+        raise ProcesoCancelado("Proceso cancelado por el usuario")
+
+
+def restante_ms():
+    """Milisegundos disponibles o None sin presupuesto activo (para find(max_time_ms=...))"""
+    verificar()
+    presupuesto = _actual.get()
+    if presupuesto is None:
+        return None
+    return max(1, int((presupuesto['limite'] - time.monotonic()) * 1000))
+
+
+def opciones_mongo():
+    """Opciones de aggregate() con el tiempo restante"""
+    ms = restante_ms()
+    return {'maxTimeMS': ms} if ms else {}
+
+
+def hint_mysql():
+    """Optimizer hint para un SELECT con el tiempo restante ('' sin presupuesto)"""
+    ms = restante_ms()
+    return f"/*+ MAX_EXECUTION_TIME({ms}) */ " if ms else ""
+
+
+def es_timeout(error):
+    """Indica si un error de MongoDB o MySQL se debe a que la consulta agotó su tiempo"""
+    if isinstance(error, TiempoAgotado):
+        return True
+    from mysql.connector import errorcode
+    from pymongo.errors import ExecutionTimeout
+    return isinstance(error, ExecutionTimeout) or getattr(error, 'errno', None) == errorcode.ER_QUERY_TIMEOUT
@@ -0,0 +1,250 @@
+"""
+Circuitos por motor de base de datos (mysql, mysql_replica, mongodb, redis)
+db_manager verifica las conexiones abiertas con un ping cada
+'verificar_segundos' y reconecta si hace falta. Tras 'fallas_para_abrir'
+verificaciones fallidas seguidas el circuito se abre: las llamadas fallan
+de inmediato con CircuitoAbierto, sin tocar la base, hasta que vence la
+espera. La espera se duplica con cada reapertura (con jitter, hasta
+'espera_maxima_segundos'); al vencer pasa una única verificación de prueba
+que cierra el circuito si sale bien o lo vuelve a abrir si falla.
+
+Los errores de conexión de las consultas (vistos por los envoltorios de
+utils/instrumentacion.py) cuentan como verificaciones fallidas, así un
+motor que se cae entre dos pings abre el circuito sin esperar al próximo.
+Las lecturas de dashboards guardan su último resultado (guardar_respaldo)
+para mostrarlo mientras el motor no responde.
+
+Los servicios devuelven un valor vacío ante cualquier error (la consola
+sigue andando); dentro de propagar_caidas() los errores de conexión se
+relanzan (relanzar_caida) para que la API los informe como 503.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from config.db_config import RESILIENCIA_CONFIG
+from utils.logger import logger
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+# Errores que indican que el motor no responde, por (módulo, clase): no se
+# importan los drivers para clasificarlos
+_CLASES_CONEXION = {
+    ('builtins', 'ConnectionError'),
+    ('builtins', 'TimeoutError'),
+    ('mysql.connector.errors', 'InterfaceError'),
+    ('pymongo.errors', 'ConnectionFailure'),
+    ('redis.exceptions', 'ConnectionError'),
+    ('redis.exceptions', 'TimeoutError')
+}
+
+# Errores de cliente MySQL de conexión perdida (llegan como OperationalError)
+_ERRNOS_CONEXION_MYSQL = {2002, 2003, 2006, 2013, 2055}
+
+# Lecturas de dashboards cuyo último resultado se conserva
+CAPACIDAD_RESPALDOS = 1000
+
+_propagar = contextvars.ContextVar('propagar_caidas', default=False)
+
+
+class CircuitoAbierto(ConnectionError):
+    """El motor está marcado como caído; la operación no se intentó"""
+
+    def __init__(self, motor, segundos):
+        super().__init__(f"{motor} no disponible (reintento en {segundos:.0f}s)")
+        self.motor = motor
+        self.segundos = segundos
+
+
+class Circuito:
+    """Estado de la conexión a un motor"""
+
+    def __init__(self, motor):
+        self.motor = motor
+        self.estado = CERRADO
+        self.fallas = 0
+        self.aperturas = 0
+        self.reintento_en = 0.0
+        self.verificado_en = 0.0
+        self.ultimo_error = None
+        self._lock = threading.Lock()
+
+    def restante(self):
+        """Segundos hasta la próxima verificación de prueba (0 si el circuito no está abierto)"""
+        if self.estado == CERRADO:
+            return 0.0
+        return max(0.0, self.reintento_en - time.monotonic())
+
+    def verificar(self, comprobar, forzar=False):
+        """
+        Corre 'comprobar' (ping o reconexión) si corresponde y registra el resultado
+
+        Args:
+            comprobar: Función sin argumentos que lanza excepción si el motor no responde
+            forzar: Verificar aunque no haya vencido el intervalo (por ejemplo, sin conexión)
+
+        Raises:
+            CircuitoAbierto: El circuito está abierto (o otra verificación de prueba está en curso)
+        """
+        with self._lock:
+            if self.estado == ABIERTO:
+                restante = self.reintento_en - time.monotonic()
+                if restante > 0:
+                    raise CircuitoAbierto(self.motor, restante)
+                self.estado = SEMIABIERTO
+            elif self.estado == SEMIABIERTO:
+                raise CircuitoAbierto(self.motor, 0)
+            elif not forzar and time.monotonic() - self.verificado_en < RESILIENCIA_CONFIG['verificar_segundos']:
+                return
+
+        try:
+            comprobar()
+        except Exception as e:
+            self._falla(e)
+            raise
+        self._exito()
+
+    def _exito(self):
+        with self._lock:
+            if self.estado != CERRADO:
+                logger.info("Circuito %s cerrado: conexión restablecida", self.motor, motor=self.motor)
+            self.estado = CERRADO
+            self.fallas = 0
+            self.aperturas = 0
+            self.verificado_en = time.monotonic()
+
+    def _falla(self, error):
+        with self._lock:
+            self.fallas += 1
+            self.ultimo_error = str(error)
+            # Sin abrir, la próxima llamada vuelve a verificar
+            self.verificado_en = 0.0
+            if self.estado == CERRADO and self.fallas < RESILIENCIA_CONFIG['fallas_para_abrir']:
+                return
+
+            self.aperturas += 1
+            espera = min(
+                RESILIENCIA_CONFIG['espera_base_segundos'] * 2 ** (self.aperturas - 1),
+                RESILIENCIA_CONFIG['espera_maxima_segundos']
+            )
+            # Jitter: los procesos que vieron caer la base no vuelven todos a la vez
+            espera *= random.uniform(0.5, 1.0)
+            self.estado = ABIERTO
+            self.reintento_en = time.monotonic() + espera
+            logger.warning("Circuito %s abierto por %.1fs: %s", self.motor, espera, error,
+                           motor=self.motor, fallas=self.fallas, aperturas=self.aperturas)
+
+
+_circuitos = {}
+_lock_circuitos = threading.Lock()
+_respaldos = OrderedDict()
+_lock_respaldos = threading.Lock()
+
+
+def es_error_de_conexion(error):
+    """Indica si el error es de conexión (motor caído o inalcanzable) y no de la consulta"""
+    if isinstance(error, CircuitoAbierto):
+        return False
+    if type(error).__module__.startswith('mysql.') and getattr(error, 'errno', None) in _ERRNOS_CONEXION_MYSQL:
+        return True
+    return any((clase.__module__, clase.__name__) in _CLASES_CONEXION for clase in type(error).__mro__)
+
+
+def reportar_error(motor, error):
+    """
+    Cuenta un error de una consulta como verificación fallida del circuito
+    del motor, si es de conexión (los demás se ignoran)
+    """
+    if es_error_de_conexion(error):
+        circuito(motor)._falla(error)
+
+
+def circuito(motor):
+    """Circuito de un motor (se crea con el primer uso)"""
+    if motor not in _circuitos:
+        with _lock_circuitos:
+            _circuitos.setdefault(motor, Circuito(motor))
+    return _circuitos[motor]
+
+
+def caidos(motores):
+    """Motores de la lista con el circuito abierto y la espera sin vencer"""
+    return [m for m in motores if m in _circuitos and _circuitos[m].restante() > 0]
+
+
+def estado():
+    """
+    Estado de los circuitos usados por este proceso
+
+    Returns:
+        Diccionario motor -> {estado, fallas, aperturas, reintento_en_segundos, ultimo_error}
+    """
+    return {
+        motor: {
+            'estado': c.estado,
+            'fallas': c.fallas,
+            'aperturas': c.aperturas,
+            'reintento_en_segundos': round(c.restante(), 1),
+            'ultimo_error': c.ultimo_error
+        }
+        for motor, c in sorted(_circuitos.items())
+    }
+
+
+@contextmanager
+def propagar_caidas():
+    """Las llamadas a servicios del bloque relanzan los errores de conexión"""
+    token = _propagar.set(True)
+    try:
+        yield
+    finally:
+        _propagar.reset(token)
+
+
+def relanzar_caida(error):
+    """
+    Relanza 'error' si es de conexión (o CircuitoAbierto) y el llamador pidió
+    propagar_caidas(); si no, el servicio lo maneja como siempre
+    """
+    if _propagar.get() and (isinstance(error, CircuitoAbierto) or es_error_de_conexion(error)):
+        raise error
+
+
+def guardar_respaldo(clave, valor):
+    """
+    Conserva el último resultado de una lectura
+
+    Returns:
+        El mismo valor
+    """
+    with _lock_respaldos:
+        _respaldos[clave] = (valor, datetime.now())
+        _respaldos.move_to_end(clave)
+        while len(_respaldos) > CAPACIDAD_RESPALDOS:
+            _respaldos.popitem(last=False)
+    return valor
+
+
+def respaldo(clave):
+    """
+    Último resultado guardado de una lectura
+
+    Returns:
+        (valor, leído_en) o None si no hay
+    """
+    with _lock_respaldos:
+        return _respaldos.get(clave)
+
+
+def reiniciar():
+    """Olvida el estado de todos los circuitos y los respaldos"""
+    with _lock_circuitos:
+        _circuitos.clear()
+    with _lock_respaldos:
+        _respaldos.clear()
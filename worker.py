@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Worker en segundo plano
+Encola los procesos programados, ejecuta la cola de procesos pendientes,
+el ciclo de facturación periódico, el archivado de mediciones antiguas y
+el snapshot de indicadores de los dashboards; expone las métricas de
+instrumentación (/metrics y volcado JSON). Las tareas que dependen de una
+base caída se saltean hasta que su circuito permite reintentar
+Uso: python worker.py
+     python worker.py --una-vez [tarea ...]   (corre las tareas una vez y termina)
+
+Cada tarea importa sus servicios al ejecutarse: una corrida de una sola
+tarea (por ejemplo desde cron) no carga el resto de la aplicación.
+"""
+
+import argparse
+import time
+
+from config.db_config import FACTURACION_CONFIG, WORKER_CONFIG
+from utils.db_manager import db_manager
+from utils.logger import logger
+from utils import instrumentacion, resiliencia
+
+
+def ejecutar_programados():
+    """Crea las solicitudes de los procesos programados que llegaron a su horario"""
+    from services.programador_service import ProgramadorService
+
+    creadas = ProgramadorService.encolar_vencidos()
+    if creadas:
+        logger.info("Programador: %s solicitudes encoladas", creadas)
+
+
+def ejecutar_pendientes():
+    """Vacía la cola de procesos pendientes"""
+    from services.ejecucion_service import EjecucionService
+
+    while True:
+        success, mensaje = EjecucionService.ejecutar_proceso_pendiente()
+        if not success:
+            if "No hay procesos pendientes" not in mensaje:
+                logger.error("Worker: %s", mensaje)
+            return
+
+
+def ejecutar_facturacion():
+    """Emite las facturas del período si el ciclo está vencido"""
+    from services.facturacion_service import FacturacionService
+
+    if FACTURACION_CONFIG['modo'] != 'ciclo' or not FacturacionService.ciclo_vencido():
+        return
+
+    success, mensaje, _ = FacturacionService.facturar_ciclo()
+    if success:
+        logger.info("Ciclo de facturación: %s", mensaje)
+    else:
+        logger.warning("Ciclo de facturación: %s", mensaje)
+
+
+def ejecutar_retencion():
+    """Archiva las mediciones que superaron la retención de datos crudos"""
+    from services.retencion_service import RetencionService
+
+    if not RetencionService.ejecucion_vencida():
+        return
+
+    success, mensaje = RetencionService.archivar()
+    if success:
+        logger.info("Retención: %s", mensaje)
+    else:
+        logger.warning("Retención: %s", mensaje)
+
+
+def ejecutar_snapshot():
+    """Regenera los indicadores de los dashboards si el snapshot está vencido"""
+    from services.snapshot_service import SnapshotService
+
+    if not SnapshotService.vencido():
+        return
+
+    success, mensaje = SnapshotService.generar()
+    if not success:
+        logger.warning("Snapshot: %s", mensaje)
+
+
+def ejecutar_volcado_metricas():
+    """Vuelca las métricas de instrumentación a JSON si corresponde"""
+    if instrumentacion.volcado_vencido():
+        instrumentacion.volcar_json()
+
+
+# Tareas en el orden en que corren en cada vuelta, con los motores que usan.
+# Una tarea cuyo motor tiene el circuito abierto se saltea hasta que vence
+# la espera (utils/resiliencia.py), en lugar de fallar contra la base caída
+TAREAS = {
+    'programados': (ejecutar_programados, ('mysql', 'redis')),
+    'pendientes': (ejecutar_pendientes, ('mysql', 'mongodb', 'redis')),
+    'facturacion': (ejecutar_facturacion, ('mysql', 'redis')),
+    'retencion': (ejecutar_retencion, ('mongodb', 'redis')),
+    'snapshot': (ejecutar_snapshot, ('mysql', 'mongodb', 'redis')),
+    'metricas': (ejecutar_volcado_metricas, ()),
+}
+
+
+def ejecutar_tareas(nombres):
+    """
+    Corre las tareas indicadas, salteando las que dependen de un motor caído
+
+    Returns:
+        True si ninguna tarea falló
+    """
+    exito = True
+    for nombre in nombres:
+        tarea, motores = TAREAS[nombre]
+        caidos = resiliencia.caidos(motores)
+        if caidos:
+            logger.debug("Tarea %s salteada: %s no disponible", nombre, ', '.join(caidos))
+            continue
+        try:
+            tarea()
+        except resiliencia.CircuitoAbierto as e:
+            logger.warning("Tarea %s interrumpida: %s", nombre, e)
+            exito = False
+        except Exception as e:
+            logger.error("Error en tarea %s", nombre, excepcion=e)
+            exito = False
+    return exito
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Worker en segundo plano")
+    parser.add_argument('--una-vez', nargs='*', metavar='TAREA', choices=list(TAREAS),
+                        help=f"corre las tareas una vez y termina (defecto: todas): {', '.join(TAREAS)}")
+    args = parser.parse_args()
+
+    if args.una_vez is not None:
+        try:
+            exito = ejecutar_tareas(args.una_vez or list(TAREAS))
+        finally:
+            db_manager.cerrar_conexiones()
+        raise SystemExit(0 if exito else 1)
+
+    print(f"[*] Worker iniciado (facturación: {FACTURACION_CONFIG['modo']})")
+    servidor = instrumentacion.servir()
+    if servidor:
+        print(f"[*] Métricas en http://localhost:{servidor.server_address[1]}/metrics")
+    try:
+        while True:
+            ejecutar_tareas(list(TAREAS))
+            time.sleep(WORKER_CONFIG['intervalo_segundos'])
+    except KeyboardInterrupt:
+        print("\n[!] Worker detenido")
+    finally:
+        db_manager.cerrar_conexiones()
+
+
+if __name__ == "__main__":
+    main()